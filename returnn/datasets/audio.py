@@ -12,7 +12,10 @@ from .cached2 import CachedDataset2
 from .util.feature_extraction import ExtractAudioFeatures
 from .util.vocabulary import Vocabulary
 from .util.strings import str_to_numpy_array
+from .util.seq_index_cache import SeqIndex
+from .util.feature_cache import FeatureCache, get_feature_cache_dir
 from returnn.util.basic import PY3
+from returnn.log import log
 
 
 class OggZipDataset(CachedDataset2):
@@ -51,6 +54,7 @@ class OggZipDataset(CachedDataset2):
         zip_audio_files_have_name_as_prefix=True,
         fixed_random_subset=None,
         epoch_wise_filter=None,
+        feature_cache=False,
         **kwargs,
     ):
         """
@@ -70,6 +74,13 @@ class OggZipDataset(CachedDataset2):
           i.e. not dependent on the epoch.
           It will use an internally hardcoded fixed random seed, i.e. it's deterministic.
         :param dict|None epoch_wise_filter: see init_seq_order
+        :param bool|str feature_cache: if enabled, the extracted features are stored on disk
+            in the first epoch (via :class:`FeatureCache`), and later epochs read them from there,
+            instead of decoding the audio and extracting the features again.
+            If str, it is the base cache dir, otherwise :func:`returnn.util.basic.get_cache_dir` is used.
+            The cache is per zip file (or audio dir), meta data file and feature options
+            (incl. the content of the norm files).
+            It is bypassed when the features are not deterministic (e.g. ``random_permute``).
         """
         import os
         import zipfile
@@ -161,6 +172,14 @@ class OggZipDataset(CachedDataset2):
             assert isinstance(epoch_wise_filter, EpochWiseFilter)
             self.epoch_wise_filter = epoch_wise_filter
         self._seq_order = None  # type: typing.Optional[typing.Sequence[int]]
+        self._feature_cache = feature_cache
+        self._feature_caches: Optional[List[FeatureCache]] = None  # per zip index, lazily loaded
+        if feature_cache and self.feature_extractor and self.feature_extractor.get_cache_key_opts() is None:
+            print(
+                "%s: features are not deterministic (random_permute, pre_process or post_process), "
+                "feature_cache is not used" % self,
+                file=log.v3,
+            )
 
     def _read(self, filename, zip_index):
         """
@@ -189,8 +208,19 @@ class OggZipDataset(CachedDataset2):
         """
         from returnn.util.literal_py_to_pickle import literal_eval
 
-        data: List[Dict[str, Any]] = literal_eval(self._read("%s.txt" % self._names[zip_index], zip_index))
-        assert data and isinstance(data, list)
+        index_cache = self._get_seq_index_cache(
+            [self._get_meta_filename(zip_index)], name="OggZipDataset", opts={"name": self._names[zip_index]}
+        )
+        index = index_cache.load() if index_cache else None
+        if index:
+            data = self._entries_from_seq_index(index)
+        else:
+            data: List[Dict[str, Any]] = literal_eval(self._read("%s.txt" % self._names[zip_index], zip_index))
+            assert data and isinstance(data, list)
+            if index_cache:
+                index = self._seq_index_from_entries(data)
+                if index:
+                    index_cache.save(index)
         first_entry = data[0]
         assert isinstance(first_entry, dict)
         assert isinstance(first_entry["text"], str)
@@ -213,6 +243,65 @@ class OggZipDataset(CachedDataset2):
             data[:] = [entry for entry in data if self._get_tag_from_info_dict(entry) in self.segments]
         return data, example_entry
 
+    def _get_meta_filename(self, zip_index: int) -> str:
+        """
+        :param zip_index:
+        :return: filename which contains the meta data (list of entries) for this zip index
+        """
+        name = self._names[zip_index]
+        if not self._use_zip_files:
+            return "%s/%s.txt" % (self.paths[0], name)
+        if name in self._separate_txt_files:
+            return self._separate_txt_files[name]
+        return self.paths[zip_index]
+
+    def _get_feature_cache_source_files(self, zip_index: int) -> List[str]:
+        """
+        :param zip_index:
+        :return: files which the features of this zip index depend on. their mtime and size go into the cache key.
+            Without zip files, this is the directory of the audio files,
+            which only covers added, removed or renamed files, but not files which are modified inplace.
+        """
+        files = [self._get_meta_filename(zip_index)]
+        audio_path = self.paths[zip_index] if self._use_zip_files else self.paths[0]
+        if audio_path not in files:
+            files.append(audio_path)
+        return files
+
+    _SeqIndexStrKeys = {"text", "file", "seq_name"}
+
+    @classmethod
+    def _seq_index_from_entries(cls, entries: List[Dict[str, Any]]) -> Optional[SeqIndex]:
+        """
+        :param entries: as in the meta data txt
+        :return: the entries in columnar format, or None if the entries have other (or inconsistent) keys or types
+        """
+        keys = set(entries[0].keys())
+        if "duration" not in keys or not keys.issubset(cls._SeqIndexStrKeys | {"duration"}):
+            return None
+        if any(entry.keys() != keys for entry in entries):
+            return None
+        strings = {key: [entry[key] for entry in entries] for key in sorted(keys - {"duration"})}
+        if not all(isinstance(v, str) for col in strings.values() for v in col):
+            return None
+        durations = [entry["duration"] for entry in entries]
+        if not all(isinstance(v, float) for v in durations):
+            return None
+        return SeqIndex(seq_lens={"duration": numpy.array(durations, dtype="float64")}, strings=strings)
+
+    @staticmethod
+    def _entries_from_seq_index(index: SeqIndex) -> List[Dict[str, Any]]:
+        """
+        :param index: from :func:`_seq_index_from_entries`
+        :return: entries, as in the meta data txt
+        """
+        keys = list(index.strings.keys())
+        columns = [index.strings[key] for key in keys]
+        return [
+            dict(zip(keys, values), duration=duration)
+            for duration, *values in zip(index.seq_lens["duration"].tolist(), *columns)
+        ]
+
     def _lazy_init(self):
         """
         :return: entries
@@ -255,16 +344,48 @@ class OggZipDataset(CachedDataset2):
 
         self._data = data
 
+        if self._feature_cache and self.feature_extractor:
+            opts = self.feature_extractor.get_cache_key_opts()
+            if opts is not None:
+                self._feature_caches = [
+                    FeatureCache(
+                        get_feature_cache_dir(
+                            self._get_feature_cache_source_files(zip_index),
+                            name="OggZipDataset-%s" % self._names[zip_index],
+                            opts=opts,
+                            cache_dir=self._feature_cache if isinstance(self._feature_cache, str) else None,
+                        ),
+                        frame_shape=self._get_feature_frame_shape(),
+                    )
+                    for zip_index in range(len(self._names))
+                ]
+
+    def _get_feature_frame_shape(self) -> Tuple[int, ...]:
+        """
+        :return: shape of the features without the time axis
+        """
+        if self.feature_extractor.num_channels is not None:
+            return self.feature_extractor.num_channels, self.feature_extractor.get_feature_dimension()
+        return (self.feature_extractor.get_feature_dimension(),)
+
     def finish_epoch(self, *, free_resources: bool = False):
         """finish epoch"""
         super().finish_epoch()
         self._seq_order = None
         self._num_seqs = 0
+        if self._feature_caches:
+            for cache in self._feature_caches:
+                cache.flush()
+                print("%s: feature cache %s" % (self, cache.get_stats_str()), file=log.v5)
         if free_resources:
             # Basically undo the _lazy_init, such that _lazy_init would init again next time.
             self._data = None
             self.segments = None
             self._zip_files = None
+            if self._feature_caches:
+                for cache in self._feature_caches:
+                    cache.close()
+            self._feature_caches = None
 
     def _read_segment_list(self, segment_file):
         """
@@ -302,6 +423,9 @@ class OggZipDataset(CachedDataset2):
             return True
 
         self._lazy_init()
+        if self._feature_caches:
+            for cache in self._feature_caches:
+                cache.refresh()  # e.g. filled by other workers in the last epoch
         random_seed = self._get_random_seed_for_epoch(epoch=epoch)
         self._audio_random.seed(random_seed)
         if self.targets:
@@ -463,8 +587,15 @@ class OggZipDataset(CachedDataset2):
         self._lazy_init()
         seq_tag = self._get_tag_from_info_dict(self._data[corpus_seq_idx])
         if self.feature_extractor:
-            with self._open_audio_file(corpus_seq_idx) as audio_file:
-                features = self.feature_extractor.get_audio_features_from_raw_bytes(audio_file, seq_name=seq_tag)
+            feature_cache = None
+            if self._feature_caches:
+                feature_cache = self._feature_caches[self._data[corpus_seq_idx]["_zip_file_index"]]
+            features = feature_cache.get(seq_tag) if feature_cache is not None else None
+            if features is None:
+                with self._open_audio_file(corpus_seq_idx) as audio_file:
+                    features = self.feature_extractor.get_audio_features_from_raw_bytes(audio_file, seq_name=seq_tag)
+                if feature_cache is not None:
+                    feature_cache.put(seq_tag, features)
         else:
             features = numpy.zeros((), dtype=numpy.float32)  # currently the API requires some dummy values...
         targets, txt = self._get_transcription(corpus_seq_idx)
@@ -24,6 +24,7 @@ from typing import Optional, Any, Union, Type, Dict, Sequence, List, Callable
 from returnn.log import log
 from returnn.engine.batch import Batch, BatchSetGenerator
 from returnn.datasets.util.vocabulary import Vocabulary
+from returnn.datasets.util.seq_index_cache import SeqIndex, SeqIndexCache
 from returnn.util.basic import try_run, NumbersDict, OptionalNotImplementedError
 from returnn.tensor import TensorDict
 
@@ -98,6 +99,7 @@ class Dataset(object):
         seq_list_filter_file=None,
         unique_seq_tags=False,
         seq_order_seq_lens_file=None,
+        seq_index_cache=False,
         shuffle_frames_of_nseqs=0,
         min_chunk_size=0,
         chunking_variance=0,
@@ -123,6 +125,10 @@ class Dataset(object):
         :param str|None seq_list_filter_file: defines a subset of sequences (by tag) to use
         :param bool unique_seq_tags: uniquify seqs with same seq tags in seq order
         :param str|None seq_order_seq_lens_file: for seq order, use the seq length given by this file
+        :param bool|str seq_index_cache: persistently cache seq tags and seq lengths which are otherwise
+          obtained by scanning the corpus at startup, e.g. the seq_order_seq_lens_file.
+          If str, it specifies the cache directory.
+          See :mod:`returnn.datasets.util.seq_index_cache`. Not all datasets make use of this.
         :param int shuffle_frames_of_nseqs: shuffles the frames. not always supported
         :param None|int estimated_num_seqs: for progress reporting in case the real num_seqs is unknown
         """
@@ -146,6 +152,7 @@ class Dataset(object):
         self.unique_seq_tags = unique_seq_tags
         self._seq_order_seq_lens_file = seq_order_seq_lens_file
         self._seq_order_seq_lens_by_idx = None
+        self.seq_index_cache = seq_index_cache
         # There is probably no use case for combining the two, so avoid potential misconfiguration.
         assert (
             self.partition_epoch == 1 or self.repeat_epoch == 1
@@ -431,29 +438,70 @@ class Dataset(object):
         :param int seq_idx:
         :rtype: int
         """
-        if not self._seq_order_seq_lens_by_idx:
-            assert self._seq_order_seq_lens_file
-            if self._seq_order_seq_lens_file.endswith(".gz"):
-                import gzip
+        return self._get_seq_order_seq_lens()[seq_idx].item()
 
-                raw = gzip.GzipFile(self._seq_order_seq_lens_file, "rb").read()
+    def _get_seq_order_seq_lens(self):
+        """
+        :return: seq lens from seq_order_seq_lens_file, seq_idx -> len
+        :rtype: numpy.ndarray
+        """
+        if self._seq_order_seq_lens_by_idx is None:
+            assert self._seq_order_seq_lens_file
+            index_cache = self._get_seq_index_cache([self._seq_order_seq_lens_file], name="seq_order_seq_lens")
+            index = index_cache.load() if index_cache else None
+            if index:
+                seq_lens = dict(zip(index.tags, index.seq_lens["seq_len"].tolist()))
             else:
-                raw = open(self._seq_order_seq_lens_file, "rb").read()
-            seq_lens = eval(raw)
-            assert isinstance(seq_lens, dict)
+                if self._seq_order_seq_lens_file.endswith(".gz"):
+                    import gzip
+
+                    raw = gzip.GzipFile(self._seq_order_seq_lens_file, "rb").read()
+                else:
+                    raw = open(self._seq_order_seq_lens_file, "rb").read()
+                seq_lens = eval(raw)
+                assert isinstance(seq_lens, dict)
+                if index_cache:
+                    index_cache.save(
+                        SeqIndex(tags=list(seq_lens.keys()), seq_lens={"seq_len": list(seq_lens.values())})
+                    )
             all_tags = self.get_all_tags()
-            self._seq_order_seq_lens_by_idx = [seq_lens[tag] for tag in all_tags]
-        return self._seq_order_seq_lens_by_idx[seq_idx]
+            self._seq_order_seq_lens_by_idx = numpy.array([seq_lens[tag] for tag in all_tags])
+        return self._seq_order_seq_lens_by_idx
+
+    def _get_seq_index_cache(
+        self, files: Sequence[str], *, name: str, opts: Optional[Dict[str, Any]] = None
+    ) -> Optional[SeqIndexCache]:
+        """
+        :param files: the files the index is derived from
+        :param name: e.g. the dataset class name
+        :param opts: other options which influence the index
+        :return: cache, if enabled via the seq_index_cache option
+        """
+        if not self.seq_index_cache:
+            return None
+        return SeqIndexCache(
+            files,
+            name=name,
+            opts=opts,
+            cache_dir=self.seq_index_cache if isinstance(self.seq_index_cache, str) else None,
+        )
 
-    def get_seq_order_for_epoch(self, epoch, num_seqs, get_seq_len=None):
+    def get_seq_order_for_epoch(self, epoch, num_seqs, get_seq_len=None, *, seq_lens=None):
         """
         Returns the order of the given epoch.
         This is mostly a static method, except that is depends on the configured type of ordering,
         such as 'default' (= as-is), 'sorted' or 'random'. 'sorted' also uses the sequence length.
 
+        All the orderings which use the sequence length operate on a Numpy array of all the seq lens.
+        If the dataset has them already as an array, it should pass ``seq_lens``,
+        otherwise they are collected once via ``get_seq_len``.
+
         :param int|None epoch: for 'random', this determines the random seed
         :param int num_seqs:
         :param ((int) -> int)|None get_seq_len: function (originalSeqIdx: int) -> int
+        :param numpy.ndarray|(()->(numpy.ndarray|None))|None seq_lens: originalSeqIdx -> len, shape (num_seqs,).
+            alternative to get_seq_len. can also be a function, which is only called when the seq lens are needed.
+            if this returns None, get_seq_len is used.
         :return: the order for the given epoch. such that seq_idx -> underlying idx
         :rtype: typing.Sequence[int]
         """
@@ -468,7 +516,24 @@ class Dataset(object):
         assert num_seqs == int(num_seqs)
         num_seqs = int(num_seqs)
         if self._seq_order_seq_lens_file:
-            get_seq_len = self._get_seq_order_seq_lens_by_idx
+            seq_lens = self._get_seq_order_seq_lens()
+
+        def _get_seq_lens() -> numpy.ndarray:
+            nonlocal seq_lens
+            if callable(seq_lens):
+                seq_lens = seq_lens()
+            if seq_lens is None:
+                assert get_seq_len, "%s: seq ordering %r needs the seq lens" % (self, self.seq_ordering)
+                seq_lens = [get_seq_len(i) for i in range(num_seqs)]
+            seq_lens = numpy.asarray(seq_lens)
+            assert seq_lens.shape == (num_seqs,), "%s: seq lens shape %r, num seqs %i" % (
+                self,
+                seq_lens.shape,
+                num_seqs,
+            )
+            if seq_lens.dtype.kind == "u":  # we might negate it
+                seq_lens = seq_lens.astype("int64")
+            return seq_lens
 
         if self.seq_ordering == "default":
             seq_index = range(num_seqs)
@@ -483,10 +548,8 @@ class Dataset(object):
         elif self.seq_ordering == "reverse":
             seq_index = range(num_seqs - 1, -1, -1)  # type: Union[range, typing.Sequence[int]]
         elif self.seq_ordering in ["sorted", "sorted_reverse"]:
-            assert get_seq_len
             reverse = -1 if self.seq_ordering == "sorted_reverse" else 1
-            seq_lens = [reverse * get_seq_len(i) for i in range(num_seqs)]
-            seq_index = numpy.argsort(seq_lens, kind="stable")
+            seq_index = numpy.argsort(reverse * _get_seq_lens(), kind="stable")
         elif self.seq_ordering.startswith("random"):
             tmp = self.seq_ordering.split(":")
             nth = int(tmp[1]) if len(tmp) > 1 else 1
@@ -496,7 +559,7 @@ class Dataset(object):
             seq_index = random_generator.permutation(num_seqs)
         elif self.seq_ordering.startswith("sort_bin_shuffle"):
             # Shuffle seqs, sort by length, and shuffle bins (then shuffle seqs within each bin if sort_bin_shuffle_x2).
-            assert get_seq_len
+            seq_lens_ = _get_seq_lens()
             tmp = self.seq_ordering.split(":")[1:]
             # Keep this deterministic! Use fixed seed.
             if len(tmp) <= 1:
@@ -505,8 +568,9 @@ class Dataset(object):
                 nth = int(tmp[1])
             rnd_seed = self._get_random_seed_for_epoch(epoch=epoch, num_epochs_fixed=nth)
             random_generator = numpy.random.RandomState(rnd_seed)
-            seq_index = random_generator.permutation(num_seqs).tolist()  # type: Union[List[int], numpy.ndarray]
-            seq_index.sort(key=get_seq_len)  # Sort by length, starting with shortest.
+            seq_index = random_generator.permutation(num_seqs)
+            # Sort by length, starting with shortest. Stable, i.e. equal lengths keep the shuffled order.
+            seq_index = seq_index[numpy.argsort(seq_lens_[seq_index], kind="stable")]
             if len(tmp) == 0:
                 bins = 2
             else:
@@ -518,15 +582,15 @@ class Dataset(object):
             out_index = []
             for i in bin_ids:
                 if i == bins - 1:
-                    part = seq_index[i * len(seq_index) // bins :][:]
+                    part = seq_index[i * len(seq_index) // bins :].copy()
                 else:
-                    part = seq_index[i * len(seq_index) // bins : (i + 1) * len(seq_index) // bins][:]
+                    part = seq_index[i * len(seq_index) // bins : (i + 1) * len(seq_index) // bins].copy()
                 if self.seq_ordering.startswith("sort_bin_shuffle_x2"):
                     random_generator.shuffle(part)  # Shuffle within the bin.
                 out_index.append(part)
             seq_index = numpy.concatenate(out_index)
         elif self.seq_ordering.startswith("laplace"):
-            assert get_seq_len
+            seq_lens_ = _get_seq_lens()
             tmp = self.seq_ordering.split(":")[1:]
             if len(tmp) == 0:
                 bins = 2
@@ -541,30 +605,36 @@ class Dataset(object):
                 nth = int(tmp[1])
             rnd_seed = self._get_random_seed_for_epoch(epoch=epoch, num_epochs_fixed=nth)
             random_generator = numpy.random.RandomState(rnd_seed)
-            seq_index = random_generator.permutation(num_seqs)  # type: Union[numpy.ndarray, List[int]]
+            seq_index = random_generator.permutation(num_seqs)
             out_index = []
             for i in range(bins):
                 if i == bins - 1:
-                    part = seq_index[i * len(seq_index) // bins :].tolist()
+                    part = seq_index[i * len(seq_index) // bins :]
                 else:
-                    part = seq_index[i * len(seq_index) // bins : (i + 1) * len(seq_index) // bins].tolist()
-                part.sort(key=get_seq_len, reverse=(i % 2 == 1))
-                out_index += part
-            seq_index = out_index
+                    part = seq_index[i * len(seq_index) // bins : (i + 1) * len(seq_index) // bins]
+                # Stable sort, ascending or descending by length. Equal lengths keep the shuffled order.
+                part_lens = seq_lens_[part]
+                part = part[numpy.argsort(-part_lens if i % 2 == 1 else part_lens, kind="stable")]
+                out_index.append(part)
+            seq_index = numpy.concatenate(out_index)
         else:
             assert False, "invalid batching specified: " + self.seq_ordering
 
         if self.unique_seq_tags:
             # Note: This is as generic as possible, but requires that get_all_tags is implemented.
             all_seq_tags = self.get_all_tags()
-            used_seq_tags = set()
-            seq_index = [
-                i for i in seq_index if (all_seq_tags[i] not in used_seq_tags, used_seq_tags.add(all_seq_tags[i]))[0]
-            ]
+            # Map the tags to int ids, such that we can use numpy.unique. Keep the first occurrence in the order.
+            tag_ids = {}  # type: Dict[str,int]
+            all_seq_tag_ids = numpy.fromiter(
+                (tag_ids.setdefault(tag, len(tag_ids)) for tag in all_seq_tags), dtype="int64", count=len(all_seq_tags)
+            )
+            seq_index = numpy.asarray(seq_index)
+            _, first_idx = numpy.unique(all_seq_tag_ids[seq_index], return_index=True)
+            seq_index = seq_index[numpy.sort(first_idx)]
         if partition_epoch > 1:
             seq_index = self._apply_partition_epoch(seq_index, partition_epoch, epoch)
         if repeat_epoch > 1:
-            seq_index = list(seq_index) * repeat_epoch
+            seq_index = numpy.tile(numpy.asarray(seq_index), repeat_epoch)
         if self.seq_tags_filter is not None:
             # Note: This is as generic as possible, but requires that get_all_tags is implemented.
             assert len(seq_index)
@@ -575,9 +645,13 @@ class Dataset(object):
                 self.get_total_num_seqs(),
             )
             old_seq_index = seq_index
-            seq_index = [i for i in seq_index if all_seq_tags[i] in self.seq_tags_filter]
+            seq_tags_mask = numpy.fromiter(
+                (tag in self.seq_tags_filter for tag in all_seq_tags), dtype=bool, count=len(all_seq_tags)
+            )
+            seq_index = numpy.asarray(seq_index)
+            seq_index = seq_index[seq_tags_mask[seq_index]]
             assert (
-                seq_index
+                len(seq_index) > 0
             ), "%s: empty after applying seq_list_filter_file. Example filter tags: %r, used tags: %r" % (
                 self,
                 sorted(self.seq_tags_filter)[:3],
@@ -640,6 +714,18 @@ class Dataset(object):
         self.rnd_seq_drop = Random(self._get_random_seed_for_epoch(epoch=epoch))
         return False
 
+    def skip_to_seq_idx(self, seq_idx: int):
+        """
+        Continues the iteration over the current epoch (after :func:`init_seq_order`) at ``seq_idx``,
+        i.e. the seqs before are never loaded.
+        This is used to resume in the middle of an epoch, e.g. from a step-level checkpoint.
+
+        By default, this does nothing, as :func:`load_seqs` can start at any seq idx.
+        Datasets which load seqs sequentially (e.g. :class:`CachedDataset2`) need to override this.
+
+        :param seq_idx:
+        """
+
     def finish_epoch(self, *, free_resources: bool = False):
         """
         This would get called at the end of the epoch (currently optional only).
@@ -705,6 +791,18 @@ class Dataset(object):
         else:
             return self.get_targets(key, seq_idx)
 
+    def get_data_batch(self, seq_idxs: Sequence[int], key: str) -> List[numpy.ndarray]:
+        """
+        Bulk version of :func:`get_data`, e.g. for the batch assembly in :class:`FeedDictDataProvider`.
+        Subclasses can override this when they can look up multiple seqs more efficiently.
+        The seqs must have been loaded via :func:`load_seqs` before.
+
+        :param seq_idxs: sorted seq indices
+        :param key: data-key, e.g. "data" or "classes"
+        :return: list of features or targets, same as :func:`get_data`, for each seq idx
+        """
+        return [self.get_data(seq_idx, key) for seq_idx in seq_idxs]
+
     def get_input_data(self, sorted_seq_idx: int) -> numpy.ndarray:
         """
         DEPRECATED: Some older classes still use this deprecated API,
@@ -90,7 +90,10 @@ class CachedDataset(Dataset):
             seq_index = [self._tag_idx[tag] for tag in seq_list]
         else:
             seq_index = self.get_seq_order_for_epoch(
-                epoch, self._num_seqs, lambda s: self._get_seq_length_by_real_idx(s)[0]
+                epoch,
+                self._num_seqs,
+                lambda s: self._get_seq_length_by_real_idx(s)[0],
+                seq_lens=self._get_all_seq_lens_by_real_idx,
             )
 
         old_index_map = self._index_map[:]
@@ -563,6 +566,14 @@ class CachedDataset(Dataset):
         """
         raise NotImplementedError
 
+    def _get_all_seq_lens_by_real_idx(self):
+        """
+        :return: lengths of the first data key of all sequences, real_seq_idx -> len, if this is cheap to get,
+            otherwise None. see :func:`Dataset.get_seq_order_for_epoch`
+        :rtype: numpy.ndarray|None
+        """
+        return None
+
     def get_seq_length_nd(self, sorted_seq_idx):
         """
         :type sorted_seq_idx: int
@@ -4,7 +4,7 @@ Provides :class:`CachedDataset2`.
 
 from __future__ import annotations
 import typing
-from typing import Optional
+from typing import Optional, List
 from threading import Condition
 from .basic import Dataset, DatasetSeq
 
@@ -23,6 +23,7 @@ class CachedDataset2(Dataset):
 
     If you derive from this class:
     - you must override `_collect_single_seq`
+    - you can override `_collect_seqs`, if loading multiple seqs at once is more efficient
     - you must set `num_inputs` (dense-dim of "data" key) and `num_outputs` (dict key -> dim, ndim-1)
     - you should set `labels`
     - handle seq ordering by overriding `init_seq_order`
@@ -60,6 +61,22 @@ class CachedDataset2(Dataset):
         self.epoch = epoch
         return True
 
+    def skip_to_seq_idx(self, seq_idx: int):
+        """
+        Continues the iteration over the current epoch at ``seq_idx``, without loading the seqs before it.
+        This requires that :func:`_collect_single_seq` can be called with any seq idx,
+        which is the case for most datasets, as they get the seq via the seq order of the epoch.
+
+        :param seq_idx:
+        """
+        assert seq_idx >= self.expected_load_seq_start, "%s: cannot skip backwards to seq idx %i (at %i)" % (
+            self,
+            seq_idx,
+            self.expected_load_seq_start,
+        )
+        self._cleanup_old_seqs(seq_idx)
+        self.expected_load_seq_start = seq_idx
+
     def _cleanup_old_seqs(self, seq_idx_end):
         """
         :param int seq_idx_end:
@@ -118,8 +135,7 @@ class CachedDataset2(Dataset):
             self.expected_load_seq_start = start
         if self.added_data:
             start = max(self.added_data[-1].seq_idx + 1, start)
-        seqs = [self._collect_single_seq(seq_idx=seq_idx) for seq_idx in range(start, end)]
-        seqs = list(filter(None, seqs))  # We might not know the num seqs in advance.
+        seqs = self._collect_seqs(start, end) if start < end else []
         self._num_timesteps_accumulated += sum([seq.num_frames for seq in seqs])
         self.added_data += seqs
 
@@ -154,6 +170,15 @@ class CachedDataset2(Dataset):
         """
         raise NotImplementedError
 
+    def _collect_seqs(self, start: int, end: int) -> List[DatasetSeq]:
+        """
+        :param start: inclusive seq idx start
+        :param end: exclusive seq idx end. can be more than num_seqs
+        :return: the seqs in order. seqs >= num_seqs are not included.
+        """
+        seqs = [self._collect_single_seq(seq_idx=seq_idx) for seq_idx in range(start, end)]
+        return list(filter(None, seqs))  # We might not know the num seqs in advance.
+
     def get_num_timesteps(self):
         """
         :rtype: int
@@ -188,6 +213,19 @@ class CachedDataset2(Dataset):
         """
         return self._get_seq(seq_idx).features[key]
 
+    def get_data_batch(self, seq_idxs, key):
+        """
+        :param typing.Sequence[int] seq_idxs:
+        :param str key:
+        :rtype: list[numpy.ndarray]
+        """
+        res = []
+        for seq_idx in seq_idxs:
+            seq = self._get_seq(seq_idx)
+            assert seq is not None, "%s: seq %i not loaded, call load_seqs() first" % (self, seq_idx)
+            res.append(seq.features[key])
+        return res
+
     def get_input_data(self, seq_idx):
         """
         :param int seq_idx:
@@ -11,6 +11,7 @@ import numpy
 from .cached import CachedDataset
 from .cached2 import CachedDataset2
 from .basic import Dataset, DatasetSeq
+from .util.seq_index_cache import SeqIndex
 from returnn.log import log
 
 
@@ -25,18 +26,34 @@ class HDFDataset(CachedDataset):
     """
     Dataset based on HDF files.
     This was the main original dataset format of RETURNN.
+
+    With ``cache_byte_size=0`` (the default), the data is read directly from the files when requested.
+    For that, we use the per-file seq start index (``file_seq_start``) which is created once in :func:`add_file`.
+    With ``use_mmap=True``, HDF datasets with contiguous uncompressed layout are accessed via :class:`numpy.memmap`,
+    which avoids the h5py overhead per read and shares the pages (via the OS page cache) with other processes.
+    Other HDF datasets (e.g. chunked or compressed) are read via h5py as usual.
+    With ``seq_cache_size``, the last read seqs are kept in a LRU cache.
     """
 
-    def __init__(self, files=None, use_cache_manager=False, **kwargs):
+    def __init__(self, files=None, use_cache_manager=False, use_mmap=False, seq_cache_size=0, **kwargs):
         """
         :param None|list[str] files:
         :param bool use_cache_manager: uses :func:`Util.cf` for files
+        :param bool use_mmap: for direct reads (cache_byte_size=0), use numpy.memmap when the layout allows it
+        :param int seq_cache_size: for direct reads (cache_byte_size=0), max number of (seq, key) entries in LRU cache
         """
         super(HDFDataset, self).__init__(**kwargs)
         assert (
             self.partition_epoch == 1 or self.cache_byte_size_total_limit == 0
         ), "To use partition_epoch in HDFDatasets, disable caching by setting cache_byte_size=0"
+        assert (not use_mmap and not seq_cache_size) or self.cache_byte_size_total_limit == 0, (
+            "%s: use_mmap and seq_cache_size are for direct reads, disable caching by setting cache_byte_size=0" % self
+        )
         self._use_cache_manager = use_cache_manager
+        self._use_mmap = use_mmap
+        self._seq_cache_size = seq_cache_size
+        # (real seq idx, key) -> data, in LRU order (most recently used last)
+        self._seq_cache = collections.OrderedDict()  # type: typing.OrderedDict[typing.Tuple[int,str],numpy.ndarray]
         self.files = []  # type: typing.List[str]  # file names
         self.h5_files = []  # type: typing.List[h5py.File]
         # We cache the h5py.Dataset objects that are created each time when accessing a h5py.File,
@@ -44,7 +61,7 @@ class HDFDataset(CachedDataset):
         # as this access seems to have a significant overhead.
         # Speeds up going through a HDFDataset by up to factor 3
         # (tested with h5py 3.1.0).
-        self.cached_h5_datasets = []  # type: typing.List[typing.Dict[str,h5py.Dataset]]
+        self.cached_h5_datasets = []  # type: typing.List[typing.Dict[str,typing.Union[h5py.Dataset,numpy.memmap]]]
         self.file_start = [0]
         self.file_seq_start = []  # type: typing.List[numpy.ndarray]
         self.data_dtype = {}  # type: typing.Dict[str,str]
@@ -122,7 +139,16 @@ class HDFDataset(CachedDataset):
         else:
             self.target_keys = ["classes"]
 
-        seq_lengths = fin[attr_seqLengths][...]  # shape (num_seqs,num_target_keys + 1)
+        index_cache = self._get_seq_index_cache([filename], name="HDFDataset")
+        index = index_cache.load() if index_cache else None
+        if index:
+            seq_lengths = index.seq_lens[attr_seqLengths]
+        else:
+            seq_lengths = fin[attr_seqLengths][...]  # shape (num_seqs,num_target_keys + 1)
+            if index_cache:
+                tags = list(map(self._decode, fin["seqTags"][...].tolist()))
+                index_cache.save(SeqIndex(tags=tags, seq_lens={attr_seqLengths: seq_lengths}))
+                del tags
         num_input_keys = 1 if "inputs" in fin else 0
         if len(seq_lengths.shape) == 1:
             seq_lengths = numpy.array(
@@ -303,7 +329,58 @@ class HDFDataset(CachedDataset):
         real_seq_idx = self._tag_idx[seq_tag]
         return self._get_data_by_real_seq_idx(real_seq_idx, key)
 
+    def _get_h5_dataset(self, file_idx, name):
+        """
+        :param int file_idx:
+        :param str name: e.g. "inputs" or "targets/data/classes"
+        :return: the HDF dataset, or a memmap of it (see use_mmap)
+        :rtype: h5py.Dataset|numpy.memmap
+        """
+        if name in self.cached_h5_datasets[file_idx]:
+            return self.cached_h5_datasets[file_idx][name]
+        ds = self.h5_files[file_idx][name]
+        if self._use_mmap:
+            ds = self._maybe_memmap_h5_dataset(self.files[file_idx], ds)
+        self.cached_h5_datasets[file_idx][name] = ds  # cached for efficiency, see comment in __init__()
+        return ds
+
+    @staticmethod
+    def _maybe_memmap_h5_dataset(filename, ds):
+        """
+        :param str filename:
+        :param h5py.Dataset ds:
+        :return: memmap if the layout allows it (contiguous, uncompressed, fixed size dtype), otherwise ds
+        :rtype: h5py.Dataset|numpy.memmap
+        """
+        if ds.chunks is not None or ds.compression is not None or ds.dtype.hasobject or ds.size == 0:
+            return ds
+        offset = ds.id.get_offset()
+        if offset is None:  # not allocated, or not contiguous
+            return ds
+        return numpy.memmap(filename, dtype=ds.dtype, mode="r", offset=offset, shape=ds.shape)
+
     def _get_data_by_real_seq_idx(self, real_seq_idx, key):
+        """
+        :param int real_seq_idx:
+        :param str key:
+        :rtype: numpy.ndarray
+        """
+        if self._seq_cache_size > 0:
+            # The caller might modify the returned array inplace, so we always return a copy of the cached array.
+            # The cached array is read-only, to be sure that we do not leak it.
+            data = self._seq_cache.get((real_seq_idx, key))
+            if data is not None:
+                self._seq_cache.move_to_end((real_seq_idx, key))
+                return data.copy()
+            data = self._read_data_by_real_seq_idx(real_seq_idx, key)
+            data.setflags(write=False)
+            self._seq_cache[(real_seq_idx, key)] = data
+            while len(self._seq_cache) > self._seq_cache_size:
+                self._seq_cache.popitem(last=False)
+            return data.copy()
+        return self._read_data_by_real_seq_idx(real_seq_idx, key)
+
+    def _read_data_by_real_seq_idx(self, real_seq_idx, key):
         """
         :param int real_seq_idx:
         :param str key:
@@ -317,26 +394,19 @@ class HDFDataset(CachedDataset):
         end_pos = self.file_seq_start[file_idx][real_file_seq_idx + 1]
 
         if key == "data" and self.num_inputs > 0:
-            if "inputs" not in self.cached_h5_datasets[file_idx]:
-                assert "inputs" in fin
-                self.cached_h5_datasets[file_idx]["inputs"] = fin[
-                    "inputs"
-                ]  # cached for efficiency, see comment in __init__()
-
-            inputs = self.cached_h5_datasets[file_idx]["inputs"]
-            data = inputs[start_pos[0] : end_pos[0]]
+            assert "inputs" in fin
+            inputs = self._get_h5_dataset(file_idx, "inputs")
+            # For a memmap, this copies exactly this seq.
+            data = numpy.array(inputs[start_pos[0] : end_pos[0]])
             if self.window > 1:
                 data = self._sliding_window(data)
 
         else:
-            if key not in self.cached_h5_datasets[file_idx]:
-                assert "targets" in fin
-                self.cached_h5_datasets[file_idx][key] = fin["targets/data/" + key]  # see comment in __init__()
-
-            targets = self.cached_h5_datasets[file_idx][key]
+            assert "targets" in fin
+            targets = self._get_h5_dataset(file_idx, "targets/data/" + key)
             first_target_idx = 1 if self.num_inputs > 0 else 0  # self.num_inputs == 0 if no 'inputs' in HDF file
             ldx = first_target_idx + self.target_keys.index(key)
-            data = targets[start_pos[ldx] : end_pos[ldx]]
+            data = numpy.array(targets[start_pos[ldx] : end_pos[ldx]])
 
         return data
 
@@ -382,6 +452,13 @@ class HDFDataset(CachedDataset):
 
         return end_pos - start_pos
 
+    def _get_all_seq_lens_by_real_idx(self):
+        """
+        :return: lengths of the first data key of all sequences, real_seq_idx -> len
+        :rtype: numpy.ndarray
+        """
+        return numpy.concatenate([numpy.diff(seq_start[:, 0]) for seq_start in self.file_seq_start])
+
     def _get_tag_by_real_idx(self, real_seq_idx):
         file_idx = self._get_file_index(real_seq_idx)
         real_file_seq_idx = real_seq_idx - self.file_start[file_idx]
@@ -423,9 +500,14 @@ class HDFDataset(CachedDataset):
         :rtype: list[str]
         """
         tags = []
-        for h5_file in self.h5_files:
-            tags += h5_file["seqTags"][...].tolist()
-        return list(map(self._decode, tags))
+        for filename, h5_file in zip(self.files, self.h5_files):
+            index_cache = self._get_seq_index_cache([filename], name="HDFDataset")
+            index = index_cache.load() if index_cache else None
+            if index:
+                tags += index.tags
+            else:
+                tags += map(self._decode, h5_file["seqTags"][...].tolist())
+        return tags
 
     def get_total_num_seqs(self):
         """
@@ -1053,15 +1135,128 @@ class SiameseHDFDataset(CachedDataset2):
         return 1  # unknown
 
 
+class _HDFWriteThread:
+    """
+    Runs HDF write operations in a background thread, fed via a bounded queue,
+    such that the producer (e.g. the forward loop) does not wait for the disk.
+    Exceptions in the thread are reraised in the producer thread on the next :func:`put` or in :func:`join`.
+    """
+
+    def __init__(self, name, queue_size=4):
+        """
+        :param str name: for the thread name
+        :param int queue_size: max number of pending write operations. put() blocks when this is reached
+        """
+        import queue
+        from threading import Thread
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._exception = None  # type: typing.Optional[BaseException]
+        self._thread = Thread(target=self._thread_main, name=name, daemon=True)
+        self._thread.start()
+
+    def _thread_main(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            if self._exception is not None:
+                continue  # just drain the queue
+            func, args = item
+            # noinspection PyBroadException
+            try:
+                func(*args)
+            except BaseException as exc:
+                self._exception = exc
+
+    def _check_exception(self):
+        if self._exception is not None:
+            exc, self._exception = self._exception, None
+            raise exc
+
+    def put(self, func, *args):
+        """
+        :param function func: will be called in the background thread as func(*args)
+        :param args:
+        """
+        self._check_exception()
+        assert self._thread.is_alive()
+        self._queue.put((func, args))
+
+    def join(self):
+        """
+        Waits until all pending writes are done, and stops the thread.
+        """
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._check_exception()
+
+
+class _HDFWriteStats:
+    """
+    Write throughput statistics.
+    """
+
+    def __init__(self):
+        import time
+
+        self.start_time = time.time()
+        self.num_bytes = 0
+        self.num_seqs = 0
+        self.write_time = 0.0  # time spent in the actual writes
+
+    def report(self, writer, file=None):
+        """
+        :param writer: for the message prefix
+        :param file: log stream, log.v4 by default
+        """
+        import time
+        from returnn.util.basic import human_bytes_size
+
+        total_time = time.time() - self.start_time
+        print(
+            "%s: wrote %i seqs, %s in %.1f secs (%.1f secs writing), %s/sec"
+            % (
+                writer,
+                self.num_seqs,
+                human_bytes_size(self.num_bytes),
+                total_time,
+                self.write_time,
+                human_bytes_size(self.num_bytes / max(total_time, 1e-10)),
+            ),
+            file=file or log.v4,
+        )
+
+
 class SimpleHDFWriter:
     """
     Intended for a simple interface, to dump data on-the-fly into a HDF file,
     which can be read later by :class:`HDFDataset`.
 
     Note that we dump to a temp file first, and only at :func:`close` we move it over to the real destination.
+
+    The HDF datasets are preallocated with geometrically growing extent (instead of being resized for every seq),
+    and are trimmed to the final size at :func:`close`.
+    With ``write_thread=True``, :func:`insert_batch` only puts a copy of the batch into a bounded queue,
+    and the writes are done in a background thread.
     """
 
-    def __init__(self, filename, dim, labels=None, ndim=None, extra_type=None, swmr=False, extend_existing_file=False):
+    def __init__(
+        self,
+        filename,
+        dim,
+        labels=None,
+        ndim=None,
+        extra_type=None,
+        swmr=False,
+        extend_existing_file=False,
+        write_thread=False,
+        write_queue_size=4,
+        chunk_num_frames=None,
+        compression=None,
+        compression_opts=None,
+    ):
         """
         :param str filename: Create file, truncate if exists
         :param int|None dim:
@@ -1070,6 +1265,11 @@ class SimpleHDFWriter:
         :param dict[str,(int,int,str)]|None extra_type: key -> (dim,ndim,dtype)
         :param bool swmr: see https://docs.h5py.org/en/stable/swmr.html
         :param bool extend_existing_file: True also means we expect that it exists
+        :param bool write_thread: do the writes in a background thread
+        :param int write_queue_size: max number of pending batches for the write thread
+        :param int|None chunk_num_frames: HDF chunk size along the time axis for the data. None: automatic
+        :param str|None compression: for the data, e.g. "gzip" or "lzf". see h5py create_dataset
+        :param int|None compression_opts: e.g. gzip level
         """
         from returnn.util.basic import hdf5_strings, unicode
         import tempfile
@@ -1099,17 +1299,22 @@ class SimpleHDFWriter:
         self._file = h5py.File(
             self.tmp_filename, "r+" if extend_existing_file else "w", libver="latest" if swmr else None
         )
+        self._chunk_num_frames = chunk_num_frames
+        self._compression = compression
+        self._compression_opts = compression_opts
 
         if not extend_existing_file:
-            self._file.attrs["numTimesteps"] = 0  # we will increment this on-the-fly
+            self._file.attrs["numTimesteps"] = 0  # we will set this at the end
             self._file.attrs["inputPattSize"] = dim or 1
             self._file.attrs["numDims"] = 1  # ignored?
             self._file.attrs["numLabels"] = dim or 1
-            self._file.attrs["numSeqs"] = 0  # we will increment this on-the-fly
+            self._file.attrs["numSeqs"] = 0  # we will set this at the end
             if labels:
                 hdf5_strings(self._file, "labels", labels)
             else:
                 self._file.create_dataset("labels", (0,), dtype="S5")  # dtype string length does not matter
+        # The HDF datasets are preallocated, so we keep track of the real sizes here.
+        self._num_time_steps = int(self._file.attrs["numTimesteps"])
 
         self._datasets = {}  # type: typing.Dict[str, h5py.Dataset]  # key -> data
         # seq_length idx represents (seq_idx,data_key_idx),
@@ -1129,6 +1334,8 @@ class SimpleHDFWriter:
             dt = h5py.special_dtype(vlen=unicode)
             self._seq_tags = self._file.create_dataset("seqTags", (0,), dtype=dt, maxshape=(None,))
 
+        self._num_seqs = self._seq_lengths.shape[0]
+
         self._extra_num_time_steps = {}  # type: typing.Dict[str,int]  # key -> num-steps
         self._prepared_extra = set()
         if extra_type:
@@ -1140,11 +1347,62 @@ class SimpleHDFWriter:
             # See comments in test_SimpleHDFWriter_swmr...
             raise NotImplementedError("SimpleHDFWriter SWMR is not really finished...")
 
+        self._stats = _HDFWriteStats()
+        self._write_thread = None  # type: typing.Optional[_HDFWriteThread]
+        if write_thread:
+            self._write_thread = _HDFWriteThread(name="%r write thread" % self, queue_size=write_queue_size)
+
+    def __repr__(self):
+        return "<%s %r>" % (self.__class__.__name__, self.filename)
+
     def __del__(self):
+        if self._write_thread:
+            # noinspection PyBroadException
+            try:
+                self._write_thread.join()
+            except Exception:  # e.g. at shutdown. but does not matter
+                pass
+            self._write_thread = None
         if self._file:
             self._file.close()
             self._file = None
 
+    def _create_data_dataset(self, group, name, shape, dtype, maxshape):
+        """
+        :param h5py.Group group:
+        :param str name:
+        :param tuple[int]|list[int] shape:
+        :param str|numpy.dtype dtype:
+        :param tuple[int|None]|list[int|None] maxshape:
+        :rtype: h5py.Dataset
+        """
+        chunks = True
+        if self._chunk_num_frames:
+            chunks = (self._chunk_num_frames,) + tuple(d or 1 for d in maxshape[1:])
+        compression = self._compression
+        if h5py.check_dtype(vlen=numpy.dtype(dtype)) is not None:
+            compression = None  # not supported for vlen strings by all filters, and not much gain
+        return group.create_dataset(
+            name,
+            shape=shape,
+            dtype=dtype,
+            maxshape=maxshape,
+            chunks=chunks,
+            compression=compression,
+            compression_opts=self._compression_opts if compression else None,
+        )
+
+    @staticmethod
+    def _reserve(hdf_data, size):
+        """
+        Resizes the HDF dataset along axis 0 to at least the given size, with geometric growth.
+
+        :param h5py.Dataset hdf_data:
+        :param int size: needed size
+        """
+        if hdf_data.shape[0] < size:
+            hdf_data.resize(max(size, 2 * hdf_data.shape[0]), axis=0)
+
     def _prepare_extra(self, extra_type):
         """
         :param dict[str,(int,int,str)] extra_type: key -> (dim,ndim,dtype)
@@ -1157,7 +1415,7 @@ class SimpleHDFWriter:
         for data_key, (dim, ndim, dtype) in extra_type.items():
             assert data_key != "inputs"
             if data_key in self._prepared_extra:
-                return
+                continue
             if not self._prepared_extra and not self.extend_existing_file:
                 # For the first time, need to create the groups.
                 self._file.create_group("targets/data")
@@ -1177,8 +1435,12 @@ class SimpleHDFWriter:
                 assert shape[0] is None
                 self._extra_num_time_steps[data_key] = self._datasets[data_key].shape[0]
             else:
-                self._datasets[data_key] = self._file["targets/data"].create_dataset(
-                    data_key, shape=[d if d else 0 for d in shape], dtype=dtype, maxshape=shape
+                self._datasets[data_key] = self._create_data_dataset(
+                    self._file["targets/data"],
+                    data_key,
+                    shape=[d if d else 0 for d in shape],
+                    dtype=dtype,
+                    maxshape=shape,
                 )
                 self._file["targets/size"].attrs[data_key] = [dim or 1, ndim]
                 self._extra_num_time_steps[data_key] = 0
@@ -1191,7 +1453,7 @@ class SimpleHDFWriter:
 
     def _insert_h5_inputs(self, raw_data):
         """
-        Inserts a record into the hdf5-file.
+        Inserts the data of one or multiple seqs (concatenated) into the hdf5-file.
         Resizes if necessary.
 
         :param numpy.ndarray raw_data: shape=(time,data) or shape=(time,)
@@ -1202,25 +1464,25 @@ class SimpleHDFWriter:
             # Just expect that the same dataset already exists.
             self._datasets[name] = self._file[name]
         if name not in self._datasets:
-            self._datasets[name] = self._file.create_dataset(
-                name, raw_data.shape, raw_data.dtype, maxshape=tuple(None for _ in raw_data.shape)
+            self._datasets[name] = self._create_data_dataset(
+                self._file, name, raw_data.shape, raw_data.dtype, maxshape=tuple(None for _ in raw_data.shape)
             )
         else:
-            old_shape = self._datasets[name].shape
-            self._datasets[name].resize(old_shape[0] + raw_data.shape[0], axis=0)
+            self._reserve(self._datasets[name], self._num_time_steps + raw_data.shape[0])
         # append raw data to dataset
-        self._datasets[name][self._file.attrs["numTimesteps"] :] = raw_data
-        self._file.attrs["numTimesteps"] += raw_data.shape[0]
-        self._file.attrs["numSeqs"] += 1
+        self._datasets[name][self._num_time_steps : self._num_time_steps + raw_data.shape[0]] = raw_data
+        self._num_time_steps += raw_data.shape[0]
 
-    def _insert_h5_other(self, data_key, raw_data, dtype=None, add_time_dim=False, dim=None):
+    @staticmethod
+    def _prepare_h5_other(raw_data, dtype=None, add_time_dim=False, dim=None):
         """
-        :param str data_key:
         :param numpy.ndarray|int|float|list[int]|numpy.float32|numpy.int32 raw_data:
           shape=(time,data) or shape=(time,) or shape=()...
         :param str|None dtype:
         :param bool add_time_dim:
         :param int|None dim:
+        :return: raw_data, extra_type (dim,ndim,dtype)
+        :rtype: (numpy.ndarray, (int,int,str))
         """
         if isinstance(raw_data, (int, float, list, numpy.float32, numpy.int32)):
             raw_data = numpy.array(raw_data)
@@ -1236,32 +1498,27 @@ class SimpleHDFWriter:
             else:
                 dim = 1  # dummy
 
-        # We assume that _insert_h5_inputs was called before.
-        assert self._file.attrs["numSeqs"] > 0 and self._seq_lengths.shape[0] > 0
-        seq_idx = self._file.attrs["numSeqs"] - 1
-
         if raw_data.dtype == object:
             # Is this a string?
             assert isinstance(raw_data.flat[0], (str, bytes))
             dtype = "string"
         else:
             dtype = raw_data.dtype.name
-        if self._prepare_extra({data_key: (dim, raw_data.ndim, dtype)}):
-            # We added it now. Maybe other extra data keys were added before. The data_key_idx is different now.
-            # Thus, seq_lengths might have become invalid. Reinit them.
-            assert seq_idx == 0 or self.extend_existing_file  # We can only do that in the beginning.
-            for data_key_idx_0, data_key_ in enumerate(sorted(self._prepared_extra)):
-                self._seq_lengths[seq_idx, data_key_idx_0 + 1] = self._extra_num_time_steps[data_key_]
+        return raw_data, (dim, raw_data.ndim, dtype)
 
-        self._extra_num_time_steps[data_key] += raw_data.shape[0]
-        self._datasets[data_key].resize(self._extra_num_time_steps[data_key], axis=0)
-
-        data_key_idx = sorted(self._prepared_extra).index(data_key) + 1
-        self._seq_lengths[seq_idx, data_key_idx] = raw_data.shape[0]
+    def _insert_h5_other(self, data_key, raw_data):
+        """
+        Inserts the data of one or multiple seqs (concatenated) for some extra data key.
 
-        offset = self._extra_num_time_steps[data_key] - raw_data.shape[0]
+        :param str data_key:
+        :param numpy.ndarray raw_data: see :func:`_prepare_h5_other`
+        """
+        assert data_key in self._prepared_extra
+        offset = self._extra_num_time_steps[data_key]
+        self._extra_num_time_steps[data_key] += raw_data.shape[0]
         hdf_data = self._datasets[data_key]
-        hdf_data[offset:] = raw_data
+        self._reserve(hdf_data, self._extra_num_time_steps[data_key])
+        hdf_data[offset : offset + raw_data.shape[0]] = raw_data
 
     def insert_batch(self, inputs, seq_len, seq_tag, extra=None):
         """
@@ -1301,38 +1558,40 @@ class SimpleHDFWriter:
                 {key: value.shape for (key, value) in extra.items()},
             )
 
-        seqlen_offset = self._seq_lengths.shape[0]
-        self._seq_lengths.resize(seqlen_offset + n_batch, axis=0)
-        self._seq_tags.resize(seqlen_offset + n_batch, axis=0)
-
+        # Copy the data per seq, and concatenate it per data key.
+        # Thus, the caller can reuse its buffers (relevant for the write thread),
+        # and we have only a single HDF write per data key per batch.
+        # Note: Currently, our HDFDataset does not support to have multiple axes with dynamic length.
+        # Thus, we flatten all together, and calculate the flattened seq len.
+        # (Ignore this if there is only a single time dimension.)
+        flat_seq_lens = [
+            int(numpy.prod([seq_len[axis][i] for axis in range(ndim_with_seq_len)])) for i in range(n_batch)
+        ]
+        assert all(flat_seq_len > 0 for flat_seq_len in flat_seq_lens)
+        inputs_flat = []
+        extra_flat = {}  # type: typing.Dict[str,typing.List[numpy.ndarray]]
+        extra_types = {}  # type: typing.Dict[str,typing.Tuple[int,int,str]]
         for i in range(n_batch):
-            self._seq_tags[seqlen_offset + i] = numpy.array(seq_tag[i], dtype=self._seq_tags.dtype)
-            # Note: Currently, our HDFDataset does not support to have multiple axes with dynamic length.
-            # Thus, we flatten all together, and calculate the flattened seq len.
-            # (Ignore this if there is only a single time dimension.)
-            flat_seq_len = int(numpy.prod([seq_len[axis][i] for axis in range(ndim_with_seq_len)]))
-            assert flat_seq_len > 0
-            flat_shape = [flat_seq_len]
+            flat_shape = [flat_seq_lens[i]]
             if self.dim and not sparse:
                 flat_shape.append(self.dim)
-            self._seq_lengths[seqlen_offset + i, 0] = flat_seq_len
             data = inputs[i]
             data = data[tuple([slice(None, seq_len[axis][i]) for axis in range(ndim_with_seq_len)])]
-            data = numpy.reshape(data, flat_shape)
-            self._insert_h5_inputs(data)
+            inputs_flat.append(numpy.reshape(data, flat_shape))
+            extra_seq = {}
             if len(seq_len) > 1:
                 # Note: Because we have flattened multiple axes with dynamic len into a single one,
                 # we want to store the individual axes lengths. We store those in a separate data entry "sizes".
                 # Note: We could add a dummy time-dim for this "sizes", and then have a feature-dim = number of axes.
                 # However, we keep it consistent to how we handled it in our 2D MDLSTM experiments.
-                self._insert_h5_other(
-                    "sizes", [seq_len[axis][i] for axis in range(ndim_with_seq_len)], add_time_dim=False, dtype="int32"
+                extra_seq["sizes"] = self._prepare_h5_other(
+                    [seq_len[axis][i] for axis in range(ndim_with_seq_len)], add_time_dim=False, dtype="int32"
                 )
             if extra:
                 try:
                     for key, value in extra.items():
                         assert value.shape[0] == n_batch
-                        self._insert_h5_other(key, value[i])
+                        extra_seq[key] = self._prepare_h5_other(value[i])
                 except Exception:
                     print(
                         "%s: insert extra exception. input shape %r, seq len %r, extra shapes: %r"
@@ -1348,6 +1607,72 @@ class SimpleHDFWriter:
                         file=log.v3,
                     )
                     raise
+            for key, (value, extra_type) in extra_seq.items():
+                extra_flat.setdefault(key, []).append(value)
+                extra_types.setdefault(key, extra_type)
+        inputs_flat = numpy.concatenate(inputs_flat, axis=0)
+        extra_seq_lens = {key: [value.shape[0] for value in values] for (key, values) in extra_flat.items()}
+        extra_flat = {key: numpy.concatenate(values, axis=0) for (key, values) in extra_flat.items()}
+
+        if self._write_thread:
+            self._write_thread.put(
+                self._write_batch, list(seq_tag), flat_seq_lens, inputs_flat, extra_flat, extra_types, extra_seq_lens
+            )
+        else:
+            self._write_batch(list(seq_tag), flat_seq_lens, inputs_flat, extra_flat, extra_types, extra_seq_lens)
+
+    def _write_batch(self, seq_tag, flat_seq_lens, inputs_flat, extra_flat, extra_types, extra_seq_lens):
+        """
+        Called via :func:`insert_batch`, maybe in the write thread.
+
+        :param list[str|bytes] seq_tag: sequence tags of length n_batch
+        :param list[int] flat_seq_lens: len n_batch
+        :param numpy.ndarray inputs_flat: concatenated inputs, shape=(sum(flat_seq_lens),...)
+        :param dict[str,numpy.ndarray] extra_flat: data key -> concatenated data
+        :param dict[str,(int,int,str)] extra_types: data key -> (dim,ndim,dtype)
+        :param dict[str,list[int]] extra_seq_lens: data key -> seq lens
+        """
+        import time
+
+        start_time = time.time()
+        n_batch = len(seq_tag)
+        seq_idx = self._num_seqs
+        if extra_types and self._prepare_extra(extra_types):
+            # We added it now. Maybe other extra data keys were added before. The data_key_idx is different now.
+            # Thus, the seq_lengths of previous seqs would be invalid.
+            assert seq_idx == 0 or self.extend_existing_file  # We can only do that in the beginning.
+
+        self._reserve(self._seq_tags, seq_idx + n_batch)
+        self._seq_tags[seq_idx : seq_idx + n_batch] = numpy.array(seq_tag, dtype=self._seq_tags.dtype)
+        seq_lengths = numpy.zeros((n_batch, self._seq_lengths.shape[1]), dtype=self._seq_lengths.dtype)
+        seq_lengths[:, 0] = flat_seq_lens
+        for data_key_idx_0, data_key in enumerate(sorted(self._prepared_extra)):
+            if data_key in extra_seq_lens:
+                seq_lengths[:, data_key_idx_0 + 1] = extra_seq_lens[data_key]
+        self._reserve(self._seq_lengths, seq_idx + n_batch)
+        self._seq_lengths[seq_idx : seq_idx + n_batch] = seq_lengths
+
+        self._insert_h5_inputs(inputs_flat)
+        for data_key, raw_data in extra_flat.items():
+            self._insert_h5_other(data_key, raw_data)
+        self._num_seqs += n_batch
+
+        self._stats.num_seqs += n_batch
+        self._stats.num_bytes += inputs_flat.nbytes + sum(raw_data.nbytes for raw_data in extra_flat.values())
+        self._stats.write_time += time.time() - start_time
+
+    def _finalize(self):
+        """
+        Trims the preallocated HDF datasets to the real sizes, and sets the attribs.
+        """
+        self._seq_lengths.resize(self._num_seqs, axis=0)
+        self._seq_tags.resize(self._num_seqs, axis=0)
+        if "inputs" in self._datasets:
+            self._datasets["inputs"].resize(self._num_time_steps, axis=0)
+        for data_key, num_time_steps in self._extra_num_time_steps.items():
+            self._datasets[data_key].resize(num_time_steps, axis=0)
+        self._file.attrs["numTimesteps"] = self._num_time_steps
+        self._file.attrs["numSeqs"] = self._num_seqs
 
     def close(self):
         """
@@ -1356,9 +1681,14 @@ class SimpleHDFWriter:
         import os
         import shutil
 
+        if self._write_thread:
+            write_thread, self._write_thread = self._write_thread, None
+            write_thread.join()  # this reraises any exception from the write thread
         if self._file:
+            self._finalize()
             self._file.close()
             self._file = None
+            self._stats.report(self)
         if self.tmp_filename:
             if not self.extend_existing_file:
                 assert not os.path.exists(self.filename)
@@ -1380,13 +1710,24 @@ class HDFDatasetWriter:
     The resulting HDF file can be read later by :class:`HDFDataset`.
     """
 
-    def __init__(self, filename):
+    def __init__(self, filename, *, write_thread=False, write_queue_size=16, compression=None, compression_opts=None):
         """
         :param str filename: for the HDF to write
+        :param bool write_thread: write the data in a background thread, while the next seqs are loaded
+        :param int write_queue_size: max number of pending seqs for the write thread
+        :param str|None compression: for the data, e.g. "gzip" or "lzf". see h5py create_dataset
+        :param int|None compression_opts: e.g. gzip level
         """
         print("Creating HDF dataset file %s" % filename, file=log.v3)
         self.filename = filename
         self.file = h5py.File(filename, "w")
+        self._write_thread = write_thread
+        self._write_queue_size = write_queue_size
+        self._compression = compression
+        self._compression_opts = compression_opts
+
+    def __repr__(self):
+        return "<%s %r>" % (self.__class__.__name__, self.filename)
 
     def close(self):
         """
@@ -1402,6 +1743,7 @@ class HDFDatasetWriter:
         :param int|float end_seq:
         :param bool use_progress_bar:
         """
+        import time
         from returnn.util.basic import NumbersDict, human_size, progress_bar_with_time, try_run, PY3
 
         hdf_dataset = self.file
@@ -1486,31 +1828,36 @@ class HDFDatasetWriter:
             shapes[data_key] = shape
 
         print("Set seq tags...", file=log.v3)
-        hdf_dataset.create_dataset("seqTags", shape=(num_seqs,), dtype="S%i" % (max_tag_len + 1))
-        for i, tag in enumerate(seq_tags):
-            hdf_dataset["seqTags"][i] = numpy.array(tag, dtype="S%i" % (max_tag_len + 1))
-            if use_progress_bar:
-                progress_bar_with_time(float(i) / num_seqs)
+        hdf_dataset.create_dataset(
+            "seqTags", data=numpy.array(seq_tags, dtype="S%i" % (max_tag_len + 1)), dtype="S%i" % (max_tag_len + 1)
+        )
 
         print("Set seq len info...", file=log.v3)
-        hdf_dataset.create_dataset(attr_seqLengths, shape=(num_seqs, len(data_keys)), dtype="int32")
-        for i, seq_len in enumerate(seq_lens):
-            data_len = [seq_len[data_input_key]] if data_input_key else []
-            targets_lens = [seq_len[data_key] for data_key in sorted(data_target_keys)]
-            hdf_dataset[attr_seqLengths][i] = data_len + targets_lens
-            if use_progress_bar:
-                progress_bar_with_time(float(i) / num_seqs)
+        seq_lens_keys = ([data_input_key] if data_input_key else []) + sorted(data_target_keys)
+        hdf_dataset.create_dataset(
+            attr_seqLengths,
+            data=numpy.array([[seq_len[key] for key in seq_lens_keys] for seq_len in seq_lens], dtype="int32"),
+            dtype="int32",
+        )
 
         print("Create arrays in HDF...", file=log.v3)
         hdf_dataset.create_group("targets/data")
         hdf_dataset.create_group("targets/size")
         hdf_dataset.create_group("targets/labels")
         for data_key in data_keys:
+            data_opts = {}
+            if self._compression and shapes[data_key][0] > 0:
+                data_opts = {"compression": self._compression, "compression_opts": self._compression_opts}
             if data_input_key and data_key == data_input_key:
-                hdf_dataset.create_dataset("inputs", shape=shapes[data_key], dtype=dataset.get_data_dtype(data_key))
+                hdf_dataset.create_dataset(
+                    "inputs", shape=shapes[data_key], dtype=dataset.get_data_dtype(data_key), **data_opts
+                )
             else:
                 hdf_dataset["targets/data"].create_dataset(
-                    hdf_data_key_map[data_key], shape=shapes[data_key], dtype=dataset.get_data_dtype(data_key)
+                    hdf_data_key_map[data_key],
+                    shape=shapes[data_key],
+                    dtype=dataset.get_data_dtype(data_key),
+                    **data_opts,
                 )
                 hdf_dataset["targets/size"].attrs[hdf_data_key_map[data_key]] = dataset.num_outputs[data_key]
             if data_key in dataset.labels:
@@ -1524,36 +1871,68 @@ class HDFDatasetWriter:
             max_label_len = max(map(len, labels))
             if not data_input_key or data_key != data_input_key:
                 hdf_dataset["targets/labels"].create_dataset(
-                    hdf_data_key_map[data_key], (len(labels),), dtype="S%i" % (max_label_len + 1)
+                    hdf_data_key_map[data_key],
+                    data=numpy.array(labels, dtype="S%i" % (max_label_len + 1)),
+                    dtype="S%i" % (max_label_len + 1),
                 )
-                for i, label in enumerate(labels):
-                    hdf_dataset["targets/labels"][hdf_data_key_map[data_key]][i] = numpy.array(
-                        label, dtype="S%i" % (max_label_len + 1)
-                    )
 
         # Again iterate through dataset, and set the data
         print("Write data...", file=log.v3)
         dataset.init_seq_order(epoch)
+        hdf_data_by_key = {
+            data_key: (
+                hdf_dataset["inputs"]
+                if data_input_key and data_key == data_input_key
+                else hdf_dataset["targets/data"][hdf_data_key_map[data_key]]
+            )
+            for data_key in data_keys
+        }
+        stats = _HDFWriteStats()
+        write_thread = (
+            _HDFWriteThread(name="%r write thread" % self, queue_size=self._write_queue_size)
+            if self._write_thread
+            else None
+        )
+
+        def _write_seq(seq_data, seq_offsets):
+            """
+            :param dict[str,numpy.ndarray] seq_data:
+            :param NumbersDict seq_offsets:
+            """
+            start_time = time.time()
+            for data_key_, data_ in seq_data.items():
+                hdf_data_by_key[data_key_][seq_offsets[data_key_] : seq_offsets[data_key_] + data_.shape[0]] = data_
+            stats.num_seqs += 1
+            stats.num_bytes += sum(data_.nbytes for data_ in seq_data.values())
+            stats.write_time += time.time() - start_time
+
         offsets = NumbersDict(0)
-        for seq_idx, tag in zip(seq_idxs, seq_tags):
-            dataset.load_seqs(seq_idx, seq_idx + 1)
-            tag_ = dataset.get_tag(seq_idx)
-            assert tag == tag_  # Just a check for sanity. We expect the same order.
-            seq_len = dataset.get_seq_length(seq_idx)
-            for data_key in data_keys:
-                if data_input_key and data_key == data_input_key:
-                    hdf_data = hdf_dataset["inputs"]
+        try:
+            for seq_idx, tag in zip(seq_idxs, seq_tags):
+                dataset.load_seqs(seq_idx, seq_idx + 1)
+                tag_ = dataset.get_tag(seq_idx)
+                assert tag == tag_  # Just a check for sanity. We expect the same order.
+                seq_len = dataset.get_seq_length(seq_idx)
+                data = {data_key: dataset.get_data(seq_idx, data_key) for data_key in data_keys}
+                for data_key in data_keys:
+                    assert data[data_key].shape[0] == seq_len[data_key]
+                if write_thread:
+                    # The dataset might reuse or free the buffers with the next load_seqs, so copy them.
+                    data = {data_key: numpy.array(data_, copy=True) for data_key, data_ in data.items()}
+                    write_thread.put(_write_seq, data, offsets.copy())
                 else:
-                    hdf_data = hdf_dataset["targets/data"][hdf_data_key_map[data_key]]
-                data = dataset.get_data(seq_idx, data_key)
-                hdf_data[offsets[data_key] : offsets[data_key] + seq_len[data_key]] = data
+                    _write_seq(data, offsets)
 
-            if use_progress_bar:
-                progress_bar_with_time(float(offsets[progress_bar_data_key]) / total_seq_len[progress_bar_data_key])
+                if use_progress_bar:
+                    progress_bar_with_time(float(offsets[progress_bar_data_key]) / total_seq_len[progress_bar_data_key])
 
-            offsets += seq_len
+                offsets += seq_len
+        finally:
+            if write_thread:
+                write_thread.join()
 
         assert offsets == total_seq_len  # Sanity check.
+        stats.report(self, file=log.v3)
 
         # Set some old-format attribs. Not needed for newer RETURNN versions.
         hdf_dataset.attrs[attr_inputPattSize] = dataset.num_inputs
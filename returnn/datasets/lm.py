@@ -11,6 +11,7 @@ import os
 import sys
 from .basic import DatasetSeq
 from .cached2 import CachedDataset2
+from .util.seq_index_cache import SeqIndex
 import gzip
 import xml.etree.ElementTree as ElementTree
 from returnn.util.basic import parse_orthography, parse_orthography_into_symbols, load_json, BackendEngine, unicode
@@ -51,6 +52,7 @@ class LmDataset(CachedDataset2):
         error_on_invalid_seq=True,
         add_delayed_seq_data=False,
         delayed_seq_data_start_symbol="[START]",
+        token_ids_cache=False,
         **kwargs,
     ):
         """
@@ -68,7 +70,8 @@ class LmDataset(CachedDataset2):
 
         The LmDataset does not work without providing a vocabulary with any of the above mentioned ways.
 
-        After initialization, the corpus is represented by self.orths (as a list of sequences).
+        After initialization, the corpus is represented by self.orths (as a list of sequences),
+        or with ``token_ids_cache``, by the flat token id array (see below).
         The vocabulary is given by self.orth_symbols and self.orth_symbols_map gives the corresponding
         mapping from symbol to integer index (in case ``phone_info`` is not set).
 
@@ -97,6 +100,16 @@ class LmDataset(CachedDataset2):
         :param bool add_delayed_seq_data: will add another data-key "delayed" which will have the sequence.
           delayed_seq_data_start_symbol + original_sequence[:-1].
         :param str delayed_seq_data_start_symbol: used for add_delayed_seq_data.
+        :param bool|str token_ids_cache: if set, the corpus is tokenized (converted to label indices) only once,
+          and stored as a flat token id array plus an offsets array.
+          Those are memory-mapped, so the corpus strings are not kept in memory,
+          the orthography is not parsed again in every epoch,
+          and multiple processes on the same machine (e.g. data loader workers) share the memory.
+          If True, the cache is stored next to the (first) corpus file,
+          or in the RETURNN cache dir if that is not writable.
+          If a str, it is the directory for the cache.
+          The cache is invalidated when the corpus files or any of the relevant options change.
+          Not supported with ``phone_info``.
         """
         super(LmDataset, self).__init__(**kwargs)
 
@@ -136,7 +149,7 @@ class LmDataset(CachedDataset2):
             self.orth_symbols = orth_symbols
             self.labels["data"] = orth_symbols
             self.seq_gen = None
-        if orth_symbols_map_file and orth_symbols_map_file.endswith(".pkl"):
+        elif orth_symbols_map_file and orth_symbols_map_file.endswith(".pkl"):
             import pickle
 
             with open(orth_symbols_map_file, "rb") as f:
@@ -225,21 +238,35 @@ class LmDataset(CachedDataset2):
             self.num_outputs["delayed"] = self.num_outputs["data"]
             self.labels["delayed"] = self.labels["data"]
 
-        if isinstance(corpus_file, list):  # If a list of files is provided, concatenate all.
-            self.orths = []
-            for file_name in corpus_file:
-                self.orths += read_corpus(file_name, skip_empty_lines=skip_empty_lines)
-        else:
-            self.orths = read_corpus(corpus_file, skip_empty_lines=skip_empty_lines)
-        # It's only estimated because we might filter some out or so.
-        self._estimated_num_seqs = len(self.orths) // self.partition_epoch
-        print("  done, loaded %i sequences" % len(self.orths), file=log.v4)
-
         self.next_orth_idx = 0
         self.next_seq_idx = 0
         self.num_skipped = 0
         self.num_unknown = 0
 
+        self.token_ids_cache = token_ids_cache
+        self._token_ids = None  # type: typing.Optional[numpy.ndarray]  # flat, all seqs concatenated
+        self._token_ids_offsets = None  # type: typing.Optional[numpy.ndarray]  # (num_seqs + 1,)
+        self._token_ids_flags = None  # type: typing.Optional[numpy.ndarray]  # (num_seqs,), see _TokenIdsFlags
+        self.orths = None  # type: typing.Optional[typing.List[str]]
+        corpus_files = corpus_file if isinstance(corpus_file, list) else [corpus_file]
+        token_ids_cache_prefix = None
+        if token_ids_cache:
+            assert not self.seq_gen, "%s: token_ids_cache not supported with phone_info" % self
+            token_ids_cache_prefix = self._get_token_ids_cache_prefix(corpus_files, skip_empty_lines=skip_empty_lines)
+            self._load_token_ids_cache(token_ids_cache_prefix)
+        if self._token_ids is None:
+            self.orths = []
+            for file_name in corpus_files:  # If a list of files is provided, concatenate all.
+                self.orths += read_corpus(file_name, skip_empty_lines=skip_empty_lines)
+            if token_ids_cache:
+                self._create_token_ids_cache(token_ids_cache_prefix)
+                self._load_token_ids_cache(token_ids_cache_prefix)
+                assert self._token_ids is not None
+                self.orths = None  # free the memory
+        # It's only estimated because we might filter some out or so.
+        self._estimated_num_seqs = self.get_total_num_seqs() // self.partition_epoch
+        print("  done, loaded %i sequences" % self.get_total_num_seqs(), file=log.v4)
+
     def get_data_keys(self):
         """
         :rtype: list[str]
@@ -289,7 +316,9 @@ class LmDataset(CachedDataset2):
             self.seq_order = [int(s[len(self._tag_prefix) :]) for s in seq_list]
         else:
             self.seq_order = self.get_seq_order_for_epoch(
-                epoch=epoch, num_seqs=len(self.orths), get_seq_len=lambda i: len(self.orths[i])
+                epoch=epoch,
+                num_seqs=self.get_total_num_seqs(),
+                seq_lens=self._get_seq_lens,
             )
         self.next_orth_idx = 0
         self.next_seq_idx = 0
@@ -305,8 +334,116 @@ class LmDataset(CachedDataset2):
 
     def get_total_num_seqs(self) -> int:
         """total num seqs"""
+        if self._token_ids_offsets is not None:
+            return len(self._token_ids_offsets) - 1
         return len(self.orths)
 
+    def _get_seq_lens(self) -> numpy.ndarray:
+        """
+        :return: for sorting. num tokens with token_ids_cache, otherwise num chars of the orth
+        """
+        if self._token_ids_offsets is not None:
+            return numpy.diff(self._token_ids_offsets)
+        return numpy.fromiter(map(len, self.orths), dtype="int64", count=len(self.orths))
+
+    def _get_token_ids_cache_prefix(self, corpus_files: typing.List[str], *, skip_empty_lines: bool) -> str:
+        """
+        :return: filename prefix of the token ids cache files, incl. the hash of all relevant options
+        """
+        from returnn.util.basic import get_cache_dir
+        from .util.seq_index_cache import get_files_hash
+
+        opts = {
+            "version": self._TokenIdsCacheVersion,
+            "skip_empty_lines": skip_empty_lines,
+            "orth_symbols_map": sorted(self.orth_symbols_map.items()),
+            "orth_replace_map": self.orth_replace_map,
+            "parse_orth_opts": self.parse_orth_opts,
+            "word_based": self.word_based,
+            "word_end_symbol": self.word_end_symbol,
+            "unknown_symbol": self.unknown_symbol,
+            "auto_replace_unknown_symbol": bool(self.auto_replace_unknown_symbol),
+            "dtype": self.dtype,
+        }
+        name = "%s.token_ids-%s" % (os.path.basename(corpus_files[0]), get_files_hash(corpus_files, extra=opts))
+        if isinstance(self.token_ids_cache, str):
+            cache_dir = self.token_ids_cache
+        else:
+            cache_dir = os.path.dirname(os.path.realpath(corpus_files[0]))
+            if not os.access(cache_dir, os.W_OK) and not os.path.exists("%s/%s.offsets.npy" % (cache_dir, name)):
+                cache_dir = "%s/returnn/lm_token_ids" % get_cache_dir()
+        return "%s/%s" % (cache_dir, name)
+
+    _TokenIdsCacheVersion = 1
+
+    class _TokenIdsFlags:
+        valid = 0
+        ignored = 1  # e.g. "</s>", silently ignored
+        invalid = 2  # e.g. missing orth symbol
+
+    def _load_token_ids_cache(self, prefix: str):
+        """
+        Memory-maps the token ids cache, if it exists.
+        The offsets file is written last, so it marks the cache as complete.
+        """
+        if not os.path.exists(prefix + ".offsets.npy"):
+            return
+        self._token_ids_offsets = numpy.load(prefix + ".offsets.npy", mmap_mode="r")
+        self._token_ids_flags = numpy.load(prefix + ".flags.npy", mmap_mode="r")
+        if self._token_ids_offsets[-1] > 0:
+            self._token_ids = numpy.memmap(prefix + ".tokens.bin", dtype=self.dtype, mode="r")
+        else:  # cannot memmap empty files
+            self._token_ids = numpy.zeros((0,), dtype=self.dtype)
+        assert len(self._token_ids) == self._token_ids_offsets[-1]
+        assert len(self._token_ids_flags) == len(self._token_ids_offsets) - 1
+        print("LmDataset, loaded token ids cache %s.*, %i tokens" % (prefix, len(self._token_ids)), file=log.v4)
+
+    def _create_token_ids_cache(self, prefix: str):
+        """
+        Tokenizes all of ``self.orths`` and writes the token ids cache.
+        Files are written to temp files first and then renamed,
+        such that concurrent readers (e.g. other jobs on the same corpus) never see partially written files.
+        """
+        print("LmDataset, creating token ids cache %s.*" % prefix, file=log.v3)
+        start_time = time.time()
+        os.makedirs(os.path.dirname(prefix), exist_ok=True)
+        tmp_suffix = ".tmp%i" % os.getpid()
+        offsets = numpy.zeros((len(self.orths) + 1,), dtype="int64")
+        flags = numpy.zeros((len(self.orths),), dtype="uint8")
+        buffer = []  # type: typing.List[numpy.ndarray]
+        buffer_len = 0
+        with open(prefix + ".tokens.bin" + tmp_suffix, "wb") as f:
+            for i, orth in enumerate(self.orths):
+                data = None
+                if orth == "</s>":
+                    flags[i] = self._TokenIdsFlags.ignored
+                else:
+                    data = self._orth_to_seq(orth, error_on_invalid_seq=False)
+                    if data is None:
+                        flags[i] = self._TokenIdsFlags.invalid
+                offsets[i + 1] = offsets[i] + (len(data) if data is not None else 0)
+                if data is not None:
+                    buffer.append(data)
+                    buffer_len += len(data)
+                if buffer_len >= 1000000 or (i == len(self.orths) - 1 and buffer):
+                    f.write(numpy.concatenate(buffer).astype(self.dtype, copy=False).tobytes())
+                    buffer, buffer_len = [], 0
+        for ext, arr in [(".flags.npy", flags), (".offsets.npy", offsets)]:
+            with open(prefix + ext + tmp_suffix, "wb") as f:
+                numpy.save(f, arr)
+        for ext in [".tokens.bin", ".flags.npy", ".offsets.npy"]:  # offsets last, it marks completion
+            os.replace(prefix + ext + tmp_suffix, prefix + ext)
+        print(
+            "LmDataset, created token ids cache, %i seqs, %i tokens, %i invalid seqs, took %.1f secs"
+            % (
+                len(self.orths),
+                offsets[-1],
+                numpy.count_nonzero(flags == self._TokenIdsFlags.invalid),
+                time.time() - start_time,
+            ),
+            file=log.v3,
+        )
+
     def _reduce_log_skipped_seqs(self):
         if isinstance(self.log_skipped_seqs, bool):
             return
@@ -325,6 +462,58 @@ class LmDataset(CachedDataset2):
         if not self.log_auto_replace_unknown_symbols:
             print("LmDataset: will stop logging about auto-replace with unknown symbol now", file=log.v4)
 
+    def _orth_to_seq(self, orth: str, *, error_on_invalid_seq: bool) -> typing.Optional[numpy.ndarray]:
+        """
+        :param orth: via ``orth_symbols``
+        :param error_on_invalid_seq: if True, raise an exception for an invalid seq
+        :return: label indices, or None if the seq is invalid (e.g. missing orth symbol)
+        """
+        orth_syms = parse_orthography(orth, **self.parse_orth_opts)
+        while True:
+            orth_syms = sum([self.orth_replace_map.get(s, [s]) for s in orth_syms], [])
+            i = 0
+            # For the character-based case, spaces have been replaced by word_end_symbol.
+            space_symbol = self.word_end_symbol if self.word_end_symbol and not self.word_based else " "
+            while i < len(orth_syms) - 1:
+                if orth_syms[i : i + 2] == [space_symbol, space_symbol]:
+                    orth_syms[i : i + 2] = [space_symbol]  # collapse two spaces
+                else:
+                    i += 1
+            if self.auto_replace_unknown_symbol:
+                try:
+                    list(
+                        map(self.orth_symbols_map.__getitem__, orth_syms)
+                    )  # convert to list to trigger map (it's lazy)
+                except KeyError as e:
+                    orth_sym = e.args[0]
+                    if self.log_auto_replace_unknown_symbols:
+                        print(
+                            "LmDataset: unknown orth symbol %r, adding to orth_replace_map as %r"
+                            % (orth_sym, self.unknown_symbol),
+                            file=log.v3,
+                        )
+                        self._reduce_log_auto_replace_unknown_symbols()
+                    self.orth_replace_map[orth_sym] = [self.unknown_symbol] if self.unknown_symbol is not None else []
+                    continue  # try this seq again with updated orth_replace_map
+            break
+        self.num_unknown += orth_syms.count(self.unknown_symbol)
+        if self.word_based:
+            orth_debug_str = repr(orth_syms)
+        else:
+            orth_debug_str = repr("".join(orth_syms))
+        try:
+            return numpy.array(list(map(self.orth_symbols_map.__getitem__, orth_syms)), dtype=self.dtype)
+        except KeyError as e:
+            if self.log_skipped_seqs:
+                print(
+                    "LmDataset: skipping sequence %s because of missing orth symbol: %s" % (orth_debug_str, e),
+                    file=log.v4,
+                )
+                self._reduce_log_skipped_seqs()
+            if error_on_invalid_seq:
+                raise Exception("LmDataset: invalid seq %s, missing orth symbol %s" % (orth_debug_str, e))
+            return None
+
     def _collect_single_seq(self, seq_idx):
         """
         :type seq_idx: int
@@ -339,84 +528,53 @@ class LmDataset(CachedDataset2):
                 return None
             assert self.next_seq_idx == seq_idx, "We expect that we iterate through all seqs."
             true_idx = self.seq_order[self.next_orth_idx]
-            orth = self.orths[true_idx]  # get sequence for the next index given by seq_order
             seq_tag = self._tag_prefix + str(true_idx)
             self.next_orth_idx += 1
-            if orth == "</s>":
-                continue  # special sentence end symbol. empty seq, ignore.
 
-            if self.seq_gen:
-                try:
-                    phones = self.seq_gen.generate_seq(orth)
-                except KeyError as e:
-                    if self.log_skipped_seqs:
-                        print(
-                            "LmDataset: skipping sequence %r because of missing lexicon entry: %s" % (orth, e),
-                            file=log.v4,
-                        )
-                        self._reduce_log_skipped_seqs()
+            if self._token_ids is not None:
+                flag = self._token_ids_flags[true_idx]
+                if flag == self._TokenIdsFlags.ignored:
+                    continue
+                if flag == self._TokenIdsFlags.invalid:
                     if self.error_on_invalid_seq:
-                        raise Exception("LmDataset: invalid seq %r, missing lexicon entry %r" % (orth, e))
+                        raise Exception("LmDataset: invalid seq %r, see log of token ids cache creation" % seq_tag)
                     self.num_skipped += 1
                     continue  # try another seq
-                data = self.seq_gen.seq_to_class_idxs(phones, dtype=self.dtype)
+                data = numpy.array(
+                    self._token_ids[self._token_ids_offsets[true_idx] : self._token_ids_offsets[true_idx + 1]]
+                )
+                if self.unknown_symbol in self.orth_symbols_map:
+                    self.num_unknown += numpy.count_nonzero(data == self.orth_symbols_map[self.unknown_symbol])
 
-            elif self.orth_symbols:
-                orth_syms = parse_orthography(orth, **self.parse_orth_opts)
-                while True:
-                    orth_syms = sum([self.orth_replace_map.get(s, [s]) for s in orth_syms], [])
-                    i = 0
-                    # For the character-based case, spaces have been replaced by word_end_symbol.
-                    space_symbol = self.word_end_symbol if self.word_end_symbol and not self.word_based else " "
-                    while i < len(orth_syms) - 1:
-                        if orth_syms[i : i + 2] == [space_symbol, space_symbol]:
-                            orth_syms[i : i + 2] = [space_symbol]  # collapse two spaces
-                        else:
-                            i += 1
-                    if self.auto_replace_unknown_symbol:
-                        try:
-                            list(
-                                map(self.orth_symbols_map.__getitem__, orth_syms)
-                            )  # convert to list to trigger map (it's lazy)
-                        except KeyError as e:
-                            if sys.version_info >= (3, 0):
-                                orth_sym = e.args[0]
-                            else:
-                                # noinspection PyUnresolvedReferences
-                                orth_sym = e.message
-                            if self.log_auto_replace_unknown_symbols:
-                                print(
-                                    "LmDataset: unknown orth symbol %r, adding to orth_replace_map as %r"
-                                    % (orth_sym, self.unknown_symbol),
-                                    file=log.v3,
-                                )
-                                self._reduce_log_auto_replace_unknown_symbols()
-                            self.orth_replace_map[orth_sym] = (
-                                [self.unknown_symbol] if self.unknown_symbol is not None else []
+            else:
+                orth = self.orths[true_idx]  # get sequence for the next index given by seq_order
+                if orth == "</s>":
+                    continue  # special sentence end symbol. empty seq, ignore.
+
+                if self.seq_gen:
+                    try:
+                        phones = self.seq_gen.generate_seq(orth)
+                    except KeyError as e:
+                        if self.log_skipped_seqs:
+                            print(
+                                "LmDataset: skipping sequence %r because of missing lexicon entry: %s" % (orth, e),
+                                file=log.v4,
                             )
-                            continue  # try this seq again with updated orth_replace_map
-                    break
-                self.num_unknown += orth_syms.count(self.unknown_symbol)
-                if self.word_based:
-                    orth_debug_str = repr(orth_syms)
-                else:
-                    orth_debug_str = repr("".join(orth_syms))
-                try:
-                    data = numpy.array(list(map(self.orth_symbols_map.__getitem__, orth_syms)), dtype=self.dtype)
-                except KeyError as e:
-                    if self.log_skipped_seqs:
-                        print(
-                            "LmDataset: skipping sequence %s because of missing orth symbol: %s" % (orth_debug_str, e),
-                            file=log.v4,
-                        )
-                        self._reduce_log_skipped_seqs()
-                    if self.error_on_invalid_seq:
-                        raise Exception("LmDataset: invalid seq %s, missing orth symbol %s" % (orth_debug_str, e))
-                    self.num_skipped += 1
-                    continue  # try another seq
+                            self._reduce_log_skipped_seqs()
+                        if self.error_on_invalid_seq:
+                            raise Exception("LmDataset: invalid seq %r, missing lexicon entry %r" % (orth, e))
+                        self.num_skipped += 1
+                        continue  # try another seq
+                    data = self.seq_gen.seq_to_class_idxs(phones, dtype=self.dtype)
+
+                elif self.orth_symbols:
+                    data = self._orth_to_seq(orth, error_on_invalid_seq=self.error_on_invalid_seq)
+                    if data is None:
+                        self.num_skipped += 1
+                        continue  # try another seq
 
-            else:
-                assert False
+                else:
+                    assert False
 
             targets = {}
             for i in range(self.add_random_phone_seqs):
@@ -1189,6 +1347,19 @@ class TranslationDataset(CachedDataset2):
         self._data = {data_key: [] for data_key in self._data_keys}  # type: typing.Dict[str,typing.List[numpy.ndarray]]
         self._data_len = None  # type: typing.Optional[int]
 
+        # With the seq index cache, we know the data len and the seq lens already before the data is loaded.
+        self._index_cache = self._get_seq_index_cache(
+            [self._get_data_filename(prefix) for prefix in self._files_to_read],
+            name=self.__class__.__name__,
+            opts={"source_postfix": source_postfix, "target_postfix": target_postfix},
+        )
+        self._seq_lens_from_index = None  # type: typing.Optional[typing.Dict[str,numpy.ndarray]]
+        if self._index_cache:
+            index = self._index_cache.load()
+            if index and set(index.seq_lens.keys()) == set(self._main_data_key_map[p] for p in self._files_to_read):
+                self._seq_lens_from_index = index.seq_lens
+                self._data_len = index.num_seqs
+
         self._vocabs = self._get_vocabs()
         self.num_outputs = {k: [max(self._vocabs[k].values()) + 1, 1] for k in self._vocabs.keys()}  # all sparse
         assert all([v1 <= 2**31 for (k, (v1, v2)) in self.num_outputs.items()])  # we use int32
@@ -1245,16 +1416,17 @@ class TranslationDataset(CachedDataset2):
             returnn.util.better_exchook.install()
             from returnn.util.basic import AsyncThreadRun
 
-            # First iterate once over the data to get the data len as fast as possible.
-            data_len = 0
-            while True:
-                ls = self._data_files[self.source_file_prefix].readlines(10**4)
-                data_len += len(ls)
-                if not ls:
-                    break
-            with self._lock:
-                self._data_len = data_len
-            self._data_files[self.source_file_prefix].seek(0, os.SEEK_SET)  # we will read it again below
+            if self._data_len is None:
+                # First iterate once over the data to get the data len as fast as possible.
+                data_len = 0
+                while True:
+                    ls = self._data_files[self.source_file_prefix].readlines(10**4)
+                    data_len += len(ls)
+                    if not ls:
+                        break
+                with self._lock:
+                    self._data_len = data_len
+                self._data_files[self.source_file_prefix].seek(0, os.SEEK_SET)  # we will read it again below
 
             # Now, read and use the vocab for a compact representation in memory.
             files_to_read = list(self._files_to_read)
@@ -1273,6 +1445,16 @@ class TranslationDataset(CachedDataset2):
                 file_handle.close()
                 self._data_files[file_prefix] = None
 
+            if self._index_cache and self._seq_lens_from_index is None:
+                self._index_cache.save(
+                    SeqIndex(
+                        seq_lens={
+                            data_key: numpy.array([len(x) for x in self._data[data_key]], dtype="int32")
+                            for data_key in (self._main_data_key_map[p] for p in self._files_to_read)
+                        }
+                    )
+                )
+
         except Exception:
             sys.excepthook(*sys.exc_info())
             interrupt_main()
@@ -1289,22 +1471,33 @@ class TranslationDataset(CachedDataset2):
             filename = cf(filename)
         return filename
 
-    def _get_data_file(self, prefix):
+    def _get_data_filename(self, prefix):
         """
         :param str prefix: e.g. "source" or "target"
-        :return: full filename
-        :rtype: io.FileIO
+        :return: full filename, maybe with ".gz"
+        :rtype: str
         """
         import os
 
         filename = "%s/%s.%s" % (self.path, prefix, self.file_postfix)
         if os.path.exists(filename):
-            return open(self._transform_filename(filename), "rb")
+            return filename
         if os.path.exists(filename + ".gz"):
+            return filename + ".gz"
+        raise Exception("Data file not found: %r (.gz)?" % filename)
+
+    def _get_data_file(self, prefix):
+        """
+        :param str prefix: e.g. "source" or "target"
+        :return: file handle
+        :rtype: io.FileIO
+        """
+        filename = self._get_data_filename(prefix)
+        if filename.endswith(".gz"):
             import gzip
 
-            return gzip.GzipFile(self._transform_filename(filename + ".gz"), "rb")
-        raise Exception("Data file not found: %r (.gz)?" % filename)
+            return gzip.GzipFile(self._transform_filename(filename), "rb")
+        return open(self._transform_filename(filename), "rb")
 
     def _get_vocabs(self):
         """
@@ -1472,7 +1665,12 @@ class TranslationDataset(CachedDataset2):
             self._seq_order = self.get_seq_order_for_epoch(
                 epoch=epoch,
                 num_seqs=num_seqs,
-                get_seq_len=lambda i: len(self._get_data(key=self.main_source_data_key, line_nr=i)),
+                get_seq_len=self._get_main_source_seq_len,
+                seq_lens=(
+                    self._seq_lens_from_index[self.main_source_data_key]
+                    if self._seq_lens_from_index is not None
+                    else None
+                ),
             )
         self._num_seqs = len(self._seq_order)
         return True
@@ -1490,7 +1688,17 @@ class TranslationDataset(CachedDataset2):
         corpus_seq_idx = self.get_corpus_seq_idx(seq_idx)
         assert corpus_seq_idx is not None
 
-        return len(self._get_data(key=self.main_source_data_key, line_nr=corpus_seq_idx))
+        return self._get_main_source_seq_len(corpus_seq_idx)
+
+    def _get_main_source_seq_len(self, line_nr):
+        """
+        :param int line_nr:
+        :return: seq len of the main source data key ("data"), maybe from the seq index cache
+        :rtype: int
+        """
+        if self._seq_lens_from_index is not None:
+            return int(self._seq_lens_from_index[self.main_source_data_key][line_nr])
+        return len(self._get_data(key=self.main_source_data_key, line_nr=line_nr))
 
     def _collect_single_seq(self, seq_idx):
         if seq_idx >= self._num_seqs:
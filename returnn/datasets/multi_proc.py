@@ -3,9 +3,13 @@ Multi-processing dataset
 """
 
 from __future__ import annotations
-from typing import Optional, Any, Dict, List
+from typing import Optional, Any, Dict, List, Tuple
 import sys
 import gc
+import ctypes
+import weakref
+from collections import deque
+import numpy
 from .basic import init_dataset, Dataset, DatasetSeq
 from .cached2 import CachedDataset2
 from returnn.util.basic import try_run
@@ -13,18 +17,42 @@ import multiprocessing as mp
 from returnn.util.multi_proc_non_daemonic_spawn import NonDaemonicSpawnContext
 
 # noinspection PyProtectedMember
-from multiprocessing.connection import Connection as mpConnection
+from multiprocessing.connection import Connection as mpConnection, wait as mp_wait
 
 
 class MultiProcDataset(CachedDataset2):
     """
     Dataset which uses multi-processing to load the data from another dataset.
 
-    To get deterministic behavior, it will use round-robin scheduling.
+    To get deterministic behavior, it will use round-robin scheduling by default.
 
     There is one process just for generating the sequence order, i.e. list of sequences.
     Then there are ``num_workers`` processes which will load the data for the shard of the sequences.
     This means, one epoch (or subepoch) is exactly as in the original dataset.
+
+    With ``scheduling="dynamic"``, every worker gets the full sequence order,
+    and the workers pull the next seq idx from a shared counter whenever they are free.
+    The main process reorders the seqs back to the original order.
+    This is faster when the loading time of the seqs varies a lot (e.g. audio decoding),
+    as one slow seq does not block the other workers.
+    The order of the seqs is the same as with round-robin scheduling,
+    but it is not deterministic which worker loads which seq,
+    so this should not be used if the loading itself has randomness (e.g. data augmentation).
+    Also, the dataset must support loading the seqs in the order with gaps.
+    ``read_ahead_size`` should be set, as otherwise the workers are only busy within :func:`load_seqs`.
+
+    By default, the sequences are sent from the workers via the pipe, i.e. they are pickled.
+    With ``transport="shared_memory"``, each worker instead copies the numpy arrays of the sequences
+    into its own shared memory ring buffer, and only sends a small descriptor via the pipe.
+    The arrays in the main process are then views into the shared memory (zero-copy).
+    The worker can reuse the memory once all views of a sequence in the main process are gone.
+    When the ring buffer is full, or for arrays which cannot be shared (e.g. object dtype),
+    it falls back to the pipe.
+
+    When loading a range of seqs (via :func:`load_seqs`), the main process sends one request
+    to every worker for all its seqs in the range, and the workers process them in parallel.
+    With ``read_ahead_size``, the main process additionally already requests the following seqs,
+    such that the workers can work on them while the main process consumes the current seqs.
     """
 
     def __init__(
@@ -32,6 +60,10 @@ class MultiProcDataset(CachedDataset2):
         dataset: Dict[str, Any],
         num_workers: int,
         buffer_size: int,
+        transport: str = "pipe",
+        shared_memory_size: int = 64 * 1024 * 1024,
+        read_ahead_size: int = 0,
+        scheduling: str = "round_robin",
         _meta_info_cache: Optional[Dict[str, Any]] = None,
         **kwargs,
     ):
@@ -39,10 +71,19 @@ class MultiProcDataset(CachedDataset2):
         :param dataset: the dataset to use
         :param num_workers: number of workers to use
         :param buffer_size: buffer size for each worker, amount of seqs to prefetch
+        :param transport: how the seqs are sent from the workers: "pipe" or "shared_memory"
+        :param shared_memory_size: size in bytes of the shared memory ring buffer of each worker,
+            for ``transport="shared_memory"``
+        :param read_ahead_size: number of seqs which the main process requests in advance from the workers.
+            With dynamic scheduling, this is also the size of the reorder buffer (plus the loaded range).
+        :param scheduling: how the seqs are distributed to the workers: "round_robin" or "dynamic"
         :param _meta_info_cache: for internal use
         """
         super().__init__(**kwargs)
         assert num_workers > 0 and buffer_size > 0
+        assert transport in {"pipe", "shared_memory"}, f"{self}: invalid transport {transport!r}"
+        assert shared_memory_size > 0 and read_ahead_size >= 0
+        assert scheduling in {"round_robin", "dynamic"}, f"{self}: invalid scheduling {scheduling!r}"
         dataset = dataset.copy()
         for k, v in kwargs.items():
             if k not in dataset:
@@ -52,6 +93,10 @@ class MultiProcDataset(CachedDataset2):
         self.dataset = dataset
         self.num_workers = num_workers
         self.buffer_size = buffer_size
+        self.transport = transport
+        self.shared_memory_size = shared_memory_size
+        self.read_ahead_size = read_ahead_size
+        self.scheduling = scheduling
         self._data_keys = None
         self._num_seqs = None
         self._total_num_seqs = None
@@ -60,6 +105,11 @@ class MultiProcDataset(CachedDataset2):
         self._seq_order_proc_parent_conn = None  # type: Optional[mpConnection]
         self._seq_order_proc = None  # type: Optional[mp.Process]
         self._worker_procs = None  # type: Optional[List[mp.Process]]
+        self._worker_shm_readers = None  # type: Optional[List[_ShmRingBufferReader]]
+        self._worker_num_pending_requests = None  # type: Optional[List[int]]
+        self._next_seq_counter = None  # for dynamic scheduling, next seq idx to be loaded by some worker
+        self._requested_seqs_end = 0  # all seqs before this were requested from the workers in this epoch
+        self._received_seqs = {}  # type: Dict[int, DatasetSeq]  # seq idx -> seq, received but not consumed yet
 
         if _meta_info_cache:
             # This allows to skip the lazy init in self.initialize().
@@ -106,6 +156,14 @@ class MultiProcDataset(CachedDataset2):
                 worker_parent_conns.append(parent_conn)
                 worker_child_conns.append(child_conn)
 
+            worker_shm_readers = None  # type: Optional[List[_ShmRingBufferReader]]
+            if self.transport == "shared_memory":
+                worker_shm_readers = [_ShmRingBufferReader(self.shared_memory_size) for _ in range(self.num_workers)]
+
+            next_seq_counter = None
+            if self.scheduling == "dynamic":
+                next_seq_counter = _mp.Value("q", 0)
+
             worker_procs = []
             for i in range(self.num_workers):
                 worker_proc = _mp.Process(
@@ -118,6 +176,8 @@ class MultiProcDataset(CachedDataset2):
                         worker_child_conns[i],
                         worker_from_seq_order[i - 1] if i > 0 else None,
                         seq_order_to_worker if i == 0 else None,
+                        worker_shm_readers[i].shm_name if worker_shm_readers else None,
+                        next_seq_counter,
                     ),
                     daemon=True,
                 )
@@ -133,6 +193,9 @@ class MultiProcDataset(CachedDataset2):
             self._seq_order_proc_parent_conn = worker_parent_conns[0]  # type: mpConnection
             self._worker_parent_conns = worker_parent_conns
             self._worker_procs = worker_procs
+            self._worker_shm_readers = worker_shm_readers
+            self._worker_num_pending_requests = [0] * self.num_workers
+            self._next_seq_counter = next_seq_counter
 
             self._seq_order_proc_parent_conn.send(("init", {}))
             msg, self.num_inputs = self._seq_order_proc_parent_conn.recv()
@@ -146,6 +209,8 @@ class MultiProcDataset(CachedDataset2):
 
     def __del__(self):
         if self._worker_procs:
+            # Make sure no worker is blocked in sending us some answer.
+            try_run(self._drop_pending_requests)
             got_exception = False
             for worker_parent_conn in self._worker_parent_conns:
                 # noinspection PyBroadException
@@ -156,6 +221,9 @@ class MultiProcDataset(CachedDataset2):
             if not got_exception:
                 for worker_proc in self._worker_procs:
                     try_run(worker_proc.join)
+        if self._worker_shm_readers:
+            for shm_reader in self._worker_shm_readers:
+                shm_reader.close()
 
     @staticmethod
     def _worker_proc_loop(
@@ -165,12 +233,15 @@ class MultiProcDataset(CachedDataset2):
         parent_conn: mpConnection,
         seq_order_conn: Optional[mpConnection],
         other_worker_conns: Optional[List[mpConnection]],
+        shm_name: Optional[str] = None,
+        next_seq_counter: Optional[Any] = None,
     ):
         if sys.platform == "linux":
             with open("/proc/self/comm", "w") as f:
                 f.write(f"MPD worker {worker_index}")
 
         dataset: Optional[Dataset] = None
+        shm_writer = _ShmRingBufferWriter(shm_name) if shm_name else None
 
         got_init_seq_order = False
         cache = []  # type: List[DatasetSeq]
@@ -227,19 +298,45 @@ class MultiProcDataset(CachedDataset2):
 
         try:
             while True:
-                if got_init_seq_order:
+                if got_init_seq_order and next_seq_counter is None:
                     while not parent_conn.poll():
                         if not _add_to_cache():
                             break
                 msg, kwargs = parent_conn.recv()
                 if msg == "exit":
                     break
-                elif msg == "get_data_seq":
-                    seq_idx = kwargs["seq_idx"]
-                    while cache and cache[0].seq_idx < seq_idx:
-                        cache.pop(0)
-                    res = _get(seq_idx)
-                    parent_conn.send(("data_seq", res))
+                elif msg == "get_data_seqs":
+                    if shm_writer:
+                        shm_writer.release(kwargs["shm_released_alloc_ids"])
+                    res = []
+                    for seq_idx in range(kwargs["start_seq_idx"], kwargs["end_seq_idx"]):
+                        while cache and cache[0].seq_idx < seq_idx:
+                            cache.pop(0)
+                        seq = _get(seq_idx)
+                        if seq is None:
+                            break
+                        res.append(shm_writer.encode(seq) if shm_writer else seq)
+                    parent_conn.send(("data_seqs", res))
+                elif msg == "get_data_seqs_dynamic":
+                    assert next_seq_counter is not None
+                    if shm_writer:
+                        shm_writer.release(kwargs["shm_released_alloc_ids"])
+                    # Send every seq as soon as it is ready, such that the main process does not need to wait
+                    # for the whole requested range, and also to not keep all the seqs here.
+                    while True:
+                        with next_seq_counter.get_lock():
+                            seq_idx = next_seq_counter.value
+                            if seq_idx >= kwargs["end_seq_idx"]:
+                                break
+                            next_seq_counter.value = seq_idx + 1
+                        if not dataset.is_less_than_num_seqs(seq_idx):
+                            break
+                        dataset.load_seqs(seq_idx, seq_idx + 1)
+                        seq_tag = dataset.get_tag(seq_idx)
+                        features = {key: dataset.get_data(seq_idx, key) for key in dataset.get_data_keys()}
+                        seq = DatasetSeq(seq_idx=seq_idx, seq_tag=seq_tag, features=features)
+                        parent_conn.send(("data_seqs_partial", [shm_writer.encode(seq) if shm_writer else seq]))
+                    parent_conn.send(("data_seqs", []))  # end of request
                 elif msg == "init":
                     assert worker_index == 0
                     if dataset is None:
@@ -261,10 +358,16 @@ class MultiProcDataset(CachedDataset2):
                         dataset.init_seq_order(**kwargs)
                         seq_order = dataset.get_current_seq_order()
                         for i, worker_conn in enumerate(other_worker_conns):
-                            worker_conn.send(("seq_order_shard", seq_order[i + 1 :: len(other_worker_conns) + 1]))
+                            if next_seq_counter is not None:  # dynamic scheduling, every worker gets everything
+                                worker_conn.send(("seq_order_shard", seq_order))
+                            else:
+                                worker_conn.send(("seq_order_shard", seq_order[i + 1 :: len(other_worker_conns) + 1]))
                         parent_conn.send(("num_seqs", len(seq_order)))
                         # Now reset seq order for ourself (as the role of a normal worker).
-                        kwargs["seq_order"] = seq_order[0 :: len(other_worker_conns) + 1]
+                        if next_seq_counter is not None:
+                            kwargs["seq_order"] = seq_order
+                        else:
+                            kwargs["seq_order"] = seq_order[0 :: len(other_worker_conns) + 1]
                         kwargs.pop("seq_list", None)
                         dataset.init_seq_order(**kwargs)
                     else:
@@ -288,6 +391,9 @@ class MultiProcDataset(CachedDataset2):
                     raise Exception(f"unknown msg {msg!r}")
         except KeyboardInterrupt:  # when parent dies
             pass
+        finally:
+            if shm_writer:
+                shm_writer.close()
 
     def init_seq_order(self, epoch=None, seq_list=None, seq_order=None):
         """
@@ -299,6 +405,8 @@ class MultiProcDataset(CachedDataset2):
         :returns whether the order changed (True is always safe to return)
         """
         super().init_seq_order(epoch=epoch, seq_list=seq_list, seq_order=seq_order)
+        if self._worker_procs:
+            self._drop_pending_requests()
         if epoch is not None or seq_list is not None or seq_order is not None:
             self._lazy_init()
             self._seq_order_proc_parent_conn.send(
@@ -315,18 +423,116 @@ class MultiProcDataset(CachedDataset2):
         return True
 
     def _collect_single_seq(self, seq_idx: int) -> Optional[DatasetSeq]:
-        if seq_idx >= self._num_seqs:
-            return None
-        worker_idx = seq_idx % self.num_workers
-        worker = self._worker_parent_conns[worker_idx]
-        worker.send(("get_data_seq", {"seq_idx": seq_idx // self.num_workers}))
-        msg, data = worker.recv()
-        assert msg == "data_seq"
-        if data is None:
-            return None
-        assert isinstance(data, DatasetSeq)
-        data.seq_idx = seq_idx
-        return data
+        seqs = self._collect_seqs(seq_idx, seq_idx + 1)
+        return seqs[0] if seqs else None
+
+    def _collect_seqs(self, start: int, end: int) -> List[DatasetSeq]:
+        end = min(end, self._num_seqs)
+        if start >= end:
+            return []
+        self._request_seqs(start, min(end + self.read_ahead_size, self._num_seqs))
+        res = []
+        for seq_idx in range(start, end):
+            while seq_idx not in self._received_seqs:
+                if self._next_seq_counter is not None:
+                    self._receive_seqs_from_any_worker()
+                else:
+                    self._receive_seqs(seq_idx % self.num_workers)
+            res.append(self._received_seqs.pop(seq_idx))
+        return res
+
+    def _request_seqs(self, start: int, end: int):
+        """
+        Sends requests to the workers such that all seqs in [start, end) will be received.
+        Seqs before ``start`` are not needed anymore.
+        """
+        for seq_idx in [seq_idx for seq_idx in self._received_seqs if seq_idx < start]:
+            del self._received_seqs[seq_idx]
+        start = max(start, self._requested_seqs_end)
+        if start >= end:
+            return
+        if self._next_seq_counter is not None:
+            # Dynamic scheduling. All workers can take any seq. See _worker_proc_loop.
+            for worker_idx, worker in enumerate(self._worker_parent_conns):
+                shm_reader = self._worker_shm_readers[worker_idx] if self._worker_shm_readers else None
+                worker.send(
+                    (
+                        "get_data_seqs_dynamic",
+                        {
+                            "end_seq_idx": end,
+                            "shm_released_alloc_ids": shm_reader.pop_released_alloc_ids() if shm_reader else None,
+                        },
+                    )
+                )
+                self._worker_num_pending_requests[worker_idx] += 1
+            self._requested_seqs_end = end
+            return
+        for worker_idx, worker in enumerate(self._worker_parent_conns):
+            # Seq idx i is handled by worker i % num_workers, where it has the local seq idx i // num_workers.
+            local_start = (start - worker_idx + self.num_workers - 1) // self.num_workers
+            local_end = (end - worker_idx + self.num_workers - 1) // self.num_workers
+            if local_start >= local_end:
+                continue
+            shm_reader = self._worker_shm_readers[worker_idx] if self._worker_shm_readers else None
+            worker.send(
+                (
+                    "get_data_seqs",
+                    {
+                        "start_seq_idx": local_start,
+                        "end_seq_idx": local_end,
+                        "shm_released_alloc_ids": shm_reader.pop_released_alloc_ids() if shm_reader else None,
+                    },
+                )
+            )
+            self._worker_num_pending_requests[worker_idx] += 1
+        self._requested_seqs_end = end
+
+    def _receive_seqs(self, worker_idx: int):
+        """
+        Receives the (next part of the) answer of the oldest pending request of the worker.
+        With dynamic scheduling, the answer comes in multiple parts ("data_seqs_partial"),
+        and the request is only finished with the final "data_seqs".
+        """
+        assert self._worker_num_pending_requests[worker_idx] > 0
+        msg, seqs = self._worker_parent_conns[worker_idx].recv()
+        assert msg in {"data_seqs", "data_seqs_partial"}
+        if msg == "data_seqs":
+            self._worker_num_pending_requests[worker_idx] -= 1
+        shm_reader = self._worker_shm_readers[worker_idx] if self._worker_shm_readers else None
+        for seq in seqs:
+            if isinstance(seq, _ShmDatasetSeqRef):
+                assert shm_reader
+                seq = shm_reader.decode(seq)
+            assert isinstance(seq, DatasetSeq)
+            if self._next_seq_counter is None:  # round-robin, local seq idx
+                seq.seq_idx = seq.seq_idx * self.num_workers + worker_idx
+            self._received_seqs[seq.seq_idx] = seq
+
+    def _receive_seqs_from_any_worker(self):
+        """
+        Receives the answer of some worker which has a pending request, whichever is ready first.
+        """
+        conns = [
+            worker
+            for worker, num_pending in zip(self._worker_parent_conns, self._worker_num_pending_requests)
+            if num_pending > 0
+        ]
+        assert conns, f"{self}: no pending requests"
+        ready_conn = mp_wait(conns)[0]
+        self._receive_seqs(self._worker_parent_conns.index(ready_conn))
+
+    def _drop_pending_requests(self):
+        """
+        Receives all pending answers from the workers and drops them, and also drops all received seqs.
+        """
+        for worker_idx in range(len(self._worker_parent_conns)):
+            while self._worker_num_pending_requests[worker_idx] > 0:
+                self._receive_seqs(worker_idx)
+        self._received_seqs.clear()
+        self._requested_seqs_end = 0
+        if self._next_seq_counter is not None:
+            with self._next_seq_counter.get_lock():
+                self._next_seq_counter.value = 0
 
     @property
     def num_seqs(self) -> int:
@@ -342,10 +548,237 @@ class MultiProcDataset(CachedDataset2):
     def finish_epoch(self, *, free_resources: bool = False):
         """finish epoch"""
         super().finish_epoch(free_resources=free_resources)
+        if not self._worker_procs:
+            return
+        self._drop_pending_requests()
         for worker_parent_conn in self._worker_parent_conns:
             worker_parent_conn.send(("finish_epoch", {"free_resources": free_resources}))
 
 
+class _ShmDatasetSeqRef:
+    """
+    Small picklable descriptor of a :class:`DatasetSeq` whose arrays are in the shared memory ring buffer.
+    """
+
+    def __init__(
+        self,
+        *,
+        seq_idx: int,
+        seq_tag: str,
+        alloc_id: int,
+        offset: int,
+        num_bytes: int,
+        features: Dict[str, Tuple[Any, ...]],
+    ):
+        """
+        :param seq_idx:
+        :param seq_tag:
+        :param alloc_id: id of the allocation in the ring buffer, to release it later
+        :param offset: offset of the allocation in the shared memory
+        :param num_bytes: size of the allocation
+        :param features: key -> ("shm", rel offset, shape, dtype str) or ("array", numpy array)
+        """
+        self.seq_idx = seq_idx
+        self.seq_tag = seq_tag
+        self.alloc_id = alloc_id
+        self.offset = offset
+        self.num_bytes = num_bytes
+        self.features = features
+
+
+_ShmAlignment = 64
+
+
+def _shm_align(num_bytes: int) -> int:
+    return (num_bytes + _ShmAlignment - 1) // _ShmAlignment * _ShmAlignment
+
+
+class _ShmRingBufferWriter:
+    """
+    Worker side of the shared memory ring buffer.
+    Allocations are done in order, and the memory is reused once the oldest allocations were released.
+    """
+
+    def __init__(self, shm_name: str):
+        # Note: Python <3.13 will register this also at the resource tracker,
+        # but it is the same one as the parent, which owns the shared memory and unlinks it.
+        from multiprocessing.shared_memory import SharedMemory  # Python >=3.8
+
+        self.shm = SharedMemory(name=shm_name)
+        self.size = self.shm.size
+        self._next_alloc_id = 0
+        self._head = 0  # next write pos
+        self._allocs = deque()  # type: deque[Tuple[int, int, int]]  # (alloc_id, start, end), in alloc order
+        self._released_alloc_ids = set()
+
+    def close(self):
+        """close"""
+        self.shm.close()
+
+    def release(self, alloc_ids):
+        """
+        :param collections.abc.Iterable[int] alloc_ids: released by the parent, i.e. not used anymore
+        """
+        self._released_alloc_ids.update(alloc_ids)
+        while self._allocs and self._allocs[0][0] in self._released_alloc_ids:
+            alloc_id, _, _ = self._allocs.popleft()
+            self._released_alloc_ids.remove(alloc_id)
+        if not self._allocs:
+            self._head = 0
+
+    def _alloc(self, num_bytes: int) -> Optional[Tuple[int, int]]:
+        """
+        :return: (alloc_id, start) or None if there is not enough free space
+        """
+        if self._allocs:
+            tail = self._allocs[0][1]
+            if self._head >= tail:  # not wrapped around
+                if self._head + num_bytes <= self.size:
+                    start = self._head
+                elif num_bytes <= tail:
+                    start = 0
+                else:
+                    return None
+            else:  # wrapped around
+                if self._head + num_bytes <= tail:
+                    start = self._head
+                else:
+                    return None
+        else:
+            if num_bytes > self.size:
+                return None
+            start = 0
+        alloc_id = self._next_alloc_id
+        self._next_alloc_id += 1
+        self._head = start + num_bytes
+        self._allocs.append((alloc_id, start, start + num_bytes))
+        return alloc_id, start
+
+    def encode(self, seq: DatasetSeq) -> Any:
+        """
+        :return: either :class:`_ShmDatasetSeqRef` or the original seq, if it does not fit into the buffer
+        """
+        shared = {}  # type: Dict[str, Tuple[int, numpy.ndarray]]
+        num_bytes = 0
+        for key, value in seq.features.items():
+            if value.dtype.hasobject:
+                continue
+            shared[key] = (num_bytes, value)
+            num_bytes += _shm_align(value.nbytes)
+        if not shared:
+            return seq
+        res = self._alloc(max(num_bytes, _ShmAlignment))
+        if res is None:
+            return seq
+        alloc_id, start = res
+        features = {}
+        for key, value in seq.features.items():
+            if key in shared:
+                rel_offset, value = shared[key]
+                numpy.ndarray(value.shape, dtype=value.dtype, buffer=self.shm.buf, offset=start + rel_offset)[
+                    ...
+                ] = value
+                features[key] = ("shm", rel_offset, value.shape, value.dtype.str)
+            else:
+                features[key] = ("array", value)
+        return _ShmDatasetSeqRef(
+            seq_idx=seq.seq_idx,
+            seq_tag=seq.seq_tag,
+            alloc_id=alloc_id,
+            offset=start,
+            num_bytes=num_bytes,
+            features=features,
+        )
+
+
+class _ShmRingBufferReader:
+    """
+    Parent side of the shared memory ring buffer.
+    This owns the shared memory.
+    It keeps track of which allocations are still in use, via the lifetime of the numpy views.
+    """
+
+    def __init__(self, size: int):
+        from multiprocessing.shared_memory import SharedMemory  # Python >=3.8
+
+        self.shm = SharedMemory(create=True, size=size)
+        self.shm_name = self.shm.name
+        # Keeps the underlying mmap exported while we have it, i.e. it cannot be closed while views exist.
+        self._buf_ref = ctypes.c_char.from_buffer(self.shm.buf)
+        self.buf_addr = ctypes.addressof(self._buf_ref)
+        self._released_alloc_ids = []  # type: List[int]
+        self._num_alive = 0
+        self._closed = False
+
+    def close(self):
+        """
+        Unlink the shared memory.
+        The memory is unmapped once the last view is gone.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        try_run(self.shm.unlink)
+        if not self._num_alive:
+            self._unmap()
+
+    def _unmap(self):
+        self._buf_ref = None
+        self.shm.close()
+
+    def _release(self, alloc_id: int):
+        self._num_alive -= 1
+        self._released_alloc_ids.append(alloc_id)
+        if self._closed and not self._num_alive:
+            self._unmap()
+
+    def pop_released_alloc_ids(self) -> List[int]:
+        """
+        :return: alloc ids which were released since the last call
+        """
+        res, self._released_alloc_ids = self._released_alloc_ids, []
+        return res
+
+    def decode(self, ref: _ShmDatasetSeqRef) -> DatasetSeq:
+        """
+        :return: seq where the arrays are views into the shared memory
+        """
+        assert not self._closed and ref.offset + ref.num_bytes <= self.shm.size
+        # The holder is the base of all the views.
+        # Once all views are gone, the holder gets deleted, and then we release the allocation.
+        holder = _ShmViewHolder(self, ref.offset, ref.num_bytes)
+        self._num_alive += 1
+        weakref.finalize(holder, self._release, ref.alloc_id)
+        buf = numpy.asarray(holder)
+        features = {}
+        for key, value in ref.features.items():
+            if value[0] == "shm":
+                _, rel_offset, shape, dtype = value
+                dtype = numpy.dtype(dtype)
+                num_bytes = int(numpy.prod(shape, dtype=numpy.int64)) * dtype.itemsize
+                features[key] = buf[rel_offset : rel_offset + num_bytes].view(dtype).reshape(shape)
+            else:
+                assert value[0] == "array"
+                features[key] = value[1]
+        return DatasetSeq(seq_idx=ref.seq_idx, seq_tag=ref.seq_tag, features=features)
+
+
+class _ShmViewHolder:
+    """
+    Provides the array interface to some region of the shared memory.
+    Also keeps a reference to the reader, such that the shared memory stays alive.
+    """
+
+    def __init__(self, reader: _ShmRingBufferReader, offset: int, num_bytes: int):
+        self.reader = reader
+        self.__array_interface__ = {
+            "data": (reader.buf_addr + offset, False),
+            "shape": (num_bytes,),
+            "typestr": "|u1",
+            "version": 3,
+        }
+
+
 class _SetupProcPreInit:
     def __init__(self):
         # Get the RETURNN global config here. Allow this to be optional (for use outside of RETURNN).
@@ -22,6 +22,7 @@ import numpy
 
 import returnn.util.task_system as task_system
 from returnn.datasets.basic import Dataset, DatasetSeq
+from returnn.datasets.util.seq_index_cache import SeqIndex
 from .cached2 import CachedDataset2
 from returnn.log import log
 from returnn.util.task_system import numpy_copy_and_set_unused
@@ -1075,17 +1076,45 @@ class SprintCacheDataset(CachedDataset2):
         Helper class to read a Sprint cache directly.
         """
 
-        def __init__(self, data_key, filename, data_type=None, allophone_labeling=None):
+        def __init__(
+            self,
+            data_key,
+            filename,
+            data_type=None,
+            allophone_labeling=None,
+            bundle_index_cache=False,
+            max_open_archives=64,
+        ):
             """
             :param str data_key: e.g. "data" or "classes"
             :param str filename: to Sprint cache archive
             :param str|None data_type: "feat" or "align"
             :param dict[str] allophone_labeling: kwargs for :class:`AllophoneLabeling`
+            :param bool|str bundle_index_cache: for a bundle, store the consolidated index of all archives
+                (see :class:`FileArchiveBundle`), such that the archives do not need to be scanned at startup.
+                If str, it is the cache dir, otherwise :func:`returnn.util.basic.get_cache_dir` is used.
+            :param int|None max_open_archives: for a bundle, max number of simultaneously opened archives
             """
             self.data_key = data_key
             from returnn.sprint.cache import open_file_archive
 
-            self.sprint_cache = open_file_archive(filename)
+            self.filename = filename
+            bundle_index_file = None
+            if bundle_index_cache and filename.endswith(".bundle"):
+                import hashlib
+
+                if isinstance(bundle_index_cache, str):
+                    cache_dir = bundle_index_cache
+                else:
+                    cache_dir = "%s/returnn/sprint_bundle_index" % util.get_cache_dir()
+                bundle_index_file = "%s/%s-%s.npz" % (
+                    cache_dir,
+                    os.path.basename(filename),
+                    hashlib.sha256(os.path.realpath(filename).encode("utf8")).hexdigest()[:16],
+                )
+            self.sprint_cache = open_file_archive(
+                filename, bundle_index_file=bundle_index_file, max_open_archives=max_open_archives
+            )
             if not data_type:
                 if data_key == "data":
                     data_type = "feat"
@@ -1133,12 +1162,34 @@ class SprintCacheDataset(CachedDataset2):
             """
             assert self.type == "feat"
             assert self.content_keys
-            times, feats = self.sprint_cache.read(self.content_keys[0], "feat")
+            times, feats = self.sprint_cache.read_features(self.content_keys[0])
             assert len(times) == len(feats) > 0
-            feat = feats[0]
-            assert isinstance(feat, numpy.ndarray)
-            assert feat.ndim == 1
-            return feat.shape[0]
+            assert isinstance(feats, numpy.ndarray)
+            assert feats.ndim == 2
+            return feats.shape[1]
+
+        def get_archive_filenames(self):
+            """
+            :return: the archive filename, or for a bundle, the bundle filename and all archive filenames
+            :rtype: list[str]
+            """
+            from returnn.sprint.cache import FileArchiveBundle
+
+            if isinstance(self.sprint_cache, FileArchiveBundle):
+                return [self.filename] + sorted(self.sprint_cache.archive_filenames)
+            return [self.filename]
+
+        def get_size(self, name):
+            """
+            :param str name: content-filename for sprint cache
+            :return: size of the entry in bytes, used as seq len estimate for sorting
+            :rtype: int
+            """
+            from returnn.sprint.cache import FileArchiveBundle
+
+            if isinstance(self.sprint_cache, FileArchiveBundle):
+                return self.sprint_cache.get_file_info(name)[1].size
+            return self.sprint_cache.ft[name].size
 
         def read(self, name):
             """
@@ -1146,27 +1197,23 @@ class SprintCacheDataset(CachedDataset2):
             :return: numpy array of shape (time, [num_labels])
             :rtype: numpy.ndarray
             """
-            res = self.sprint_cache.read(name, typ=self.type)
-            if self.type == "align":
-                for (t, a, s, w) in res:
-                    assert w == 1, "soft alignment not supported"
-                label_seq = numpy.array(
-                    [self.allophone_labeling.get_label_idx(a, s) for (t, a, s, w) in res], dtype=self.dtype
-                )
-                assert label_seq.shape == (len(res),)
-                return label_seq
-            elif self.type == "align_raw":
-                for (t, a, s, w) in res:
-                    assert w == 1, "soft alignment not supported"
-                label_seq = numpy.array(
-                    [self.allophone_labeling.state_tying_by_allo_state_idx[a] for (t, a, s, w) in res], dtype=self.dtype
-                )
-                assert label_seq.shape == (len(res),)
+            if self.type in ["align", "align_raw"]:
+                times, allos, states, weights = self.sprint_cache.read_alignment(name, raw=self.type == "align_raw")
+                assert (weights == 1).all(), "soft alignment not supported"
+                # The label mapping is in pure Python, so only do it once for each distinct value.
+                if self.type == "align":
+                    keys, idx = numpy.unique(numpy.stack([allos, states], axis=1), axis=0, return_inverse=True)
+                    labels = [self.allophone_labeling.get_label_idx(int(a), int(s)) for (a, s) in keys]
+                else:
+                    keys, idx = numpy.unique(allos, return_inverse=True)
+                    labels = [self.allophone_labeling.state_tying_by_allo_state_idx[int(a)] for a in keys]
+                label_seq = numpy.array(labels, dtype=self.dtype)[idx.reshape(-1)]
+                assert label_seq.shape == (len(times),)
                 return label_seq
             elif self.type == "feat":
-                times, feats = res
+                times, feats = self.sprint_cache.read_features(name)
                 assert len(times) == len(feats) > 0
-                feat_mat = numpy.array(feats, dtype=self.dtype)
+                feat_mat = feats.astype(self.dtype, copy=False)
                 assert feat_mat.shape == (len(times), self.num_labels)
                 return feat_mat
             else:
@@ -1184,7 +1231,7 @@ class SprintCacheDataset(CachedDataset2):
         self._check_matching_content_list()
         self.num_outputs = {key: (d.num_labels, d.num_dims) for (key, d) in self.data.items()}
         self.num_inputs = self.num_outputs["data"][0]
-        self._seq_lens = None
+        self._seq_lens = None  # type: typing.Optional[numpy.ndarray]  # sizes of seq_list_original
 
     def _check_matching_content_list(self):
         data0 = self.data["data"]
@@ -1214,21 +1261,32 @@ class SprintCacheDataset(CachedDataset2):
         self._num_seqs = len(self.seq_list_ordered)
         if not need_reinit:
             return False
-        data0 = self.data["data"]
-        assert isinstance(data0, self.SprintCacheReader)
-
-        def get_seq_size(s):
-            """
-            :param int s:
-            :rtype: int
-            """
-            return data0.sprint_cache.ft[self.seq_list_original[s]].size
-
-        seq_index = self.get_seq_order_for_epoch(epoch, num_seqs=len(self.seq_list_original), get_seq_len=get_seq_size)
+        seq_index = self.get_seq_order_for_epoch(
+            epoch, num_seqs=len(self.seq_list_original), seq_lens=self._get_seq_lens
+        )
         self.seq_list_ordered = [self.seq_list_original[s] for s in seq_index]
         self._num_seqs = len(self.seq_list_ordered)
         return True
 
+    def _get_seq_lens(self):
+        """
+        :return: sizes (in bytes) of the seqs in seq_list_original, maybe via the seq index cache
+        :rtype: numpy.ndarray
+        """
+        if self._seq_lens is not None:
+            return self._seq_lens
+        data0 = self.data["data"]
+        assert isinstance(data0, self.SprintCacheReader)
+        index_cache = self._get_seq_index_cache(data0.get_archive_filenames(), name="SprintCacheDataset")
+        index = index_cache.load() if index_cache else None
+        if index and index.tags == self.seq_list_original:
+            self._seq_lens = index.seq_lens["data"]
+        else:
+            self._seq_lens = numpy.array([data0.get_size(name) for name in self.seq_list_original], dtype="int64")
+            if index_cache:
+                index_cache.save(SeqIndex(tags=self.seq_list_original, seq_lens={"data": self._seq_lens}))
+        return self._seq_lens
+
     def get_total_num_seqs(self) -> int:
         """total num seqs"""
         return len(self.seq_list_original)
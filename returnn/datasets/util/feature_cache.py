@@ -0,0 +1,203 @@
+"""
+Persistent on-disk cache for extracted features per sequence,
+e.g. used by :class:`returnn.datasets.audio.OggZipDataset` (``feature_cache`` option),
+to not rerun the audio decoding and feature extraction in every epoch.
+
+The cache is filled on the fly, i.e. in the first epoch, the features are computed as usual
+and then appended to the cache, and later epochs read them from the cache.
+The cache dir contains shards. Every process which writes to the cache
+(e.g. multiple data loader workers, or multiple jobs on the same corpus) writes its own shard,
+so there is no locking needed:
+
+  - ``<shard>.bin``: the raw features of all seqs in this shard, concatenated over time (the first axis)
+  - ``<shard>.idx.npz``: seq tags, frame offsets and num frames of all seqs in the shard.
+    This is written (atomically via rename) only after the features were flushed to the bin file,
+    so every seq in the index is complete.
+
+Reading is via memory-mapping the bin files,
+so multiple processes on the same machine share the memory.
+"""
+
+from __future__ import annotations
+from typing import Optional, Any, Tuple, List, Dict
+import os
+import glob
+import uuid
+import socket
+import numpy
+from returnn.log import log
+
+
+class FeatureCache:
+    """
+    Cache seq tag -> features (numpy array of shape (time,...)), see module docstring.
+    """
+
+    def __init__(self, cache_dir: str, *, frame_shape: Tuple[int, ...], dtype: str = "float32", flush_interval=100):
+        """
+        :param cache_dir: all seqs in here must be from the same source and the same feature options,
+            i.e. the dir name should contain a hash of those, e.g. via :func:`get_files_hash`
+        :param frame_shape: shape of the features without the time axis
+        :param dtype:
+        :param flush_interval: after this num of new seqs, the index of our shard is written
+        """
+        self.cache_dir = cache_dir
+        self.frame_shape = tuple(frame_shape)
+        self.dtype = numpy.dtype(dtype)
+        self.flush_interval = flush_interval
+        self._frame_size = int(numpy.prod(self.frame_shape))
+        # seq tag -> (shard name, frame offset, num frames)
+        self._index = {}  # type: Dict[str,Tuple[str,int,int]]
+        self._shard_mtimes = {}  # type: Dict[str,int]  # shard name -> mtime_ns of its index file when loaded
+        self._memmaps = {}  # type: Dict[str,numpy.ndarray]  # shard name -> memmap, shape (num frames, frame size)
+        self._own_shard = None  # type: Optional[str]
+        self._own_file = None
+        self._own_num_frames = 0
+        self._own_entries = []  # type: List[Tuple[str,int,int]]
+        self._own_num_unflushed = 0
+        self.num_hits = 0
+        self.num_misses = 0
+        self.refresh()
+
+    def __repr__(self):
+        return "<%s %r, %i seqs>" % (self.__class__.__name__, self.cache_dir, len(self._index))
+
+    def __del__(self):
+        # noinspection PyBroadException
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, seq_tag: str) -> bool:
+        return seq_tag in self._index
+
+    def refresh(self):
+        """
+        Loads new or updated shard indices, e.g. written by other processes.
+        """
+        for idx_fn in glob.glob("%s/*.idx.npz" % glob.escape(self.cache_dir)):
+            shard = os.path.basename(idx_fn)[: -len(".idx.npz")]
+            if shard == self._own_shard:
+                continue
+            try:
+                mtime = os.stat(idx_fn).st_mtime_ns
+                if self._shard_mtimes.get(shard) == mtime:
+                    continue
+                with numpy.load(idx_fn, allow_pickle=False) as f:
+                    tags, offsets, lens = f["tags"].tolist(), f["offsets"].tolist(), f["lens"].tolist()
+            except (OSError, KeyError, ValueError) as exc:  # e.g. just being replaced, or broken
+                print("%s: cannot load %s, ignoring: %s" % (self, idx_fn, exc), file=log.v4)
+                continue
+            self._shard_mtimes[shard] = mtime
+            self._memmaps.pop(shard, None)  # might have grown
+            for tag, offset, len_ in zip(tags, offsets, lens):
+                self._index.setdefault(tag, (shard, offset, len_))
+
+    def get(self, seq_tag: str) -> Optional[numpy.ndarray]:
+        """
+        :param seq_tag:
+        :return: features (copy) or None if not in the cache
+        """
+        entry = self._index.get(seq_tag)
+        if entry is None:
+            self.num_misses += 1
+            return None
+        shard, offset, num_frames = entry
+        data = self._get_memmap(shard, min_num_frames=offset + num_frames)
+        self.num_hits += 1
+        return numpy.array(data[offset : offset + num_frames]).reshape((num_frames,) + self.frame_shape)
+
+    def put(self, seq_tag: str, features: numpy.ndarray):
+        """
+        Adds the features to our own shard. No-op if the seq is already in the cache.
+
+        :param seq_tag:
+        :param features: shape (time,) + frame_shape
+        """
+        if seq_tag in self._index:
+            return
+        assert features.shape[1:] == self.frame_shape, "%s: unexpected shape %r" % (self, features.shape)
+        if self._own_file is None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._own_shard = "%s-%i-%s" % (socket.gethostname(), os.getpid(), uuid.uuid4().hex[:8])
+            self._own_file = open("%s/%s.bin" % (self.cache_dir, self._own_shard), "ab")
+        self._own_file.write(numpy.ascontiguousarray(features, dtype=self.dtype).tobytes())
+        entry = (self._own_shard, self._own_num_frames, features.shape[0])
+        self._own_num_frames += features.shape[0]
+        self._own_entries.append((seq_tag,) + entry[1:])
+        self._index[seq_tag] = entry
+        self._own_num_unflushed += 1
+        if self._own_num_unflushed >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """
+        Flushes our own shard and writes its index, such that other processes can use it.
+        """
+        if self._own_file is None or not self._own_num_unflushed:
+            return
+        self._own_file.flush()
+        os.fsync(self._own_file.fileno())
+        idx_fn = "%s/%s.idx.npz" % (self.cache_dir, self._own_shard)
+        tmp_fn = idx_fn + ".tmp"
+        tags, offsets, lens = zip(*self._own_entries)
+        with open(tmp_fn, "wb") as f:
+            numpy.savez(
+                f,
+                tags=numpy.array(tags, dtype="U"),
+                offsets=numpy.array(offsets, dtype="int64"),
+                lens=numpy.array(lens, dtype="int64"),
+            )
+        os.replace(tmp_fn, idx_fn)
+        self._own_num_unflushed = 0
+
+    def close(self):
+        """
+        Flushes and closes our own shard. Further :func:`put` calls would start a new shard.
+        """
+        self.flush()
+        if self._own_file is not None:
+            self._own_file.close()
+            self._own_file = None
+            self._own_shard = None
+            self._own_num_frames = 0
+            self._own_entries = []
+
+    def get_stats_str(self) -> str:
+        """
+        :return: hits, misses, num seqs
+        """
+        return "%s: %i hits, %i misses" % (self, self.num_hits, self.num_misses)
+
+    def _get_memmap(self, shard: str, *, min_num_frames: int) -> numpy.ndarray:
+        data = self._memmaps.get(shard)
+        if data is None or len(data) < min_num_frames:
+            if shard == self._own_shard:
+                self._own_file.flush()
+            fn = "%s/%s.bin" % (self.cache_dir, shard)
+            num_frames = os.stat(fn).st_size // (self._frame_size * self.dtype.itemsize)
+            assert num_frames >= min_num_frames, "%s: shard %r incomplete" % (self, shard)
+            data = numpy.memmap(fn, dtype=self.dtype, mode="r", shape=(num_frames, self._frame_size))
+            self._memmaps[shard] = data
+        return data
+
+
+def get_feature_cache_dir(files: List[str], *, name: str, opts: Dict[str, Any], cache_dir: Optional[str] = None) -> str:
+    """
+    :param files: the source files. when any of them changes, a new cache dir is used
+    :param name: e.g. the dataset name
+    :param opts: e.g. feature extraction options. part of the hash
+    :param cache_dir: base dir. if not given, uses :func:`returnn.util.basic.get_cache_dir`
+    :return: cache dir for :class:`FeatureCache`
+    """
+    from .seq_index_cache import get_files_hash
+
+    if not cache_dir:
+        from returnn.util.basic import get_cache_dir
+
+        cache_dir = "%s/returnn/feature_cache" % get_cache_dir()
+    return "%s/%s-%s" % (cache_dir, name, get_files_hash(files, extra=(FeatureCache.__name__, name, opts)))
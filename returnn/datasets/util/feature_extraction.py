@@ -2,6 +2,10 @@
 ExtractAudioFeatures class and related helpers
 """
 
+from __future__ import annotations
+from typing import Optional, Any, Union, List, Tuple, Dict
+import functools
+import hashlib
 import numpy
 
 from returnn.util.basic import CollectionReadCheckCovered
@@ -11,6 +15,13 @@ class ExtractAudioFeatures:
     """
     Currently uses librosa to extract MFCC/log-mel features.
     (Alternatives: python_speech_features, talkbox.features.mfcc, librosa)
+
+    With ``backend="numpy"`` (or ``"torch"``), the STFT based features
+    ("mfcc", "log_mel_filterbank", "log_log_mel_filterbank", "db_mel_filterbank", "linear_spectrogram")
+    are computed by our own vectorized implementation instead,
+    which matches the librosa (>=0.10) features numerically (up to float precision),
+    and which can also process multiple utterances in one call, see :func:`get_audio_features_batch`.
+    Windows, filterbanks and DCT matrices are cached.
     """
 
     def __init__(
@@ -33,6 +44,7 @@ class ExtractAudioFeatures:
         peak_normalization=True,
         preemphasis=None,
         join_frames=None,
+        backend="librosa",
     ):
         """
         :param float window_len: in seconds
@@ -53,6 +65,7 @@ class ExtractAudioFeatures:
         :param bool peak_normalization: set to False to disable the peak normalization for audio files
         :param float|None preemphasis: set a preemphasis filter coefficient
         :param int|None join_frames: concatenate multiple frames together to a superframe
+        :param str backend: "librosa", "numpy" or "torch" (CPU). see class docstring
         :return: float32 data of shape
         (audio_len // int(step_len * sample_rate), num_channels (optional), (with_delta + 1) * num_feature_filters)
         :rtype: numpy.ndarray
@@ -99,6 +112,8 @@ class ExtractAudioFeatures:
         self.num_channels = num_channels
         self.raw_ogg_opts = raw_ogg_opts
         self.peak_normalization = peak_normalization
+        assert backend in {"librosa", "numpy", "torch"}, "invalid backend %r" % (backend,)
+        self.backend = backend
 
     def _load_feature_vec(self, value):
         """
@@ -156,13 +171,48 @@ class ExtractAudioFeatures:
         :return: array (time,dim), dim == self.get_feature_dimension()
         :rtype: numpy.ndarray
         """
+        return self.get_audio_features_batch([audio], sample_rate=sample_rate, seq_names=[seq_name])[0]
+
+    def get_audio_features_batch(
+        self, audios: List[numpy.ndarray], sample_rate: int, seq_names: Optional[List[Optional[str]]] = None
+    ) -> List[numpy.ndarray]:
+        """
+        Like :func:`get_audio_features` but for multiple utterances.
+        With ``backend="numpy"`` or ``"torch"``, the STFT and the filterbank are computed for all of them at once.
+
+        :param audios: list of raw audio samples, each shape (audio_len,)
+        :param sample_rate: e.g. 22050. same for all
+        :param seq_names:
+        :return: list of arrays (time,dim), dim == self.get_feature_dimension()
+        """
+        if seq_names is None:
+            seq_names = [None] * len(audios)
+        assert len(seq_names) == len(audios)
+        audios = [self._preprocess_audio(audio, sample_rate=sample_rate) for audio in audios]
+        if self.backend != "librosa" and self.features in _BatchedFeatureFuncs:
+            kwargs = self._get_feature_func_kwargs(sample_rate=sample_rate)
+            features = _BatchedFeatureFuncs[self.features](audios, use_torch=self.backend == "torch", **kwargs)
+        else:
+            features = [self._get_raw_features(audio, sample_rate=sample_rate) for audio in audios]
+        return [
+            self._postprocess_features(feature_data, seq_name=seq_name)
+            for feature_data, seq_name in zip(features, seq_names)
+        ]
+
+    def _preprocess_audio(self, audio: numpy.ndarray, *, sample_rate: int) -> numpy.ndarray:
+        """
+        Preemphasis, peak normalization, random permutation and pre_process.
+        """
         if self.sample_rate is not None:
             assert sample_rate == self.sample_rate, "currently no conversion implemented..."
 
         if self.preemphasis:
-            from scipy import signal  # noqa
+            if self.backend == "librosa":
+                from scipy import signal  # noqa
 
-            audio = signal.lfilter([1, -self.preemphasis], [1], audio)
+                audio = signal.lfilter([1, -self.preemphasis], [1], audio)
+            else:  # same as lfilter, but without the scipy dependency
+                audio = numpy.concatenate([audio[:1], audio[1:] - self.preemphasis * audio[:-1]], axis=0)
 
         if self.peak_normalization:
             peak = numpy.max(numpy.abs(audio))
@@ -178,6 +228,24 @@ class ExtractAudioFeatures:
             audio = self.pre_process(audio=audio, sample_rate=sample_rate, random_state=self.random_state)
             assert isinstance(audio, numpy.ndarray) and len(audio.shape) == 1
 
+        return audio
+
+    def _get_feature_func_kwargs(self, *, sample_rate: int):
+        kwargs = {
+            "sample_rate": sample_rate,
+            "window_len": self.window_len,
+            "step_len": self.step_len,
+            "num_feature_filters": self.num_feature_filters,
+        }
+        if self.feature_options is not None:
+            assert isinstance(self.feature_options, dict)
+            kwargs.update(self.feature_options)
+        return kwargs
+
+    def _get_raw_features(self, audio: numpy.ndarray, *, sample_rate: int) -> numpy.ndarray:
+        """
+        :return: features before delta, normalization etc
+        """
         if self.features == "raw":
             assert self.num_feature_filters == 1
             if audio.ndim == 1:
@@ -187,50 +255,46 @@ class ExtractAudioFeatures:
                     audio = numpy.expand_dims(audio, axis=2)  # add dummy feature axis
                 assert audio.shape[1] == self.num_channels
                 assert audio.ndim == 3  # time, channel, feature
-            feature_data = audio.astype("float32")
-
+            return audio.astype("float32")
+
+        kwargs = self._get_feature_func_kwargs(sample_rate=sample_rate)
+        kwargs["audio"] = audio
+        if callable(self.features):
+            return self.features(random_state=self.random_state, **kwargs)
+        elif self.features == "mfcc":
+            return _get_audio_features_mfcc(**kwargs)
+        elif self.features == "log_mel_filterbank":
+            return _get_audio_log_mel_filterbank(**kwargs)
+        elif self.features == "log_log_mel_filterbank":
+            return _get_audio_log_log_mel_filterbank(**kwargs)
+        elif self.features == "db_mel_filterbank":
+            return _get_audio_db_mel_filterbank(**kwargs)
+        elif self.features == "linear_spectrogram":
+            return _get_audio_linear_spectrogram(**kwargs)
+        elif self.features == "f0":
+            kwargs.pop("num_feature_filters")
+            kwargs.pop("window_len")
+            return _get_f0_values(**kwargs)
         else:
-            kwargs = {
-                "sample_rate": sample_rate,
-                "window_len": self.window_len,
-                "step_len": self.step_len,
-                "num_feature_filters": self.num_feature_filters,
-                "audio": audio,
-            }
-
-            if self.feature_options is not None:
-                assert isinstance(self.feature_options, dict)
-                kwargs.update(self.feature_options)
-
-            if callable(self.features):
-                feature_data = self.features(random_state=self.random_state, **kwargs)
-            elif self.features == "mfcc":
-                feature_data = _get_audio_features_mfcc(**kwargs)
-            elif self.features == "log_mel_filterbank":
-                feature_data = _get_audio_log_mel_filterbank(**kwargs)
-            elif self.features == "log_log_mel_filterbank":
-                feature_data = _get_audio_log_log_mel_filterbank(**kwargs)
-            elif self.features == "db_mel_filterbank":
-                feature_data = _get_audio_db_mel_filterbank(**kwargs)
-            elif self.features == "linear_spectrogram":
-                feature_data = _get_audio_linear_spectrogram(**kwargs)
-            elif self.features == "f0":
-                kwargs.pop("num_feature_filters")
-                kwargs.pop("window_len")
-                feature_data = _get_f0_values(**kwargs)
-            else:
-                raise Exception("non-supported feature type %r" % (self.features,))
+            raise Exception("non-supported feature type %r" % (self.features,))
 
+    def _postprocess_features(self, feature_data: numpy.ndarray, *, seq_name: Optional[str]) -> numpy.ndarray:
+        """
+        Delta, normalization, join_frames and post_process.
+        """
         assert feature_data.ndim == self.num_dim, "got feature data shape %r" % (feature_data.shape,)
         assert feature_data.shape[-1] == self.num_feature_filters
 
         if self.with_delta:
-            import librosa  # noqa
+            if self.backend == "librosa":
+                import librosa  # noqa
 
-            deltas = [
-                librosa.feature.delta(feature_data, order=i, axis=0).astype("float32")
-                for i in range(1, self.with_delta + 1)
-            ]
+                deltas = [
+                    librosa.feature.delta(feature_data, order=i, axis=0).astype("float32")
+                    for i in range(1, self.with_delta + 1)
+                ]
+            else:
+                deltas = [_get_delta_np(feature_data, order=i) for i in range(1, self.with_delta + 1)]
             feature_data = numpy.concatenate([feature_data] + deltas, axis=-1)
             assert feature_data.shape[1] == (self.with_delta + 1) * self.num_feature_filters
 
@@ -271,7 +335,7 @@ class ExtractAudioFeatures:
                 new_shape = (new_len // self.join_frames, self.num_channels, feature_data.shape[-1] * self.join_frames)
                 pad_width = ((0, pad_len), (0, 0), (0, 0))
             feature_data = numpy.pad(feature_data, pad_width=pad_width, mode="edge")
-            feature_data = numpy.reshape(feature_data, newshape=new_shape, order="C")
+            feature_data = numpy.reshape(feature_data, new_shape, order="C")
 
         assert feature_data.shape[-1] == self.get_feature_dimension()
         if self.post_process:
@@ -286,6 +350,39 @@ class ExtractAudioFeatures:
         """
         return (self.with_delta + 1) * self.num_feature_filters * (self.join_frames or 1)
 
+    def get_cache_key_opts(self) -> Optional[Dict[str, Any]]:
+        """
+        :return: all options which influence the features, e.g. to be used as a cache key,
+            or None if the features are not deterministic (random permutation, custom functions),
+            i.e. they must not be cached
+        """
+        if self.random_permute_opts or self.pre_process or self.post_process or callable(self.features):
+            return None
+
+        def _norm(value):
+            # The norm files are already loaded, so this covers their content, not just the filename.
+            if isinstance(value, numpy.ndarray):
+                return {"sha256": hashlib.sha256(numpy.ascontiguousarray(value).tobytes()).hexdigest()}
+            return value
+
+        return dict(
+            window_len=self.window_len,
+            step_len=self.step_len,
+            num_feature_filters=self.num_feature_filters,
+            with_delta=self.with_delta,
+            norm_mean=_norm(self.norm_mean),
+            norm_std_dev=_norm(self.norm_std_dev),
+            features=self.features,
+            feature_options=self.feature_options,
+            raw_ogg_opts=self.raw_ogg_opts,
+            sample_rate=self.sample_rate,
+            num_channels=self.num_channels,
+            peak_normalization=self.peak_normalization,
+            preemphasis=self.preemphasis,
+            join_frames=self.join_frames,
+            backend=self.backend,
+        )
+
 
 def _get_audio_linear_spectrogram(
     audio, sample_rate, window_len=0.025, step_len=0.010, num_feature_filters=512, center=True
@@ -502,6 +599,339 @@ def _get_audio_log_log_mel_filterbank(audio, sample_rate, window_len=0.025, step
     return log_log_mel_filterbank
 
 
+# The following is the vectorized implementation for ExtractAudioFeatures with backend "numpy" or "torch".
+# It follows the librosa (>=0.10) definitions, i.e. STFT with centered frames and zero padding,
+# a periodic Hann window, and the Slaney-style mel filterbank.
+# Note that this mel filterbank is different from the one in returnn.frontend.audio.mel
+# (which follows [Huang & Acero+, 2001]), so that one cannot be used here without changing the features.
+
+
+@functools.lru_cache()
+def _get_window_np(win_length: int, n_fft: int) -> numpy.ndarray:
+    """
+    :return: periodic Hann window of len win_length, zero padded (centered) to n_fft, shape (n_fft,), float64
+    """
+    assert win_length <= n_fft
+    window = 0.5 - 0.5 * numpy.cos(2.0 * numpy.pi * numpy.arange(win_length) / win_length)
+    left = (n_fft - win_length) // 2
+    return numpy.pad(window, (left, n_fft - win_length - left))
+
+
+def _hz_to_mel_slaney(freqs: numpy.ndarray) -> numpy.ndarray:
+    freqs = numpy.asarray(freqs, dtype="float64")
+    f_sp = 200.0 / 3
+    min_log_hz = 1000.0
+    min_log_mel = min_log_hz / f_sp
+    log_step = numpy.log(6.4) / 27.0
+    return numpy.where(
+        freqs >= min_log_hz,
+        min_log_mel + numpy.log(numpy.maximum(freqs, min_log_hz) / min_log_hz) / log_step,
+        freqs / f_sp,
+    )
+
+
+def _mel_to_hz_slaney(mels: numpy.ndarray) -> numpy.ndarray:
+    f_sp = 200.0 / 3
+    min_log_hz = 1000.0
+    min_log_mel = min_log_hz / f_sp
+    log_step = numpy.log(6.4) / 27.0
+    return numpy.where(mels >= min_log_mel, min_log_hz * numpy.exp(log_step * (mels - min_log_mel)), f_sp * mels)
+
+
+@functools.lru_cache()
+def _get_slaney_mel_filter_bank_np(
+    *, sample_rate: int, n_fft: int, n_mels: int, fmin: float = 0.0, fmax: Optional[float] = None
+) -> numpy.ndarray:
+    """
+    Same as ``librosa.filters.mel`` (with the defaults ``htk=False, norm="slaney"``).
+
+    :return: shape (n_fft // 2 + 1, n_mels), to be applied via matmul on the power spectrum
+    """
+    if fmax is None:
+        fmax = sample_rate / 2.0
+    fft_freqs = numpy.fft.rfftfreq(n=n_fft, d=1.0 / sample_rate)
+    mel_freqs = _mel_to_hz_slaney(numpy.linspace(_hz_to_mel_slaney(fmin), _hz_to_mel_slaney(fmax), n_mels + 2))
+    mel_freqs_diff = numpy.diff(mel_freqs)
+    ramps = numpy.subtract.outer(mel_freqs, fft_freqs)  # (n_mels + 2, n_freqs)
+    lower = -ramps[:-2] / mel_freqs_diff[:-1, None]
+    upper = ramps[2:] / mel_freqs_diff[1:, None]
+    weights = numpy.maximum(0.0, numpy.minimum(lower, upper))  # (n_mels, n_freqs)
+    weights *= (2.0 / (mel_freqs[2:] - mel_freqs[:-2]))[:, None]
+    # librosa computes the filterbank in float32
+    return weights.astype("float32").astype("float64").T
+
+
+@functools.lru_cache()
+def _get_dct_matrix_np(n: int, num_out: int) -> numpy.ndarray:
+    """
+    :return: shape (n, num_out), orthonormal DCT-II, as ``scipy.fft.dct(x, type=2, norm="ortho")[:num_out]``
+    """
+    k = numpy.arange(num_out)[None, :]
+    i = numpy.arange(n)[:, None]
+    m = numpy.cos(numpy.pi * k * (2 * i + 1) / (2.0 * n)) * numpy.sqrt(2.0 / n)
+    m[:, 0] *= numpy.sqrt(0.5)
+    return m
+
+
+def _get_frames_batch_np(
+    audios: List[numpy.ndarray], *, frame_length: int, hop_length: int, center: bool
+) -> Tuple[numpy.ndarray, List[int]]:
+    """
+    :return: frames of all audios concatenated, shape (total_num_frames, frame_length), and num frames per audio
+    """
+    from numpy.lib.stride_tricks import sliding_window_view
+
+    frames = []
+    num_frames = []
+    for audio in audios:
+        if center:
+            audio = numpy.pad(audio, (frame_length // 2, frame_length // 2))
+        assert len(audio) >= frame_length, "audio too short, len %i < frame length %i" % (len(audio), frame_length)
+        frames_ = sliding_window_view(audio, frame_length)[::hop_length]
+        frames.append(frames_)
+        num_frames.append(len(frames_))
+    return numpy.concatenate(frames, axis=0), num_frames
+
+
+def _get_spectrogram_batch_np(
+    audios: List[numpy.ndarray],
+    *,
+    n_fft: int,
+    hop_length: int,
+    win_length: Optional[int] = None,
+    center: bool = True,
+    power: float = 2.0,
+    mel_filter_bank: Optional[numpy.ndarray] = None,
+    use_torch: bool = False,
+) -> Tuple[numpy.ndarray, List[int]]:
+    """
+    STFT magnitude (power) spectrogram, optionally with mel filterbank applied,
+    computed for all audios in one go.
+
+    :return: spectrogram of all audios concatenated, shape (total_num_frames, dim), and num frames per audio
+    """
+    frames, num_frames = _get_frames_batch_np(audios, frame_length=n_fft, hop_length=hop_length, center=center)
+    window = _get_window_np(win_length or n_fft, n_fft)
+    if use_torch:
+        import torch
+
+        x = torch.fft.rfft(torch.from_numpy(frames) * torch.from_numpy(window), dim=-1).abs()
+        if power != 1.0:
+            x = x**power
+        if mel_filter_bank is not None:
+            x = torch.matmul(x, torch.from_numpy(mel_filter_bank).to(x.dtype))
+        return x.numpy(), num_frames
+    x = numpy.abs(numpy.fft.rfft(frames * window, axis=-1))
+    if power != 1.0:
+        x = x**power
+    if mel_filter_bank is not None:
+        x = numpy.matmul(x, mel_filter_bank)
+    return x, num_frames
+
+
+def _split_batch(x: numpy.ndarray, num_frames: List[int]) -> List[numpy.ndarray]:
+    return numpy.split(x, numpy.cumsum(num_frames)[:-1], axis=0)
+
+
+def _power_to_db_np(x: numpy.ndarray, *, amin: float = 1e-10, top_db: Optional[float] = 80.0) -> numpy.ndarray:
+    """
+    Same as ``librosa.power_to_db`` with ``ref=1.0``. Per utterance (the top_db clipping uses the max).
+    """
+    x = 10.0 * numpy.log10(numpy.maximum(amin, x))
+    if top_db is not None and x.size > 0:
+        x = numpy.maximum(x, x.max() - top_db)
+    return x
+
+
+def _get_mel_spectrogram_batch_np(
+    audios, *, sample_rate, window_len, step_len, num_feature_filters, fmin=0, fmax=None, center=True, use_torch
+):
+    n_fft = int(window_len * sample_rate)
+    x, num_frames = _get_spectrogram_batch_np(
+        audios,
+        n_fft=n_fft,
+        hop_length=int(step_len * sample_rate),
+        center=center,
+        mel_filter_bank=_get_slaney_mel_filter_bank_np(
+            sample_rate=sample_rate, n_fft=n_fft, n_mels=num_feature_filters, fmin=fmin, fmax=fmax
+        ),
+        use_torch=use_torch,
+    )
+    return x, num_frames
+
+
+def _get_audio_features_mfcc_batch(
+    audios,
+    *,
+    sample_rate,
+    window_len=0.025,
+    step_len=0.010,
+    num_feature_filters=40,
+    n_mels=128,
+    fmin=0,
+    fmax=None,
+    center=True,
+    use_torch=False,
+):
+    """
+    Batched variant of :func:`_get_audio_features_mfcc`.
+
+    :param list[numpy.ndarray] audios:
+    :rtype: list[numpy.ndarray]
+    """
+    frame_length = int(window_len * sample_rate)
+    hop_length = int(step_len * sample_rate)
+    x, num_frames = _get_mel_spectrogram_batch_np(
+        audios,
+        sample_rate=sample_rate,
+        window_len=window_len,
+        step_len=step_len,
+        num_feature_filters=n_mels,
+        fmin=fmin,
+        fmax=fmax,
+        center=center,
+        use_torch=use_torch,
+    )
+    dct = _get_dct_matrix_np(n_mels, num_feature_filters)
+    frames, _ = _get_frames_batch_np(audios, frame_length=frame_length, hop_length=hop_length, center=center)
+    # librosa.feature.rms computes this in float32
+    energy = numpy.sqrt(numpy.mean(numpy.square(frames, dtype="float32"), axis=-1))
+    res = []
+    for x_, energy_ in zip(_split_batch(x, num_frames), _split_batch(energy, num_frames)):
+        features = numpy.matmul(_power_to_db_np(x_), dct)
+        features[:, 0] = energy_  # replace first MFCC with energy, per convention
+        res.append(features.astype("float32"))
+    return res
+
+
+def _get_audio_log_mel_filterbank_batch(
+    audios, *, sample_rate, window_len=0.025, step_len=0.010, num_feature_filters=80, use_torch=False
+):
+    """
+    Batched variant of :func:`_get_audio_log_mel_filterbank`.
+
+    :param list[numpy.ndarray] audios:
+    :rtype: list[numpy.ndarray]
+    """
+    x, num_frames = _get_mel_spectrogram_batch_np(
+        audios,
+        sample_rate=sample_rate,
+        window_len=window_len,
+        step_len=step_len,
+        num_feature_filters=num_feature_filters,
+        use_torch=use_torch,
+    )
+    log_noise_floor = 1e-3  # prevent numeric overflow in log
+    x = numpy.log(numpy.maximum(log_noise_floor, x)).astype("float32")
+    return _split_batch(x, num_frames)
+
+
+def _get_audio_db_mel_filterbank_batch(
+    audios,
+    *,
+    sample_rate,
+    window_len=0.025,
+    step_len=0.010,
+    num_feature_filters=80,
+    fmin=0,
+    fmax=None,
+    min_amp=1e-10,
+    center=True,
+    use_torch=False,
+):
+    """
+    Batched variant of :func:`_get_audio_db_mel_filterbank`.
+
+    :param list[numpy.ndarray] audios:
+    :rtype: list[numpy.ndarray]
+    """
+    assert fmin >= 0
+    assert min_amp > 0
+    x, num_frames = _get_mel_spectrogram_batch_np(
+        audios,
+        sample_rate=sample_rate,
+        window_len=window_len,
+        step_len=step_len,
+        num_feature_filters=num_feature_filters,
+        fmin=fmin,
+        fmax=fmax,
+        center=center,
+        use_torch=use_torch,
+    )
+    x = (20 * numpy.log10(numpy.maximum(min_amp, x))).astype("float32")
+    return _split_batch(x, num_frames)
+
+
+def _get_audio_log_log_mel_filterbank_batch(
+    audios, *, sample_rate, window_len=0.025, step_len=0.010, num_feature_filters=80, use_torch=False
+):
+    """
+    Batched variant of :func:`_get_audio_log_log_mel_filterbank`.
+
+    :param list[numpy.ndarray] audios:
+    :rtype: list[numpy.ndarray]
+    """
+    x, num_frames = _get_mel_spectrogram_batch_np(
+        audios,
+        sample_rate=sample_rate,
+        window_len=window_len,
+        step_len=step_len,
+        num_feature_filters=num_feature_filters,
+        use_torch=use_torch,
+    )
+    log_noise_floor = 1e-3  # prevent numeric overflow in log
+    x = numpy.log(numpy.maximum(log_noise_floor, x))
+    # Same as librosa.amplitude_to_db, i.e. power_to_db(abs(x) ** 2, amin=1e-5 ** 2), per utterance.
+    return [_power_to_db_np(numpy.abs(x_) ** 2, amin=1e-10).astype("float32") for x_ in _split_batch(x, num_frames)]
+
+
+def _get_audio_linear_spectrogram_batch(
+    audios, *, sample_rate, window_len=0.025, step_len=0.010, num_feature_filters=512, center=True, use_torch=False
+):
+    """
+    Batched variant of :func:`_get_audio_linear_spectrogram`.
+
+    :param list[numpy.ndarray] audios:
+    :rtype: list[numpy.ndarray]
+    """
+    min_n_fft = int(window_len * sample_rate)
+    assert num_feature_filters * 2 >= min_n_fft
+    assert num_feature_filters % 2 == 0
+    x, num_frames = _get_spectrogram_batch_np(
+        audios,
+        n_fft=num_feature_filters * 2,
+        hop_length=int(step_len * sample_rate),
+        win_length=int(window_len * sample_rate),
+        center=center,
+        power=1.0,
+        use_torch=use_torch,
+    )
+    x = x[:, 1:].astype("float32")  # remove the DC part
+    return _split_batch(x, num_frames)
+
+
+_BatchedFeatureFuncs = {
+    "mfcc": _get_audio_features_mfcc_batch,
+    "log_mel_filterbank": _get_audio_log_mel_filterbank_batch,
+    "log_log_mel_filterbank": _get_audio_log_log_mel_filterbank_batch,
+    "db_mel_filterbank": _get_audio_db_mel_filterbank_batch,
+    "linear_spectrogram": _get_audio_linear_spectrogram_batch,
+}
+
+
+def _get_delta_np(feature_data: numpy.ndarray, *, order: int, width: int = 9) -> numpy.ndarray:
+    """
+    Same as ``librosa.feature.delta(feature_data, order=order, axis=0)``.
+
+    :param feature_data: (time, dim)
+    :return: (time, dim), float32
+    """
+    from scipy.signal import savgol_filter  # noqa
+
+    assert width <= feature_data.shape[0], "delta width %i exceeds num frames %i" % (width, feature_data.shape[0])
+    return savgol_filter(feature_data, width, deriv=order, polyorder=order, axis=0, mode="interp").astype("float32")
+
+
 def _get_random_permuted_audio(audio, sample_rate, opts, random_state):
     """
     :param numpy.ndarray audio: raw time signal
@@ -0,0 +1,205 @@
+"""
+Persistent on-disk cache for the sequence index of a dataset,
+i.e. the seq tags and the seq lengths (per data key),
+and maybe other per-seq string metadata.
+
+Getting this information often requires to parse or scan the whole corpus at startup
+(e.g. the OggZipDataset txt meta files, or a seq lens file via ``eval``),
+which can take minutes for large corpora.
+With this cache, it is stored in a compact binary format (uncompressed Numpy ``.npz``),
+keyed on the file path, file size and modification time of the underlying files,
+such that it is invalidated automatically when the files change.
+
+Enable via the ``seq_index_cache`` dataset option, see :class:`returnn.datasets.basic.Dataset`.
+"""
+
+from __future__ import annotations
+from typing import Optional, Any, Union, Sequence, List, Dict
+import os
+import hashlib
+import numpy
+from returnn.log import log
+
+
+class SeqIndex:
+    """
+    Seq tags, seq lengths (per key) and other per-seq string metadata.
+    All entries (if given) have the same length (num seqs).
+    """
+
+    def __init__(
+        self,
+        *,
+        tags: Optional[Sequence[str]] = None,
+        seq_lens: Optional[Dict[str, Union[numpy.ndarray, Sequence[Union[int, float]]]]] = None,
+        strings: Optional[Dict[str, Sequence[str]]] = None,
+    ):
+        """
+        :param tags: seq tags
+        :param seq_lens: data key -> seq lengths. can also be float, e.g. a duration
+        :param strings: other per-seq strings, e.g. transcriptions or filenames
+        """
+        self.tags = list(tags) if tags is not None else None  # type: Optional[List[str]]
+        self.seq_lens = {k: numpy.asarray(v) for k, v in (seq_lens or {}).items()}  # type: Dict[str,numpy.ndarray]
+        self.strings = {k: list(v) for k, v in (strings or {}).items()}  # type: Dict[str,List[str]]
+        num_seqs = {
+            len(v) for v in [self.tags] + list(self.seq_lens.values()) + list(self.strings.values()) if v is not None
+        }
+        assert len(num_seqs) <= 1, "SeqIndex: inconsistent num seqs %r" % (num_seqs,)
+        self.num_seqs = num_seqs.pop() if num_seqs else 0
+
+    def __repr__(self):
+        return "<%s num_seqs=%i tags=%s seq_lens=%r strings=%r>" % (
+            self.__class__.__name__,
+            self.num_seqs,
+            self.tags is not None,
+            list(self.seq_lens.keys()),
+            list(self.strings.keys()),
+        )
+
+
+class SeqIndexCache:
+    """
+    Cache for a :class:`SeqIndex`, stored in the cache dir.
+
+    The cache filename is a hash of the name, the options, and the path, size and mtime of all the given files.
+    """
+
+    Version = 1
+    CacheDirName = "returnn/seq_index_cache"
+
+    def __init__(
+        self,
+        files: Sequence[str],
+        *,
+        name: str,
+        opts: Optional[Dict[str, Any]] = None,
+        cache_dir: Optional[str] = None,
+    ):
+        """
+        :param files: the files the index is derived from. when any of them changes, the cache is invalidated
+        :param name: e.g. the dataset class name. part of the hash
+        :param opts: other options which influence the index. repr must be deterministic. part of the hash
+        :param cache_dir: if not given, uses :func:`returnn.util.basic.get_cache_dir`
+        """
+        if not cache_dir:
+            from returnn.util.basic import get_cache_dir
+
+            cache_dir = "%s/%s" % (get_cache_dir(), self.CacheDirName)
+        self.cache_dir = cache_dir
+        self.name = name
+        self.filename = "%s/%s-%s.npz" % (
+            cache_dir,
+            name,
+            get_files_hash(files, extra=(self.Version, name, opts or {})),
+        )
+
+    def __repr__(self):
+        return "<%s %r>" % (self.__class__.__name__, self.filename)
+
+    def load(self) -> Optional[SeqIndex]:
+        """
+        :return: the cached index, or None if it does not exist (or is invalid)
+        """
+        if not os.path.exists(self.filename):
+            return None
+        # noinspection PyBroadException
+        try:
+            with numpy.load(self.filename, allow_pickle=False) as f:
+                tags = None
+                seq_lens = {}
+                strings = {}
+                for key in f.files:
+                    if key == "tags":
+                        tags = _decode_strings(f[key])
+                    elif key.startswith("seq_lens/"):
+                        seq_lens[key[len("seq_lens/") :]] = f[key]
+                    elif key.startswith("strings/"):
+                        strings[key[len("strings/") :]] = _decode_strings(f[key])
+                    else:
+                        raise Exception("unexpected entry %r" % key)
+            index = SeqIndex(tags=tags, seq_lens=seq_lens, strings=strings)
+        except Exception as exc:
+            print("%s: cannot load, ignoring: %s" % (self, exc), file=log.v3)
+            return None
+        print("%s: loaded %s" % (self, index), file=log.v4)
+        return index
+
+    def save(self, index: SeqIndex) -> bool:
+        """
+        Stores the index in the cache.
+        The file is written to a temp file first and then renamed, such that concurrent readers
+        (e.g. other jobs on the same corpus) never see a partially written file.
+
+        :return: whether it was stored. it can fail e.g. if strings contain "\\0", or if the cache dir is not writable
+        """
+        arrays = {}  # type: Dict[str,numpy.ndarray]
+        if index.tags is not None:
+            arrays["tags"] = _encode_strings(index.tags)
+        for key, v in index.seq_lens.items():
+            arrays["seq_lens/" + key] = v
+        for key, v in index.strings.items():
+            arrays["strings/" + key] = _encode_strings(v)
+        if any(v is None for v in arrays.values()):
+            print("%s: cannot encode strings with '\\0', not caching" % self, file=log.v4)
+            return False
+        tmp_filename = "%s.tmp%i" % (self.filename, os.getpid())
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(tmp_filename, "wb") as f:
+                numpy.savez(f, **arrays)
+            os.replace(tmp_filename, self.filename)
+        except OSError as exc:
+            print("%s: cannot save: %s" % (self, exc), file=log.v3)
+            if os.path.exists(tmp_filename):
+                os.remove(tmp_filename)
+            return False
+        print("%s: saved %s" % (self, index), file=log.v4)
+        return True
+
+
+def get_files_hash(files: Sequence[str], *, extra: Any = None) -> str:
+    """
+    :param files: the hash covers the real path, size and mtime of each file
+    :param extra: other things which should be part of the hash. repr must be deterministic.
+        dicts are sorted by key
+    :return: hex digest, e.g. to be used as part of a cache filename
+    """
+    h = hashlib.sha256()
+    h.update(repr(_sort_dicts(extra)).encode("utf8"))
+    for fn in files:
+        fn = os.path.realpath(fn)
+        st = os.stat(fn)
+        h.update(repr((fn, st.st_size, st.st_mtime_ns)).encode("utf8"))
+    return h.hexdigest()[:32]
+
+
+def _sort_dicts(obj: Any) -> Any:
+    if isinstance(obj, dict):
+        return sorted((k, _sort_dicts(v)) for k, v in obj.items())
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(_sort_dicts(v) for v in obj)
+    return obj
+
+
+def _encode_strings(strings: Sequence[str]) -> Optional[numpy.ndarray]:
+    """
+    :return: uint8 array of the "\\0"-joined UTF8 strings, or None if not possible
+    """
+    if not strings:
+        return numpy.zeros((0,), dtype="uint8")
+    if any("\0" in s for s in strings):
+        return None
+    # Add one extra "\0" at the beginning, to distinguish [""] from [].
+    return numpy.frombuffer(("\0" + "\0".join(strings)).encode("utf8"), dtype="uint8")
+
+
+def _decode_strings(data: numpy.ndarray) -> List[str]:
+    """
+    :param data: from :func:`_encode_strings`
+    """
+    if len(data) == 0:
+        return []
+    s = data.tobytes().decode("utf8")
+    assert s[:1] == "\0"
+    return s[1:].split("\0")
@@ -270,6 +270,30 @@ class Vocabulary(object):
         segments = sentence.split()
         return self.get_seq_indices(segments) + self.seq_postfix
 
+    def get_seqs(self, sentences, num_workers=0):
+        """
+        Bulk version of :func:`get_seq`, e.g. to preprocess a whole corpus.
+
+        With ``num_workers > 0``, the sentences are distributed over a pool of subprocesses (spawned).
+        This must not be used from a daemonic process (e.g. a :class:`MultiProcDataset` worker).
+        Note that for vocabs with randomness (e.g. :class:`SamplingBytePairEncoding`),
+        the result will differ from sequential :func:`get_seq` calls.
+
+        :param typing.Sequence[str] sentences:
+        :param int num_workers: number of subprocesses. 0 means to do it in this process
+        :return: for each sentence, same as :func:`get_seq`
+        :rtype: list[list[int]]
+        """
+        if num_workers <= 0 or len(sentences) <= 1:
+            return [self.get_seq(sentence) for sentence in sentences]
+        import multiprocessing
+
+        chunksize = max(1, len(sentences) // (num_workers * 4))
+        with multiprocessing.get_context("spawn").Pool(
+            num_workers, initializer=_get_seqs_worker_init, initargs=(self,)
+        ) as pool:
+            return pool.map(_get_seqs_worker_get_seq, sentences, chunksize=chunksize)
+
     def get_seq_indices(self, seq):
         """
         :param list[str] seq:
@@ -297,16 +321,19 @@ class BytePairEncoding(Vocabulary):
     Proceedings of the 54th Annual Meeting of the Association for Computational Linguistics (ACL 2016). Berlin, Germany.
     """
 
-    def __init__(self, vocab_file, bpe_file, seq_postfix=None, **kwargs):
+    def __init__(self, vocab_file, bpe_file, seq_postfix=None, word_cache_size=100000, **kwargs):
         """
         :param str vocab_file:
         :param str bpe_file:
         :param list[int]|None seq_postfix: labels will be added to the seq in self.get_seq
+        :param int|None word_cache_size: see :class:`StandardBytePairEncoder`
         """
         super(BytePairEncoding, self).__init__(vocab_file=vocab_file, seq_postfix=seq_postfix, **kwargs)
         from returnn.util.bpe import StandardBytePairEncoder
 
-        self.bpe = StandardBytePairEncoder(bpe_codes_file=bpe_file, labels=self._labels)
+        self.bpe = StandardBytePairEncoder(
+            bpe_codes_file=bpe_file, labels=self._labels, word_cache_size=word_cache_size
+        )
 
     def get_seq(self, sentence):
         """
@@ -561,3 +588,22 @@ class Utf8ByteTargets(Vocabulary):
         :rtype: str
         """
         return bytearray(seq).decode(encoding="utf8")
+
+
+_get_seqs_worker_vocab = None  # type: typing.Optional[Vocabulary]
+
+
+def _get_seqs_worker_init(vocab):
+    """
+    :param Vocabulary vocab:
+    """
+    global _get_seqs_worker_vocab
+    _get_seqs_worker_vocab = vocab
+
+
+def _get_seqs_worker_get_seq(sentence):
+    """
+    :param str sentence:
+    :rtype: list[int]
+    """
+    return _get_seqs_worker_vocab.get_seq(sentence)
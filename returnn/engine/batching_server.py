@@ -0,0 +1,387 @@
+"""
+Dynamic micro-batching for inference servers,
+e.g. the ``search_server`` task (see :func:`returnn.tf.engine.Engine.web_server`
+and :func:`returnn.torch.engine.Engine.web_server`).
+This is shared across different backends.
+
+Concurrent requests are put into a queue.
+A single worker thread collects them into batches
+(up to some max number of seqs, or up to some max waiting time),
+sorts them by length, runs the whole batch at once,
+and scatters the results back to the waiting requests.
+"""
+
+from __future__ import annotations
+from typing import Optional, Any, Callable, List, Dict
+import sys
+import time
+import threading
+import queue
+import math
+import json
+from concurrent.futures import Future
+from http.server import ThreadingHTTPServer
+from returnn.log import log
+
+
+class LatencyHistogram:
+    """
+    Histogram over times (in seconds), with logarithmically spaced buckets.
+    Thread-safe.
+    """
+
+    def __init__(self, *, name: str, min_time: float = 1e-4, max_time: float = 1e3, num_buckets_per_decade: int = 4):
+        """
+        :param name: for reporting
+        :param min_time: everything below goes into the first bucket
+        :param max_time: everything above goes into the last bucket
+        :param num_buckets_per_decade: resolution
+        """
+        self.name = name
+        self.min_time = min_time
+        self.num_buckets_per_decade = num_buckets_per_decade
+        self.num_buckets = int(math.ceil(math.log10(max_time / min_time) * num_buckets_per_decade)) + 1
+        self.counts = [0] * self.num_buckets
+        self.num = 0
+        self.total_time = 0.0
+        self.max_seen_time = 0.0
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return "<%s %r num=%i>" % (self.__class__.__name__, self.name, self.num)
+
+    def get_bucket_upper_bound(self, bucket_idx: int) -> float:
+        """
+        :return: upper bound (inclusive) of the bucket, in seconds
+        """
+        return self.min_time * 10.0 ** (bucket_idx / self.num_buckets_per_decade)
+
+    def add(self, t: float):
+        """
+        :param t: time in seconds
+        """
+        if t <= self.min_time:
+            bucket_idx = 0
+        else:
+            bucket_idx = int(math.ceil(math.log10(t / self.min_time) * self.num_buckets_per_decade))
+            bucket_idx = min(bucket_idx, self.num_buckets - 1)
+        with self._lock:
+            self.counts[bucket_idx] += 1
+            self.num += 1
+            self.total_time += t
+            self.max_seen_time = max(self.max_seen_time, t)
+
+    def get_percentile(self, q: float) -> float:
+        """
+        :param q: in [0,1], e.g. 0.5 for the median
+        :return: upper bound of the bucket which contains the q-percentile.
+            0 if there are no entries
+        """
+        with self._lock:
+            if not self.num:
+                return 0.0
+            threshold = q * self.num
+            acc = 0
+            for bucket_idx, c in enumerate(self.counts):
+                acc += c
+                if acc >= threshold and c > 0:
+                    return min(self.get_bucket_upper_bound(bucket_idx), self.max_seen_time)
+            return self.max_seen_time
+
+    def get_summary_str(self) -> str:
+        """
+        :return: one line with count, mean and percentiles
+        """
+        if not self.num:
+            return "%s: no entries" % self.name
+        return "%s: num %i, mean %.4f, p50 %.4f, p90 %.4f, p99 %.4f, max %.4f secs" % (
+            self.name,
+            self.num,
+            self.total_time / self.num,
+            self.get_percentile(0.5),
+            self.get_percentile(0.9),
+            self.get_percentile(0.99),
+            self.max_seen_time,
+        )
+
+    def get_histogram_str(self) -> str:
+        """
+        :return: multiple lines, one per non-empty bucket
+        """
+        with self._lock:
+            counts = list(self.counts)
+        lines = [self.get_summary_str()]
+        max_count = max(counts) if self.num else 0
+        for bucket_idx, c in enumerate(counts):
+            if not c:
+                continue
+            lines.append(
+                "  <= %9.4f secs: %6i %s" % (self.get_bucket_upper_bound(bucket_idx), c, "*" * (40 * c // max_count))
+            )
+        return "\n".join(lines)
+
+
+class _Request:
+    """
+    Pending request in the :class:`DynamicBatcher` queue.
+    """
+
+    def __init__(self, inputs: Any, length: int):
+        self.inputs = inputs
+        self.length = length
+        self.future = Future()
+        self.enqueue_time = time.time()
+
+
+class DynamicBatcher:
+    """
+    Collects concurrent requests into batches and processes them in a single worker thread.
+
+    Usage::
+
+        batcher = DynamicBatcher(process_batch, max_batch_size=16, max_wait_time=0.01)
+        batcher.start()
+        # from any thread:
+        result = batcher.process(inputs)
+    """
+
+    def __init__(
+        self,
+        process_batch: Callable[[List[Any]], List[Any]],
+        *,
+        max_batch_size: int = 1,
+        max_wait_time: float = 0.0,
+        get_len: Optional[Callable[[Any], int]] = None,
+        max_queue_size: int = 0,
+        name: str = "DynamicBatcher",
+    ):
+        """
+        :param process_batch: gets a list of inputs (sorted by length, longest first),
+            returns the list of results in the same order.
+            This is always called in the worker thread.
+        :param max_batch_size: max number of requests per batch
+        :param max_wait_time: in seconds. after the first request of a batch came in,
+            wait at most this long for further requests before the batch is processed
+        :param get_len: for sorting the requests inside a batch. by default :func:`len`
+        :param max_queue_size: if >0, :func:`submit` blocks when the queue is full
+        :param name: for reporting and the thread name
+        """
+        assert max_batch_size >= 1 and max_wait_time >= 0
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait_time = max_wait_time
+        self.get_len = get_len or len
+        self.name = name
+        self._queue = queue.Queue(maxsize=max_queue_size)  # type: queue.Queue[Optional[_Request]]
+        self._thread = None  # type: Optional[threading.Thread]
+        self.latency = LatencyHistogram(name="%s request latency" % name)
+        self.queue_latency = LatencyHistogram(name="%s queue latency" % name)
+        self.batch_latency = LatencyHistogram(name="%s batch compute time" % name)
+        self.num_batches = 0
+        self.num_requests = 0
+        self.start_time = None  # type: Optional[float]
+
+    def __repr__(self):
+        return "<%s %r max_batch_size=%i max_wait_time=%s>" % (
+            self.__class__.__name__,
+            self.name,
+            self.max_batch_size,
+            self.max_wait_time,
+        )
+
+    def start(self):
+        """
+        Starts the worker thread.
+        """
+        assert not self._thread
+        self.start_time = time.time()
+        self._thread = threading.Thread(target=self._thread_main, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops the worker thread, after all pending requests are processed.
+        """
+        if not self._thread:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def submit(self, inputs: Any) -> Future:
+        """
+        :param inputs: for ``process_batch``
+        :return: future of the result
+        """
+        assert self._thread, "%s: not started" % self
+        req = _Request(inputs, length=self.get_len(inputs))
+        self._queue.put(req)
+        return req.future
+
+    def process(self, inputs: Any, *, timeout: Optional[float] = None) -> Any:
+        """
+        Submits the inputs and waits for the result.
+        Exceptions from ``process_batch`` are reraised here.
+
+        :param inputs: for ``process_batch``
+        :param timeout: in seconds
+        :return: result from ``process_batch``
+        """
+        return self.submit(inputs).result(timeout=timeout)
+
+    def _collect_batch(self) -> Optional[List[_Request]]:
+        """
+        :return: next batch, or None if we should stop
+        """
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.time() + self.max_wait_time
+        while len(batch) < self.max_batch_size:
+            try:
+                timeout = deadline - time.time()
+                req = self._queue.get(block=timeout > 0, timeout=timeout if timeout > 0 else None)
+            except queue.Empty:
+                break
+            if req is None:  # stop after this batch
+                self._queue.put(None)
+                break
+            batch.append(req)
+        return batch
+
+    def _thread_main(self):
+        while True:
+            batch = self._collect_batch()
+            if batch is None:
+                break
+            self._run_batch(batch)
+
+    def _run_batch(self, batch: List[_Request]):
+        batch = sorted(batch, key=lambda req: req.length, reverse=True)
+        start_time = time.time()
+        for req in batch:
+            self.queue_latency.add(start_time - req.enqueue_time)
+        try:
+            results = self.process_batch([req.inputs for req in batch])
+            assert len(results) == len(batch), "%s: got %i results for %i inputs" % (self, len(results), len(batch))
+        except BaseException as exc:
+            print("%s: exception in batch of %i requests: %s" % (self, len(batch), exc), file=log.v2)
+            sys.excepthook(*sys.exc_info())
+            for req in batch:
+                req.future.set_exception(exc)
+            return
+        end_time = time.time()
+        self.batch_latency.add(end_time - start_time)
+        for req, res in zip(batch, results):
+            self.latency.add(end_time - req.enqueue_time)
+            req.future.set_result(res)
+        self.num_batches += 1
+        self.num_requests += len(batch)
+        print(
+            "%s: batch of %i requests (max len %i), took %.3f secs, queue size %i"
+            % (self.name, len(batch), batch[0].length, end_time - start_time, self._queue.qsize()),
+            file=log.v5,
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        :return: stats as a dict, e.g. for JSON output
+        """
+        elapsed = time.time() - self.start_time if self.start_time else 0.0
+        return {
+            "num_requests": self.num_requests,
+            "num_batches": self.num_batches,
+            "avg_batch_size": self.num_requests / max(self.num_batches, 1),
+            "requests_per_sec": self.num_requests / elapsed if elapsed > 0 else 0.0,
+            "latency": {
+                h.name: {
+                    "mean": h.total_time / max(h.num, 1),
+                    "p50": h.get_percentile(0.5),
+                    "p90": h.get_percentile(0.9),
+                    "p99": h.get_percentile(0.99),
+                    "max": h.max_seen_time,
+                }
+                for h in [self.latency, self.queue_latency, self.batch_latency]
+            },
+        }
+
+    def get_report_str(self) -> str:
+        """
+        :return: multi-line report with throughput and latency histograms
+        """
+        stats = self.get_stats()
+        lines = [
+            "%s: %i requests in %i batches (avg batch size %.2f), %.2f requests/sec"
+            % (self.name, self.num_requests, self.num_batches, stats["avg_batch_size"], stats["requests_per_sec"]),
+            self.latency.get_histogram_str(),
+            self.queue_latency.get_summary_str(),
+            self.batch_latency.get_summary_str(),
+        ]
+        return "\n".join(lines)
+
+
+def get_dynamic_batcher_opts_from_config(config) -> Dict[str, Any]:
+    """
+    :param returnn.config.Config config:
+    :return: kwargs for :class:`DynamicBatcher`, from ``web_server_max_batch_size``
+        and ``web_server_max_wait_time``
+    """
+    return {
+        "max_batch_size": config.int("web_server_max_batch_size", 1),
+        "max_wait_time": config.float("web_server_max_wait_time", 0.0),
+        "max_queue_size": config.int("web_server_max_queue_size", 0),
+    }
+
+
+class BatchingHTTPServer(ThreadingHTTPServer):
+    """
+    Multi-threaded HTTP server which owns a :class:`DynamicBatcher`.
+    Each request is handled in its own thread,
+    and the handler is supposed to call ``self.server.batcher.process(...)`` in ``do_POST``.
+    GET requests to ``/stats`` return the batcher stats as JSON.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, *, port: int, handler_cls, batcher: DynamicBatcher, name: str = "Web server"):
+        """
+        :param port:
+        :param type[BaseHTTPRequestHandler] handler_cls: should implement ``do_POST``
+        :param batcher: will be started and stopped in :func:`serve_forever`
+        :param name: for logging
+        """
+        self.batcher = batcher
+        self.name = name
+
+        class _Handler(handler_cls):
+            # noinspection PyPep8Naming
+            def do_GET(self):
+                """
+                Handle GET request. Only ``/stats``.
+                """
+                if self.path.rstrip("/") != "/stats":
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-type", "application/json")
+                self.end_headers()
+                self.wfile.write(json.dumps(batcher.get_stats(), indent=2).encode("utf8") + b"\n")
+
+        super().__init__(("", port), _Handler)
+
+    def serve_forever(self, poll_interval: float = 0.5):
+        """
+        Starts the batcher, and serves until :func:`shutdown` or interrupted.
+        At the end, prints the throughput and latency report.
+        """
+        self.batcher.start()
+        print(
+            "%s, listening on port %i, %s. Stats via GET /stats." % (self.name, self.server_address[1], self.batcher),
+            file=log.v2,
+        )
+        try:
+            super().serve_forever(poll_interval=poll_interval)
+        finally:
+            self.batcher.stop()
+            print(self.batcher.get_report_str(), file=log.v2)
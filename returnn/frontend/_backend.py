@@ -615,6 +615,17 @@ class Backend(Generic[T]):
         """
         raise NotImplementedError
 
+    @staticmethod
+    def edit_distance(a: Tensor, a_spatial_dim: Dim, b: Tensor, b_spatial_dim: Dim) -> Tensor:
+        """
+        :param a: sparse
+        :param a_spatial_dim:
+        :param b: sparse
+        :param b_spatial_dim:
+        :return: unnormalized edit distance, int32, dims of a without a_spatial_dim
+        """
+        raise NotImplementedError
+
     @staticmethod
     def have_sequence_mask_raw() -> bool:
         """
@@ -7,7 +7,7 @@ from returnn.tensor import Tensor, Dim
 import returnn.frontend as rf
 
 
-__all__ = ["cross_entropy", "ctc_loss"]
+__all__ = ["cross_entropy", "ctc_loss", "edit_distance"]
 
 
 def cross_entropy(
@@ -88,3 +88,21 @@ def ctc_loss(
         blank_index=blank_index,
         max_approx=max_approx,
     )
+
+
+def edit_distance(a: Tensor, a_spatial_dim: Dim, b: Tensor, b_spatial_dim: Dim) -> Tensor:
+    """
+    Levenshtein distance, i.e. the minimum number of edits (insertion, deletion, substitution)
+    to transform ``a`` into ``b``. E.g. to calculate the WER or CER, or for min-WER training.
+    This is not normalized.
+
+    Internally, this uses :class:`returnn.native_op.EditDistanceOp`.
+
+    :param a: sparse, shape [B...,a_spatial]
+    :param a_spatial_dim:
+    :param b: sparse, shape [B...,b_spatial]
+    :param b_spatial_dim:
+    :return: edit distance, int32, shape [B...]
+    """
+    # noinspection PyProtectedMember
+    return a._raw_backend.edit_distance(a, a_spatial_dim, b, b_spatial_dim)
@@ -8,6 +8,7 @@ from __future__ import annotations
 from typing import Optional, Any, Dict
 import typing
 import os
+import json
 import returnn.util.basic as util
 from returnn.util.basic import better_repr, simple_obj_repr, ObjAsDict, unicode
 from returnn.log import log
@@ -102,6 +103,7 @@ class LearningRateControl(object):
                 "learning_rate_growth", config.opt_typed_value("newbob_learning_rate_growth", 1.0)
             ),
             "filename": config.value("learning_rate_file", None),
+            "file_format": config.value("learning_rate_file_format", "py"),
         }
 
     @classmethod
@@ -125,6 +127,8 @@ class LearningRateControl(object):
         learning_rate_decay=1.0,
         learning_rate_growth=1.0,
         filename=None,
+        file_format="py",
+        journal_compact_min_num_records=100,
     ):
         """
         :param float default_learning_rate: default learning rate. usually for epoch 1
@@ -136,9 +140,22 @@ class LearningRateControl(object):
         :param float|(float)->float learning_rate_decay:
         :param float|(float)->float learning_rate_growth:
         :param str filename: load from and save to file
-        """
+        :param str file_format: for saving. "py": Python repr of the whole epoch data, rewritten on every save.
+            "jsonl": append-only journal, one JSON line per changed epoch, see :func:`read_learning_rate_file`.
+            Loading always detects the format automatically.
+        :param int journal_compact_min_num_records: with the "jsonl" format,
+            the journal is rewritten (compacted) when it has more than twice as many records as epochs,
+            but at least this amount of records
+        """
+        assert file_format in {"py", "jsonl"}, "invalid learning_rate_file_format %r" % file_format
         self.epoch_data = {}  # type: typing.Dict[int,LearningRateControl.EpochData]
         self.filename = filename
+        self.file_format = file_format
+        self.journal_compact_min_num_records = journal_compact_min_num_records
+        # epoch -> (epoch data, JSON line) as it is in the journal file. None if the file is not a journal (yet).
+        self._journal_lines = None  # type: Optional[Dict[int,typing.Tuple[LearningRateControl.EpochData,str]]]
+        self._journal_num_records = 0
+        self._journal_changed_epochs = set()  # type: typing.Set[int]  # since the last save
         if filename:
             if os.path.exists(filename):
                 print("Learning-rate-control: loading file %s" % filename, file=log.v4)
@@ -293,6 +310,7 @@ class LearningRateControl(object):
         if epoch in self.epoch_data:
             if not self.epoch_data[epoch].learning_rate:
                 self.epoch_data[epoch].learning_rate = learning_rate
+                self._journal_changed_epochs.add(epoch)
         else:
             self.epoch_data[epoch] = self.EpochData(learning_rate=learning_rate)
 
@@ -373,6 +391,7 @@ class LearningRateControl(object):
         for v in error.values():
             assert isinstance(v, float)
         self.epoch_data[epoch].error.update(error)
+        self._journal_changed_epochs.add(epoch)
         if epoch == 1:
             print("Learning-rate-control: error key %r from %r" % (self.get_error_key(epoch), error), file=log.v4)
 
@@ -515,6 +534,9 @@ class LearningRateControl(object):
         directory = os.path.dirname(self.filename)
         if directory and not os.path.exists(directory):
             os.makedirs(directory, exist_ok=True)
+        if self.file_format == "jsonl":
+            self._save_journal()
+            return
         # First write to a temp-file, to be sure that the write happens without errors.
         # Otherwise, it could happen that we delete the old existing file, then
         # some error happens (e.g. disk quota), and we loose the newbob data.
@@ -525,13 +547,144 @@ class LearningRateControl(object):
         f.write("\n")
         f.close()
         os.rename(tmp_filename, self.filename)
+        self._journal_lines = None
+        self._journal_changed_epochs.clear()
+
+    def _save_journal(self):
+        cached = self._journal_lines or {}
+        # Only serialize the epochs which (might) have changed since the last save:
+        # those from set_epoch_error() etc., new or replaced epoch data,
+        # and the most recent epoch, as the engine updates its meta directly.
+        changed_epochs = set(self._journal_changed_epochs)
+        changed_epochs.update(
+            epoch for epoch, data in self.epoch_data.items() if cached.get(epoch, (None,))[0] is not data
+        )
+        if self.epoch_data:
+            changed_epochs.add(max(self.epoch_data.keys()))
+        lines = dict(cached)
+        new_lines = []
+        for epoch in sorted(changed_epochs):
+            if epoch not in self.epoch_data:
+                continue
+            line = _epoch_data_to_json_line(epoch, self.epoch_data[epoch])
+            if cached.get(epoch, (None, None))[1] != line:
+                new_lines.append(line)
+            lines[epoch] = (self.epoch_data[epoch], line)
+        self._journal_changed_epochs.clear()
+        if self._journal_lines is not None and os.path.exists(self.filename):
+            num_records = self._journal_num_records + len(new_lines)
+            if set(lines.keys()) == set(self.epoch_data.keys()) and num_records <= max(
+                2 * len(lines), self.journal_compact_min_num_records
+            ):
+                if new_lines:
+                    # Single write call, to keep the chance of a partially written line small.
+                    with open(self.filename, "a") as f:
+                        f.write("".join(new_lines))
+                self._journal_lines = lines
+                self._journal_num_records = num_records
+                return
+        # Compact, i.e. write the whole journal, reusing the cached lines.
+        # Same as above, first write to a temp-file.
+        lines = {epoch: lines[epoch] for epoch in sorted(self.epoch_data.keys())}
+        tmp_filename = self.filename + ".new_tmp"
+        with open(tmp_filename, "w") as f:
+            f.write(_JournalHeaderLine)
+            f.write("".join(line for _, line in lines.values()))
+        os.rename(tmp_filename, self.filename)
+        self._journal_lines = lines
+        self._journal_num_records = len(lines)
 
     def load(self):
         """
         Loads the saved epoch data from file (self.filename).
-        """
-        s = open(self.filename).read()
-        self.epoch_data = eval(s, {"nan": float("nan"), "inf": float("inf")}, ObjAsDict(self))
+        Both the "py" and the "jsonl" format are supported, see :func:`read_learning_rate_file`.
+        """
+        with open(self.filename) as f:
+            journal = _read_journal(f)
+        self._journal_changed_epochs.clear()
+        if journal is None:
+            self.epoch_data = read_learning_rate_file(self.filename)
+            self._journal_lines = None
+            return
+        self.epoch_data, self._journal_num_records, complete = journal
+        if complete:
+            self._journal_lines = {
+                epoch: (data, _epoch_data_to_json_line(epoch, data)) for epoch, data in sorted(self.epoch_data.items())
+            }
+        else:
+            self._journal_lines = None  # do not append to the broken line but compact on the next save
+
+
+_JournalHeaderLine = '{"format": "returnn-learning-rate-control-journal", "version": 1}\n'
+
+
+def read_learning_rate_file(filename: str) -> Dict[int, LearningRateControl.EpochData]:
+    """
+    Reads a learning rate file (``learning_rate_file``), in any of the supported formats:
+
+      - "py": Python repr of the dict epoch -> :class:`LearningRateControl.EpochData`.
+        This is evaluated as a whole.
+      - "jsonl": a header line, and then one JSON object per line,
+        like ``{"epoch": 1, "learning_rate": 0.001, "error": {...}, "meta": {...}}``.
+        The lines are parsed one by one, and a later line for the same epoch replaces the earlier one.
+        A broken last line (e.g. the process was killed while appending to the file) is ignored.
+
+    :param filename:
+    :return: epoch -> epoch data
+    """
+    with open(filename) as f:
+        journal = _read_journal(f)
+        if journal is not None:
+            return journal[0]
+        f.seek(0)
+        s = f.read()
+    return eval(s, {"nan": float("nan"), "inf": float("inf")}, ObjAsDict(LearningRateControl))
+
+
+def _read_journal(f: typing.TextIO) -> Optional[typing.Tuple[Dict[int, LearningRateControl.EpochData], int, bool]]:
+    """
+    :param f: file opened for reading, at the beginning
+    :return: None if this is not the "jsonl" format, otherwise epoch data, num records, whether the last line is ok
+    """
+    if f.readline() != _JournalHeaderLine:
+        return None
+    res = {}  # type: Dict[int,LearningRateControl.EpochData]
+    num_records = 0
+    broken_line = None
+    line = "\n"
+    for line_idx, line in enumerate(f):
+        if broken_line is not None:
+            raise ValueError("%s: line %i: broken record: %r" % (f.name, broken_line[0] + 2, broken_line[1]))
+        try:
+            record = json.loads(line)
+        except ValueError:
+            broken_line = (line_idx, line)
+            continue
+        res[record["epoch"]] = LearningRateControl.EpochData(
+            learning_rate=record["learning_rate"], error=record["error"], meta=record["meta"]
+        )
+        num_records += 1
+    if broken_line is not None:
+        print("Learning-rate-control: %s: ignoring broken last line %r" % (f.name, broken_line[1]), file=log.v3)
+    return res, num_records, broken_line is None and line.endswith("\n")
+
+
+def _epoch_data_to_json_line(epoch: int, data: LearningRateControl.EpochData) -> str:
+    return (
+        json.dumps(
+            {"epoch": epoch, "learning_rate": data.learning_rate, "error": data.error, "meta": data.meta},
+            default=_json_default,
+        )
+        + "\n"
+    )
+
+
+def _json_default(obj: Any) -> Any:
+    if isinstance(obj, numpy.generic):
+        return obj.item()
+    if isinstance(obj, numpy.ndarray):
+        return obj.tolist()
+    raise TypeError("Learning-rate-control: cannot serialize %r of type %s" % (obj, type(obj)))
 
 
 class ConstantLearningRate(LearningRateControl):
@@ -16,6 +16,10 @@
 #define TENSORFLOW 0
 #endif
 
+#ifndef TORCH
+#define TORCH 0
+#endif
+
 #ifndef _ns
 #define _ns
 #endif
@@ -551,7 +555,50 @@ static void _cudaHandleError(cublasStatus_t status, const char *file, int line)
 #else   // not CUDA
 
 
-#if !TENSORFLOW
+#if TORCH
+// PyTorch, via ctypes, see returnn/torch/native_op.py.
+// The Python side fills this struct for every input and output tensor.
+struct NativeOpTensor {
+    void* data;
+    int64_t ndim;
+    const int64_t* dims;
+    const int64_t* strides;  // in elements, like torch.Tensor.stride()
+    int64_t dtype_size;
+};
+#define Ndarray NativeOpTensor
+typedef int32_t int32;  // like in TensorFlow, used by some kernels
+#define Ndarray_DEV_DATA(x) ((float*) (x)->data)
+#define Ndarray_DEV_DATA_int32(x) ((int32_t*) (x)->data)
+#define Ndarray_DEV_DATA_int32_scalar(x) Ndarray_DEV_DATA_int32(x)[0]
+#define Ndarray_HOST_DIMS(x) ((x)->dims)
+#define Ndarray_STRIDE(x, i) ((x)->strides[i])  // return in elements
+#define Ndarray_DIMS Ndarray_HOST_DIMS
+#define Ndarray_NDIM(x) ((x)->ndim)
+#define Ndarray_DIM_Type int64_t
+typedef Ndarray_DIM_Type const* Ndarray_DIMS_Type;
+#define Ndarray_dtype_size(x) ((x)->dtype_size)
+
+static inline int64_t Ndarray_SIZE(const Ndarray* x) {
+    int64_t size = 1;
+    for(int64_t i = 0; i < x->ndim; ++i)
+        size *= x->dims[i];
+    return size;
+}
+
+#define Ndarray_sgemm(\
+	transpose_A, transpose_B, \
+	m, n, k, alpha, A, lda, B, ldb, beta, C, ldc) \
+	{ \
+		char transa = transpose_A, transb = transpose_B; \
+		int m_ = m, n_ = n, k_ = k, lda_ = lda, ldb_ = ldb, ldc_ = ldc; \
+		sgemm_(&transa, &transb, \
+			&m_, &n_, &k_, alpha, (float*) A, &lda_, (float*) B, &ldb_, beta, C, &ldc_); \
+	}
+
+static inline void* device_malloc(size_t size) { return malloc(size); }
+static inline void device_free(void* ptr) { free(ptr); }
+
+#elif !TENSORFLOW
 // Numpy, see: https://docs.scipy.org/doc/numpy/reference/c-api.array.html
 // And: https://deeplearning.net/software/theano/extending/extending_theano_c.html
 #define Ndarray PyArrayObject
@@ -671,6 +718,7 @@ struct _KernelLoop {
 #endif
 
 
+#if !TORCH  // with Torch, all outputs are allocated on the Python side
 Ndarray* Ndarray_uninitialized_like(Ndarray* a) {
 	Ndarray_DIMS_Type dim = Ndarray_HOST_DIMS(a);
 #if TENSORFLOW
@@ -680,6 +728,7 @@ Ndarray* Ndarray_uninitialized_like(Ndarray* a) {
 #endif
 	return res;
 }
+#endif
 
 long Ndarray_get_n_total_elements(Ndarray* a) {
 	long c = 1;
@@ -5,8 +5,8 @@ Generic interface which automatically creates:
 * inplace and not inplace
 * grad variants
 
-See :mod:`returnn.tf.native_op` and :mod:`returnn.theano.native_op`
-for usage in TensorFlow and Theano.
+See :mod:`returnn.tf.native_op` and :mod:`returnn.torch.native_op`
+for usage in TensorFlow and PyTorch.
 
 See :ref:`native_ops` for more background.
 """
@@ -278,6 +278,49 @@ class NativeOpGenBase:
         return outputs[0]
 
 
+class OpDescription(NativeOpBaseMixin):
+    """
+    Meta-info about an op, used by the ``OpMaker`` in :mod:`returnn.tf.native_op` and :mod:`returnn.torch.native_op`.
+    """
+
+    @classmethod
+    def from_gen_base(cls, gen_base):
+        """
+        :param NativeOpGenBase|type[NativeOpGenBase] gen_base:
+        :rtype: OpDescription
+        """
+        name = gen_base.__name__
+        assert gen_base.in_info is not None
+        assert gen_base.out_info is not None
+        assert gen_base.c_fw_code is not None
+        return OpDescription(
+            in_info=gen_base.in_info,
+            out_info=gen_base.out_info,
+            c_fw_code=gen_base.c_fw_code,
+            c_bw_code=gen_base.c_bw_code,
+            c_extra_support_code=gen_base.c_extra_support_code,
+            cpu_support=gen_base.cpu_support,
+            grad_input_map=gen_base.grad_input_map,
+            name=name,
+        )
+
+    @property
+    def is_grad_defined(self):
+        """
+        :rtype: bool
+        """
+        return bool(self.c_bw_code)
+
+    def grad(self):
+        """
+        :rtype: OpDescription|None
+        """
+        if not self.is_grad_defined:
+            return None
+        kwargs = self.kwargs_for_grad_op()
+        return OpDescription(**kwargs)
+
+
 class LstmGenericBase(NativeOpGenBase):
     # noinspection PyUnresolvedReferences
     """
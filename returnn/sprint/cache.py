@@ -12,10 +12,11 @@ import sys
 import os
 import typing
 import array
-from struct import pack, unpack
+from struct import pack, unpack, unpack_from
 import numpy
 import zlib
 import mmap
+from collections import OrderedDict
 
 
 class FileInfo:
@@ -209,18 +210,30 @@ class FileArchive:
     start_recovery_tag = 0xAA55AA55
     end_recovery_tag = 0x55AA55AA
 
-    def __init__(self, filename, must_exists=True, encoding="ascii"):
+    def __init__(self, filename, must_exists=True, encoding="ascii", read_file_info_table=True):
+        """
+        :param str filename:
+        :param bool must_exists:
+        :param str encoding:
+        :param bool read_file_info_table: if False, :attr:`ft` stays empty,
+            and reading needs an explicit ``file_info`` (e.g. from a :class:`FileArchiveBundle` index)
+        """
         self.encoding = encoding
 
         self.ft = {}  # type: typing.Dict[str,FileInfo]
+        self._mmap = None  # type: typing.Optional[mmap.mmap]  # for reading, see _get_entry_buffer
         if os.path.exists(filename):
             self.allophones = []
             self.f = open(filename, "rb")
+            if os.fstat(self.f.fileno()).st_size > 0:
+                self._mmap = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ)
             header = self.read_str(len(self.SprintCacheHeader))
             assert header == self.SprintCacheHeader
 
             ft = bool(self.read_char())
-            if ft:
+            if not read_file_info_table:
+                pass
+            elif ft:
                 self.read_file_info_table()
             else:
                 self.scan_archive()
@@ -248,6 +261,15 @@ class FileArchive:
         """
         self.write_file_info_table()
 
+    def close(self):
+        """
+        Closes the file (and the memory map).
+        """
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self.f.close()
+
     def read_file_info_table(self):
         """
         Read file info table.
@@ -420,10 +442,24 @@ class FileArchive:
         """
         return filename in self.ft
 
-    def read(self, filename, typ):
+    def _get_file_info(self, filename, file_info=None):
+        """
+        :param str filename: the entry-name in the archive
+        :param FileInfo|None file_info: if given, this is used
+        :rtype: FileInfo
+        """
+        if file_info is not None:
+            return file_info
+        if filename not in self.ft:
+            if filename in self._short_seg_names:
+                filename = self._short_seg_names[filename]
+        return self.ft[filename]
+
+    def read(self, filename, typ, file_info=None):
         """
         :param str filename: the entry-name in the archive
         :param str typ: "str", "feat" or "align"
+        :param FileInfo|None file_info: if given, this is used instead of the lookup in :attr:`ft`
         :return: depending on typ, "str" -> string, "feat" -> (time, data), "align" -> align,
           where string is a str,
           time is list of time-stamp tuples (start-time,end-time) in millisecs,
@@ -433,11 +469,7 @@ class FileArchive:
         :rtype: str|(list[numpy.ndarray],list[numpy.ndarray])|list[(int,int,int,float)]
         """
 
-        if filename not in self.ft:
-            if filename in self._short_seg_names:
-                filename = self._short_seg_names[filename]
-
-        fi = self.ft[filename]
+        fi = self._get_file_info(filename, file_info)
         self.f.seek(fi.pos)
         size = self.read_U32()
         comp = self.read_U32()
@@ -446,11 +478,8 @@ class FileArchive:
             return None
 
         if comp > 0:
-            # read compressed bytes into memory as 'bytearray'
-            a = array.array("b")
-            a.fromfile(self.f, comp)
-            # unpack
-            b = zlib.decompress(a.tostring(), 15 + 32)
+            # read compressed bytes into memory and unpack
+            b = zlib.decompress(self.f.read(comp), 15 + 32)
             # substitute self.f by an anonymous memmap file object
             # restore original file handle after we're done
             backup_f = self.f
@@ -464,6 +493,155 @@ class FileArchive:
 
         return self._raw_read(size=fi.size, typ=typ)
 
+    def _get_entry_buffer(self, filename, file_info=None):
+        """
+        :param str filename: the entry-name in the archive
+        :param FileInfo|None file_info:
+        :return: (buffer, offset) of the (uncompressed) entry content, or None if the entry is empty.
+            For uncompressed entries, this directly points into the memory-mapped archive, without a copy.
+        :rtype: (mmap.mmap|bytes, int)|None
+        """
+        fi = self._get_file_info(filename, file_info)
+        if self._mmap is not None:
+            size, comp, _ = unpack_from("III", self._mmap, fi.pos)
+            pos = fi.pos + 12
+            if size == 0:
+                return None
+            if comp > 0:
+                return zlib.decompress(self._mmap[pos : pos + comp], 15 + 32), 0
+            return self._mmap, pos
+        self.f.seek(fi.pos)
+        size = self.read_U32()
+        comp = self.read_U32()
+        self.read_U32()  # chk
+        if size == 0:
+            return None
+        if comp > 0:
+            return zlib.decompress(self.f.read(comp), 15 + 32), 0
+        return self.f.read(size), 0
+
+    def read_features(self, filename, file_info=None):
+        """
+        Like ``read(filename, "feat")``, but vectorized, and returns the features as one matrix.
+
+        :param str filename: the entry-name in the archive
+        :param FileInfo|None file_info:
+        :return: (times, features) or None if the entry is empty,
+          where times is of shape (time,2) (float64), the (start-time,end-time) of each frame,
+          features is of shape (time,dim) (float32)
+        :rtype: (numpy.ndarray,numpy.ndarray)|None
+        """
+        entry = self._get_entry_buffer(filename, file_info)
+        if entry is None:
+            return None
+        buf, pos = entry
+        (type_len,) = unpack_from("I", buf, pos)
+        pos += 4
+        type_ = bytes(buf[pos : pos + type_len]).decode("ascii")
+        pos += type_len
+        assert type_ == "vector-f32"
+        (count,) = unpack_from("I", buf, pos)
+        pos += 4
+        if count == 0:
+            return numpy.zeros((0, 2), dtype="float64"), numpy.zeros((0, 0), dtype="float32")
+        # Each frame is: size (u32), size x f32, 2 x f64. We assume the same size for all frames.
+        (dim,) = unpack_from("I", buf, pos)
+        frame_dtype = numpy.dtype([("dim", "I"), ("data", "f", (dim,)), ("time", "d", (2,))])
+        frames = numpy.frombuffer(buf, dtype=frame_dtype, count=count, offset=pos)
+        assert (frames["dim"] == dim).all(), "%r: entry %r: feature dims differ" % (self, filename)
+        return frames["time"].copy(), frames["data"].copy()
+
+    def read_alignment(self, filename, raw=False, file_info=None):
+        """
+        Like ``read(filename, "align")`` (or ``"align_raw"`` if ``raw``),
+        but the RLE scheme is decoded in bulk, and it returns numpy arrays.
+
+        :param str filename: the entry-name in the archive
+        :param bool raw: if True, does not split the mixture idx into allophone and state (see :func:`get_states`)
+        :param FileInfo|None file_info:
+        :return: (times, allophones, states, weights), each of shape (len,), or None if the entry is empty.
+          states is None if raw
+        :rtype: (numpy.ndarray,numpy.ndarray,numpy.ndarray|None,numpy.ndarray)|None
+        """
+        entry = self._get_entry_buffer(filename, file_info)
+        if entry is None:
+            return None
+        buf, pos = entry
+        (type_len,) = unpack_from("I", buf, pos)
+        pos += 4
+        type_ = bytes(buf[pos : pos + type_len]).decode("ascii")
+        pos += type_len
+        assert type_ == "flow-alignment"
+        pos += 4  # flag ?
+        alignment_header = bytes(buf[pos : pos + 8]).decode("ascii")
+        pos += 8
+        if alignment_header not in ["ALIGNRLE", "AALPHRLE"]:
+            raise Exception("No valid alignment header found (found: %r). Wrong cache?" % alignment_header)
+        (size,) = unpack_from("I", buf, pos)
+        pos += 4
+        if size >= (1 << 31):
+            # Weighted RLE scheme. This is rarely used, so just use the generic code.
+            alignment = self.read(filename, "align_raw" if raw else "align", file_info=file_info)
+            times, mixes, states, weights = zip(*alignment) if alignment else ((), (), (), ())
+            return (
+                numpy.array(times, dtype="int32"),
+                numpy.array(mixes, dtype="int32"),
+                numpy.array(states, dtype="int32"),
+                numpy.array(weights, dtype="float32"),
+            )
+        # RLE scheme: a sequence of (n: int8, ...), where
+        # n > 0: n mixture indices follow, n < 0: one mixture idx follows, repeated -n times,
+        # n == 0: a new time follows.
+        time = 0
+        num_frames = 0
+        time_chunks = []  # type: typing.List[numpy.ndarray]
+        mix_chunks = []  # type: typing.List[numpy.ndarray]
+        while num_frames < size:
+            (n,) = unpack_from("b", buf, pos)
+            pos += 1
+            if n > 0:
+                mix_chunks.append(numpy.frombuffer(buf, dtype="i", count=n, offset=pos))
+                pos += 4 * n
+            elif n < 0:
+                n = -n
+                (mix,) = unpack_from("i", buf, pos)
+                pos += 4
+                mix_chunks.append(numpy.full((n,), mix, dtype="int32"))
+            else:
+                (time,) = unpack_from("i", buf, pos)
+                pos += 4
+                continue
+            time_chunks.append(numpy.arange(time, time + n, dtype="int32"))
+            time += n
+            num_frames += n
+        times = numpy.concatenate(time_chunks) if time_chunks else numpy.zeros((0,), dtype="int32")
+        mixes = numpy.concatenate(mix_chunks).astype("int32") if mix_chunks else numpy.zeros((0,), dtype="int32")
+        states = None
+        if not raw:
+            mixes, states = self.get_states(mixes)
+        return times, mixes, states, numpy.ones(times.shape, dtype="float32")
+
+    def get_states(self, mixes):
+        """
+        Vectorized version of :func:`get_state`.
+
+        :param numpy.ndarray mixes: int
+        :return: (mixes, states)
+        :rtype: (numpy.ndarray,numpy.ndarray)
+        """
+        assert self.allophones
+        max_states = 6
+        mixes = numpy.array(mixes, dtype="int32")
+        states = numpy.zeros(mixes.shape, dtype="int32")
+        for state in range(max_states):
+            mask = mixes >= len(self.allophones)
+            if not mask.any():
+                break
+            mixes[mask] -= 1 << 26
+            states[mask] = min(state + 1, max_states - 1)
+        assert (mixes >= 0).all()
+        return mixes, states
+
     def get_state(self, mix):
         """
         :param int mix:
@@ -567,46 +745,237 @@ class FileArchive:
 class FileArchiveBundle:
     """
     File archive bundle.
+
+    All entries of all archives are kept in one consolidated index,
+    entry name -> (archive idx, pos, size, compressed), so the lookup does not depend on the number of archives.
+    The index can be stored in a file (``index_file``), such that we do not need to open all archives
+    and read all their file info tables at startup, which is slow for bundles with thousands of archives.
+    The archives are opened lazily, and at most ``max_open_archives`` (default 64) are kept open
+    at the same time (LRU), to bound the number of open file handles (and memory maps).
+    Archives beyond that are closed and reopened when needed again.
+    Use ``max_open_archives=None`` to keep all archives open, as in earlier versions.
+
+    :attr:`archives` (archive filename -> :class:`FileArchive`) and :attr:`files` (entry name -> :class:`FileArchive`)
+    are still available for compatibility, as read-only mappings which open the archives via the LRU pool.
+    Note that an archive obtained from them gets closed when it is evicted from the pool,
+    so do not keep references to them but look them up again (or use :func:`read` etc).
     """
 
-    def __init__(self, filename=None, encoding="ascii"):
+    IndexVersion = 1
+
+    def __init__(self, filename=None, encoding="ascii", index_file=None, max_open_archives=64):
         """
         :param str|None filename: .bundle file
         :param str encoding: encoding used in the files
+        :param str|None index_file: if given, the consolidated index is loaded from this file (if it is valid),
+            or otherwise created and stored there. it is invalidated when any archive changes
+        :param int|None max_open_archives: max number of archives kept open at the same time. None means unlimited
         """
-        # filename -> FileArchive
-        self.archives = {}  # type: typing.Dict[str,FileArchive]
-        # archive content file -> FileArchive
-        self.files = {}  # type: typing.Dict[str,FileArchive]
-        self._short_seg_names = {}
+        self.encoding = encoding
+        self.max_open_archives = max_open_archives
+        self.archive_filenames = []  # type: typing.List[str]
+        self._archive_idx_by_filename = {}  # type: typing.Dict[str,int]
+        # archive content file -> (archive idx, pos, size, compressed)
+        self._entries = {}  # type: typing.Dict[str,typing.Tuple[int,int,int,int]]
+        self._short_seg_names = {}  # type: typing.Dict[str,str]
+        self._open_archives = OrderedDict()  # type: typing.OrderedDict[int,FileArchive]  # LRU
+        self._allophones = None  # type: typing.Optional[typing.List[str]]
         if filename is not None:
-            self.add_bundle(filename=filename, encoding=encoding)
+            self.add_bundle(filename=filename, encoding=encoding, index_file=index_file)
 
-    def add_bundle(self, filename, encoding="ascii"):
+    def add_bundle(self, filename, encoding="ascii", index_file=None):
         """
         :param str filename: bundle
         :param str encoding:
+        :param str|None index_file: see :class:`FileArchiveBundle`
         """
         file_dir = os.path.dirname(filename) or "."
+        archive_files = []
         for line in open(filename).read().splitlines():
             if line.startswith("/"):
-                archive_file = line
+                archive_files.append(line)
             else:
-                archive_file = f"{file_dir}/{line}"
+                archive_files.append(f"{file_dir}/{line}")
+        if index_file and self._load_index(index_file, archive_files=archive_files, encoding=encoding):
+            return
+        for archive_file in archive_files:
             self.add_archive(filename=archive_file, encoding=encoding)
+        if index_file:
+            self._save_index(index_file, archive_files=archive_files, encoding=encoding)
 
     def add_archive(self, filename, encoding="ascii"):
         """
         :param str filename: single archive
         :param str encoding:
         """
-        if filename in self.archives:
+        if filename in self._archive_idx_by_filename:
             return
-        self.archives[filename] = a = FileArchive(filename, must_exists=True, encoding=encoding)
-        for f in a.ft.keys():
-            self.files[f] = a
+        a = FileArchive(filename, must_exists=True, encoding=encoding)
+        if self._allophones is not None:
+            a.allophones = self._allophones
+        archive_idx = self._add_archive_filename(filename)
+        for fi in a.ft.values():
+            self._entries[fi.name] = (archive_idx, fi.pos, fi.size, fi.compressed)
         # noinspection PyProtectedMember
         self._short_seg_names.update(a._short_seg_names)
+        self._put_open_archive(archive_idx, a)
+
+    def _add_archive_filename(self, filename):
+        """
+        :param str filename:
+        :return: archive idx
+        :rtype: int
+        """
+        archive_idx = len(self.archive_filenames)
+        self.archive_filenames.append(filename)
+        self._archive_idx_by_filename[filename] = archive_idx
+        return archive_idx
+
+    @property
+    def archives(self):
+        """
+        For compatibility. Prefer :func:`read` etc. See class docstring.
+
+        :return: archive filename -> archive
+        :rtype: typing.Mapping[str,FileArchive]
+        """
+        return _FileArchiveBundleArchivesView(self)
+
+    @property
+    def files(self):
+        """
+        For compatibility. Prefer :func:`read` etc. See class docstring.
+
+        :return: archive content file (entry name) -> archive
+        :rtype: typing.Mapping[str,FileArchive]
+        """
+        return _FileArchiveBundleFilesView(self)
+
+    def _get_archive_with_file_info_table(self, archive_idx):
+        """
+        :param int archive_idx:
+        :return: opened archive, via the LRU pool, where :attr:`FileArchive.ft` is filled, as it was before
+        :rtype: FileArchive
+        """
+        a = self._get_archive(archive_idx)
+        if not a.ft:
+            a.read_file_info_table()
+        return a
+
+    def _get_index_key(self, archive_files, encoding):
+        """
+        :param list[str] archive_files:
+        :param str encoding:
+        :return: hash over the archive files (path, size, mtime) and the options
+        :rtype: str
+        """
+        import hashlib
+
+        h = hashlib.sha256()
+        h.update(repr((self.IndexVersion, encoding)).encode("utf8"))
+        for fn in archive_files:
+            st = os.stat(fn)
+            h.update(repr((os.path.realpath(fn), st.st_size, st.st_mtime_ns)).encode("utf8"))
+        return h.hexdigest()
+
+    def _load_index(self, index_file, archive_files, encoding):
+        """
+        :param str index_file:
+        :param list[str] archive_files:
+        :param str encoding:
+        :return: whether the index was loaded. if False, nothing was changed
+        :rtype: bool
+        """
+        if not os.path.exists(index_file):
+            return False
+        # noinspection PyBroadException
+        try:
+            with numpy.load(index_file, allow_pickle=False) as f:
+                if f["key"].item() != self._get_index_key(archive_files, encoding):
+                    return False
+                names = f["names"].tolist()
+                archive_idxs, pos, size, comp = [f[k].tolist() for k in ["archive_idx", "pos", "size", "comp"]]
+        except Exception as exc:
+            print("FileArchiveBundle: cannot load index %r, ignoring: %s" % (index_file, exc), file=sys.stderr)
+            return False
+        archive_idx_map = [self._add_archive_filename(fn) for fn in archive_files]
+        self._entries.update(
+            (name, (archive_idx_map[a], p, s, c)) for name, a, p, s, c in zip(names, archive_idxs, pos, size, comp)
+        )
+        short_seg_names = {os.path.basename(n): n for n in names}
+        if len(short_seg_names) == len(names):
+            self._short_seg_names.update(short_seg_names)
+        return True
+
+    def _save_index(self, index_file, archive_files, encoding):
+        """
+        :param str index_file:
+        :param list[str] archive_files:
+        :param str encoding:
+        """
+        archive_idx_map = {self._archive_idx_by_filename[fn]: i for i, fn in enumerate(archive_files)}
+        entries = [(name, e) for name, e in self._entries.items() if e[0] in archive_idx_map]
+        tmp_file = "%s.tmp%i" % (index_file, os.getpid())
+        try:
+            os.makedirs(os.path.dirname(index_file) or ".", exist_ok=True)
+            with open(tmp_file, "wb") as f:
+                numpy.savez(
+                    f,
+                    key=numpy.array(self._get_index_key(archive_files, encoding)),
+                    names=numpy.array([name for name, _ in entries], dtype="U"),
+                    archive_idx=numpy.array([archive_idx_map[e[0]] for _, e in entries], dtype="int32"),
+                    pos=numpy.array([e[1] for _, e in entries], dtype="int64"),
+                    size=numpy.array([e[2] for _, e in entries], dtype="int64"),
+                    comp=numpy.array([e[3] for _, e in entries], dtype="int64"),
+                )
+            os.replace(tmp_file, index_file)
+        except OSError as exc:
+            print("FileArchiveBundle: cannot save index %r: %s" % (index_file, exc), file=sys.stderr)
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+
+    def _get_archive(self, archive_idx):
+        """
+        :param int archive_idx:
+        :return: opened archive, via the LRU pool
+        :rtype: FileArchive
+        """
+        a = self._open_archives.get(archive_idx)
+        if a is not None:
+            self._open_archives.move_to_end(archive_idx)
+            return a
+        a = FileArchive(
+            self.archive_filenames[archive_idx],
+            must_exists=True,
+            encoding=self.encoding,
+            read_file_info_table=False,
+        )
+        if self._allophones is not None:
+            a.allophones = self._allophones
+        self._put_open_archive(archive_idx, a)
+        return a
+
+    def _put_open_archive(self, archive_idx, archive):
+        """
+        :param int archive_idx:
+        :param FileArchive archive:
+        """
+        self._open_archives[archive_idx] = archive
+        while self.max_open_archives is not None and len(self._open_archives) > max(self.max_open_archives, 1):
+            _, a = self._open_archives.popitem(last=False)
+            a.close()
+
+    def _get_entry(self, filename):
+        """
+        :param str filename: the entry-name in the archive
+        :return: archive, file info
+        :rtype: (FileArchive, FileInfo)
+        """
+        if filename not in self._entries:
+            if filename in self._short_seg_names:
+                filename = self._short_seg_names[filename]
+        archive_idx, pos, size, comp = self._entries[filename]
+        return self._get_archive(archive_idx), FileInfo(filename, pos, size, comp, -1)
 
     def add_bundle_or_archive(self, filename, encoding="ascii"):
         """
@@ -623,14 +992,26 @@ class FileArchiveBundle:
         :rtype: list[str]
         :returns: list of content-filenames (which can be used for self.read())
         """
-        return self.files.keys()
+        return self._entries.keys()
 
     def has_entry(self, filename):
         """
         :param str filename: argument for self.read()
         :return: True if we have this entry
         """
-        return filename in self.files
+        return filename in self._entries
+
+    def get_file_info(self, filename):
+        """
+        :param str filename: the entry-name in the archive
+        :return: archive filename, file info (pos, size, compressed)
+        :rtype: (str, FileInfo)
+        """
+        if filename not in self._entries:
+            if filename in self._short_seg_names:
+                filename = self._short_seg_names[filename]
+        archive_idx, pos, size, comp = self._entries[filename]
+        return self.archive_filenames[archive_idx], FileInfo(filename, pos, size, comp, -1)
 
     def read(self, filename, typ):
         """
@@ -646,36 +1027,131 @@ class FileArchiveBundle:
 
         Uses FileArchive.read().
         """
-        if filename not in self.files:
-            if filename in self._short_seg_names:
-                filename = self._short_seg_names[filename]
-        return self.files[filename].read(filename, typ)
+        archive, fi = self._get_entry(filename)
+        return archive.read(fi.name, typ, file_info=fi)
+
+    def read_features(self, filename):
+        """
+        :param str filename: the entry-name in the archive
+        :return: (times, features), see :func:`FileArchive.read_features`
+        :rtype: (numpy.ndarray,numpy.ndarray)|None
+        """
+        archive, fi = self._get_entry(filename)
+        return archive.read_features(fi.name, file_info=fi)
+
+    def read_alignment(self, filename, raw=False):
+        """
+        :param str filename: the entry-name in the archive
+        :param bool raw:
+        :return: (times, allophones, states, weights), see :func:`FileArchive.read_alignment`
+        :rtype: (numpy.ndarray,numpy.ndarray,numpy.ndarray|None,numpy.ndarray)|None
+        """
+        archive, fi = self._get_entry(filename)
+        return archive.read_alignment(fi.name, raw=raw, file_info=fi)
 
     def set_allophones(self, filename):
         """
         :param str filename: allophone filename
         """
-        for a in self.archives.values():
-            a.set_allophones(filename)
+        allophones = []
+        for line in open(filename):
+            line = line.strip()
+            if line.startswith("#"):
+                continue
+            allophones.append(line)
+        self._allophones = allophones
+        for a in self._open_archives.values():
+            a.allophones = allophones
 
     def get_allophones_list(self) -> List[str]:
         """
         :return: list of allophones
         """
-        a = next(iter(self.archives.values()))
-        return a.get_allophones_list()
+        return self._allophones if self._allophones is not None else []
+
+
+class _FileArchiveBundleArchivesView(typing.Mapping[str, FileArchive]):
+    """
+    :attr:`FileArchiveBundle.archives`
+    """
+
+    def __init__(self, bundle):
+        """
+        :param FileArchiveBundle bundle:
+        """
+        self._bundle = bundle
+
+    def __getitem__(self, filename):
+        """
+        :param str filename: archive filename
+        :rtype: FileArchive
+        """
+        # noinspection PyProtectedMember
+        archive_idx = self._bundle._archive_idx_by_filename[filename]
+        # noinspection PyProtectedMember
+        return self._bundle._get_archive_with_file_info_table(archive_idx)
+
+    def __iter__(self):
+        return iter(self._bundle.archive_filenames)
+
+    def __len__(self):
+        return len(self._bundle.archive_filenames)
+
+    def __contains__(self, filename):
+        # noinspection PyProtectedMember
+        return filename in self._bundle._archive_idx_by_filename
+
+
+class _FileArchiveBundleFilesView(typing.Mapping[str, FileArchive]):
+    """
+    :attr:`FileArchiveBundle.files`
+    """
+
+    def __init__(self, bundle):
+        """
+        :param FileArchiveBundle bundle:
+        """
+        self._bundle = bundle
+
+    def __getitem__(self, filename):
+        """
+        :param str filename: entry name
+        :rtype: FileArchive
+        """
+        # noinspection PyProtectedMember
+        archive_idx = self._bundle._entries[filename][0]
+        # noinspection PyProtectedMember
+        return self._bundle._get_archive_with_file_info_table(archive_idx)
+
+    def __iter__(self):
+        # noinspection PyProtectedMember
+        return iter(self._bundle._entries)
+
+    def __len__(self):
+        # noinspection PyProtectedMember
+        return len(self._bundle._entries)
+
+    def __contains__(self, filename):
+        # noinspection PyProtectedMember
+        return filename in self._bundle._entries
 
 
-def open_file_archive(archive_filename, must_exists=True, encoding="ascii"):
+def open_file_archive(
+    archive_filename, must_exists=True, encoding="ascii", bundle_index_file=None, max_open_archives=64
+):
     """
     :param str archive_filename:
     :param bool must_exists:
     :param str encoding:
+    :param str|None bundle_index_file: for a bundle, see :class:`FileArchiveBundle`
+    :param int|None max_open_archives: for a bundle, see :class:`FileArchiveBundle`
     :rtype: FileArchiveBundle|FileArchive
     """
     if archive_filename.endswith(".bundle"):
         assert must_exists
-        return FileArchiveBundle(archive_filename, encoding=encoding)
+        return FileArchiveBundle(
+            archive_filename, encoding=encoding, index_file=bundle_index_file, max_open_archives=max_open_archives
+        )
     else:
         return FileArchive(archive_filename, must_exists=must_exists, encoding=encoding)
 
@@ -118,15 +118,15 @@ from __future__ import annotations
 import contextlib
 import sys
 import typing
-from typing import Optional, Dict
+from typing import Optional, Tuple, Dict
 
 from queue import Queue
-from threading import Thread, Condition
+from threading import Thread, Condition, Lock
 
 import numpy
 import tensorflow as tf
 
-from returnn.datasets.basic import Dataset, BatchSetGenerator
+from returnn.datasets.basic import Dataset, Batch, BatchSetGenerator
 from returnn.tensor import TensorDict
 from returnn.tf.network import ExternData
 import returnn.tf.compat as tf_compat
@@ -226,8 +226,12 @@ class FeedDictDataProvider(DataProviderBase):
     This class will fill all the placeholders used for training or forwarding or evaluation etc.
     of a :class:`returnn.tf.network.TFNetwork`.
 
-    It will run a background thread which reads the data from a dataset and puts it into a queue
+    It will run background threads which read the data from a dataset and put it into a queue
     when you call start_threads().
+    The data of a batch is fetched from the dataset in one go (via :func:`Dataset.get_data_batch`),
+    and the padded batch arrays are reused across batches (see :class:`_BatchBufferPool`).
+    With ``num_threads > 1``, the fetching is still sequential (as the dataset requires),
+    but the batch assembly (padding, copying) is done in parallel, and the batches are queued in order.
 
     In principle, this class can also be used independently of TensorFlow.
     """
@@ -240,6 +244,7 @@ class FeedDictDataProvider(DataProviderBase):
         enforce_min_len1: bool = False,
         capacity: int = 10,
         batch_slice: Optional[slice] = None,
+        num_threads: int = 1,
         **kwargs,
     ):
         """
@@ -248,6 +253,7 @@ class FeedDictDataProvider(DataProviderBase):
         :param enforce_min_len1:
         :param capacity:
         :param batch_slice: select a subset of the batches
+        :param num_threads: number of threads for the batch assembly
         :param extern_data:
         :param data_keys:
         """
@@ -256,34 +262,48 @@ class FeedDictDataProvider(DataProviderBase):
         self.batches = batches
         self.enforce_min_len1 = enforce_min_len1
         self.batch_slice = batch_slice
+        assert num_threads >= 1
+        self.num_threads = num_threads
         self.state_change_cond = Condition()
         self.queue = None  # type: typing.Optional[Queue]
         self.queue = Queue(maxsize=capacity)
-        self.thread = None  # type: typing.Optional[Thread]
+        self.threads = []  # type: typing.List[Thread]
         self.thread_finished = False
         self.cur_batch_idx = 0
         self.reached_end = False
+        self._buffer_pool = _BatchBufferPool()
+        # Buffers (from _buffer_pool) of the last batch returned by get_feed_dict.
+        self._last_buffers = None  # type: typing.Optional[typing.List[numpy.ndarray]]
+        self._fetch_lock = Lock()
+        self._num_fetched = 0  # protected by _fetch_lock
+        self._num_enqueued = 0  # protected by state_change_cond
+        self._num_threads_finished = 0  # protected by state_change_cond
+        self._thread_exception = False
 
     def start_threads(self, session):
         """
-        Start the thread.
+        Start the threads.
 
         :param tf.compat.v1.Session session:
         """
-        thread = Thread(target=self._thread_main, name="DataProvider thread")
-        thread.daemon = True  # Thread will close when parent quits.
-        thread.start()
-        self.thread = thread
+        for i in range(self.num_threads):
+            thread = Thread(
+                target=self._thread_main, name="DataProvider thread" + (" %i" % i if self.num_threads > 1 else "")
+            )
+            thread.daemon = True  # Thread will close when parent quits.
+            thread.start()
+            self.threads.append(thread)
 
     def stop_threads(self):
         """
-        Stop the thread.
+        Stop the threads.
         """
         self.coord.request_stop()
-        if self.thread:
+        if self.threads:
             self._flush_all_data()
-            self.thread.join()
-            self.thread = None
+            for thread in self.threads:
+                thread.join()
+            self.threads = []
         self.dataset.finish_epoch()
 
     def get_next_batch(self, *, consider_batch_slice: bool = False) -> Optional[Dict[str, numpy.ndarray]]:
@@ -296,7 +316,17 @@ class FeedDictDataProvider(DataProviderBase):
         :param consider_batch_slice:
         :returns: batch-data-value-dict or None. if not consider_batch_slice, will never be None
         """
-        # See EngineUtil.assign_dev_data() for reference.
+        batch = self._get_next_batch_def(consider_batch_slice=consider_batch_slice)
+        if batch is None:
+            return None
+        data, _ = self._assemble_batch(batch, self._fetch_batch_data(batch))
+        return data  # the buffers are not released, i.e. they stay valid
+
+    def _get_next_batch_def(self, *, consider_batch_slice: bool) -> Optional[Batch]:
+        """
+        :param consider_batch_slice:
+        :return: the next batch (without advancing), or None if it should be skipped due to the batch slice
+        """
         cur_batch_idx = self.cur_batch_idx
         (batch,) = self.batches.peek_next_n(1)
         self.cur_batch_idx += 1
@@ -311,9 +341,53 @@ class FeedDictDataProvider(DataProviderBase):
                 return None
             if step > 1 and (cur_batch_idx - start) % step != 0:
                 return None
-        from returnn.datasets.basic import Batch, shapes_for_batches
-
         assert isinstance(batch, Batch)
+        return batch
+
+    def _fetch_batch_data(self, batch: Batch) -> Dict[str, typing.List[typing.Any]]:
+        """
+        Loads the seqs of the batch and gets the raw data from the dataset.
+        This must be called in the order of the batches, as the dataset might free earlier seqs.
+
+        :param batch:
+        :return: data key -> per seq in batch.seqs, the raw data (or None if not needed), and "seq_tag"
+        """
+        self.dataset.load_seqs(batch.start_seq, batch.end_seq)
+        res = {}  # type: Dict[str,typing.List[typing.Any]]
+        with self.dataset.lock or contextlib.nullcontext():
+            for k in self.data_keys:
+                # Some special cases first, such as "seq_idx" and "seq_tag".
+                # See also :func:`TFNetwork.get_extern_data`.
+                if k in ["seq_idx", "seq_tag"]:
+                    continue  # handled below. will always be added
+                if self._exclude_data_key(k):
+                    continue
+                data_ = self.extern_data.data[k]
+                # Do not rely on time_dim_axis but check for any dynamic axes.
+                dyn_axes = data_.get_dynamic_axes()
+                assert len(dyn_axes) <= 1, f"unexpected dynamic axes in data {k!r} {data_}"
+                seq_indices = [
+                    i for i, seq in enumerate(batch.seqs) if not dyn_axes or seq.frame_length.get(k) not in [0, None]
+                ]
+                values = self.dataset.get_data_batch([batch.seqs[i].seq_idx for i in seq_indices], k)
+                res[k] = [None] * len(batch.seqs)
+                for i, v in zip(seq_indices, values):
+                    res[k][i] = v
+            res["seq_tag"] = [self.dataset.get_tag(seq.seq_idx) for seq in batch.seqs]
+        return res
+
+    def _assemble_batch(
+        self, batch: Batch, raw: Dict[str, typing.List[typing.Any]]
+    ) -> Tuple[Dict[str, typing.Any], typing.List[numpy.ndarray]]:
+        """
+        :param batch:
+        :param raw: from :func:`_fetch_batch_data`
+        :return: batch-data-value-dict, and the buffers from :class:`_BatchBufferPool` used in it
+        """
+        # See EngineUtil.assign_dev_data() for reference.
+        from returnn.datasets.basic import shapes_for_batches
+        from returnn.util.basic import slice_pad_zeros
+
         # In Returnn with Theano, we usually have the shape (time,batch,feature).
         # In TensorFlow, the default is (batch,time,feature).
         # This is also what we use here, i.e. batch_dim_first=True.
@@ -322,10 +396,11 @@ class FeedDictDataProvider(DataProviderBase):
             [batch], data_keys=self.data_keys, extern_data=self.extern_data, enforce_min_len1=self.enforce_min_len1
         )
         data = {
-            k: numpy.zeros(shape=shapes[k], dtype=self.extern_data.data[k].dtype)
+            k: self._buffer_pool.get_zeros(shapes[k], dtype=self.extern_data.data[k].dtype)
             for k in self.data_keys
             if self.extern_data.data[k].dtype != "string"
         }
+        buffers = list(data.values())
         # Numpy cannot handle "string" dtype. Just make it a list[str], which is what TF can handle.
         data.update({k: [""] * batch.num_slices for k in self.data_keys if self.extern_data.data[k].dtype == "string"})
         data.update({"seq_idx": [-1] * batch.num_slices, "seq_tag": [""] * batch.num_slices})
@@ -334,55 +409,42 @@ class FeedDictDataProvider(DataProviderBase):
             for k in self.data_keys
             if self.extern_data.data[k].get_dynamic_axes()
         }
-        self.dataset.load_seqs(batch.start_seq, batch.end_seq)
-        from returnn.util.basic import slice_pad_zeros
-
-        with self.dataset.lock or contextlib.nullcontext():
-            for seq in batch.seqs:
-                o = seq.batch_frame_offset
-                q = seq.batch_slice
-                length = seq.frame_length
-                # input-data, input-index will also be set in this loop. That is data-key "data".
-                for k in self.data_keys:
-                    # Some special cases first, such as "seq_idx" and "seq_tag".
-                    # See also :func:`TFNetwork.get_extern_data`.
-                    if k in ["seq_idx", "seq_tag"]:
-                        continue  # handled below. will always be added
-                    if self._exclude_data_key(k):
-                        continue
-                    data_ = self.extern_data.data[k]
-                    # Do not rely on time_dim_axis but check for any dynamic axes.
-                    dyn_axes = data_.get_dynamic_axes()
-                    assert len(dyn_axes) <= 1, f"unexpected dynamic axes in data {k!r} {data_}"
-                    if dyn_axes:
-                        if length.get(k) in [0, None]:
-                            continue
-                    v = self.dataset.get_data(seq.seq_idx, k)
-                    if dyn_axes:
-                        v = slice_pad_zeros(v, begin=seq.seq_start_frame[k], end=seq.seq_end_frame[k])
-                        ls = v.shape[0]
-                        if ls != length[k]:
-                            raise Exception(
-                                "got shape[0]: %i, expected: %i, start/end: %r/%r, seq_idx: %i, seq len: %r"
-                                % (
-                                    ls,
-                                    length[k],
-                                    seq.seq_start_frame,
-                                    seq.seq_end_frame,
-                                    seq.seq_idx,
-                                    self.dataset.get_seq_length(seq.seq_idx),
-                                )
+        for i, seq in enumerate(batch.seqs):
+            o = seq.batch_frame_offset
+            q = seq.batch_slice
+            length = seq.frame_length
+            # input-data, input-index will also be set in this loop. That is data-key "data".
+            for k, values in raw.items():
+                if k == "seq_tag":
+                    continue
+                v = values[i]
+                if v is None:
+                    continue
+                if k in seq_lens:
+                    v = slice_pad_zeros(v, begin=seq.seq_start_frame[k], end=seq.seq_end_frame[k])
+                    ls = v.shape[0]
+                    if ls != length[k]:
+                        raise Exception(
+                            "got shape[0]: %i, expected: %i, start/end: %r/%r, seq_idx: %i, seq len: %r"
+                            % (
+                                ls,
+                                length[k],
+                                seq.seq_start_frame,
+                                seq.seq_end_frame,
+                                seq.seq_idx,
+                                self.dataset.get_seq_length(seq.seq_idx),
                             )
-                        data[k][q, o[k] : o[k] + ls] = v
-                        seq_lens[k][q] = max(seq_lens[k][q], o[k] + ls)
-                    else:  # no time-axis
-                        data[k][q] = v
-                data["seq_idx"][q] = seq.seq_idx
-                data["seq_tag"][q] = self.dataset.get_tag(seq.seq_idx)
+                        )
+                    data[k][q, o[k] : o[k] + ls] = v
+                    seq_lens[k][q] = max(seq_lens[k][q], o[k] + ls)
+                else:  # no time-axis
+                    data[k][q] = v
+            data["seq_idx"][q] = seq.seq_idx
+            data["seq_tag"][q] = raw["seq_tag"][i]
         for k in seq_lens.keys():
             data["%s_seq_lens" % k] = seq_lens[k]
         data["batch_dim"] = batch.num_slices
-        return data
+        return data, buffers
 
     def _thread_main(self):
         try:
@@ -390,24 +452,43 @@ class FeedDictDataProvider(DataProviderBase):
 
             better_exchook.install()
 
-            while self.batches.has_more() and not self.coord.should_stop():
-                enqueue_args = self.get_next_batch(consider_batch_slice=True)
+            while not self.coord.should_stop():
+                with self._fetch_lock:
+                    if not self.batches.has_more():
+                        break
+                    batch_idx = self._num_fetched
+                    self._num_fetched += 1
+                    batch = self._get_next_batch_def(consider_batch_slice=True)
+                    raw = self._fetch_batch_data(batch) if batch is not None else None
+                    self.batches.advance(1)
+                enqueue_args = self._assemble_batch(batch, raw) if batch is not None else None
+                with self.state_change_cond:
+                    # Keep the order of the batches.
+                    while self._num_enqueued != batch_idx and not self._thread_exception:
+                        self.state_change_cond.wait()
+                    if self._thread_exception:
+                        break
                 if enqueue_args is not None:
                     self.queue.put(enqueue_args)
                 with self.state_change_cond:
-                    self.state_change_cond.notifyAll()
-                self.batches.advance(1)
+                    self._num_enqueued += 1
+                    self.state_change_cond.notify_all()
 
-            self.reached_end = not self.batches.has_more()
+            with self._fetch_lock:
+                self.reached_end = not self.batches.has_more()
 
         except Exception as exc:
             print("Exception in DataProvider thread: %r" % exc, file=log.v1)
             sys.excepthook(*sys.exc_info())
+            with self.state_change_cond:
+                self._thread_exception = True
 
         finally:
             with self.state_change_cond:
-                self.thread_finished = True
-                self.state_change_cond.notifyAll()
+                self._num_threads_finished += 1
+                if self._num_threads_finished == self.num_threads:
+                    self.thread_finished = True
+                self.state_change_cond.notify_all()
 
     def have_more_data(self, session):
         """
@@ -424,7 +505,7 @@ class FeedDictDataProvider(DataProviderBase):
                     return True
                 if self.thread_finished:
                     return False
-                if not self.thread.is_alive:
+                if not any(thread.is_alive() for thread in self.threads):
                     return False
                 # The thread is alive and working. Wait for a change.
                 self.state_change_cond.wait()
@@ -446,19 +527,29 @@ class FeedDictDataProvider(DataProviderBase):
         Note that this will block if there is nothing in the queue.
         The queue gets filled by the other thread, via self.thread_main().
 
+        The arrays in the returned feed dict are reused for later batches (see :class:`_BatchBufferPool`),
+        i.e. they are only valid until the next call of this function.
+        Copy them if you need them for longer.
+
         :param bool single_threaded: whether to not use the queue
         :returns: we dequeue one batch from the queue and provide it for all placeholders of our external data,
           and additionally return some meta information.
         :rtype: (dict[tf.Tensor,numpy.ndarray],dict[str])
         """
+        if self._last_buffers is not None:
+            # The previous batch was consumed (session.run() is done), so we can reuse its buffers.
+            self._buffer_pool.release(self._last_buffers)
+            self._last_buffers = None
         if single_threaded:
             assert self.batches.has_more()
             assert self.batch_slice is None
-            output = self.get_next_batch(consider_batch_slice=False)
+            batch = self._get_next_batch_def(consider_batch_slice=False)
+            output, buffers = self._assemble_batch(batch, self._fetch_batch_data(batch))
             self.batches.advance(1)
         else:
-            output = self.queue.get()
+            output, buffers = self.queue.get()
         assert isinstance(output, dict)
+        self._last_buffers = buffers
         # The data itself.
         d = {self.extern_data.data[k].placeholder: output[k] for k in self.data_keys if not self._exclude_data_key(k)}
         # And seq lengths info.
@@ -507,6 +598,52 @@ class FeedDictDataProvider(DataProviderBase):
         return self.batches.completed_frac()
 
 
+class _BatchBufferPool:
+    """
+    Pool of numpy arrays for the padded batch data, reused across batches,
+    to avoid the allocation (and page faults) of large arrays for every batch.
+    A buffer is only reused after it was released, i.e. after the batch was consumed.
+    Thread-safe.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._free = {}  # type: Dict[numpy.dtype,typing.List[numpy.ndarray]]  # flat arrays
+
+    def get_zeros(self, shape: typing.Sequence[int], *, dtype: str) -> numpy.ndarray:
+        """
+        :param shape:
+        :param dtype:
+        :return: zero-filled array, like ``numpy.zeros(shape, dtype)``. release via :func:`release`
+        """
+        dtype = numpy.dtype(dtype)
+        size = int(numpy.prod(shape))
+        buf = None
+        with self._lock:
+            free = self._free.get(dtype)
+            if free:
+                # Take the smallest one which is large enough. Otherwise, drop the smallest one.
+                free.sort(key=lambda a: a.size)
+                idx = next((i for i, a in enumerate(free) if a.size >= size), None)
+                buf = free.pop(idx if idx is not None else 0)
+                if buf.size < size:
+                    buf = None
+        if buf is None:
+            return numpy.zeros(shape, dtype=dtype)
+        res = buf[:size].reshape(shape)
+        res.fill(0)
+        return res
+
+    def release(self, arrays: typing.Sequence[numpy.ndarray]):
+        """
+        :param arrays: from :func:`get_zeros`. must not be used anymore afterwards
+        """
+        with self._lock:
+            for a in arrays:
+                owner = a.base if a.base is not None else a  # the contiguous array owning the memory
+                self._free.setdefault(owner.dtype, []).append(owner.reshape(-1))
+
+
 class InputContext(object):
     """
     This object will be passed to the dataset pipeline function
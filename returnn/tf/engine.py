@@ -2189,6 +2189,7 @@ class Engine(EngineBase):
                 batches=batches,
                 batch_slice=batch_slice,
                 enforce_min_len1=self.config.is_true("enforce_min_len1", False),
+                num_threads=self.config.int("data_provider_num_threads", 1),
             )
             return data_provider
 
@@ -2311,7 +2312,9 @@ class Engine(EngineBase):
         else:
             assert not os.path.exists(output_file)
         print("Forward output:", output, file=log.v3)
-        writer = SimpleHDFWriter(filename=output_file, dim=output.dim, ndim=output.ndim, labels=labels)
+        # E.g. {"write_thread": True} to write in the background while the next batch is computed.
+        writer_opts = self.config.typed_value("forward_hdf_writer_opts", None) or {}
+        writer = SimpleHDFWriter(filename=output_file, dim=output.dim, ndim=output.ndim, labels=labels, **writer_opts)
 
         def extra_fetches_cb(inputs, seq_tag, **kwargs):
             """
@@ -2909,12 +2912,20 @@ class Engine(EngineBase):
         Starts a web-server with a simple API to forward data through the network
         (or search if the flag is set).
 
+        Concurrent requests are batched together dynamically,
+        see :class:`returnn.engine.batching_server.DynamicBatcher`,
+        configured via ``web_server_max_batch_size`` (default 1, i.e. no batching)
+        and ``web_server_max_wait_time`` (in seconds).
+        Throughput and latency stats are available via GET ``/stats``.
+
         :param int port: for the http server
         :return:
         """
         assert sys.version_info[0] >= 3, "only Python 3 supported"
         # noinspection PyCompatibility
-        from http.server import HTTPServer, BaseHTTPRequestHandler
+        from http.server import BaseHTTPRequestHandler
+        from returnn.engine.batching_server import DynamicBatcher, BatchingHTTPServer
+        from returnn.engine.batching_server import get_dynamic_batcher_opts_from_config
         from returnn.datasets.generating import StaticDataset
         from returnn.datasets.util.feature_extraction import ExtractAudioFeatures
         from returnn.datasets.util.vocabulary import Vocabulary, BytePairEncoding
@@ -2971,9 +2982,50 @@ class Engine(EngineBase):
             print("Given output %r has beam size %i." % (output_layer, out_beam_size), file=log.v1)
             output_layer_beam_scores_t = output_layer.get_search_choices().beam_scores
 
+        def _process_batch(inputs):
+            """
+            :param list[numpy.ndarray] inputs: input features per request, sorted by length
+            :return: per request: (output, seq_lens, beam_scores), without batch dim
+            :rtype: list[(numpy.ndarray,numpy.ndarray,numpy.ndarray|None)]
+            """
+            targets = numpy.array([], dtype="int32")  # empty...
+            dataset = StaticDataset(
+                data=[{input_data.name: features, output_data.name: targets} for features in inputs],
+                output_dim=num_outputs,
+            )
+            dataset.init_seq_order(epoch=1)
+            output_d = engine.run_single(
+                dataset=dataset,
+                seq_idx=-1,  # all seqs, i.e. the whole batch
+                output_dict={
+                    "output": output_t,
+                    "seq_lens": output_seq_lens_t,
+                    "beam_scores": output_layer_beam_scores_t,
+                },
+            )
+            output = output_d["output"]
+            seq_lens = output_d["seq_lens"]
+            beam_scores = output_d["beam_scores"]
+            beam = out_beam_size or 1
+            assert len(output) == len(seq_lens) == len(inputs) * beam
+            if out_beam_size:
+                assert beam_scores.shape == (len(inputs), out_beam_size)  # (batch, beam)
+            return [
+                (
+                    output[i * beam : (i + 1) * beam],
+                    seq_lens[i * beam : (i + 1) * beam],
+                    beam_scores[i] if out_beam_size else None,
+                )
+                for i in range(len(inputs))
+            ]
+
+        batcher = DynamicBatcher(_process_batch, name="Search", **get_dynamic_batcher_opts_from_config(self.config))
+
         class Handler(BaseHTTPRequestHandler):
             """
             Handle POST requests.
+            Each request is handled in its own thread,
+            and the search itself is done by the batcher, potentially batched together with other requests.
             """
 
             # noinspection PyPep8Naming
@@ -3020,35 +3072,17 @@ class Engine(EngineBase):
                     seq = input_vocab.get_seq(sentence)
                     print("Input seq:", input_vocab.get_seq_labels(seq), file=log.v4)
                     features = numpy.array(seq, dtype="int32")
-                targets = numpy.array([], dtype="int32")  # empty...
-                dataset = StaticDataset(
-                    data=[{input_data.name: features, output_data.name: targets}], output_dim=num_outputs
-                )
-                dataset.init_seq_order(epoch=1)
 
-                self.send_response(200)
-                self.send_header("Content-type", "text/plain")
-                self.end_headers()
                 start_time = time.time()
-                output_d = engine.run_single(
-                    dataset=dataset,
-                    seq_idx=0,
-                    output_dict={
-                        "output": output_t,
-                        "seq_lens": output_seq_lens_t,
-                        "beam_scores": output_layer_beam_scores_t,
-                    },
-                )
+                output, seq_lens, beam_scores = batcher.process(features)
                 delta_time = time.time() - start_time
-                print("Took %.3f secs for decoding." % delta_time, file=log.v4)
+                print("Took %.3f secs for decoding (including queueing)." % delta_time, file=log.v4)
                 if audio_len:
                     print("Real-time-factor: %.3f" % (delta_time / audio_len), file=log.v4)
-                output = output_d["output"]
-                seq_lens = output_d["seq_lens"]
-                beam_scores = output_d["beam_scores"]
-                assert len(output) == len(seq_lens) == (out_beam_size or 1)
-                if out_beam_size:
-                    assert beam_scores.shape == (1, out_beam_size)  # (batch, beam)
+
+                self.send_response(200)
+                self.send_header("Content-type", "text/plain")
+                self.end_headers()
 
                 first_best_txt = output_vocab.get_seq_labels(output[0][: seq_lens[0]])
                 print("Best output: %s" % first_best_txt, file=log.v4)
@@ -3057,17 +3091,17 @@ class Engine(EngineBase):
                     self.wfile.write(b"[\n")
                     for i in range(out_beam_size):
                         txt = output_vocab.get_seq_labels(output[i][: seq_lens[i]])
-                        score = beam_scores[0][i]
+                        score = beam_scores[i]
                         self.wfile.write(("(%r, %r)\n" % (score, txt)).encode("utf8"))
                     self.wfile.write(b"]\n")
 
                 else:
                     self.wfile.write(("%r\n" % first_best_txt).encode("utf8"))
 
-        print("Simple search web server, listening on port %i." % port, file=log.v2)
-        server_address = ("", port)
         # noinspection PyAttributeOutsideInit
-        self.httpd = HTTPServer(server_address, Handler)
+        self.httpd = BatchingHTTPServer(
+            port=port, handler_cls=Handler, batcher=batcher, name="Simple search web server"
+        )
         self.httpd.serve_forever()
 
 
@@ -480,6 +480,20 @@ class ReturnnLayersBackend(Backend[Layer]):
             name="ctc_loss",
         )
 
+    @staticmethod
+    def edit_distance(a: Tensor, a_spatial_dim: Dim, b: Tensor, b_spatial_dim: Dim) -> Tensor:
+        """edit distance"""
+        return rfl.make_layer(
+            {
+                "class": "edit_distance",
+                "a": a,
+                "b": b,
+                "a_spatial_dim": a_spatial_dim,
+                "b_spatial_dim": b_spatial_dim,
+            },
+            name="edit_distance",
+        )
+
     @staticmethod
     def create_parameter_raw(tensor: rf.Parameter, *, device: Optional[str] = None) -> Layer:
         """create parameter"""
@@ -0,0 +1,79 @@
+"""
+Data iterator which prefetches the next batch to the device
+"""
+
+from __future__ import annotations
+
+from typing import Optional, Union, Iterator, Iterable, Dict
+from contextlib import nullcontext
+import numpy
+import torch
+
+
+RawDictT = Dict[str, Union[torch.Tensor, numpy.ndarray]]
+
+
+class DevicePrefetchDataIter:
+    """
+    Wraps another iterator over raw dicts (e.g. the DataLoader, via collate_batch),
+    and copies the tensors to the device.
+    The next batch is already fetched and copied while the current batch is used.
+
+    On CUDA, the copy is done with ``non_blocking=True`` on a separate CUDA stream,
+    such that it can overlap with the computation of the current step.
+    For this to be really asynchronous, the tensors should be in pinned memory
+    (e.g. via ``pin_memory=True`` for the DataLoader).
+    On other devices (e.g. CPU), this just does a normal copy (which is a no-op on CPU).
+
+    The sequence lengths (``<key>:seq_len``) are kept on CPU, as expected by :func:`raw_dict_to_extern_data`.
+    """
+
+    def __init__(
+        self, original_iter: Union[Iterable[RawDictT], Iterator[RawDictT]], *, device: Union[str, torch.device]
+    ):
+        self._iter = iter(original_iter)
+        self._device = torch.device(device)
+        self._stream = None  # type: Optional[torch.cuda.Stream]
+        if self._device.type == "cuda":
+            self._stream = torch.cuda.Stream(device=self._device)
+        self._next = None  # type: Optional[RawDictT]
+        self._finished = False
+        self._prefetch()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> RawDictT:
+        if self._next is None:
+            assert self._finished
+            raise StopIteration
+        res = self._next
+        if self._stream is not None:
+            # Make sure the copy is finished before the data is used on the current stream,
+            # and that the memory is not reused by the caching allocator while it is still used there.
+            cur_stream = torch.cuda.current_stream(self._device)
+            cur_stream.wait_stream(self._stream)
+            for v in res.values():
+                if isinstance(v, torch.Tensor) and v.device.type == "cuda":
+                    v.record_stream(cur_stream)
+        self._next = None
+        self._prefetch()
+        return res
+
+    def _prefetch(self):
+        if self._finished:
+            return
+        try:
+            raw = next(self._iter)
+        except StopIteration:
+            self._finished = True
+            return
+        with torch.no_grad(), (torch.cuda.stream(self._stream) if self._stream is not None else nullcontext()):
+            self._next = {
+                k: (
+                    v.to(self._device, non_blocking=self._stream is not None)
+                    if isinstance(v, torch.Tensor) and not k.endswith(":seq_len")
+                    else v
+                )
+                for k, v in raw.items()
+            }
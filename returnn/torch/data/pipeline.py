@@ -19,7 +19,8 @@ other PyTorch datasets more directly, including also HuggingFace datasets.
 """
 
 from __future__ import annotations
-from typing import Optional, Any, Union, List, Dict, Callable
+from typing import Optional, Any, Union, Tuple, List, Dict, Callable
+import functools
 import sys
 from copy import deepcopy
 
@@ -27,7 +28,13 @@ import numpy
 import torch
 import torch.utils.data
 
+from returnn.log import log
 from returnn.util.basic import NumbersDict
+from .returnn_dataset_wrapper import SeqIdxKey, SkipChunksKey
+
+# Extra keys in the data dicts, added by ChunkingIterDataPipe, when the seq idx (SeqIdxKey) is given.
+ChunkIdxKey = ":chunk_idx"
+NumChunksKey = ":num_chunks"
 
 
 def create_tensor(array: numpy.ndarray) -> Union[torch.Tensor, numpy.ndarray]:
@@ -47,9 +54,22 @@ def create_tensor(array: numpy.ndarray) -> Union[torch.Tensor, numpy.ndarray]:
     return torch.tensor(array)
 
 
-def collate_batch(batch: List[Dict[str, numpy.ndarray]]) -> Dict[str, Union[torch.Tensor, numpy.ndarray]]:
+def collate_batch(
+    batch: List[Dict[str, numpy.ndarray]], *, pin_memory: bool = False
+) -> Dict[str, Union[torch.Tensor, numpy.ndarray]]:
     """
-    :param batch:
+    Merges the sequences of a batch into one padded array per data key (batch-major),
+    plus ``<key>:seq_len`` for keys with a time axis (the first axis).
+
+    For every data key, one output buffer of the padded shape is allocated,
+    and every sequence is copied into it exactly once.
+    Dtypes which are not supported by PyTorch are converted as in :func:`create_tensor`.
+    Extra keys starting with ":" (e.g. :data:`SeqIdxKey`) are kept as Numpy arrays.
+
+    :param batch: list of sequences, each a dict data_key -> array
+    :param pin_memory: allocate the tensors in pinned memory,
+        such that the copy to the GPU can be asynchronous.
+        The DataLoader ``pin_memory`` option would do this as well, but with another copy.
     """
     assert isinstance(batch, list)
     assert batch, "batch is empty?"
@@ -58,27 +78,92 @@ def collate_batch(batch: List[Dict[str, numpy.ndarray]]) -> Dict[str, Union[torc
 
     res = {}
     for key in data_keys:
-        ls = [create_tensor(sample[key]) for sample in batch]
-        if not ls:
-            raise ValueError("batch is empty?")
-        if isinstance(ls[0], torch.Tensor):
-            if ls[0].ndim > 0:
-                padded = torch.nn.utils.rnn.pad_sequence(ls, batch_first=True, padding_value=0)
-                res[key] = padded
-                res["%s:seq_len" % key] = torch.tensor([v.shape[0] for v in ls], dtype=torch.int32)
-            else:
-                res[key] = torch.stack(ls, dim=0)
-        elif isinstance(ls[0], numpy.ndarray):
-            padded = numpy.stack(ls, axis=0)
+        ls = [sample[key] for sample in batch]
+        dtype = _get_torch_compatible_numpy_dtype(ls[0].dtype)
+        if dtype is None or key.startswith(":"):  # string (unicode) or object, e.g. seq_tag, or extra key
+            res[key] = numpy.stack(ls, axis=0)
+            continue
+        if ls[0].ndim > 0:
+            seq_lens = numpy.array([v.shape[0] for v in ls], dtype=numpy.int32)
+            feature_shape = ls[0].shape[1:]
+            for v in ls:
+                if v.shape[1:] != feature_shape:
+                    raise ValueError(f"collate_batch: key {key!r}, shape mismatch {v.shape} vs {ls[0].shape}")
+            max_len = int(seq_lens.max())
+            padded, padded_np = _alloc_buffer((len(ls), max_len) + feature_shape, dtype, pin_memory=pin_memory)
+            for i, (v, seq_len) in enumerate(zip(ls, seq_lens.tolist())):
+                padded_np[i, :seq_len] = v
+                padded_np[i, seq_len:] = 0
             res[key] = padded
+            res["%s:seq_len" % key] = torch.from_numpy(seq_lens)
+        else:
+            stacked, stacked_np = _alloc_buffer((len(ls),), dtype, pin_memory=pin_memory)
+            stacked_np[:] = ls
+            res[key] = stacked
 
     return res
 
 
+def _get_torch_compatible_numpy_dtype(dtype: numpy.dtype) -> Optional[numpy.dtype]:
+    """
+    :return: the dtype to use for the tensor (see :func:`create_tensor`), or None if it should stay a numpy array
+    """
+    if dtype.kind in "UO":  # string (unicode) or object
+        return None
+    if dtype == numpy.uint32:
+        return numpy.dtype(numpy.int64)
+    if dtype == numpy.uint16:
+        return numpy.dtype(numpy.int32)
+    return dtype
+
+
+def _alloc_buffer(
+    shape: Tuple[int, ...], dtype: numpy.dtype, *, pin_memory: bool = False
+) -> Tuple[torch.Tensor, numpy.ndarray]:
+    """
+    :return: uninitialized tensor and a numpy array which shares its memory
+    """
+    if pin_memory:
+        tensor = torch.empty(shape, dtype=_numpy_to_torch_dtype(dtype), pin_memory=True)
+        return tensor, tensor.numpy()
+    array = numpy.empty(shape, dtype=dtype)
+    return torch.from_numpy(array), array
+
+
+def _numpy_to_torch_dtype(dtype: numpy.dtype) -> torch.dtype:
+    return torch.from_numpy(numpy.empty((0,), dtype=dtype)).dtype
+
+
+def pop_data_position_after_batch(batch: Dict[str, Any]) -> Optional[Tuple[int, int]]:
+    """
+    Removes the position keys (:data:`SeqIdxKey` etc.) from the collated batch.
+    This assumes that the batch contains the seqs in order, e.g. via :class:`BatchingIterDataPipe`.
+
+    :param batch: from :func:`collate_batch`
+    :return: seq idx, chunk idx, where the iteration continues after this batch,
+        e.g. for :func:`ReturnnDatasetIterDataPipe.set_resume_position`,
+        or None if the seq idx is not given (``with_seq_idx`` of :class:`ReturnnDatasetIterDataPipe`)
+    """
+    seq_idxs = batch.pop(SeqIdxKey, None)
+    chunk_idxs = batch.pop(ChunkIdxKey, None)
+    nums_chunks = batch.pop(NumChunksKey, None)
+    if seq_idxs is None:
+        return None
+    seq_idx = int(seq_idxs[-1])
+    if chunk_idxs is not None and int(chunk_idxs[-1]) + 1 < int(nums_chunks[-1]):
+        return seq_idx, int(chunk_idxs[-1]) + 1
+    return seq_idx + 1, 0
+
+
 class ChunkingIterDataPipe(torch.utils.data.IterDataPipe):
     """
     Splits each sequence in the given dataset into chunks according to the 'chunking' config option.
     So it transforms one sequences into multiple sequences.
+
+    If the seq idx is given (:data:`SeqIdxKey`), the chunk idx and the number of chunks of the seq
+    are added to each chunk (:data:`ChunkIdxKey`, :data:`NumChunksKey`),
+    such that the position can be tracked for resuming.
+    The first chunks of a seq are skipped when requested via :data:`SkipChunksKey`.
     """
 
     def __init__(self, dataset: torch.utils.data.IterableDataset, chunking, *, min_chunk_size=0):
@@ -119,8 +204,13 @@ class ChunkingIterDataPipe(torch.utils.data.IterDataPipe):
                 for key in chunking_data_key_black_list:
                     if key in chunking_data_keys:
                         chunking_data_keys.remove(key)
+                chunking_data_keys = [key for key in chunking_data_keys if not key.startswith(":")]
                 assert chunking_data_keys, "Dataset produced sequence without any data."
 
+            skip_chunks = 0
+            if SkipChunksKey in data_dict:
+                data_dict = dict(data_dict)
+                skip_chunks = int(data_dict.pop(SkipChunksKey))
             data_chunks = {}
             num_chunks = None
 
@@ -148,8 +238,11 @@ class ChunkingIterDataPipe(torch.utils.data.IterDataPipe):
             if num_chunks == 0:
                 continue
             assert num_chunks, "Bug: no chunk produced from current sequence."
-            for chunk_index in range(num_chunks):
+            for chunk_index in range(skip_chunks, num_chunks):
                 chunk_data = {data_key: data_chunks[data_key][chunk_index] for data_key in data_chunks.keys()}
+                if SeqIdxKey in data_dict:
+                    chunk_data[ChunkIdxKey] = numpy.array(chunk_index, dtype=numpy.int64)
+                    chunk_data[NumChunksKey] = numpy.array(num_chunks, dtype=numpy.int64)
 
                 # If chunking is configured using a dict,
                 # i.e. with explicit data keys, there might be remaining data keys
@@ -254,6 +347,152 @@ class BatchingIterDataPipe(torch.utils.data.IterDataPipe):
             yield current_batch
 
 
+# noinspection PyAbstractClass
+class BucketBatchingIterDataPipe(torch.utils.data.IterDataPipe):
+    """
+    Like :class:`BatchingIterDataPipe`, but minimizes the padding:
+    Sequences are collected in a buffer of ``buffer_size`` sequences,
+    which is sorted by sequence length (ties broken randomly),
+    and then cut into batches of sequences of similar length (i.e. length buckets)
+    according to the 'max_tokens' and 'max_seqs' batch size limits.
+    The batches of one buffer are emitted in random order.
+    The randomness is seeded by ``seed`` and the epoch, so it is deterministic.
+
+    At the end of each epoch, the achieved padding ratio is printed,
+    i.e. the fraction of padding frames in all batches.
+    """
+
+    def __init__(
+        self,
+        dataset: torch.utils.data.IterableDataset,
+        batch_size=1,
+        max_seqs=None,
+        *,
+        buffer_size: int = 1000,
+        shuffle: bool = True,
+        seed: int = 0,
+        epoch_mp_shared: Optional[torch.multiprocessing.Value] = None,
+    ):
+        """
+        :param dataset: dataset to apply batching to
+        :param int|dict[str,int]|None batch_size: Maximum number of time steps (e.g. audio frames / words) in one
+            batch (padding included).
+            If given as a dict data_key -> value, sets different individual limits per data key.
+            If None, no limit.
+        :param int|None max_seqs: maximum number of sequences in a batch,
+            None means unlimited (also -1 to match TF backend)
+        :param buffer_size: number of sequences which are collected and sorted before they are cut into batches
+        :param shuffle: whether to break ties randomly and to shuffle the batches of one buffer.
+            Otherwise, the batches of one buffer are emitted from short to long.
+        :param seed: random seed, combined with the epoch
+        :param epoch_mp_shared: the current epoch, also shared with worker processes.
+            If not given, we count the epochs (calls to ``__iter__``) ourselves, starting at epoch 1.
+        """
+        super().__init__()
+        self._dataset = dataset
+        self._max_batch_size = NumbersDict(sys.maxsize if batch_size is None else batch_size)
+        self._max_seqs = sys.maxsize if (max_seqs is None or max_seqs == -1) else max_seqs
+        self._buffer_size = buffer_size
+        self._shuffle = shuffle
+        self._seed = seed
+        self._epoch_mp_shared = epoch_mp_shared
+        self._epoch_counter = 0
+
+        assert self._max_batch_size.min_value() > 0
+        assert self._max_seqs > 0
+        assert self._buffer_size > 0
+
+    def _get_max_batch_size(self, data_key: str) -> int:
+        if data_key in self._max_batch_size.dict:
+            return self._max_batch_size.dict[data_key]
+        if self._max_batch_size.value is not None:
+            return self._max_batch_size.value
+        return sys.maxsize
+
+    def __iter__(self):
+        """
+        :return: generator providing batches in the form of lists of sequences, where each sequence is a dict
+          data_key -> data_array.
+        :rtype: Iterable[list[dict[str, numpy.ndarray]]]
+        """
+        if self._epoch_mp_shared is not None:
+            epoch = self._epoch_mp_shared.value
+        else:
+            self._epoch_counter += 1
+            epoch = self._epoch_counter
+        rnd = numpy.random.RandomState(((self._seed * 1000003) + epoch) % (2**32))
+        stats = {"num_batches": 0, "num_seqs": 0, "num_frames": 0, "num_padded_frames": 0}
+
+        buffer = []
+        for data_dict in self._dataset:
+            buffer.append(data_dict)
+            if len(buffer) >= self._buffer_size:
+                yield from self._make_batches(buffer, rnd=rnd, stats=stats)
+                buffer = []
+        if buffer:
+            yield from self._make_batches(buffer, rnd=rnd, stats=stats)
+
+        if stats["num_padded_frames"]:
+            padding_ratio = 1.0 - stats["num_frames"] / stats["num_padded_frames"]
+            print(
+                f"{self.__class__.__name__}, epoch {epoch}: {stats['num_batches']} batches,"
+                f" {stats['num_seqs']} seqs, padding ratio {padding_ratio:.2%}",
+                file=log.v4,
+            )
+
+    def _make_batches(
+        self, buffer: List[Dict[str, numpy.ndarray]], *, rnd: numpy.random.RandomState, stats: Dict[str, int]
+    ) -> List[List[Dict[str, numpy.ndarray]]]:
+        # TODO: This assumes all data has time as first dimension. Currently we can't know better..
+        data_keys = [data_key for data_key, data in buffer[0].items() if data.shape]
+        if not data_keys:
+            lens = numpy.ones((len(buffer), 1), dtype=numpy.int64)
+            max_batch_sizes = [sys.maxsize]
+        else:
+            lens = numpy.array(
+                [[data_dict[key].shape[0] for key in data_keys] for data_dict in buffer], dtype=numpy.int64
+            )
+            max_batch_sizes = [self._get_max_batch_size(key) for key in data_keys]
+        # Sort by the lengths of all the data keys, where the first data key is the primary sort key.
+        # lexsort uses the last key as primary key.
+        sort_keys = [lens[:, i] for i in reversed(range(lens.shape[1]))]
+        if self._shuffle:
+            sort_keys.insert(0, rnd.permutation(len(buffer)))
+        order = numpy.lexsort(sort_keys)
+        lens_sorted = lens[order].tolist()
+
+        batches = []  # list of (start, end) in the sorted order
+        start = 0
+        cur_max_lens = None
+        for i, seq_lens in enumerate(lens_sorted):
+            if cur_max_lens is not None:
+                num_seqs = i - start + 1
+                new_max_lens = [max(a, b) for a, b in zip(cur_max_lens, seq_lens)]
+                if num_seqs > self._max_seqs or any(
+                    max_len * num_seqs > max_batch_size
+                    for max_len, max_batch_size in zip(new_max_lens, max_batch_sizes)
+                ):
+                    batches.append((start, i))
+                    start = i
+                    cur_max_lens = seq_lens
+                else:
+                    cur_max_lens = new_max_lens
+            else:
+                cur_max_lens = seq_lens
+        batches.append((start, len(lens_sorted)))
+
+        lens_sorted = numpy.array(lens_sorted, dtype=numpy.int64)
+        for start, end in batches:
+            stats["num_frames"] += int(lens_sorted[start:end].sum())
+            stats["num_padded_frames"] += int(lens_sorted[start:end].max(axis=0).sum()) * (end - start)
+        stats["num_batches"] += len(batches)
+        stats["num_seqs"] += len(buffer)
+
+        if self._shuffle:
+            batches = [batches[i] for i in rnd.permutation(len(batches))]
+        return [[buffer[j] for j in order[start:end]] for start, end in batches]
+
+
 class LenFilterDataPipe(torch.utils.data.IterDataPipe):
     """
     Removes sequences which are either too long or too short from a dataset
@@ -298,10 +537,17 @@ class LenFilterDataPipe(torch.utils.data.IterDataPipe):
 
 
 def create_data_loader_from_batches(
-    batches_dataset: torch.utils.data.Dataset, loader_opts: Optional[Dict[str, Any]] = None
+    batches_dataset: torch.utils.data.Dataset,
+    loader_opts: Optional[Dict[str, Any]] = None,
+    *,
+    collate_fn: Optional[Callable[[Any], Dict[str, Any]]] = None,
 ) -> torch.utils.data.DataLoader:
     """
     Create DataLoader based on dataset over batches, e.g. via :class:`BatchingIterDataPipe`.
+
+    :param batches_dataset:
+    :param loader_opts: DataLoader options, e.g. from ``torch_dataloader_opts``
+    :param collate_fn: :func:`collate_batch` by default
     """
     if loader_opts is None:
         loader_opts: Dict[str, Any] = {}
@@ -328,9 +574,16 @@ def create_data_loader_from_batches(
                 process_pre_init_func=_DataLoaderWorkerPreInitFunc()
             )
 
+    if collate_fn is None:
+        collate_fn = collate_batch
+        if not loader_opts.get("num_workers") and loader_opts.get("pin_memory") and torch.cuda.is_available():
+            # Directly collate into pinned memory in the main process,
+            # then the DataLoader pin_memory does not need to copy again.
+            collate_fn = functools.partial(collate_batch, pin_memory=True)
+
     return torch.utils.data.DataLoader(
         batches_dataset,
-        collate_fn=collate_batch,
+        collate_fn=collate_fn,
         # Batching is already done by BatchingIterDataPipe.
         batch_size=None,
         # Explicitly not use the following opts, which are not supported and/or do not make sense
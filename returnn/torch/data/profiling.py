@@ -0,0 +1,292 @@
+"""
+Profiling of the data loading pipeline,
+and autotuning of the DataLoader worker settings (``num_workers``, ``prefetch_factor``).
+
+The pipeline stages (e.g. :class:`returnn.torch.data.returnn_dataset_wrapper.ReturnnDatasetIterDataPipe`,
+:class:`returnn.torch.data.pipeline.ChunkingIterDataPipe`, :class:`returnn.torch.data.pipeline.BatchingIterDataPipe`)
+can be wrapped by :class:`ProfiledIterDataPipe`, and the collate function by :class:`ProfiledCollateFn`.
+These run in the DataLoader worker processes (or in the main process with ``num_workers=0``).
+The time spent in each stage is accumulated per process,
+and :class:`ProfiledCollateFn` attaches it to each batch (key :data:`LoaderProfileKey`),
+such that it ends up in the main process,
+where :class:`DataLoaderProfiler` collects it, together with the time blocked on the next batch
+and the number of batches which were ready in the queue.
+
+Enabled in the engine via the ``torch_dataloader_profile`` config option,
+and the autotuning via ``torch_dataloader_autotune``.
+"""
+
+from __future__ import annotations
+from typing import Optional, Any, Union, Iterator, Iterable, Callable, Sequence, List, Tuple, Dict
+import time
+import torch.utils.data
+
+from returnn.log import log
+
+
+LoaderProfileKey = ":loader_profile"
+
+
+class _StageTimes:
+    """
+    Accumulated exclusive times per stage, in the current process.
+    """
+
+    def __init__(self):
+        self.times = {}  # type: Dict[str,float]
+        # Time spent in nested (upstream) stages during the current call of the enclosing stage.
+        self.nested_time = 0.0
+
+    def add(self, name: str, duration: float):
+        """add"""
+        self.times[name] = self.times.get(name, 0.0) + duration
+
+    def pop(self) -> Dict[str, float]:
+        """
+        :return: accumulated times since the last call, and resets them
+        """
+        res, self.times = self.times, {}
+        return res
+
+
+_stage_times = _StageTimes()
+
+
+class ProfiledIterDataPipe(torch.utils.data.IterDataPipe):
+    """
+    Wraps a data pipe and measures the time spent in it,
+    excluding the time spent in upstream profiled data pipes.
+    """
+
+    def __init__(self, dataset: torch.utils.data.IterableDataset, *, name: Optional[str] = None):
+        """
+        :param dataset: the data pipe to profile
+        :param name: stage name. class name of the dataset by default
+        """
+        super().__init__()
+        self._dataset = dataset
+        self._name = name or type(dataset).__name__
+
+    def __iter__(self):
+        it = iter(self._dataset)
+        while True:
+            outer_nested_time = _stage_times.nested_time
+            _stage_times.nested_time = 0.0
+            start_time = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                item = StopIteration
+            duration = time.perf_counter() - start_time
+            _stage_times.add(self._name, duration - _stage_times.nested_time)
+            _stage_times.nested_time = outer_nested_time + duration
+            if item is StopIteration:
+                return
+            yield item
+
+    def __getitem__(self, index):
+        raise Exception(f"{self.__class__.__name__}.__getitem__ not supported")
+
+
+class ProfiledCollateFn:
+    """
+    Wraps the collate function (e.g. :func:`returnn.torch.data.pipeline.collate_batch`),
+    measures its time, and attaches all accumulated stage times of this process
+    to the batch (key :data:`LoaderProfileKey`).
+    """
+
+    def __init__(self, collate_fn: Callable[[Any], Dict[str, Any]], *, name: Optional[str] = None):
+        self.collate_fn = collate_fn
+        self.name = name or getattr(collate_fn, "__name__", None) or type(collate_fn).__name__
+
+    def __call__(self, batch: Any) -> Dict[str, Any]:
+        start_time = time.perf_counter()
+        res = self.collate_fn(batch)
+        _stage_times.add(self.name, time.perf_counter() - start_time)
+        res[LoaderProfileKey] = _stage_times.pop()
+        return res
+
+
+def get_data_loader_iter_queue_size(loader_iter: Any) -> Optional[int]:
+    """
+    :param loader_iter: e.g. ``iter(data_loader)``
+    :return: number of batches which are ready in the main process, i.e. which can be fetched without waiting,
+        or None if this is unknown (e.g. ``num_workers=0``)
+    """
+    # This relies on internals of torch.utils.data.dataloader._MultiProcessingDataLoaderIter.
+    data_queue = getattr(loader_iter, "_data_queue", None)
+    if data_queue is None:
+        return None
+    try:
+        size = data_queue.qsize()
+        # Batches which were already received out of order.
+        size += sum(1 for info in loader_iter._task_info.values() if len(info) == 2)
+    except (NotImplementedError, AttributeError):  # qsize not implemented e.g. on MacOS
+        return None
+    return size
+
+
+class DataLoaderProfiler:
+    """
+    Collects the profiling information of one epoch in the main process.
+    """
+
+    def __init__(self):
+        self.loader_iter = None  # type: Optional[Any]
+        self.wait_time = 0.0
+        self.num_batches = 0
+        self.stage_times = {}  # type: Dict[str,float]
+        self.queue_size_sum = 0
+        self.queue_size_count = 0
+
+    def reset(self, loader_iter: Optional[Any] = None):
+        """
+        Resets the stats, e.g. at the beginning of an epoch.
+
+        :param loader_iter: the DataLoader iterator, used to get the queue size
+        """
+        self.__init__()
+        self.loader_iter = loader_iter
+
+    def add_wait_time(self, duration: float):
+        """
+        :param duration: time blocked on the data loader which was not measured by :func:`next`,
+            e.g. the initial prefetch of :class:`DevicePrefetchDataIter`
+        """
+        self.wait_time += duration
+
+    def next(self, data_iter: Iterator[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        Like ``next(data_iter, None)``, but measures the time blocked in it,
+        and removes the profile information (:data:`LoaderProfileKey`) from the batch.
+        """
+        queue_size = get_data_loader_iter_queue_size(self.loader_iter)
+        if queue_size is not None:
+            self.queue_size_sum += queue_size
+            self.queue_size_count += 1
+        start_time = time.perf_counter()
+        res = next(data_iter, None)
+        self.wait_time += time.perf_counter() - start_time
+        if res is not None:
+            self.num_batches += 1
+            for name, duration in (res.pop(LoaderProfileKey, None) or {}).items():
+                self.stage_times[name] = self.stage_times.get(name, 0.0) + duration
+        return res
+
+    def get_avg_queue_size(self) -> Optional[float]:
+        """
+        :return: average num of ready batches, sampled before every fetch, or None if unknown
+        """
+        if not self.queue_size_count:
+            return None
+        return self.queue_size_sum / self.queue_size_count
+
+    def get_summary_str(self, *, elapsed: float) -> str:
+        """
+        :param elapsed: total time of the epoch
+        """
+        avg_queue_size = self.get_avg_queue_size()
+        return "waited %.1f secs for data (%.1f%% of %.1f secs), avg queue size %s, stages: %s" % (
+            self.wait_time,
+            (self.wait_time / elapsed * 100.0) if elapsed > 0 else 0.0,
+            elapsed,
+            ("%.1f" % avg_queue_size) if avg_queue_size is not None else "?",
+            ", ".join("%s %.1f secs" % (name, duration) for name, duration in self.stage_times.items()) or "?",
+        )
+
+    def get_meta(self) -> Dict[str, Any]:
+        """
+        :return: for the epoch meta data of the learning rate control
+        """
+        avg_queue_size = self.get_avg_queue_size()
+        res = {
+            "epoch_data_wait_secs": round(self.wait_time, 3),
+            "epoch_data_stage_secs": {name: round(duration, 3) for name, duration in self.stage_times.items()},
+        }
+        if avg_queue_size is not None:
+            res["epoch_data_queue_size"] = round(avg_queue_size, 3)
+        return res
+
+
+def get_autotune_candidates(
+    loader_opts: Dict[str, Any],
+    *,
+    num_workers: Sequence[int] = (0, 1, 2, 4),
+    prefetch_factor: Sequence[int] = (2, 4),
+) -> List[Dict[str, Any]]:
+    """
+    :param loader_opts: base DataLoader options, e.g. from ``torch_dataloader_opts``
+    :param num_workers: candidates
+    :param prefetch_factor: candidates. only used for ``num_workers > 0``
+    :return: list of DataLoader options to try
+    """
+    res = []
+    for num_workers_ in num_workers:
+        if num_workers_ == 0:
+            opts = {k: v for (k, v) in loader_opts.items() if k not in {"prefetch_factor", "persistent_workers"}}
+            opts["num_workers"] = 0
+            res.append(opts)
+            continue
+        for prefetch_factor_ in prefetch_factor:
+            opts = dict(loader_opts)
+            opts.update({"num_workers": num_workers_, "prefetch_factor": prefetch_factor_})
+            res.append(opts)
+    return res
+
+
+def autotune_data_loader(
+    create_data_loader: Callable[[Dict[str, Any]], torch.utils.data.DataLoader],
+    *,
+    candidates: Sequence[Dict[str, Any]],
+    num_steps: int = 20,
+) -> Tuple[Dict[str, Any], List[Tuple[Dict[str, Any], float]]]:
+    """
+    For every candidate, creates a data loader and measures how fast it delivers ``num_steps`` batches.
+    The very first batch is not counted, as it includes the startup of the worker processes.
+
+    :param create_data_loader: loader opts -> DataLoader
+    :param candidates: see :func:`get_autotune_candidates`
+    :param num_steps: number of batches to measure per candidate
+    :return: best candidate, and the list of all candidates with their throughput (batches per second)
+    """
+    assert candidates and num_steps > 0
+    results = []  # type: List[Tuple[Dict[str,Any],float]]
+    for opts in candidates:
+        data_loader = create_data_loader(opts)
+        loader_iter = iter(data_loader)
+        num_batches = 0
+        start_time = None
+        for _ in _take(loader_iter, num_steps + 1):
+            if start_time is None:
+                start_time = time.perf_counter()
+            else:
+                num_batches += 1
+        elapsed = (time.perf_counter() - start_time) if start_time is not None else 0.0
+        batches_per_sec = (num_batches / elapsed) if num_batches and elapsed > 0 else 0.0
+        print(
+            "DataLoader autotune: %s: %.2f batches/sec (%i batches)"
+            % (_format_loader_opts(opts), batches_per_sec, num_batches),
+            file=log.v4,
+        )
+        results.append((opts, batches_per_sec))
+        # Make sure the worker processes are shut down.
+        if hasattr(loader_iter, "_shutdown_workers"):
+            loader_iter._shutdown_workers()
+        del loader_iter, data_loader
+    best_opts, best_batches_per_sec = max(results, key=lambda res: res[1])
+    print(
+        "DataLoader autotune: best %s with %.2f batches/sec" % (_format_loader_opts(best_opts), best_batches_per_sec),
+        file=log.v3,
+    )
+    return best_opts, results
+
+
+def _take(it: Union[Iterator[Any], Iterable[Any]], num: int) -> Iterator[Any]:
+    for i, item in enumerate(it):
+        yield item
+        if i + 1 >= num:
+            break
+
+
+def _format_loader_opts(opts: Dict[str, Any]) -> str:
+    return "num_workers=%s prefetch_factor=%s" % (opts.get("num_workers", 0), opts.get("prefetch_factor", None))
@@ -5,7 +5,7 @@ We make use of TorchData data pipelines.
 """
 
 from __future__ import annotations
-from typing import Callable, Optional, Iterable, Dict
+from typing import Callable, Optional, Iterable, Tuple, Dict
 import numpy
 import torch.utils.data
 from returnn.datasets.basic import Dataset as ReturnnDataset
@@ -13,6 +13,10 @@ from returnn.datasets.util.strings import str_to_numpy_array
 
 ResetCallbackT = Callable[[], None]
 
+# Extra keys in the data dicts, for the position in the epoch, see ReturnnDatasetIterDataPipe.
+SeqIdxKey = ":seq_idx"
+SkipChunksKey = ":skip_chunks"
+
 
 class ReturnnDatasetResetDefaultEpochCounterCallback:
     """
@@ -49,18 +53,32 @@ class ReturnnDatasetResetMpSharedEpochCallback:
 class ReturnnDatasetIterDataPipe(torch.utils.data.IterDataPipe):
     """
     Converts a RETURNN dataset into a PyTorch IterableDataset.
+
+    The iteration is resumable:
+    With ``with_seq_idx``, every data dict also contains the seq idx (key :data:`SeqIdxKey`),
+    such that the position in the epoch can be tracked after batching (e.g. for a step-level checkpoint),
+    and via :func:`set_resume_position`, the iteration continues at such a position.
     """
 
-    def __init__(self, returnn_dataset: ReturnnDataset, *, reset_callback: Optional[ResetCallbackT] = None):
+    def __init__(
+        self,
+        returnn_dataset: ReturnnDataset,
+        *,
+        reset_callback: Optional[ResetCallbackT] = None,
+        with_seq_idx: bool = False,
+    ):
         """
         :param returnn_dataset: dataset to be wrapped
         :param reset_callback: callback function to be called when the dataset is reset, e.g. to init the epoch.
             ReturnnDatasetResetDefaultEpochCounterCallback(returnn_dataset) is the default.
+        :param with_seq_idx: add the seq idx to the data dicts (key :data:`SeqIdxKey`)
         """
         self._dataset = returnn_dataset
         if not reset_callback:
             reset_callback = ReturnnDatasetResetDefaultEpochCounterCallback(returnn_dataset)
         self._reset_callback = reset_callback
+        self._with_seq_idx = with_seq_idx
+        self._resume_position = None  # type: Optional[Tuple[int,int,int]]  # epoch, seq idx, chunk idx
 
     def reset(self):
         """
@@ -68,6 +86,20 @@ class ReturnnDatasetIterDataPipe(torch.utils.data.IterDataPipe):
         """
         self._reset_callback()
 
+    def set_resume_position(self, *, epoch: int, seq_idx: int, chunk_idx: int = 0):
+        """
+        The next iteration over the given epoch starts at the given position,
+        where the seqs before are skipped without loading them (see :func:`Dataset.skip_to_seq_idx`).
+        This only applies once.
+        Note that with DataLoader worker processes, this must be set before the workers are started.
+
+        :param epoch:
+        :param seq_idx: first seq to yield
+        :param chunk_idx: if the first seq is split into chunks (:class:`ChunkingIterDataPipe`),
+            the chunks before are skipped (via :data:`SkipChunksKey`)
+        """
+        self._resume_position = (epoch, seq_idx, chunk_idx)
+
     def __iter__(self) -> Iterable[Dict[str, numpy.ndarray]]:
         """
         :return: generator providing data samples in the form of a dict data_key -> data
@@ -75,10 +107,20 @@ class ReturnnDatasetIterDataPipe(torch.utils.data.IterDataPipe):
         data_keys = self._dataset.get_data_keys()
 
         seq_index = 0
+        skip_chunks = 0
+        if self._resume_position is not None and self._resume_position[0] == self._dataset.epoch:
+            _, seq_index, skip_chunks = self._resume_position
+            self._resume_position = None
+            self._dataset.skip_to_seq_idx(seq_index)
         while self._dataset.is_less_than_num_seqs(seq_index):
             self._dataset.load_seqs(seq_index, seq_index + 1)
             data = {data_key: self._dataset.get_data(seq_index, data_key) for data_key in data_keys}
             data["seq_tag"] = str_to_numpy_array(self._dataset.get_tag(seq_index))
+            if self._with_seq_idx:
+                data[SeqIdxKey] = numpy.array(seq_index, dtype=numpy.int64)
+            if skip_chunks:
+                data[SkipChunksKey] = numpy.array(skip_chunks, dtype=numpy.int64)
+                skip_chunks = 0
             yield data
             seq_index += 1
 
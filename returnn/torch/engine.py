@@ -3,13 +3,14 @@ Main engine for PyTorch
 """
 
 from __future__ import annotations
-from typing import Optional, Any, Union, Callable, Dict
+from typing import Optional, Any, Union, Callable, Dict, List, Tuple, Iterator
 from contextlib import nullcontext
 
 import gc
 import os
 import time
 
+import numpy
 import torch
 import torch.distributed
 from torch.nn.parallel import DistributedDataParallel
@@ -37,8 +38,11 @@ from .data import pipeline as data_pipeline
 from .data import returnn_dataset_wrapper
 from .data import extern_data as extern_data_util
 from .data.queued_data_iter import QueuedDataIter
+from .data.device_prefetch_data_iter import DevicePrefetchDataIter
+from .data import profiling as data_profiling
 from .frontend.bridge import rf_module_to_pt_module
 from .util import diagnose_gpu
+from .util.async_checkpoint import AsyncCheckpointWriter, save_checkpoint
 from .distributed import DistributedContext, get_ctx as dist_get_ctx
 
 
@@ -119,6 +123,42 @@ class Engine(EngineBase):
         self._log_batch_size = config.bool("log_batch_size", False) and log.verbose[5]
         self._reset_dev_memory_caches = config.bool("reset_dev_memory_caches", False)
         self._forward_auto_split_batch_on_oom = config.bool("forward_auto_split_batch_on_oom", False)
+        self._data_device_prefetch = config.bool("torch_data_device_prefetch", False)
+        # Profiling of the train data loader, i.e. time waiting for data, per pipeline stage, and queue size.
+        self._data_loader_profiler = None  # type: Optional[data_profiling.DataLoaderProfiler]
+        if config.bool("torch_dataloader_profile", False):
+            self._data_loader_profiler = data_profiling.DataLoaderProfiler()
+        # Autotuning of num_workers/prefetch_factor for the train data loader. True or dict.
+        self._data_loader_autotune = config.typed_value("torch_dataloader_autotune", None)
+        self._data_loader_autotune_done = False
+        # Asynchronous checkpoint saving. True or dict with AsyncCheckpointWriter options (e.g. pin_memory).
+        self._checkpoint_writer = None  # type: Optional[AsyncCheckpointWriter]
+        async_checkpoint_opts = config.typed_value("torch_async_checkpoint", None)
+        if async_checkpoint_opts:
+            if async_checkpoint_opts is True:
+                async_checkpoint_opts = {}
+            assert isinstance(
+                async_checkpoint_opts, dict
+            ), f"config torch_async_checkpoint, expected dict or bool, got {type(async_checkpoint_opts)}"
+            self._checkpoint_writer = AsyncCheckpointWriter(**async_checkpoint_opts)
+        # Mid-epoch checkpoints every N train steps, to resume exactly at that step (see _save_step_checkpoint).
+        self._save_step_interval = config.int("torch_save_step_interval", 0)
+        self._train_data_position = None  # type: Optional[Tuple[int,int]]  # seq idx, chunk idx
+        self._step_checkpoint_resume = None  # type: Optional[Dict[str,Any]]
+        if self._save_step_interval:
+            assert self._save_step_interval > 0
+            assert (
+                config.typed_value("torch_distributed") is None
+            ), "torch_save_step_interval: distributed not supported"
+            assert not config.typed_value(
+                "torch_bucket_batching", None
+            ), "torch_save_step_interval: torch_bucket_batching not supported, the batches are not in order"
+            assert (config.typed_value("torch_dataloader_opts") or {}).get(
+                "num_workers", 0
+            ) <= 1, "torch_save_step_interval: only num_workers <= 1 supported"
+        # Sync the train losses to the host only every N steps, to not block the asynchronous device execution.
+        self._train_loss_sync_interval = config.int("torch_train_loss_sync_interval", 1)
+        assert self._train_loss_sync_interval >= 1
 
         amp_options = self.config.opt_typed_value("torch_amp")
         grad_scaler_opts = self.config.typed_value("grad_scaler", NotSpecified)
@@ -184,7 +224,15 @@ class Engine(EngineBase):
             for dataset_name, dataset_opts in config.typed_value("eval_datasets", {}).items():
                 self.eval_datasets[dataset_name] = init_dataset(dataset_opts, default_kwargs={"name": dataset_name})
 
-        self._train_dataloader = self._create_data_loader(train_data) if train_data else None
+        self._train_dataloader = (
+            self._create_data_loader(
+                train_data,
+                profile=self._data_loader_profiler is not None,
+                with_seq_idx=bool(self._save_step_interval),
+            )
+            if train_data
+            else None
+        )
         for dataset_name, dataset in self.eval_datasets.items():
             self._eval_dataloaders[dataset_name] = self._create_data_loader(dataset)
 
@@ -226,6 +274,8 @@ class Engine(EngineBase):
             f"Starting training at epoch {self._start_epoch}, global train step {self.global_train_step}", file=log.v3
         )
         self.epoch = self._start_epoch - 1
+        if self._save_step_interval:
+            self._maybe_load_step_checkpoint()
         while self.epoch + 1 <= self._final_epoch:
             self.epoch += 1
             self._epoch_mp_shared.value = self.epoch
@@ -237,6 +287,8 @@ class Engine(EngineBase):
                 self._handle_run_exception(exc)
                 raise
 
+        if self._checkpoint_writer:
+            self._checkpoint_writer.wait()
         print(f"Finished training at epoch {self.epoch}, global train step {self.global_train_step}", file=log.v3)
 
     def _handle_run_exception(self, exc: Exception, *, always_direct_print: bool = False):
@@ -329,9 +381,31 @@ class Engine(EngineBase):
         accumulated_losses_dict = NumbersDict()
         accumulated_inv_norm_factors_dict = NumbersDict()
         step_idx = 0
-        epoch_start_time = time.time()
 
-        data_iter = iter(self._train_dataloader)
+        if self._data_loader_autotune and not self._data_loader_autotune_done:
+            # Before the epoch start time, to not count it in the epoch time and the data loader profile.
+            self._autotune_train_data_loader()
+        epoch_start_time = time.time()
+        self._train_data_position = (0, 0)
+        resume, self._step_checkpoint_resume = self._step_checkpoint_resume, None
+        if resume is not None:
+            assert resume["epoch"] == self.epoch
+            step_idx = resume["epoch_step_idx"]
+            accumulated_losses_dict = NumbersDict(**resume["accumulated_losses"])
+            accumulated_inv_norm_factors_dict = NumbersDict(**resume["accumulated_inv_norm_factors"])
+            self._train_data_position = resume["data_position"]
+            seq_idx, chunk_idx = self._train_data_position
+            _get_returnn_dataset_iter_data_pipe(self._train_dataloader).set_resume_position(
+                epoch=self.epoch, seq_idx=seq_idx, chunk_idx=chunk_idx
+            )
+            print(
+                f"Resume epoch {self.epoch} at step {step_idx}, seq idx {seq_idx}, chunk idx {chunk_idx}", file=log.v3
+            )
+        last_step_checkpoint_step_idx = step_idx
+        data_iter = self._iter_data_loader(self._train_dataloader, profiler=self._data_loader_profiler)
+        if resume is not None:
+            # After creating the data loader iterator, as this also uses the RNG.
+            _set_rng_state(resume["rng_state"])
         elapsed_computation_time = 0
 
         self._pt_model.train()
@@ -354,11 +428,40 @@ class Engine(EngineBase):
         else:
             accum_grad_multiple_step = self.config.int("accum_grad_multiple_step", 1)
 
+        # Losses and inv norm factors of the last steps, maybe still on the device, not synced yet.
+        pending_steps = []  # type: List[Dict[str, Any]]
+
+        def _sync_pending_steps():
+            nonlocal accumulated_losses_dict, accumulated_inv_norm_factors_dict
+            losses_per_step = _raw_dicts_to_float_dicts([step_info["losses"] for step_info in pending_steps])
+            inv_norm_factors_per_step = _raw_dicts_to_float_dicts(
+                [step_info["inv_norm_factors"] for step_info in pending_steps]
+            )
+            for step_info, losses_dict_, inv_norm_factors_dict_ in zip(
+                pending_steps, losses_per_step, inv_norm_factors_per_step
+            ):
+                losses_dict_ = NumbersDict(losses_dict_)
+                inv_norm_factors_dict_ = NumbersDict(inv_norm_factors_dict_)
+                accumulated_losses_dict += losses_dict_
+                accumulated_inv_norm_factors_dict += inv_norm_factors_dict_
+                _print_process(
+                    f"ep {self.epoch} train",
+                    step=step_info["step_idx"],
+                    eval_info=dict(losses_dict_ / inv_norm_factors_dict_),
+                    step_duration=step_info["step_duration"],
+                    batch_size_info=step_info["batch_size_info"],
+                    log_memory_usage_device=self._device if self._log_memory_usage else None,
+                )
+            pending_steps.clear()
+
         zero_grad_next_step = True
         cur_count_grad_accum = 0
         while True:
             with torch.no_grad():
-                extern_data_raw = next(data_iter, None)
+                if self._data_loader_profiler is not None:
+                    extern_data_raw = self._data_loader_profiler.next(data_iter)
+                else:
+                    extern_data_raw = next(data_iter, None)
 
             step_begin_time = time.time()
 
@@ -369,6 +472,7 @@ class Engine(EngineBase):
                 torch.distributed.all_reduce(_has_data, op=torch.distributed.ReduceOp.MIN)
             if not _has_data[0]:
                 break
+            data_position = data_pipeline.pop_data_position_after_batch(extern_data_raw)
 
             # clear the gradients when every gradient accumulation loop starts
             if zero_grad_next_step:
@@ -382,19 +486,14 @@ class Engine(EngineBase):
 
             train_ctx = rf.get_run_ctx()
             total_loss = train_ctx.total_loss()
-            losses_dict = NumbersDict(
-                {
-                    name: (
-                        float(loss.get_summed_loss().raw_tensor.detach().cpu().numpy())
-                        if self._device != "meta"
-                        else float("nan")
-                    )
-                    for name, loss in train_ctx.losses.items()
-                }
-            )
-            inv_norm_factors_dict = NumbersDict(
-                {name: float(_to_raw(loss.get_inv_norm_factor())) for name, loss in train_ctx.losses.items()}
-            )
+            # Only get the raw tensors here, the sync to the host is done in _sync_pending_steps.
+            losses_dict = {
+                name: (loss.get_summed_loss().raw_tensor.detach() if self._device != "meta" else float("nan"))
+                for name, loss in train_ctx.losses.items()
+            }
+            inv_norm_factors_dict = {
+                name: _to_raw_tensor(loss.get_inv_norm_factor()) for name, loss in train_ctx.losses.items()
+            }
 
             if accum_grad_multiple_step_dyn:
                 accum_grad_multiple_step = accum_grad_multiple_step_dyn(
@@ -423,20 +522,37 @@ class Engine(EngineBase):
             step_duration = time.time() - step_begin_time
             elapsed_computation_time += step_duration
 
-            accumulated_losses_dict += losses_dict
-            accumulated_inv_norm_factors_dict += inv_norm_factors_dict
-            _print_process(
-                f"ep {self.epoch} train",
-                step=step_idx,
-                eval_info=dict(losses_dict / inv_norm_factors_dict),
-                step_duration=step_duration,
-                batch_size_info=_get_batch_size_info(extern_data) if self._log_batch_size else None,
-                log_memory_usage_device=self._device if self._log_memory_usage else None,
+            pending_steps.append(
+                {
+                    "step_idx": step_idx,
+                    "losses": losses_dict,
+                    "inv_norm_factors": inv_norm_factors_dict,
+                    "step_duration": step_duration,
+                    "batch_size_info": _get_batch_size_info(extern_data) if self._log_batch_size else None,
+                }
             )
+            if len(pending_steps) >= self._train_loss_sync_interval:
+                _sync_pending_steps()
 
             step_idx += 1
             self.global_train_step += 1
             self._updater.set_current_train_step(global_train_step=self.global_train_step, epoch=self.epoch)
+            self._train_data_position = data_position
+
+            if (
+                self._save_step_interval
+                and zero_grad_next_step  # not within gradient accumulation
+                and step_idx - last_step_checkpoint_step_idx >= self._save_step_interval
+            ):
+                _sync_pending_steps()
+                self._save_step_checkpoint(
+                    epoch_step_idx=step_idx,
+                    accumulated_losses_dict=accumulated_losses_dict,
+                    accumulated_inv_norm_factors_dict=accumulated_inv_norm_factors_dict,
+                )
+                last_step_checkpoint_step_idx = step_idx
+
+        _sync_pending_steps()
 
         elapsed = time.time() - epoch_start_time
         elapsed_computation_percentage = elapsed_computation_time / elapsed
@@ -445,6 +561,8 @@ class Engine(EngineBase):
             % (step_idx, hms(elapsed), (elapsed_computation_percentage * 100.0)),
             file=log.v3,
         )
+        if self._data_loader_profiler is not None:
+            print("Data loader profile:", self._data_loader_profiler.get_summary_str(elapsed=elapsed), file=log.v3)
 
         self.learning_rate_control.epoch_data[self.epoch].meta.update(
             {
@@ -452,6 +570,8 @@ class Engine(EngineBase):
                 "epoch_train_time_secs": round(elapsed),
             }
         )
+        if self._data_loader_profiler is not None:
+            self.learning_rate_control.epoch_data[self.epoch].meta.update(self._data_loader_profiler.get_meta())
 
         accumulated_losses_dict = accumulated_losses_dict / accumulated_inv_norm_factors_dict
         self.learning_rate_control.set_epoch_error(
@@ -466,10 +586,18 @@ class Engine(EngineBase):
 
         if self.epoch % self._save_model_epoch_interval == 0 or self.epoch == self._final_epoch:
             if self.model_filename:
+                save_start_time = time.time()
                 self._save_model()
                 self._save_optimizer()
+                print(
+                    "Saving the checkpoint blocked the training for %.2f secs%s"
+                    % (time.time() - save_start_time, " (async write)" if self._checkpoint_writer else ""),
+                    file=log.v4,
+                )
             else:
                 print("Not saving model, `model` not specified.", file=log.v3)
+        if self._save_step_interval:
+            self._delete_step_checkpoint()
 
         self.eval_model()
         if self.config.bool_or_other("cleanup_old_models", None):
@@ -512,7 +640,7 @@ class Engine(EngineBase):
             step_idx = 0
 
             with torch.no_grad():
-                for extern_data_raw in data_loader:
+                for extern_data_raw in self._iter_data_loader(data_loader):
                     extern_data = extern_data_util.raw_dict_to_extern_data(
                         extern_data_raw, extern_data_template=self.extern_data, device=self._device
                     )
@@ -579,9 +707,19 @@ class Engine(EngineBase):
             assert isinstance(ls[0], self.learning_rate_control.EpochData)
             self.learning_rate_control.epoch_data[self.epoch] = ls[0]
 
-    def _create_data_loader(self, dataset: Dataset) -> DataLoader:
+    def _create_data_loader(
+        self,
+        dataset: Dataset,
+        *,
+        loader_opts: Optional[Dict[str, Any]] = None,
+        profile: bool = False,
+        with_seq_idx: bool = False,
+    ) -> DataLoader:
         """
         :param dataset: RETURNN dataset
+        :param loader_opts: DataLoader options. ``torch_dataloader_opts`` from the config by default
+        :param profile: wrap the pipeline stages and the collate function for :class:`DataLoaderProfiler`
+        :param with_seq_idx: track the position in the dataset, see :class:`ReturnnDatasetIterDataPipe`
         :return: PyTorch data loader created from given RETURNN dataset
         """
         # Make sure that _dataset_reset does not keep a ref to `self`,
@@ -590,7 +728,11 @@ class Engine(EngineBase):
             dataset=dataset, epoch_mp_shared=self._epoch_mp_shared
         )
 
-        wrapped_dataset = returnn_dataset_wrapper.ReturnnDatasetIterDataPipe(dataset, reset_callback=dataset_reset)
+        wrapped_dataset = returnn_dataset_wrapper.ReturnnDatasetIterDataPipe(
+            dataset, reset_callback=dataset_reset, with_seq_idx=with_seq_idx
+        )
+        if profile:
+            wrapped_dataset = data_profiling.ProfiledIterDataPipe(wrapped_dataset)
         if (self._min_seq_length is not None) or (self._max_seq_length is not None):
             wrapped_dataset = data_pipeline.LenFilterDataPipe(
                 wrapped_dataset, min_seq_length=self._min_seq_length, max_seq_length=self._max_seq_length
@@ -601,16 +743,47 @@ class Engine(EngineBase):
             wrapped_dataset = data_pipeline.ChunkingIterDataPipe(
                 wrapped_dataset, chunking, min_chunk_size=min_chunk_size
             )
+            if profile:
+                wrapped_dataset = data_profiling.ProfiledIterDataPipe(wrapped_dataset)
 
         assert self.config.typed_value("batch_size") is not None, "batch_size not defined in config"
         batch_size = self.config.typed_value("batch_size", 1)
         max_seqs = self.config.int("max_seqs", -1)
-        batches_dataset = data_pipeline.BatchingIterDataPipe(wrapped_dataset, batch_size=batch_size, max_seqs=max_seqs)
+        bucket_batching_opts = self.config.typed_value("torch_bucket_batching", None)
+        if bucket_batching_opts:
+            if bucket_batching_opts is True:
+                bucket_batching_opts = {}
+            assert isinstance(
+                bucket_batching_opts, dict
+            ), f"config torch_bucket_batching, expected dict, got {type(bucket_batching_opts)}"
+            batches_dataset = data_pipeline.BucketBatchingIterDataPipe(
+                wrapped_dataset,
+                batch_size=batch_size,
+                max_seqs=max_seqs,
+                epoch_mp_shared=self._epoch_mp_shared,
+                **bucket_batching_opts,
+            )
+        else:
+            batches_dataset = data_pipeline.BatchingIterDataPipe(
+                wrapped_dataset, batch_size=batch_size, max_seqs=max_seqs
+            )
 
-        loader_opts = self.config.typed_value("torch_dataloader_opts") or {}
-        assert isinstance(loader_opts, dict), f"config torch_dataloader_opts, expected dict, got {type(loader_opts)}"
+        if profile:
+            batches_dataset = data_profiling.ProfiledIterDataPipe(batches_dataset)
 
-        data_loader = data_pipeline.create_data_loader_from_batches(batches_dataset, loader_opts)
+        if loader_opts is None:
+            loader_opts = self.config.typed_value("torch_dataloader_opts") or {}
+        assert isinstance(loader_opts, dict), f"config torch_dataloader_opts, expected dict, got {type(loader_opts)}"
+        if self._data_device_prefetch and torch.device(self._device).type == "cuda":
+            # Pinned memory is needed for the asynchronous copy to the device, see DevicePrefetchDataIter.
+            loader_opts = loader_opts.copy()
+            loader_opts.setdefault("pin_memory", True)
+
+        data_loader = data_pipeline.create_data_loader_from_batches(
+            batches_dataset,
+            loader_opts,
+            collate_fn=data_profiling.ProfiledCollateFn(data_pipeline.collate_batch) if profile else None,
+        )
 
         if data_loader.num_workers > 0:  # uses multi processing
             # We are not using the dataset anymore here in the main proc,
@@ -622,6 +795,77 @@ class Engine(EngineBase):
 
         return data_loader
 
+    def _autotune_train_data_loader(self):
+        """
+        Tries different ``num_workers``/``prefetch_factor`` settings for the train data loader
+        (config ``torch_dataloader_autotune``, True or dict with ``num_steps``, ``num_workers``, ``prefetch_factor``),
+        measures the throughput of the data loader alone over the first ``num_steps`` batches of the epoch,
+        and keeps the fastest setting for the rest of the training.
+        With ``torch_save_step_interval``, only settings with ``num_workers <= 1`` are tried.
+        """
+        opts = self._data_loader_autotune
+        if opts is True:
+            opts = {}
+        assert isinstance(opts, dict), f"config torch_dataloader_autotune, expected dict or True, got {type(opts)}"
+        opts = opts.copy()
+        num_steps = opts.pop("num_steps", 20)
+        base_loader_opts = self.config.typed_value("torch_dataloader_opts") or {}
+        candidates = data_profiling.get_autotune_candidates(base_loader_opts, **opts)
+        if self._save_step_interval:
+            # Same as in __init__: the step checkpoint data position is only valid for a single ordered stream.
+            candidates = [loader_opts for loader_opts in candidates if loader_opts.get("num_workers", 0) <= 1]
+            assert (
+                candidates
+            ), "torch_dataloader_autotune: with torch_save_step_interval, only num_workers <= 1 supported"
+        print(f"DataLoader autotune: trying {len(candidates)} settings with {num_steps} steps each", file=log.v3)
+        start_time = time.time()
+        best_opts, results = data_profiling.autotune_data_loader(
+            lambda loader_opts: self._create_data_loader(
+                self.train_dataset, loader_opts=loader_opts, with_seq_idx=bool(self._save_step_interval)
+            ),
+            candidates=candidates,
+            num_steps=num_steps,
+        )
+        self._train_dataloader = self._create_data_loader(
+            self.train_dataset,
+            loader_opts=best_opts,
+            profile=self._data_loader_profiler is not None,
+            with_seq_idx=bool(self._save_step_interval),
+        )
+        autotune_secs = time.time() - start_time
+        print(f"DataLoader autotune: took {autotune_secs:.1f} secs, not counted in the epoch time", file=log.v3)
+        self._data_loader_autotune_done = True
+        self.learning_rate_control.epoch_data[self.epoch].meta["data_loader_autotune"] = {
+            "num_workers": best_opts.get("num_workers", 0),
+            "prefetch_factor": best_opts.get("prefetch_factor", None),
+            "batches_per_sec": [
+                (loader_opts.get("num_workers", 0), loader_opts.get("prefetch_factor", None), round(batches_per_sec, 3))
+                for loader_opts, batches_per_sec in results
+            ],
+            "secs": round(autotune_secs, 3),
+        }
+
+    def _iter_data_loader(
+        self, data_loader: DataLoader, *, profiler: Optional[data_profiling.DataLoaderProfiler] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        :param data_loader:
+        :param profiler: if given, is reset for the new iterator
+        :return: iterator over the raw dicts from the data loader.
+            With ``torch_data_device_prefetch``, the next batch is already copied to the device
+            while the current step runs, see :class:`DevicePrefetchDataIter`.
+        """
+        start_time = time.perf_counter()
+        loader_iter = iter(data_loader)
+        if profiler is not None:
+            profiler.reset(loader_iter)
+        if self._data_device_prefetch:
+            loader_iter = DevicePrefetchDataIter(loader_iter, device=self._device)
+        if profiler is not None:
+            # E.g. the startup of the worker processes, or the initial prefetch.
+            profiler.add_wait_time(time.perf_counter() - start_time)
+        return loader_iter
+
     def _run_step(
         self, extern_data: TensorDict, *, train_flag: bool = False, train_func: bool, _inside_wrapped: bool = False
     ):
@@ -875,22 +1119,113 @@ class Engine(EngineBase):
             os.makedirs(directory, exist_ok=True)
 
         print("Save model under %s" % (filename,), file=log.v4)
-        # First write to a temp-file, to be sure that writing happens without errors,
-        # and only afterward rename to the target file.
-        tmp_filename = filename + ".tmp_write"
-        if os.path.exists(tmp_filename):
-            os.unlink(tmp_filename)
-        torch.save(
-            {
-                "model": self._pt_model.state_dict(),
-                "epoch": self.epoch,
-                "step": self.global_train_step,
-                "effective_learning_rate": self._updater.get_effective_learning_rate() if self._updater else None,
-                "returnn_version": returnn.__long_version__,
+        obj = {
+            "model": self._pt_model.state_dict(),
+            "epoch": self.epoch,
+            "step": self.global_train_step,
+            "effective_learning_rate": self._updater.get_effective_learning_rate() if self._updater else None,
+            "returnn_version": returnn.__long_version__,
+        }
+        if self._checkpoint_writer:
+            # Snapshot to CPU, and write in the background.
+            # A still pending write of the previous checkpoint is waited for first.
+            self._checkpoint_writer.save(obj, filename, name="model")
+        else:
+            # Writes to a temp-file first, and only afterward renames to the target file.
+            save_checkpoint(obj, filename)
+
+    def _get_step_checkpoint_filename(self) -> str:
+        return self.model_filename + ".step_ckpt" + util.get_model_filename_postfix()
+
+    def _save_step_checkpoint(
+        self,
+        *,
+        epoch_step_idx: int,
+        accumulated_losses_dict: NumbersDict,
+        accumulated_inv_norm_factors_dict: NumbersDict,
+    ):
+        """
+        Saves a mid-epoch checkpoint (config ``torch_save_step_interval``),
+        with everything needed to resume training exactly after the current step:
+        model, optimizer, grad scaler, RNG states, the train step, the accumulated losses of the epoch,
+        and the position in the train dataset.
+        There is only one such checkpoint, it is overwritten each time, and deleted at the end of the epoch.
+        """
+        if not self._do_save() or not self.model_filename:
+            return
+        filename = self._get_step_checkpoint_filename()
+        print(f"Save step checkpoint under {filename}, epoch step {epoch_step_idx}", file=log.v4)
+        obj = {
+            "model": self._pt_model.state_dict(),
+            "optimizer": self._updater.get_optimizer_checkpoint(),
+            "grad_scaler": self._grad_scaler.state_dict() if self._grad_scaler is not None else None,
+            "rng_state": _get_rng_state(),
+            "epoch": self.epoch,
+            "step": self.global_train_step,
+            "epoch_step_idx": epoch_step_idx,
+            "data_position": self._train_data_position,
+            "accumulated_losses": {
+                "numbers_dict": dict(accumulated_losses_dict.dict),
+                "broadcast_value": accumulated_losses_dict.value,
             },
-            tmp_filename,
-        )
-        os.rename(tmp_filename, filename)
+            "accumulated_inv_norm_factors": {
+                "numbers_dict": dict(accumulated_inv_norm_factors_dict.dict),
+                "broadcast_value": accumulated_inv_norm_factors_dict.value,
+            },
+            "effective_learning_rate": self._updater.get_effective_learning_rate(),
+            "returnn_version": returnn.__long_version__,
+        }
+        if self._checkpoint_writer:
+            self._checkpoint_writer.save(obj, filename, name="step")
+        else:
+            save_checkpoint(obj, filename)
+
+    def _maybe_load_step_checkpoint(self):
+        """
+        If there is a step checkpoint (see :func:`_save_step_checkpoint`) for the epoch we are about to start,
+        loads it, and the next :func:`train_epoch` resumes from there.
+        """
+        if not self.model_filename:
+            return
+        filename = self._get_step_checkpoint_filename()
+        if not os.path.exists(filename):
+            return
+        ckpt = torch.load(filename, map_location="cpu", weights_only=False)
+        if ckpt["epoch"] != self._start_epoch:
+            print(
+                f"Ignoring step checkpoint {filename} of epoch {ckpt['epoch']}, starting epoch {self._start_epoch}",
+                file=log.v3,
+            )
+            return
+        print(f"Load step checkpoint {filename}, global train step {ckpt['step']}", file=log.v3)
+        self._pt_model.load_state_dict(ckpt["model"])
+        self._updater.load_optimizer_checkpoint(ckpt["optimizer"])
+        if self._grad_scaler is not None and ckpt["grad_scaler"] is not None:
+            self._grad_scaler.load_state_dict(ckpt["grad_scaler"])
+        self.global_train_step = ckpt["step"]
+        self._step_checkpoint_resume = {
+            k: ckpt[k]
+            for k in [
+                "epoch",
+                "epoch_step_idx",
+                "data_position",
+                "rng_state",
+                "accumulated_losses",
+                "accumulated_inv_norm_factors",
+            ]
+        }
+
+    def _delete_step_checkpoint(self):
+        """
+        At the end of the epoch, the step checkpoint is not needed anymore.
+        """
+        if not self._do_save() or not self.model_filename:
+            return
+        if self._checkpoint_writer:
+            self._checkpoint_writer.wait("step")
+        filename = self._get_step_checkpoint_filename()
+        if os.path.exists(filename):
+            os.unlink(filename)
 
     def get_pt_optimizer(self) -> Optional[torch.optim.Optimizer]:
         """
@@ -916,7 +1251,7 @@ class Engine(EngineBase):
         if not self._do_save():
             return
         filename = self.get_epoch_model_filename() + ".opt" + util.get_model_filename_postfix()
-        self._updater.save_optimizer(filename)
+        self._updater.save_optimizer(filename, checkpoint_writer=self._checkpoint_writer)
 
         # keep only the last two optimizer states (two in case one file gets corrupted)
         clean_epoch = self.epoch - 2
@@ -953,6 +1288,8 @@ class Engine(EngineBase):
         )
 
         data_loader = self._create_data_loader(dataset)
+        if self._data_device_prefetch:
+            data_loader = self._iter_data_loader(data_loader)
         if self._forward_auto_split_batch_on_oom:
             data_loader = QueuedDataIter(data_loader)
 
@@ -1058,6 +1395,125 @@ class Engine(EngineBase):
 
         self._maybe_report_dev_memory_stats()
 
+    def forward_seqs(self, data: List[Dict[str, numpy.ndarray]]) -> List[Dict[str, numpy.ndarray]]:
+        """
+        Forwards the given seqs via :func:`forward_with_callback` (i.e. ``forward_step`` from the config),
+        all together as one dataset (so usually as one batch).
+        Used by :func:`web_server`.
+
+        :param data: list of seqs, each provides the data for the data keys of ``extern_data``.
+            Missing data keys (e.g. targets) are filled with empty arrays.
+        :return: per seq, the model outputs (via ``mark_as_output``) as Numpy arrays,
+            with dynamic dims cut to the seq lengths
+        """
+        from returnn.datasets.generating import StaticDataset
+
+        keys = [key for key in self.extern_data.data.keys() if key != "seq_tag"]  # seq_tag comes from the dataset
+        empty = {}
+        for key in keys:
+            data_ = self.extern_data.data[key]
+            shape = [0 if dim.dimension is None else dim.dimension for dim in data_.dims if not dim.is_batch_dim()]
+            empty[key] = numpy.zeros(shape, dtype=data_.dtype)
+        dataset = StaticDataset(
+            data=[{**empty, **seq} for seq in data],
+            output_dim={key: (self.extern_data.data[key].dim or 0, self.extern_data.data[key].ndim) for key in keys},
+        )
+        dataset.init_seq_order(epoch=1)
+        seq_tags = [dataset.get_tag(seq_idx) for seq_idx in range(len(data))]  # before it gets sorted
+        results = {}  # type: Dict[str,Dict[str,numpy.ndarray]]
+
+        class _Callback(ForwardCallbackIface):
+            def process_seq(self, *, seq_tag: str, outputs: TensorDict):
+                """collect"""
+                res = {}
+                for k, v in outputs.data.items():
+                    raw = v.raw_tensor
+                    for i, dim in enumerate(v.dims):
+                        if dim.dyn_size_ext is not None and dim.dyn_size_ext.raw_tensor is not None:
+                            raw = raw[(slice(None),) * i + (slice(0, int(dim.dyn_size_ext.raw_tensor)),)]
+                    res[k] = raw
+                results[seq_tag] = res
+
+        self.forward_with_callback(dataset=dataset, callback=_Callback())
+        return [results[seq_tag] for seq_tag in seq_tags]
+
+    def web_server(self, port: int):
+        """
+        Starts a web server with a simple API to forward data through the model,
+        via :func:`forward_seqs`.
+        Concurrent requests are batched together dynamically,
+        see :class:`returnn.engine.batching_server.DynamicBatcher`,
+        configured via ``web_server_max_batch_size`` (default 1, i.e. no batching)
+        and ``web_server_max_wait_time`` (in seconds).
+        Throughput and latency stats are available via GET ``/stats``.
+
+        A POST request provides the input for the ``default_input`` data key (default "data")
+        as form field "file", either as text (if the data has a vocab) or as Numpy ``.npy`` file.
+        The response is JSON with all the model outputs,
+        and for sparse outputs with vocab, also the labels as string.
+
+        :param port: for the http server
+        """
+        from http.server import BaseHTTPRequestHandler
+        from io import BytesIO
+        import json
+        import sys
+        from returnn.engine.batching_server import DynamicBatcher, BatchingHTTPServer
+        from returnn.engine.batching_server import get_dynamic_batcher_opts_from_config
+
+        input_data = self.extern_data.data[self.config.value("default_input", "data")]
+        batcher = DynamicBatcher(
+            lambda inputs: self.forward_seqs([{input_data.name: x} for x in inputs]),
+            name="Forward",
+            **get_dynamic_batcher_opts_from_config(self.config),
+        )
+        output_vocabs = {}  # type: Dict[str,returnn.datasets.util.vocabulary.Vocabulary]
+        if self._forward_step_expected_outputs:  # only known in advance when given in the config
+            output_vocabs = {k: v.vocab for k, v in self._forward_step_expected_outputs.data.items() if v.vocab}
+
+        class Handler(BaseHTTPRequestHandler):
+            """
+            Handle POST requests.
+            Each request is handled in its own thread,
+            and the forwarding itself is done by the batcher, potentially batched together with other requests.
+            """
+
+            # noinspection PyPep8Naming
+            def do_POST(self):
+                """
+                Handle POST request.
+                """
+                try:
+                    self._do_post()
+                except Exception:
+                    sys.excepthook(*sys.exc_info())
+                    raise
+
+            def _do_post(self):
+                import cgi
+
+                form = cgi.FieldStorage(fp=self.rfile, headers=self.headers, environ={"REQUEST_METHOD": "POST"})
+                f = BytesIO(form["file"].file.read())
+                if input_data.vocab:
+                    features = numpy.array(input_data.vocab.get_seq(f.read().decode("utf8").strip()), dtype="int32")
+                else:
+                    features = numpy.load(f, allow_pickle=False)
+                outputs = batcher.process(features)
+                res = {}
+                for k, v in outputs.items():
+                    res[k] = {"value": v.tolist()}
+                    vocab = output_vocabs.get(k)
+                    if vocab and v.ndim == 1:
+                        res[k]["labels"] = vocab.get_seq_labels(v)
+                self.send_response(200)
+                self.send_header("Content-type", "application/json")
+                self.end_headers()
+                self.wfile.write(json.dumps(res).encode("utf8") + b"\n")
+
+        # noinspection PyAttributeOutsideInit
+        self.httpd = BatchingHTTPServer(port=port, handler_cls=Handler, batcher=batcher, name="Forward web server")
+        self.httpd.serve_forever()
+
     @staticmethod
     def delete_model(filename):
         """
@@ -1106,6 +1562,41 @@ class Engine(EngineBase):
                 break
 
 
+def _get_returnn_dataset_iter_data_pipe(
+    data_loader: DataLoader,
+) -> returnn_dataset_wrapper.ReturnnDatasetIterDataPipe:
+    """
+    :return: the ReturnnDatasetIterDataPipe at the beginning of the data pipeline of the data loader
+    """
+    dataset = data_loader.dataset
+    while not isinstance(dataset, returnn_dataset_wrapper.ReturnnDatasetIterDataPipe):
+        # _datapipe: the serialization wrapper of the DataLoader, _dataset: our data pipes
+        dataset = getattr(dataset, "_datapipe") if hasattr(dataset, "_datapipe") else getattr(dataset, "_dataset", None)
+        assert dataset is not None, f"no ReturnnDatasetIterDataPipe in data pipeline of {data_loader}"
+    return dataset
+
+
+def _get_rng_state() -> Dict[str, Any]:
+    import random as random_
+
+    return {
+        "python": random_.getstate(),
+        "numpy": numpy.random.get_state(),
+        "torch": torch.get_rng_state(),
+        "torch_cuda": torch.cuda.get_rng_state_all() if torch.cuda.is_available() else None,
+    }
+
+
+def _set_rng_state(state: Dict[str, Any]):
+    import random as random_
+
+    random_.setstate(state["python"])
+    numpy.random.set_state(state["numpy"])
+    torch.set_rng_state(state["torch"])
+    if state["torch_cuda"] is not None and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state["torch_cuda"])
+
+
 def _to_raw(n: Union[int, float, Tensor]):
     if isinstance(n, (int, float)):
         return n
@@ -1114,6 +1605,41 @@ def _to_raw(n: Union[int, float, Tensor]):
     raise TypeError(f"Unexpected {n} of type {type(n)}")
 
 
+def _to_raw_tensor(n: Union[int, float, Tensor]) -> Union[int, float, torch.Tensor]:
+    """
+    Like :func:`_to_raw`, but keeps the tensor on the device, i.e. without sync.
+    """
+    if isinstance(n, (int, float)):
+        return n
+    if isinstance(n, Tensor):
+        return n.raw_tensor.detach()
+    raise TypeError(f"Unexpected {n} of type {type(n)}")
+
+
+def _raw_dicts_to_float_dicts(ls: List[Dict[str, Union[int, float, torch.Tensor]]]) -> List[Dict[str, float]]:
+    """
+    :param ls: e.g. losses per step, where the values are maybe scalar tensors on the device
+    :return: same values as floats. This does only one device-to-host copy per key (not per step).
+    """
+    res = [{} for _ in ls]  # type: List[Dict[str, float]]
+    tensors_by_key = {}  # type: Dict[str, List[Tuple[int, torch.Tensor]]]
+    for i, d in enumerate(ls):
+        for k, v in d.items():
+            if isinstance(v, torch.Tensor):
+                tensors_by_key.setdefault(k, []).append((i, v))
+            else:
+                res[i][k] = float(v)
+    for k, tensors in tensors_by_key.items():
+        dtype = tensors[0][1].dtype
+        for _, v in tensors[1:]:
+            dtype = torch.promote_types(dtype, v.dtype)
+        values = torch.stack([v.reshape(()).to(dtype) for _, v in tensors]).cpu().numpy()
+        for (i, _), value in zip(tensors, values):
+            res[i][k] = float(value)
+    # Keep the original key order.
+    return [{k: res_[k] for k in d.keys()} for d, res_ in zip(ls, res)]
+
+
 def _print_process(
     report_prefix: str,
     step: int,
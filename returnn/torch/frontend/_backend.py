@@ -602,8 +602,6 @@ class TorchBackend(Backend[torch.Tensor]):
         max_approx: bool = False,
     ) -> Tensor:
         """CTC"""
-        if max_approx:
-            raise NotImplementedError("ctc_loss: max_approx not implemented for PyTorch")
         assert targets.sparse_dim and targets.sparse_dim.dimension <= logits.feature_dim.dimension
         # PyTorch expects the logits to be of shape (T, B, C) where T is the input spatial dim.
         batch_dims = logits.remaining_dims((input_spatial_dim, logits.feature_dim))
@@ -614,7 +612,6 @@ class TorchBackend(Backend[torch.Tensor]):
         if len(batch_dims) != 1:
             logits_raw = torch.reshape(logits_raw, logits_raw.shape[:1] + (-1,) + logits_raw.shape[-1:])  # [T, B', C]
             input_lengths = torch.reshape(input_lengths, (-1,))  # [B']
-        log_probs = torch.nn.functional.log_softmax(logits_raw, dim=-1)
         # PyTorch expects the targets to be of shape (B, S) where S is the targets spatial dim.
         targets = targets.copy_transpose(batch_dims + [targets_spatial_dim])
         targets_raw = targets.raw_tensor  # [B..., S]
@@ -622,15 +619,28 @@ class TorchBackend(Backend[torch.Tensor]):
         if len(batch_dims) != 1:
             targets_raw = torch.reshape(targets_raw, (-1, targets_raw.shape[-1]))  # [B', S]
             targets_lengths = torch.reshape(targets_lengths, (-1,))  # [B']
-        loss_raw = torch.nn.functional.ctc_loss(
-            log_probs=log_probs,
-            targets=targets_raw,
-            input_lengths=input_lengths,
-            target_lengths=targets_lengths,
-            blank=blank_index,
-            zero_infinity=True,
-            reduction="none",
-        )
+        if max_approx:
+            from returnn.torch.native_op import ctc_loss_viterbi
+
+            loss_raw = ctc_loss_viterbi(
+                logits=logits_raw,
+                logits_seq_lens=input_lengths,
+                logits_time_major=True,
+                targets=targets_raw,
+                targets_seq_lens=targets_lengths,
+                blank_index=blank_index,
+            )
+        else:
+            log_probs = torch.nn.functional.log_softmax(logits_raw, dim=-1)
+            loss_raw = torch.nn.functional.ctc_loss(
+                log_probs=log_probs,
+                targets=targets_raw,
+                input_lengths=input_lengths,
+                target_lengths=targets_lengths,
+                blank=blank_index,
+                zero_infinity=True,
+                reduction="none",
+            )
         if len(batch_dims) != 1:
             loss_raw = torch.reshape(loss_raw, logits_raw_shape[1:-1])
         loss = Tensor(
@@ -641,6 +651,26 @@ class TorchBackend(Backend[torch.Tensor]):
         )
         return loss
 
+    @staticmethod
+    def edit_distance(a: Tensor, a_spatial_dim: Dim, b: Tensor, b_spatial_dim: Dim) -> Tensor:
+        """edit distance"""
+        from returnn.torch.native_op import edit_distance
+
+        batch_dims = a.remaining_dims(a_spatial_dim)
+        assert set(b.remaining_dims(b_spatial_dim)) == set(batch_dims), "edit_distance: batch dims mismatch"
+        batch_shape = [d.get_dim_value() for d in batch_dims]
+        a_raw = a.copy_compatible_to_dims_raw(batch_dims + [a_spatial_dim])
+        b_raw = b.copy_compatible_to_dims_raw(batch_dims + [b_spatial_dim])
+        a_lens = a_spatial_dim.get_size_tensor().copy_compatible_to_dims_raw(batch_dims)
+        b_lens = b_spatial_dim.get_size_tensor().copy_compatible_to_dims_raw(batch_dims)
+        res_raw = edit_distance(
+            a=a_raw.reshape(-1, a_raw.shape[-1]),
+            a_len=torch.broadcast_to(a_lens, batch_shape).reshape(-1),
+            b=b_raw.reshape(-1, b_raw.shape[-1]),
+            b_len=torch.broadcast_to(b_lens, batch_shape).reshape(-1),
+        )
+        return Tensor(name="edit_distance", dims=batch_dims, raw_tensor=res_raw.reshape(batch_shape), dtype="int32")
+
     @staticmethod
     def create_parameter_raw(tensor: rf.Parameter, *, device: Optional[str] = None) -> torch.nn.Parameter:
         """
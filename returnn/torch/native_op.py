@@ -0,0 +1,583 @@
+"""
+PyTorch implementation of :mod:`returnn.native_op`.
+Wrappers for most relevant NativeOp ops.
+
+The C++ code of the ops (``c_fw_code``, ``c_bw_code``, ``c_extra_support_code``)
+together with ``native_op.cpp`` is compiled via :class:`returnn.util.native_code_compiler.NativeCodeCompiler`
+into a shared library, which is loaded via ctypes.
+We do not depend on the PyTorch C++ headers:
+The Python side allocates the outputs (via the shapes given in ``out_info``)
+and passes the data pointers, dims and strides of all tensors (see ``NativeOpTensor`` in ``native_op.cpp``).
+
+Currently, only the CPU variant of the kernels is compiled.
+Tensors on other devices are copied to the CPU and the outputs are copied back.
+"""
+
+from __future__ import annotations
+
+from typing import Optional, Any, Union, Callable, Sequence, List, Tuple, Dict
+import os
+import sys
+import ctypes
+from threading import RLock
+import torch
+
+import returnn.native_op as native_op
+from returnn.native_op import OpDescription
+from returnn.util.native_code_compiler import NativeCodeCompiler
+
+_base_dir = os.path.dirname(os.path.abspath(os.path.dirname(__file__)))
+_base_dir = os.path.realpath(_base_dir)  # Make canonical path-name.
+
+_dtypes = {"float32": torch.float32, "int32": torch.int32}
+
+
+class _NativeOpTensor(ctypes.Structure):
+    """
+    Like ``NativeOpTensor`` in ``native_op.cpp``.
+    """
+
+    _fields_ = [
+        ("data", ctypes.c_void_p),
+        ("ndim", ctypes.c_int64),
+        ("dims", ctypes.POINTER(ctypes.c_int64)),
+        ("strides", ctypes.POINTER(ctypes.c_int64)),
+        ("dtype_size", ctypes.c_int64),
+    ]
+
+
+class OpMaker:
+    """
+    Compiles the op (CPU code) and makes a callable for it, see :class:`NativeOp`.
+    """
+
+    global_lock = RLock()
+    lib_cache = {}  # type: Dict[str,ctypes.CDLL]  # cache_key -> lib
+    op_cache = {}  # type: Dict[str,NativeOp]  # cache_key -> op
+    log_stream = sys.stdout
+
+    def __init__(self, description: OpDescription, *, compiler_opts: Optional[Dict[str, Any]] = None):
+        """
+        :param description:
+        :param compiler_opts: passed on to :class:`NativeCodeCompiler` as kwargs
+        """
+        self.description = description
+        self.name = description.name
+        self.compiler_opts = compiler_opts or {}
+
+    @property
+    def cache_key(self) -> str:
+        """cache key"""
+        return self.name
+
+    @property
+    def support_native_op_cpp_filename(self) -> str:
+        """native_op.cpp"""
+        support_native_op_cpp_filename = "%s/native_op.cpp" % _base_dir
+        assert os.path.exists(support_native_op_cpp_filename)
+        return support_native_op_cpp_filename
+
+    def _make_code(self) -> str:
+        # In the user code, we assume that we have the following variables:
+        # int n_inputs; int n_outputs;
+        # Ndarray* inputs[n_inputs]; Ndarray** outputs[n_outputs];
+        # The outputs are already allocated and zeroed (or a copy of the input in case of want_inplace).
+        format_args = {
+            "op_name": self.name,
+            "user_code_kernels": self.description._reduce_c_extra_support_code(self.description.c_extra_support_code),
+            "code_compute": self.description.c_fw_code % {"fail": "assert(false);"},
+            "native_op_cpp_filename": self.support_native_op_cpp_filename,
+            "n_inputs": len(self.description.in_info),
+            "n_outputs": len(self.description.out_info),
+        }
+        return (
+            """
+    typedef float real;
+    typedef int integer;
+    extern "C" {
+    extern int sgemm_(char *transa, char *transb,
+      integer *m, integer *n, integer *k,
+      const real *alpha,
+      const real *a, integer *lda,
+      const real *b, integer *ldb,
+      const real *beta,
+      real *c, integer *ldc);
+    }
+
+    #define _ns  // so _ns::something will use the root namespace
+    #define TORCH 1
+    #define CUDA 0
+    #include "%(native_op_cpp_filename)s"
+
+    static const int n_inputs = %(n_inputs)i, n_outputs = %(n_outputs)i;
+
+    %(user_code_kernels)s
+
+    extern "C" void %(op_name)s_compute(Ndarray* inputs_, Ndarray* outputs_) {
+      Ndarray* inputs[n_inputs + 1];
+      Ndarray** outputs[n_outputs + 1];
+      Ndarray* output_ptrs[n_outputs + 1];
+      for(int i = 0; i < n_inputs; ++i)
+        inputs[i] = &inputs_[i];
+      for(int i = 0; i < n_outputs; ++i) {
+        output_ptrs[i] = &outputs_[i];
+        outputs[i] = &output_ptrs[i];
+      }
+      %(code_compute)s
+    }
+    """
+            % format_args
+        )
+
+    def _make_lib(self) -> ctypes.CDLL:
+        if self.cache_key in self.lib_cache:
+            return self.lib_cache[self.cache_key]
+        ld_flags = []
+        code = self._make_code()
+        # Only the ops which use matrix multiplication (e.g. the LSTM ops) need the sgemm symbol.
+        # Link to the BLAS lib which is already loaded (e.g. via Numpy).
+        if "sgemm" in self.description.c_fw_code or "affine_" in self.description.c_fw_code:
+            from returnn.util.basic import find_sgemm_libs_from_runtime
+
+            for fn in find_sgemm_libs_from_runtime() or []:
+                ld_flags += ["-L%s" % os.path.dirname(fn), "-l:%s" % os.path.basename(fn)]
+        comp = NativeCodeCompiler(
+            base_name="torch_%s" % self.name,
+            code_version=self.description.code_version,
+            code=code,
+            include_deps=[self.support_native_op_cpp_filename],
+            ld_flags=ld_flags,
+            log_stream=self.log_stream,
+            **dict(self.compiler_opts),
+        )
+        lib = comp.load_lib_ctypes()
+        func = getattr(lib, "%s_compute" % self.name)
+        func.argtypes = [ctypes.POINTER(_NativeOpTensor), ctypes.POINTER(_NativeOpTensor)]
+        func.restype = None
+        self.lib_cache[self.cache_key] = lib
+        return lib
+
+    def make_op(self) -> NativeOp:
+        """
+        :return: op
+        """
+        with self.global_lock:
+            if self.cache_key in self.op_cache:
+                return self.op_cache[self.cache_key]
+            assert self.description.cpu_support, "%s: no CPU support" % self.name
+            lib = self._make_lib()
+            grad_op = None
+            if self.description.is_grad_defined:
+                grad_op = OpMaker(description=self.description.grad(), compiler_opts=self.compiler_opts).make_op()
+            op = NativeOp(self.description, compute_func=getattr(lib, "%s_compute" % self.name), grad_op=grad_op)
+            self.op_cache[self.cache_key] = op
+        return op
+
+
+class NativeOp:
+    """
+    Callable for the op, see :func:`make_op`.
+    Inputs are converted to the dtype given in ``in_info``.
+    If the op has gradient code (``c_bw_code``), the gradient is defined via :class:`torch.autograd.Function`.
+    """
+
+    def __init__(
+        self, description: OpDescription, *, compute_func: Callable[..., None], grad_op: Optional[NativeOp] = None
+    ):
+        self.description = description
+        self.compute_func = compute_func
+        self.grad_op = grad_op
+
+    def __repr__(self):
+        return "<%s %s>" % (self.__class__.__name__, self.description.name)
+
+    def __call__(self, *inputs: Union[torch.Tensor, int, float, bool]) -> Tuple[torch.Tensor, ...]:
+        """
+        :param inputs: like ``in_info``
+        :return: outputs, like ``out_info``
+        """
+        assert len(inputs) == len(self.description.in_info), "%s: expected %i inputs, got %i" % (
+            self,
+            len(self.description.in_info),
+            len(inputs),
+        )
+        if self.grad_op is not None and torch.is_grad_enabled():
+            outputs = _NativeOpFunction.apply(self, *inputs)
+        else:
+            outputs = self.compute(*inputs)
+        if self.description.num_dummy_outs > 0:
+            outputs = outputs[: -self.description.num_dummy_outs]
+        return outputs
+
+    def compute(self, *inputs: Union[torch.Tensor, int, float, bool]) -> Tuple[torch.Tensor, ...]:
+        """
+        Runs the op, without any gradient.
+
+        :param inputs: like ``in_info``
+        :return: all outputs, like ``out_info``, including the dummy outputs
+        """
+        in_info, out_info = self.description.in_info, self.description.out_info
+        device = None
+        inputs_ = []  # type: List[torch.Tensor]
+        for in_idx, (x, info) in enumerate(zip(inputs, in_info)):
+            if isinstance(x, torch.Tensor):
+                if device is None:
+                    device = x.device
+                x = x.detach()
+            x = torch.as_tensor(x, dtype=_dtypes[info.get("dtype", "float32")], device="cpu").contiguous()
+            assert x.ndim == info["ndim"], "%s: input %i %r: expected ndim %i, got shape %r" % (
+                self,
+                in_idx,
+                info["name"],
+                info["ndim"],
+                tuple(x.shape),
+            )
+            for axis, d in enumerate(info["shape"]):
+                if isinstance(d, int):
+                    assert x.shape[axis] == d, "%s: input %i %r: expected shape[%i] == %i, got shape %r" % (
+                        self,
+                        in_idx,
+                        info["name"],
+                        axis,
+                        d,
+                        tuple(x.shape),
+                    )
+            inputs_.append(x)
+        outputs = [None] * len(out_info)  # type: List[Optional[torch.Tensor]]
+        for in_idx, info in enumerate(in_info):
+            out_idx = info.get("want_inplace", -1)
+            if out_idx >= 0:
+                # Like the TF variant, we always make a copy.
+                inputs_[in_idx] = inputs_[in_idx].clone()
+                outputs[out_idx] = inputs_[in_idx]
+        for out_idx, info in enumerate(out_info):
+            if outputs[out_idx] is not None:
+                continue
+            shape = [d if isinstance(d, int) else inputs_[d[0]].shape[d[1]] for d in info["shape"]]
+            outputs[out_idx] = torch.zeros(shape, dtype=_dtypes[info.get("dtype", "float32")])
+        keep_alive = []
+        self.compute_func(_make_tensor_structs(inputs_, keep_alive), _make_tensor_structs(outputs, keep_alive))
+        if device is not None and device.type != "cpu":
+            outputs = [y.to(device) for y in outputs]
+        return tuple(outputs)
+
+
+# noinspection PyMethodOverriding,PyAbstractClass,PyMissingOrEmptyDocstring
+class _NativeOpFunction(torch.autograd.Function):
+    @staticmethod
+    def forward(ctx, op: NativeOp, *inputs):
+        outputs = op.compute(*inputs)
+        ctx.op = op
+        ctx.num_inputs = len(inputs)
+        ctx.mark_non_differentiable(*[y for y in outputs if not y.is_floating_point()])
+        ctx.save_for_backward(*[x if isinstance(x, torch.Tensor) else torch.as_tensor(x) for x in inputs], *outputs)
+        return outputs
+
+    @staticmethod
+    def backward(ctx, *output_grads):
+        op = ctx.op  # type: NativeOp
+        saved = ctx.saved_tensors
+        inputs, outputs = saved[: ctx.num_inputs], saved[ctx.num_inputs :]
+        output_grads = [torch.zeros_like(y) if g is None else g for y, g in zip(outputs, output_grads)]
+        # noinspection PyProtectedMember
+        grad_inputs = op.description._filter_grad_inputs(list(inputs) + list(outputs) + output_grads)
+        grad_outputs = op.grad_op.compute(*grad_inputs)
+        if op.grad_op.description.num_dummy_outs > 0:
+            grad_outputs = grad_outputs[: -op.grad_op.description.num_dummy_outs]
+        grads = op.description.make_results_of_gradient(grad_outputs, disconnected_type=lambda: None)
+        return (None,) + tuple(grads)
+
+
+def _make_tensor_structs(tensors: Sequence[torch.Tensor], keep_alive: List[Any]) -> ctypes.Array:
+    """
+    :param tensors: on CPU
+    :param keep_alive: the dims and strides arrays are added here, as long as the structs are used
+    :return: array of :class:`_NativeOpTensor`
+    """
+    res = (_NativeOpTensor * max(len(tensors), 1))()
+    for i, x in enumerate(tensors):
+        dims = (ctypes.c_int64 * max(x.ndim, 1))(*x.shape)
+        strides = (ctypes.c_int64 * max(x.ndim, 1))(*x.stride())
+        keep_alive += [dims, strides]
+        res[i].data = x.data_ptr()
+        res[i].ndim = x.ndim
+        res[i].dims = dims
+        res[i].strides = strides
+        res[i].dtype_size = x.element_size()
+    return res
+
+
+def make_op(cls: type[native_op.NativeOpGenBase], **kwargs) -> NativeOp:
+    """
+    :param cls: e.g. :class:`returnn.native_op.FastBaumWelchOp`
+    :param kwargs: passed to :class:`OpMaker`
+    :return: op
+    """
+    maker = OpMaker(OpDescription.from_gen_base(cls), **kwargs)
+    return maker.make_op()
+
+
+def fast_baum_welch(
+    am_scores: torch.Tensor,
+    edges: torch.Tensor,
+    weights: torch.Tensor,
+    start_end_states: torch.Tensor,
+    float_idx: torch.Tensor,
+    state_buffer: Optional[torch.Tensor] = None,
+) -> Tuple[torch.Tensor, torch.Tensor]:
+    """
+    Wraps :class:`NativeOp.FastBaumWelchOp`. There is no gradient for this, see :func:`ctc_loss` for an example.
+
+    :param am_scores: (time, batch, dim), in -log space
+    :param edges: (4,num_edges), edges of the graph (from,to,emission_idx,sequence_idx)
+    :param weights: (num_edges,), weights of the edges
+    :param start_end_states: (2, batch), (start,end) state idx in automaton.
+        there is only one single automaton.
+    :param float_idx: (time, batch) -> 0 or 1 (index mask, via seq lens)
+    :param state_buffer: (2, num_states)
+    :return: (fwdbwd, obs_scores), fwdbwd is (time, batch, dim), obs_scores is (time, batch), in -log space
+    """
+    op = make_op(native_op.FastBaumWelchOp)
+    if state_buffer is None:
+        last_state_idx = int(start_end_states[1].max())  # see get_automata_for_batch
+        assert last_state_idx >= 0, "last_state_idx must be >= 0 but is: %i" % last_state_idx
+        state_buffer = torch.zeros((2, last_state_idx + 1))
+    fwdbwd, obs_scores = op(am_scores, edges, weights, start_end_states, float_idx, state_buffer)
+    return fwdbwd, obs_scores
+
+
+def get_ctc_fsa_fast_bw(
+    targets: torch.Tensor, seq_lens: torch.Tensor, blank_idx: int, label_loop: bool = True
+) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+    """
+    See :class:`NativeOp.GetCtcFsaFastBwOp`.
+    Generates a FSA with CTC topology. The output format is compatible to :func:`fast_baum_welch`.
+
+    :param targets: shape (batch,time), int
+    :param seq_lens: shape (batch), int
+    :param blank_idx: vocab index of the blank symbol
+    :param label_loop: True -> normal CTC; False -> RNA-like
+    :return: edges, weights, start_end_states;
+      edges is (4,num_edges), int32, edges of the graph (from,to,emission_idx,sequence_idx).
+      weights is (num_edges,), float32. all zero.
+      start_end_states is (2,batch), int32, (start,end) state idx in FSA.
+    """
+    assert targets.ndim == 2
+    n_batch = targets.shape[0]
+    # The FSA construction expects that the time dim of the targets is exactly the max seq len.
+    # An invalid FSA can cause a crash in the FastBaumWelchOp.
+    n_time = int(seq_lens.max()) if n_batch > 0 else 0
+    assert n_time <= targets.shape[1], "get_ctc_fsa_fast_bw: seq_lens %r invalid for targets shape %r" % (
+        seq_lens,
+        tuple(targets.shape),
+    )
+    targets = targets[:, :n_time]
+    n_edges = n_batch * (5 * (n_time - 1) + 10)  # see op documentation
+    weights = torch.zeros((n_edges,), device=targets.device)
+    op = make_op(native_op.GetCtcFsaFastBwOp)
+    edges, start_end_states = op(targets, seq_lens, blank_idx, weights, label_loop)
+    return edges, weights, start_end_states
+
+
+def ctc_loss(
+    logits: torch.Tensor,
+    logits_seq_lens: torch.Tensor,
+    logits_time_major: bool,
+    targets: torch.Tensor,
+    targets_seq_lens: torch.Tensor,
+    *,
+    ctc_merge_repeated: bool = True,
+    logits_normalize: bool = True,
+    grad_wrt_softmax_in: bool = True,
+    blank_index: int = -1,
+) -> torch.Tensor:
+    """
+    Similar to :func:`torch.nn.functional.ctc_loss`.
+    We use our :func:`fast_baum_welch`.
+    Also see :func:`returnn.tf.native_op.ctc_loss`.
+
+    :param logits: (time,batch,dim) or (batch,time,dim). unnormalized (before softmax)
+    :param logits_seq_lens: shape (batch,) of int32|int64
+    :param logits_time_major:
+    :param targets: batch-major, [batch,time]
+    :param targets_seq_lens: (batch,)
+    :param ctc_merge_repeated: False -> RNA-like topology, i.e. no label loop
+    :param logits_normalize: apply log_softmax on logits (default).
+      if False, you might also set grad_wrt_softmax_in=False
+    :param grad_wrt_softmax_in: assume ``p(s|x) = softmax(logits)``, and define the gradient w.r.t. logits.
+      This is ``p(s|x) - bw``, where ``bw`` is the Baum-Welch soft alignment.
+      If logits are already normalized (e.g. we just use ``log p(s|x) = logits``),
+      the error signal to logits should be ``-bw``.
+    :param blank_index: vocab index of the blank symbol
+    :return: loss, shape (batch,)
+    """
+    assert logits.ndim == 3
+    dim = logits.shape[-1]
+    if not logits_time_major:
+        logits = logits.transpose(0, 1)  # (time,batch,dim)
+    if logits_normalize:
+        log_sm = torch.nn.functional.log_softmax(logits, dim=-1)  # (time,batch,dim)
+    else:
+        log_sm = logits
+    seq_mask = _sequence_mask_time_major(logits_seq_lens, max_len=logits.shape[0])  # (time,batch)
+
+    if blank_index < 0:
+        blank_index += dim
+    assert 0 <= blank_index < dim
+    edges, weights, start_end_states = get_ctc_fsa_fast_bw(
+        targets=targets, seq_lens=targets_seq_lens, blank_idx=blank_index, label_loop=ctc_merge_repeated
+    )
+    with torch.no_grad():
+        fwdbwd, obs_scores = fast_baum_welch(
+            am_scores=-log_sm, float_idx=seq_mask, edges=edges, weights=weights, start_end_states=start_end_states
+        )
+        loss = obs_scores[0]  # (batch,)
+        bw = torch.exp(-fwdbwd)  # (time,batch,dim)
+        if grad_wrt_softmax_in:
+            grad_x = torch.exp(log_sm) - bw  # (time,batch,dim)
+        else:
+            grad_x = -bw  # (time,batch,dim)
+        grad_x = torch.where(seq_mask[:, :, None], grad_x, 0.0)
+    loss = generic_loss_and_error_signal(loss=loss[None, :, None], x=logits, grad_x=grad_x)
+    return loss[0, :, 0]
+
+
+def fast_viterbi(
+    am_scores: torch.Tensor,
+    am_seq_len: torch.Tensor,
+    edges: torch.Tensor,
+    weights: torch.Tensor,
+    start_end_states: torch.Tensor,
+) -> Tuple[torch.Tensor, torch.Tensor]:
+    """
+    Wraps :class:`NativeOp.FastViterbiOp`.
+
+    :param am_scores: (time, batch, dim), in +log space (unlike fast_baum_welch)
+    :param am_seq_len: (batch,), int32
+    :param edges: (4,num_edges), edges of the graph (from,to,emission_idx,sequence_idx)
+    :param weights: (num_edges,), weights of the edges
+    :param start_end_states: (2, batch), (start,end) state idx in automaton.
+        there is only one single automaton.
+    :return: (alignment, scores), alignment is (time, batch), scores is (batch,), in +log space
+    """
+    n_states = int(start_end_states[1].max()) + 1
+    op = make_op(native_op.FastViterbiOp)
+    alignment, scores = op(am_scores, am_seq_len, edges, weights, start_end_states, n_states)
+    return alignment, scores
+
+
+def ctc_loss_viterbi(
+    logits: torch.Tensor,
+    logits_seq_lens: torch.Tensor,
+    logits_time_major: bool,
+    targets: torch.Tensor,
+    targets_seq_lens: torch.Tensor,
+    *,
+    blank_index: int = -1,
+) -> torch.Tensor:
+    """
+    Similar to :func:`ctc_loss`.
+    However, instead of using the full sum, we use the best path (i.e. Viterbi instead of Baum-Welch).
+    We use our :func:`fast_viterbi`.
+
+    :param logits: (time,batch,dim) or (batch,time,dim). unnormalized (before softmax)
+    :param logits_seq_lens: shape (batch,) of int32|int64
+    :param logits_time_major:
+    :param targets: batch-major, [batch,time]
+    :param targets_seq_lens: (batch,)
+    :param blank_index: vocab index of the blank symbol
+    :return: loss, shape (batch,)
+    """
+    assert logits.ndim == 3
+    dim = logits.shape[-1]
+    if not logits_time_major:
+        logits = logits.transpose(0, 1)  # (time,batch,dim)
+    log_sm = torch.nn.functional.log_softmax(logits, dim=-1)  # (time,batch,dim)
+
+    if blank_index < 0:
+        blank_index += dim
+    assert 0 <= blank_index < dim
+    edges, weights, start_end_states = get_ctc_fsa_fast_bw(
+        targets=targets, seq_lens=targets_seq_lens, blank_idx=blank_index
+    )
+    with torch.no_grad():
+        alignment, scores = fast_viterbi(
+            am_scores=log_sm,
+            am_seq_len=logits_seq_lens,
+            edges=edges,
+            weights=weights,
+            start_end_states=start_end_states,
+        )
+        loss = -scores  # (batch,)
+        # Gradient of the CE w.r.t. the alignment.
+        seq_mask = _sequence_mask_time_major(logits_seq_lens, max_len=logits.shape[0])  # (time,batch)
+        ce_grad = torch.exp(log_sm) - torch.nn.functional.one_hot(alignment.long(), dim).to(log_sm.dtype)
+        ce_grad = torch.where(seq_mask[:, :, None], ce_grad, 0.0)
+    loss = generic_loss_and_error_signal(loss=loss[None, :, None], x=logits, grad_x=ce_grad)
+    return loss[0, :, 0]
+
+
+def edit_distance(a: torch.Tensor, a_len: torch.Tensor, b: torch.Tensor, b_len: torch.Tensor) -> torch.Tensor:
+    """
+    Wraps :class:`NativeOp.EditDistanceOp`.
+
+    :param a: (batch,time1), int
+    :param a_len: (batch,), int
+    :param b: (batch,time2), int
+    :param b_len: (batch,), int
+    :return: (batch,) tensor, int32, un-normalized edit distance
+    """
+    op = make_op(native_op.EditDistanceOp)
+    (res,) = op(a, a_len, b, b_len)
+    return res
+
+
+def optimal_completion_edit_distance(
+    a: torch.Tensor, a_len: torch.Tensor, b: torch.Tensor, b_len: torch.Tensor
+) -> torch.Tensor:
+    """
+    Wraps :class:`NativeOp.OptimalCompletionEditDistanceOp`.
+
+    :param a: (batch,time1), int. prefix
+    :param a_len: (batch,), int
+    :param b: (batch,time2), int
+    :param b_len: (batch,), int
+    :return: (batch,) tensor, int32, un-normalized edit distance
+    """
+    op = make_op(native_op.OptimalCompletionEditDistanceOp)
+    (res,) = op(a, a_len, b, b_len)
+    return res
+
+
+# noinspection PyMethodOverriding,PyAbstractClass,PyMissingOrEmptyDocstring
+class _GenericLossAndErrorSignal(torch.autograd.Function):
+    @staticmethod
+    def forward(ctx, loss: torch.Tensor, x: torch.Tensor, grad_x: torch.Tensor):
+        ctx.save_for_backward(grad_x)
+        return loss.clone()
+
+    @staticmethod
+    def backward(ctx, grad_loss):
+        (grad_x,) = ctx.saved_tensors
+        # grad_loss is broadcastable to grad_x, e.g. (1,batch,1) vs (time,batch,dim).
+        return None, grad_loss * grad_x, None
+
+
+def generic_loss_and_error_signal(*, loss: torch.Tensor, x: torch.Tensor, grad_x: torch.Tensor) -> torch.Tensor:
+    """
+    Like :func:`returnn.tf.util.basic.CustomGradient.generic_loss_and_error_signal`.
+    Expects that loss = loss(x), and grad_x = \\partial loss / \\partial x.
+
+    :param loss: shape broadcastable to x
+    :param x:
+    :param grad_x: same shape as x
+    :return: loss but with the gradient for x
+    """
+    return _GenericLossAndErrorSignal.apply(loss.detach(), x, grad_x.detach())
+
+
+def _sequence_mask_time_major(seq_lens: torch.Tensor, *, max_len: int) -> torch.Tensor:
+    """
+    :return: (time,batch), bool
+    """
+    return torch.arange(max_len, device=seq_lens.device)[:, None] < seq_lens.to(torch.int64)[None, :]
@@ -16,6 +16,7 @@ from returnn.log import log
 from returnn.util.basic import RefIdEq
 import returnn.frontend as rf
 from returnn.torch.frontend.bridge import wrapped_pt_module_to_rf_module
+from returnn.torch.util.async_checkpoint import AsyncCheckpointWriter, save_checkpoint
 
 _OptimizerClassesDictInitialized = False
 _OptimizerClassesDict = {}
@@ -212,6 +213,14 @@ class Updater(object):
         """
         print("Load optimizer %s" % filename, file=log.v4)
         optimizer_state = torch.load(filename, map_location=self._device)
+        self.load_optimizer_checkpoint(optimizer_state)
+
+    def load_optimizer_checkpoint(self, optimizer_state: Dict[str, Any]):
+        """
+        Loads the optimizer state, as returned by :func:`get_optimizer_checkpoint`, into self.optimizer.
+
+        :param optimizer_state: the optimizer checkpoint. The dict is modified.
+        """
         assert isinstance(optimizer_state, dict), f"optimizer_state is not a dict but {type(optimizer_state)}"
         if "optimizer" not in optimizer_state and "param_groups" in optimizer_state and "state" in optimizer_state:
             # Old format, convert to new format.
@@ -306,42 +315,44 @@ class Updater(object):
                 param_names.append(param_id_to_name[id(p)])
         return param_names, param_id_to_name
 
-    def save_optimizer(self, filename):
+    def save_optimizer(self, filename, *, checkpoint_writer: Optional[AsyncCheckpointWriter] = None):
         """
         Saves the state of self.optimizer to a file.
 
         :param str filename: File in which to save the optimizer state.
+        :param checkpoint_writer: if given, the state is written asynchronously
         """
         directory = os.path.dirname(filename)
         if directory and not os.path.exists(directory):
             os.makedirs(directory, exist_ok=True)
 
+        print("Save optimizer under %s" % filename, file=log.v4)
+        obj = self.get_optimizer_checkpoint()
+        if checkpoint_writer:
+            checkpoint_writer.save(obj, filename, name="optimizer")
+        else:
+            save_checkpoint(obj, filename)
+
+    def get_optimizer_checkpoint(self) -> Dict[str, Any]:
+        """
+        :return: the optimizer state with the meta information, as it is saved by :func:`save_optimizer`
+        """
         # We use optimizer.state_dict() below.
         # That will only save param order indices
         # but not the name of the parameters.
         # We also save a mapping of parameter indices to names.
         param_names, _ = self._get_opt_param_names()
 
-        print("Save optimizer under %s" % filename, file=log.v4)
-        # First write to a temp-file, to be sure that writing happens without errors,
-        # and only afterward rename to the target file.
-        tmp_filename = filename + ".tmp_write"
-        if os.path.exists(tmp_filename):
-            os.unlink(tmp_filename)
-        torch.save(
-            {
-                "optimizer": self.optimizer.state_dict(),
-                "optimizer_class_name": self.optimizer.__class__.__name__,
-                "optimizer_opts": self._optimizer_opts,
-                "param_names": param_names,
-                "epoch": self._current_epoch,
-                "step": self._current_train_step,
-                "effective_learning_rate": self.get_effective_learning_rate(),
-                "returnn_version": returnn.__long_version__,
-            },
-            tmp_filename,
-        )
-        os.rename(tmp_filename, filename)
+        return {
+            "optimizer": self.optimizer.state_dict(),
+            "optimizer_class_name": self.optimizer.__class__.__name__,
+            "optimizer_opts": self._optimizer_opts,
+            "param_names": param_names,
+            "epoch": self._current_epoch,
+            "step": self._current_train_step,
+            "effective_learning_rate": self.get_effective_learning_rate(),
+            "returnn_version": returnn.__long_version__,
+        }
 
     def get_optimizer(self):
         """
@@ -0,0 +1,137 @@
+"""
+Checkpoint saving (``torch.save``), either directly or asynchronously in a background thread.
+
+In the asynchronous mode, the state (e.g. model and optimizer ``state_dict()``) is first copied to CPU memory
+(a snapshot, such that training can continue and modify the parameters),
+and then written to the file in a background thread.
+The training only blocks for the snapshot, and when a new save starts while the previous one is still writing.
+"""
+
+from __future__ import annotations
+from typing import Optional, Any, Tuple, Dict
+import os
+import time
+import threading
+import torch
+
+from returnn.log import log
+
+
+def save_checkpoint(obj: Any, filename: str):
+    """
+    ``torch.save``, but first writes to a temp file, to be sure that writing happens without errors,
+    and only afterward renames it to the target file.
+    """
+    tmp_filename = filename + ".tmp_write"
+    if os.path.exists(tmp_filename):
+        os.unlink(tmp_filename)
+    torch.save(obj, tmp_filename)
+    os.rename(tmp_filename, filename)
+
+
+class AsyncCheckpointWriter:
+    """
+    Snapshots the objects to CPU memory and writes them via :func:`save_checkpoint` in background threads.
+    """
+
+    def __init__(self, *, pin_memory: bool = False):
+        """
+        :param pin_memory: snapshot into pinned memory, which allows a faster (non-blocking) copy from the GPU.
+            The pinned buffers are reused for the next save.
+        """
+        self.pin_memory = pin_memory and torch.cuda.is_available()
+        self._jobs = {}  # type: Dict[str,Tuple[threading.Thread,Dict[str,Any]]]  # name -> thread, info
+        # (name, path in the object) -> pinned buffer
+        self._pinned_buffers = {}  # type: Dict[Tuple[Any,...],torch.Tensor]
+
+    def save(self, obj: Any, filename: str, *, name: Optional[str] = None):
+        """
+        Snapshots the object and starts writing it in the background.
+        If a previous save with the same name is still running, waits for it first.
+
+        :param obj: e.g. dict with ``state_dict()``. tensors (also nested in dicts, lists, tuples) are copied
+        :param filename:
+        :param name: identifies the kind of checkpoint (e.g. "model", "optimizer"), used for reusing the buffers.
+            filename by default
+        """
+        name = name or filename
+        self._wait_job(name)
+        start_time = time.time()
+        snapshot = self._snapshot(obj, (name,), memo={})
+        if self.pin_memory:
+            torch.cuda.synchronize()  # the non-blocking copies
+        info = {"filename": filename, "snapshot_secs": time.time() - start_time, "exception": None}
+        thread = threading.Thread(
+            target=self._write, args=(snapshot, info), name=f"{self.__class__.__name__} {name}", daemon=False
+        )
+        self._jobs[name] = (thread, info)
+        thread.start()
+
+    def wait(self, name: Optional[str] = None):
+        """
+        Waits for all pending writes, e.g. before the next save, or at exit.
+        Reraises an exception from the writing.
+
+        :param name: if given, only waits for the pending write with this name (see :func:`save`)
+        """
+        for name_ in [name] if name else list(self._jobs.keys()):
+            self._wait_job(name_)
+
+    def _wait_job(self, name: str):
+        if name not in self._jobs:
+            return
+        thread, info = self._jobs.pop(name)
+        start_time = time.time()
+        thread.join()
+        print(
+            "Saved %s: snapshot %.2f secs (blocking), write %.2f secs (background), waited %.2f secs for it"
+            % (info["filename"], info["snapshot_secs"], info.get("write_secs", 0.0), time.time() - start_time),
+            file=log.v4,
+        )
+        if info["exception"] is not None:
+            raise info["exception"]
+
+    @staticmethod
+    def _write(snapshot: Any, info: Dict[str, Any]):
+        start_time = time.time()
+        try:
+            save_checkpoint(snapshot, info["filename"])
+        except Exception as exc:
+            info["exception"] = exc
+        info["write_secs"] = time.time() - start_time
+
+    def _snapshot(self, obj: Any, path: Tuple[Any, ...], *, memo: Dict[Tuple[Any, ...], torch.Tensor]) -> Any:
+        if isinstance(obj, torch.Tensor):
+            # Keep shared tensors (e.g. tied weights) shared in the snapshot.
+            key = (
+                obj.device,
+                obj.untyped_storage().data_ptr(),
+                obj.storage_offset(),
+                obj.dtype,
+                tuple(obj.shape),
+                tuple(obj.stride()),
+            )
+            if key not in memo:
+                memo[key] = self._snapshot_tensor(obj, path)
+            return memo[key]
+        if isinstance(obj, dict):
+            res = type(obj)((k, self._snapshot(v, path + (k,), memo=memo)) for k, v in obj.items())
+            if getattr(obj, "__dict__", None):  # e.g. _metadata of the module state_dict()
+                res.__dict__.update(obj.__dict__)
+            return res
+        if isinstance(obj, (list, tuple)) and not hasattr(obj, "_fields"):  # not namedtuple
+            return type(obj)(self._snapshot(v, path + (i,), memo=memo) for i, v in enumerate(obj))
+        return obj  # assume immutable
+
+    def _snapshot_tensor(self, tensor: torch.Tensor, path: Tuple[Any, ...]) -> torch.Tensor:
+        tensor = tensor.detach()
+        if not self.pin_memory or tensor.device.type != "cuda":
+            if tensor.device.type == "cpu":
+                return tensor.clone()
+            return tensor.to("cpu")
+        buffer = self._pinned_buffers.get(path)
+        if buffer is None or buffer.shape != tensor.shape or buffer.dtype != tensor.dtype:
+            buffer = torch.empty(tensor.shape, dtype=tensor.dtype, device="cpu", pin_memory=True)
+            self._pinned_buffers[path] = buffer
+        buffer.copy_(tensor, non_blocking=True)
+        return buffer
@@ -4,6 +4,7 @@ Provide basic Byte-Pair-Encoding (BPE) utilities.
 
 import re
 import typing
+from collections import OrderedDict
 import numpy
 
 
@@ -19,21 +20,28 @@ class StandardBytePairEncoder:
     The text will not be smaller, but use only a fixed vocabulary, with rare words
     encoded as variable-length sequences of subword units.
 
+    The segmentation of a word is deterministic, and the word frequencies are Zipfian,
+    so the segmented words are kept in a LRU cache (``word_cache_size``).
+
     Reference:
     Rico Sennrich, Barry Haddow and Alexandra Birch (2016). Neural Machine Translation of Rare Words with Subword Units.
     Proceedings of the 54th Annual Meeting of the Association for Computational Linguistics (ACL 2016). Berlin, Germany.
 
     """
 
-    def __init__(self, bpe_codes_file, labels=None):
+    def __init__(self, bpe_codes_file, labels=None, word_cache_size=100000):
         """
         :param str bpe_codes_file: codes file
         :param list[str]|None labels: vocab
+        :param int|None word_cache_size: max number of words in the LRU cache. None means unlimited, 0 disables it
         """
         self.labels = labels
         self._load(bpe_codes_file)
-        self._bpe_encode_cache = {}
+        self._bpe_encode_cache = OrderedDict()  # type: typing.OrderedDict[str,typing.Sequence[str]]
         self._bpe_separator = BpeMergeSymbol
+        self.word_cache_size = word_cache_size
+        self.word_cache_hits = 0
+        self.word_cache_misses = 0
 
     _file_cache = {}  # filename -> bpe_file_version, bpe_codes, bpe_codes_reverse
 
@@ -83,8 +91,12 @@ class StandardBytePairEncoder:
         :rtype: tuple[str]
         """
 
-        if orig in self._bpe_encode_cache:
-            return self._bpe_encode_cache[orig]
+        word = self._bpe_encode_cache.get(orig)
+        if word is not None:
+            self.word_cache_hits += 1
+            self._bpe_encode_cache.move_to_end(orig)
+            return word
+        self.word_cache_misses += 1
 
         if self._bpe_file_version == (0, 1):
             word = tuple(orig) + ("</w>",)
@@ -135,9 +147,26 @@ class StandardBytePairEncoder:
         if self.labels:
             word = self._check_vocab_and_split(word, self._bpe_codes_reverse, self.labels, self._bpe_separator)
 
-        self._bpe_encode_cache[orig] = word
+        if self.word_cache_size is None or self.word_cache_size > 0:
+            self._bpe_encode_cache[orig] = word
+            if self.word_cache_size is not None and len(self._bpe_encode_cache) > self.word_cache_size:
+                self._bpe_encode_cache.popitem(last=False)
         return word
 
+    def get_word_cache_stats_str(self):
+        """
+        :return: e.g. for logging: hits, misses, hit rate, size of the word cache
+        :rtype: str
+        """
+        total = self.word_cache_hits + self.word_cache_misses
+        return "BPE word cache: %i hits, %i misses, hit rate %.1f%%, %i/%s words" % (
+            self.word_cache_hits,
+            self.word_cache_misses,
+            100.0 * self.word_cache_hits / max(total, 1),
+            len(self._bpe_encode_cache),
+            self.word_cache_size if self.word_cache_size is not None else "unlimited",
+        )
+
     def _check_vocab_and_split(self, orig, bpe_codes, vocab, separator):
         """
         Check for each segment in word if it is in-vocabulary,
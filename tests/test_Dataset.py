@@ -482,6 +482,41 @@ def test_get_seq_order():
         assert set(all_partitions_seq_index) == set(seq_index)
 
 
+def test_get_seq_order_seq_lens():
+    dataset = Dataset()
+    num_seqs = 100
+    seq_lens = numpy.array([i**2 % 17 for i in range(num_seqs)], dtype="uint8")
+
+    for seq_ordering in [
+        "sorted",
+        "sorted_reverse",
+        "laplace:3",
+        "laplace:.10",
+        "sort_bin_shuffle:3",
+        "sort_bin_shuffle_x2:.10",
+    ]:
+        dataset.seq_ordering = seq_ordering
+        seq_index_ref = dataset.get_seq_order_for_epoch(3, num_seqs, lambda i: int(seq_lens[i]))
+        seq_index = dataset.get_seq_order_for_epoch(3, num_seqs, seq_lens=seq_lens)
+        seq_index_ = dataset.get_seq_order_for_epoch(3, num_seqs, seq_lens=lambda: seq_lens)
+        assert list(seq_index_ref) == list(seq_index) == list(seq_index_)
+        if seq_ordering == "sorted_reverse":
+            assert list(seq_lens[seq_index]) == sorted(seq_lens, reverse=True)
+
+
+def test_get_seq_order_unique_seq_tags_filter():
+    dataset = Dataset(seq_ordering="random", unique_seq_tags=True)
+    num_seqs = 20
+    all_tags = ["seq-%i" % (i % 7) for i in range(num_seqs)]
+    dataset.get_all_tags = lambda: all_tags
+    dataset.get_total_num_seqs = lambda: num_seqs
+    seq_index = dataset.get_seq_order_for_epoch(1, num_seqs)
+    assert sorted(all_tags[i] for i in seq_index) == sorted(set(all_tags))
+    dataset.seq_tags_filter = {"seq-1", "seq-3"}
+    seq_index_ = dataset.get_seq_order_for_epoch(1, num_seqs)
+    assert list(seq_index_) == [i for i in seq_index if all_tags[i] in dataset.seq_tags_filter]
+
+
 @contextlib.contextmanager
 def create_ogg_zip_txt_only_dataset_opts(*, text: str = "hello world", seq_tag: str = "sequence0.wav"):
     """create OggZipDataset"""
@@ -584,6 +619,207 @@ def test_OggZipDataset():
         assert classes_ == _demo_txt + "."
 
 
+def test_OggZipDataset_seq_index_cache():
+    from returnn.datasets.audio import OggZipDataset
+
+    with create_ogg_zip_txt_only_dataset_mult_seqs(num_seqs=20) as dataset, tempfile.TemporaryDirectory() as tmp_dir:
+        assert isinstance(dataset, OggZipDataset)
+        dataset.seq_ordering = "sorted"
+        dataset.init_seq_order(epoch=1)
+        ref_seqs = dummy_iter_dataset(dataset)
+        for i in range(2):  # first creates the cache, second uses it
+            dataset_ = OggZipDataset(
+                path=dataset.paths[0],
+                audio=None,
+                targets=dataset.targets,
+                seq_ordering="sorted",
+                seq_index_cache=tmp_dir,
+            )
+            dataset_.init_seq_order(epoch=1)
+            compare_dataset_seqs(ref_seqs, dummy_iter_dataset(dataset_))
+            assert len(os.listdir(tmp_dir)) == 1
+
+
+def test_get_data_batch():
+    def _check(dataset: Dataset, key: str):
+        dataset.init_seq_order(epoch=1)
+        dataset.load_seqs(0, 7)
+        seq_idxs = [4, 0, 2]
+        values = dataset.get_data_batch(seq_idxs, key)
+        assert len(values) == len(seq_idxs)
+        for seq_idx, v in zip(seq_idxs, values):
+            numpy.testing.assert_array_equal(v, dataset.get_data(seq_idx, key))
+
+    _check(DummyDatasetMultipleSequenceLength(input_dim=2, output_dim=3, num_seqs=7), "data")
+    with create_ogg_zip_txt_only_dataset_mult_seqs(num_seqs=7) as dataset:  # CachedDataset2
+        _check(dataset, "classes")
+
+
+def test_OggZipDataset_feature_cache():
+    import io
+    import wave
+    import zipfile
+    from returnn.datasets.audio import OggZipDataset
+
+    try:
+        import soundfile  # noqa
+    except ImportError:
+        raise unittest.SkipTest("soundfile not installed")
+
+    rnd = numpy.random.RandomState(42)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        zip_fn = tmp_dir + "/corpus.zip"
+        seqs = []
+        with zipfile.ZipFile(zip_fn, "w") as zip_file:
+            for i in range(5):
+                audio = (rnd.uniform(-0.5, 0.5, size=(rnd.randint(2000, 5000),)) * 2**15).astype("int16")
+                buf = io.BytesIO()
+                with wave.open(buf, "wb") as wav_file:
+                    wav_file.setnchannels(1)
+                    wav_file.setsampwidth(2)
+                    wav_file.setframerate(16000)
+                    wav_file.writeframes(audio.tobytes())
+                zip_file.writestr("corpus/seq%i.wav" % i, buf.getvalue())
+                seqs.append({"text": "seq %i" % i, "duration": len(audio) / 16000.0, "file": "seq%i.wav" % i})
+            zip_file.writestr("corpus.txt", repr(seqs))
+
+        def _get_seqs(audio, feature_cache):
+            dataset = OggZipDataset(
+                path=zip_fn, audio=audio, targets=None, feature_cache=feature_cache, seq_ordering="sorted"
+            )
+            dataset.init_seq_order(epoch=1)
+            res = dummy_iter_dataset(dataset)
+            dataset.finish_epoch()
+            return res, dataset
+
+        audio_opts = {"features": "log_mel_filterbank", "num_feature_filters": 5, "backend": "numpy"}
+        ref_seqs, _ = _get_seqs(audio_opts, False)
+        cache_dir = tmp_dir + "/cache"
+        for i in range(2):  # first fills the cache, second uses it
+            seqs_, dataset = _get_seqs(audio_opts, cache_dir)
+            compare_dataset_seqs(ref_seqs, seqs_)
+            (cache,) = dataset._feature_caches
+            assert len(cache) == 5 and cache.num_hits == (5 if i else 0)
+        assert len(os.listdir(cache_dir)) == 1
+        # Other feature options use another cache.
+        _get_seqs(dict(audio_opts, num_feature_filters=3), cache_dir)
+        assert len(os.listdir(cache_dir)) == 2
+        # Non-deterministic features are not cached.
+        _, dataset = _get_seqs(dict(audio_opts, random_permute={"rnd_zoom_switch": 0.0}), cache_dir)
+        assert dataset._feature_caches is None
+        assert len(os.listdir(cache_dir)) == 2
+        # The content of the norm file is part of the key, not just the filename.
+        norm_fn = tmp_dir + "/norm_mean.txt"
+        for i, value in enumerate([0.0, 1.0]):
+            numpy.savetxt(norm_fn, numpy.full((5,), value))
+            _get_seqs(dict(audio_opts, norm_mean=norm_fn), cache_dir)
+            assert len(os.listdir(cache_dir)) == 3 + i
+        # Changing the audio (the zip file) invalidates the cache.
+        with zipfile.ZipFile(zip_fn, "a") as zip_file:
+            zip_file.writestr("corpus/unused.wav", b"")
+        _get_seqs(audio_opts, cache_dir)
+        assert len(os.listdir(cache_dir)) == 5
+
+
+def test_seq_order_seq_lens_file_seq_index_cache():
+    with tempfile.NamedTemporaryFile(
+        suffix=".txt", mode="w"
+    ) as seq_lens_file, tempfile.TemporaryDirectory() as tmp_dir:
+        num_seqs = 17
+        seq_lens = {"seq-%i" % i: (i * 7) % 11 + 1 for i in range(num_seqs)}
+        seq_lens_file.write(repr(seq_lens))
+        seq_lens_file.flush()
+        seq_orders = []
+        for seq_index_cache in [False, tmp_dir, tmp_dir]:
+            dataset = DummyDataset(
+                input_dim=2,
+                output_dim=3,
+                num_seqs=num_seqs,
+                seq_order_seq_lens_file=seq_lens_file.name,
+                seq_index_cache=seq_index_cache,
+            )
+            dataset.seq_ordering = "sorted"  # DummyDataset resets this in the constructor
+            seq_orders.append(list(dataset.get_seq_order_for_epoch(epoch=1, num_seqs=num_seqs)))
+        assert len(os.listdir(tmp_dir)) == 1
+        assert seq_orders[0] == seq_orders[1] == seq_orders[2]
+        assert [seq_lens["seq-%i" % i] for i in seq_orders[0]] == sorted(seq_lens.values())
+
+
+def test_LmDataset_token_ids_cache():
+    from returnn.config import Config, global_config_ctx
+    from returnn.datasets.lm import LmDataset
+
+    with tempfile.TemporaryDirectory() as tmp_dir, global_config_ctx(Config({"backend": "torch"})):
+        with open(tmp_dir + "/corpus.txt", "w") as f:
+            f.write("hello world\nabc\n</s>\nhello  x\nwhat?\nabc abc abc\n")
+        with open(tmp_dir + "/symbols.txt", "w") as f:
+            f.write("\n".join(["[END]", "[UNKNOWN]", " "] + list("abcdehlorw")) + "\n")
+
+        def _get_seqs(**kwargs):
+            dataset = LmDataset(
+                corpus_file=tmp_dir + "/corpus.txt",
+                orth_symbols_file=tmp_dir + "/symbols.txt",
+                error_on_invalid_seq=False,
+                seq_ordering="sorted",
+                **kwargs,
+            )
+            dataset.init_seq_order(epoch=1)
+            seqs = []
+            seq_idx = 0
+            while dataset.is_less_than_num_seqs(seq_idx):
+                dataset.load_seqs(seq_idx, seq_idx + 1)
+                seqs.append((dataset.get_tag(seq_idx), dataset.get_data(seq_idx, "data").tolist()))
+                seq_idx += 1
+            return dataset, seqs
+
+        _, seqs = _get_seqs()
+        print(seqs)
+        assert len(seqs) == 3  # "</s>" is ignored, "hello  x" and "what?" are invalid
+        assert not any(fn.endswith(".npy") for fn in os.listdir(tmp_dir))
+        dataset1, seqs1 = _get_seqs(token_ids_cache=True)
+        assert dataset1.orths is None and dataset1.num_skipped == 2
+        assert sorted(fn.split(".")[-2] for fn in os.listdir(tmp_dir) if fn.endswith(".npy")) == ["flags", "offsets"]
+        dataset2, seqs2 = _get_seqs(token_ids_cache=True)  # now loaded
+        assert isinstance(dataset2._token_ids, numpy.memmap)
+        # The seq lens for sorting are the num of tokens instead of the num of chars,
+        # but that does not make a difference here.
+        assert seqs == seqs1 == seqs2
+
+        _, seqs3 = _get_seqs(token_ids_cache=True, auto_replace_unknown_symbol=True)  # different options
+        assert len(seqs3) == 5
+        assert len([fn for fn in os.listdir(tmp_dir) if fn.endswith(".offsets.npy")]) == 2
+
+
+def test_ExtractAudioFeatures_numpy_backend():
+    from returnn.datasets.util.feature_extraction import ExtractAudioFeatures
+
+    try:
+        import librosa  # noqa
+    except ImportError:
+        librosa = None
+    rnd = numpy.random.RandomState(42)
+    audios = [rnd.uniform(-1.0, 1.0, size=(n,)) for n in [16000, 12345, 3001]]
+    for features, opts in [
+        ("mfcc", {"with_delta": 1}),
+        ("log_mel_filterbank", {"preemphasis": 0.97}),
+        ("db_mel_filterbank", {"feature_options": {"fmin": 60, "fmax": 7600}}),
+        ("linear_spectrogram", {"num_feature_filters": 256, "join_frames": 2}),
+    ]:
+        feature_extractor = ExtractAudioFeatures(features=features, backend="numpy", **opts)
+        batch = feature_extractor.get_audio_features_batch([audio.copy() for audio in audios], sample_rate=16000)
+        assert len(batch) == len(audios)
+        for audio, x in zip(audios, batch):
+            x_ = feature_extractor.get_audio_features(audio.copy(), sample_rate=16000)
+            assert x.dtype == x_.dtype == numpy.float32 and x.shape[1] == feature_extractor.get_feature_dimension()
+            numpy.testing.assert_allclose(x, x_, rtol=1e-5, atol=1e-5)
+            if librosa:
+                ref = ExtractAudioFeatures(features=features, **opts).get_audio_features(
+                    audio.copy(), sample_rate=16000
+                )
+                assert ref.shape == x.shape
+                numpy.testing.assert_allclose(x, ref, rtol=1e-4, atol=1e-4 * numpy.max(numpy.abs(ref)))
+
+
 def test_MetaDataset():
     _demo_txt = "some utterance text"
 
@@ -204,6 +204,23 @@ def test_BytePairEncoding_unicode():
     )
 
 
+def test_BytePairEncoding_word_cache_get_seqs():
+    opts = dict(
+        bpe_file="%s/bpe-unicode-demo.codes" % my_dir,
+        vocab_file="%s/bpe-unicode-demo.vocab" % my_dir,
+        unknown_label="<unk>",
+    )
+    bpe = BytePairEncoding(word_cache_size=3, **opts)
+    bpe_no_cache = BytePairEncoding(word_cache_size=0, **opts)
+    sentences = ["råt råt iz ďër iz ďër ám àn iz", "ďër ë låk ë kod áv dres", "wër yù wêk dù ďë àsk kod råt"] * 3
+    seqs = [bpe.get_seq(sentence) for sentence in sentences]
+    assert_equal(seqs, [bpe_no_cache.get_seq(sentence) for sentence in sentences])
+    assert len(bpe.bpe._bpe_encode_cache) == 3 and len(bpe_no_cache.bpe._bpe_encode_cache) == 0
+    assert bpe.bpe.word_cache_hits > 0 and bpe_no_cache.bpe.word_cache_hits == 0
+    print(bpe.bpe.get_word_cache_stats_str())
+    assert_equal(bpe.get_seqs(sentences, num_workers=2), seqs)
+
+
 if __name__ == "__main__":
     better_exchook.install()
     if len(sys.argv) <= 1:
@@ -295,6 +295,71 @@ def test_SimpleHDFWriter_small():
         print(repr(gzip.compress(open(fn, "rb").read())))
 
 
+def test_SimpleHDFWriter_write_thread_compression():
+    fn = get_test_tmp_file(suffix=".hdf")
+    os.remove(fn)  # SimpleHDFWriter expects that the file does not exist
+    n_dim = 5
+    writer = SimpleHDFWriter(
+        filename=fn, dim=n_dim, labels=None, write_thread=True, write_queue_size=2, compression="gzip"
+    )
+    rnd = numpy.random.RandomState(42)
+    seq_lens, seqs, classes = [], [], []
+    inputs = numpy.zeros((4, 20, n_dim), dtype="float32")
+    for batch_idx in range(10):
+        seq_lens_ = rnd.randint(1, 21, size=(4,))
+        # Reuse the same buffer, to check that the writer copies the data.
+        inputs[:] = rnd.normal(size=inputs.shape)
+        classes_ = rnd.randint(0, 10, size=(4, 20)).astype("int32")
+        writer.insert_batch(
+            inputs=inputs[:, : max(seq_lens_)],
+            seq_len=seq_lens_,
+            seq_tag=["seq-%i" % (len(seq_lens) + i) for i in range(4)],
+            extra={"classes": classes_[:, : max(seq_lens_)]},
+        )
+        seq_lens += seq_lens_.tolist()
+        seqs += [inputs[i, : seq_lens_[i]].copy() for i in range(4)]
+        classes += [classes_[i, : max(seq_lens_)] for i in range(4)]  # extra is not cut by seq_len
+    writer.close()
+
+    with h5py.File(fn, "r") as f:
+        assert f["inputs"].compression == "gzip"
+        assert f["inputs"].shape == (sum(seq_lens), n_dim)  # preallocation was trimmed
+        assert f["seqLengths"].shape == (len(seq_lens), 2)
+        assert f.attrs["numSeqs"] == len(seq_lens)
+
+    dataset = HDFDataset(files=[fn])
+    reader = DatasetTestReader(dataset=dataset)
+    reader.read_all()
+    assert reader.num_seqs == len(seq_lens)
+    assert_equal(reader.seq_tags, ["seq-%i" % i for i in range(len(seq_lens))])
+    for i, seq_len in enumerate(seq_lens):
+        assert reader.seq_lens[i]["data"] == seq_len
+        numpy.testing.assert_array_equal(reader.data["data"][i], seqs[i])
+        numpy.testing.assert_array_equal(reader.data["classes"][i], classes[i])
+
+
+def test_HDFDatasetWriter_write_thread():
+    from returnn.datasets.basic import init_dataset
+
+    opts = {"class": "Task12AXDataset", "num_seqs": 23}
+    fn = get_test_tmp_file(suffix=".hdf")
+    hdf_writer = HDFDatasetWriter(fn, write_thread=True, write_queue_size=3, compression="gzip")
+    hdf_writer.dump_from_dataset(init_dataset(opts), use_progress_bar=False)
+    hdf_writer.close()
+
+    dataset = init_dataset(opts)
+    dataset.init_seq_order(epoch=1)
+    hdf_dataset = HDFDataset(files=[fn])
+    hdf_dataset.init_seq_order(epoch=1)
+    assert hdf_dataset.num_seqs == dataset.num_seqs == 23
+    for seq_idx in range(23):
+        dataset.load_seqs(seq_idx, seq_idx + 1)
+        hdf_dataset.load_seqs(seq_idx, seq_idx + 1)
+        assert hdf_dataset.get_tag(seq_idx) == dataset.get_tag(seq_idx)
+        for key in ["data", "classes"]:
+            numpy.testing.assert_array_equal(hdf_dataset.get_data(seq_idx, key), dataset.get_data(seq_idx, key))
+
+
 def test_read_simple_hdf():
     if sys.version_info[0] <= 2:  # gzip.decompress is >=PY3
         raise unittest.SkipTest
@@ -725,6 +790,28 @@ def test_HDFDataset_no_cache_efficiency():
     # TODO... check alloc intervals etc
 
 
+def test_HDFDataset_use_mmap_seq_cache():
+    hdf_fn = generate_hdf_from_other({"class": "Task12AXDataset", "num_seqs": 23})
+    ds_ref = HDFDataset(files=[hdf_fn], cache_byte_size=0)
+    ds = HDFDataset(files=[hdf_fn], cache_byte_size=0, use_mmap=True, seq_cache_size=5)
+    for ds_ in [ds_ref, ds]:
+        ds_.initialize()
+        ds_.init_seq_order(epoch=1)
+    assert ds.num_seqs == ds_ref.num_seqs == 23
+    for seq_idx in list(range(ds.num_seqs)) + [3, 2, 3]:
+        ds_ref.load_seqs(seq_idx, seq_idx + 1)
+        ds.load_seqs(seq_idx, seq_idx + 1)
+        for key in ds.get_data_keys():
+            data_ref = ds_ref.get_data(seq_idx, key)
+            data = ds.get_data(seq_idx, key)
+            assert data.dtype == data_ref.dtype and data.shape == data_ref.shape
+            assert (data == data_ref).all()
+            data += 1  # inplace modification by the caller should not affect the cache
+    assert len(ds._seq_cache) == 5
+    # The default HDFDatasetWriter layout is contiguous, so this should use the memmap.
+    assert any(isinstance(v, numpy.memmap) for v in ds.cached_h5_datasets[0].values())
+
+
 def test_HDFDataset_pickle():
     hdf_fn = generate_hdf_from_other({"class": "Task12AXDataset", "num_seqs": 23})
     ds = HDFDataset(files=[hdf_fn], cache_byte_size=0)
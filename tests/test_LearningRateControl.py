@@ -86,6 +86,122 @@ def test_load():
         numpy.testing.assert_allclose(data.error["dev_error_output/output_prob"], 0.16270349413262444)
 
 
+def test_save_load_jsonl():
+    import tempfile
+
+    with tempfile.NamedTemporaryFile(mode="w") as f:
+        filename = f.name
+    control = ConstantLearningRate(default_learning_rate=1.0, filename=filename, file_format="jsonl")
+    for epoch in range(1, 4):
+        control.get_learning_rate_for_epoch(epoch)
+        control.set_epoch_error(epoch, {"train_score": 1.0 / epoch})
+        control.save()
+        control.set_epoch_error(epoch, {"dev_score": 2.0 / epoch, "dev_error": float("nan")})
+        control.epoch_data[epoch].meta["num_steps"] = numpy.int64(epoch * 10)
+        control.save()
+        control.save()  # no change, nothing appended
+    lines = open(filename).read().splitlines()
+    assert len(lines) == 1 + 2 * 3  # header, and two records per epoch
+    control2 = ConstantLearningRate(default_learning_rate=1.0, filename=filename, file_format="jsonl")
+    assert set(control2.epoch_data.keys()) == {1, 2, 3}
+    assert_equal(control2.epoch_data[2].error["train_score"], 0.5)
+    assert_equal(control2.epoch_data[2].error["dev_score"], 1.0)
+    assert numpy.isnan(control2.epoch_data[2].error["dev_error"])
+    assert_equal(control2.epoch_data[3].meta, {"num_steps": 30})
+    assert_equal(read_learning_rate_file(filename).keys(), control2.epoch_data.keys())
+    # Continue the journal.
+    control2.set_epoch_error(3, {"dev_score": 0.5})
+    control2.save()
+    assert len(open(filename).read().splitlines()) == 1 + 2 * 3 + 1
+    assert_equal(read_learning_rate_file(filename)[3].error["dev_score"], 0.5)
+    os.remove(filename)
+
+
+def test_jsonl_compaction():
+    import tempfile
+
+    with tempfile.NamedTemporaryFile(mode="w") as f:
+        filename = f.name
+    control = ConstantLearningRate(
+        default_learning_rate=1.0, filename=filename, file_format="jsonl", journal_compact_min_num_records=10
+    )
+    control.get_learning_rate_for_epoch(1)
+    control.get_learning_rate_for_epoch(2)
+    num_lines = []
+    for i in range(20):
+        control.set_epoch_error(2, {"train_score": float(i)})
+        control.save()
+        num_lines.append(len(open(filename).read().splitlines()))
+    assert max(num_lines) <= 1 + 10
+    assert min(num_lines[1:]) == 1 + 2  # compacted at some point
+    data = read_learning_rate_file(filename)
+    assert_equal(data[2].error["train_score"], 19.0)
+    os.remove(filename)
+
+
+def test_jsonl_serializes_only_changed_epochs():
+    import tempfile
+    from unittest import mock
+    import returnn.learning_rate_control as lrc
+
+    with tempfile.NamedTemporaryFile(mode="w") as f:
+        filename = f.name
+    control = ConstantLearningRate(default_learning_rate=1.0, filename=filename, file_format="jsonl")
+    for epoch in range(1, 11):
+        control.set_epoch_error(epoch, {"train_score": float(epoch)})
+    control.save()
+    with mock.patch.object(lrc, "_epoch_data_to_json_line", wraps=lrc._epoch_data_to_json_line) as to_json:
+        control.set_epoch_error(3, {"dev_score": 1.0})
+        control.save()
+        assert_equal(sorted(call[0][0] for call in to_json.call_args_list), [3, 10])  # changed, and most recent
+        to_json.reset_mock()
+        control.epoch_data[5] = control.EpochData(learning_rate=0.5)  # replaced, e.g. synced from another worker
+        control.save()
+        assert_equal(sorted(call[0][0] for call in to_json.call_args_list), [5, 10])
+    assert len(open(filename).read().splitlines()) == 1 + 10 + 2
+    data = read_learning_rate_file(filename)
+    assert_equal(data[3].error, {"train_score": 3.0, "dev_score": 1.0})
+    assert_equal(data[5].learning_rate, 0.5)
+    os.remove(filename)
+
+
+def test_jsonl_broken_last_line():
+    import tempfile
+
+    with tempfile.NamedTemporaryFile(mode="w") as f:
+        filename = f.name
+    control = ConstantLearningRate(default_learning_rate=1.0, filename=filename, file_format="jsonl")
+    control.get_learning_rate_for_epoch(1)
+    control.set_epoch_error(1, {"train_score": 1.0})
+    control.save()
+    with open(filename, "a") as f:
+        f.write('{"epoch": 2, "learning_')  # e.g. killed while writing
+    control = ConstantLearningRate(default_learning_rate=1.0, filename=filename, file_format="jsonl")
+    assert set(control.epoch_data.keys()) == {1}
+    control.get_learning_rate_for_epoch(2)
+    control.save()
+    assert set(read_learning_rate_file(filename).keys()) == {1, 2}
+    os.remove(filename)
+
+
+def test_convert_py_to_jsonl():
+    import tempfile
+
+    with tempfile.NamedTemporaryFile(mode="w") as f:
+        filename = f.name
+    control = ConstantLearningRate(default_learning_rate=1.0, filename=filename)
+    control.get_learning_rate_for_epoch(1)
+    control.set_epoch_error(1, {"train_score": 1.0})
+    control.save()
+    assert "EpochData(" in open(filename).read()
+    control = ConstantLearningRate(default_learning_rate=1.0, filename=filename, file_format="jsonl")
+    assert_equal(control.epoch_data[1].error, {"train_score": 1.0})
+    control.save()
+    assert "EpochData(" not in open(filename).read()
+    assert_equal(read_learning_rate_file(filename)[1].error, {"train_score": 1.0})
+    os.remove(filename)
+
+
 def test_init_error_old():
     config = Config()
     config.update({"learning_rate_control": "newbob", "learning_rate_control_error_measure": "dev_score"})
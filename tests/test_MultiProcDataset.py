@@ -64,6 +64,109 @@ def test_MultiProcDataset_n3_b5_shuffle():
         compare_dataset_seqs(hdf_dataset_seqs, mp_dataset_seqs)
 
 
+def test_MultiProcDataset_n3_b5_shuffle_shared_memory():
+    hdf_fn = generate_hdf_from_other({"class": "Task12AXDataset", "num_seqs": 23})
+    hdf_dataset_dict = {"class": "HDFDataset", "files": [hdf_fn], "seq_ordering": "random"}
+    hdf_dataset = init_dataset(hdf_dataset_dict)
+    hdf_dataset_seqs = dummy_iter_dataset(hdf_dataset)
+
+    with timeout():
+        mp_dataset = MultiProcDataset(dataset=hdf_dataset_dict, num_workers=3, buffer_size=5, transport="shared_memory")
+        mp_dataset.initialize()
+        mp_dataset_seqs = dummy_iter_dataset(mp_dataset)
+
+        compare_dataset_seqs(hdf_dataset_seqs, mp_dataset_seqs)
+
+
+def test_MultiProcDataset_shared_memory_reuse():
+    from returnn.datasets.basic import DatasetSeq
+
+    hdf_fn = generate_hdf_from_other({"class": "Task12AXDataset", "num_seqs": 50})
+    hdf_dataset_dict = {"class": "HDFDataset", "files": [hdf_fn]}
+    hdf_dataset = init_dataset(hdf_dataset_dict)
+    hdf_dataset_seqs = dummy_iter_dataset(hdf_dataset)
+
+    with timeout():
+        # Small buffer, such that it must wrap around, and sometimes must fall back to the pipe.
+        mp_dataset = MultiProcDataset(
+            dataset=hdf_dataset_dict,
+            num_workers=1,
+            buffer_size=2,
+            transport="shared_memory",
+            shared_memory_size=4096,
+        )
+        mp_dataset.initialize()
+        mp_dataset.init_seq_order(epoch=1)
+        data_keys = mp_dataset.get_data_keys()
+        mp_dataset_seqs = []
+        seq_idx = 0
+        while mp_dataset.is_less_than_num_seqs(seq_idx):
+            mp_dataset.load_seqs(seq_idx, seq_idx + 1)
+            # Copy, such that the shared memory can be reused.
+            features = {key: numpy.array(mp_dataset.get_data(seq_idx, key)) for key in data_keys}
+            mp_dataset_seqs.append(DatasetSeq(seq_idx=seq_idx, seq_tag=mp_dataset.get_tag(seq_idx), features=features))
+            seq_idx += 1
+
+        compare_dataset_seqs(hdf_dataset_seqs, mp_dataset_seqs)
+
+
+def test_MultiProcDataset_n3_b5_read_ahead_load_ranges():
+    from returnn.datasets.basic import DatasetSeq
+
+    hdf_fn = generate_hdf_from_other({"class": "Task12AXDataset", "num_seqs": 23})
+    hdf_dataset_dict = {"class": "HDFDataset", "files": [hdf_fn], "seq_ordering": "random"}
+    hdf_dataset = init_dataset(hdf_dataset_dict)
+    hdf_dataset_seqs = dummy_iter_dataset(hdf_dataset)
+
+    with timeout():
+        mp_dataset = MultiProcDataset(dataset=hdf_dataset_dict, num_workers=3, buffer_size=5, read_ahead_size=7)
+        mp_dataset.initialize()
+        for epoch in [1, 2]:
+            mp_dataset.init_seq_order(epoch=epoch)
+            data_keys = mp_dataset.get_data_keys()
+            mp_dataset_seqs = []
+            seq_idx = 0
+            while mp_dataset.is_less_than_num_seqs(seq_idx):
+                mp_dataset.load_seqs(seq_idx, seq_idx + 4)
+                for seq_idx_ in range(seq_idx, seq_idx + 4):
+                    if not mp_dataset.is_less_than_num_seqs(seq_idx_):
+                        break
+                    features = {key: mp_dataset.get_data(seq_idx_, key) for key in data_keys}
+                    mp_dataset_seqs.append(
+                        DatasetSeq(seq_idx=seq_idx_, seq_tag=mp_dataset.get_tag(seq_idx_), features=features)
+                    )
+                seq_idx += 4
+            if epoch == 1:
+                compare_dataset_seqs(hdf_dataset_seqs, mp_dataset_seqs)
+            else:
+                assert len(mp_dataset_seqs) == len(hdf_dataset_seqs)
+
+
+def test_MultiProcDataset_n3_b5_shuffle_dynamic():
+    hdf_fn = generate_hdf_from_other({"class": "Task12AXDataset", "num_seqs": 23})
+    hdf_dataset_dict = {"class": "HDFDataset", "files": [hdf_fn], "seq_ordering": "random"}
+    hdf_dataset = init_dataset(hdf_dataset_dict)
+    hdf_dataset_seqs = dummy_iter_dataset(hdf_dataset)
+
+    with timeout():
+        mp_dataset = MultiProcDataset(
+            dataset=hdf_dataset_dict,
+            num_workers=3,
+            buffer_size=5,
+            read_ahead_size=4,
+            scheduling="dynamic",
+            transport="shared_memory",
+        )
+        mp_dataset.initialize()
+        mp_dataset_seqs = dummy_iter_dataset(mp_dataset)
+        compare_dataset_seqs(hdf_dataset_seqs, mp_dataset_seqs)
+
+        # Again, to check the reset for the new epoch.
+        mp_dataset.finish_epoch()
+        mp_dataset_seqs = dummy_iter_dataset(mp_dataset)
+        compare_dataset_seqs(hdf_dataset_seqs, mp_dataset_seqs)
+
+
 def test_MultiProcDataset_meta():
     hdf_fn = generate_hdf_from_other({"class": "Task12AXDataset", "num_seqs": 23})
     meta_dataset_dict = {
@@ -123,6 +123,175 @@ def test_window():
         dataset2._exit_handler()
 
 
+def _add_sprint_cache_entry(archive, name, content, compress=False):
+    """
+    :param returnn.sprint.cache.FileArchive archive:
+    :param str name:
+    :param bytes content:
+    :param bool compress:
+    """
+    import zlib
+    from returnn.sprint.cache import FileInfo
+
+    data = zlib.compress(content) if compress else content
+    archive.write_U32(archive.start_recovery_tag)
+    archive.write_u32(len(name))
+    archive.write_str(name)
+    pos = archive.f.tell()
+    archive.write_u32(len(content))
+    archive.write_u32(len(data) if compress else 0)
+    archive.write_u32(0)
+    archive.f.write(data)
+    archive.ft[name] = FileInfo(name, pos, len(content), len(data) if compress else 0, len(archive.ft))
+    archive.write_U32(archive.end_recovery_tag)
+
+
+def test_SprintCacheDataset_vectorized_read():
+    import struct
+    import tempfile
+    import numpy
+    from returnn.sprint.cache import FileArchive
+    from returnn.datasets.sprint import SprintCacheDataset
+
+    rnd = numpy.random.RandomState(42)
+    allophones = ["si{#+#}@i@f", "a{#+#}", "b{#+#}"]
+    # seq name -> list of (n, mixes) RLE items (n == 0: new time), where mix = allo + state * 2**26
+    rle = {
+        "corpus/seq0/1": [(2, [0, 1 + 2 * 2**26]), (-3, [2 + 2**26]), (0, [10]), (1, [1])],
+        "corpus/seq1/1": [(-4, [0]), (2, [2, 1 + 2**26])],
+    }
+    num_frames = {name: sum(abs(n) for (n, _) in items) for name, items in rle.items()}
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with open(tmp_dir + "/allophones", "w") as f:
+            f.write("# comment\n" + "\n".join(allophones) + "\n")
+        with open(tmp_dir + "/phonemes", "w") as f:
+            f.write("si\na\nb\n")
+        feats = {name: rnd.normal(size=(n, 3)).astype("float32") for name, n in num_frames.items()}
+        archive = FileArchive(tmp_dir + "/feat.cache", must_exists=False)
+        for i, (name, feat) in enumerate(feats.items()):
+            times = [(0.01 * t, 0.01 * t + 0.025) for t in range(len(feat))]
+            if i == 0:
+                archive.add_feature_cache(name, feat, times)
+            else:
+                content = struct.pack("I", 10) + b"vector-f32" + struct.pack("I", len(feat))
+                for x, t in zip(feat, times):
+                    content += struct.pack("I", 3) + x.tobytes() + struct.pack("dd", *t)
+                _add_sprint_cache_entry(archive, name, content, compress=True)
+        archive.finalize()
+        archive.f.close()
+        archive = FileArchive(tmp_dir + "/align.cache", must_exists=False)
+        for i, (name, items) in enumerate(rle.items()):
+            content = struct.pack("I", 14) + b"flow-alignment" + struct.pack("i", 0) + b"ALIGNRLE"
+            content += struct.pack("I", num_frames[name])
+            for n, values in items:
+                content += struct.pack("b", n) + struct.pack("%ii" % len(values), *values)
+            _add_sprint_cache_entry(archive, name, content, compress=i == 1)
+        archive.finalize()
+        archive.f.close()
+
+        archive = FileArchive(tmp_dir + "/feat.cache")
+        for name, feat in feats.items():
+            times, data = archive.read_features(name)
+            times_, data_ = archive.read(name, "feat")
+            assert data.shape == feat.shape and times.shape == (len(feat), 2)
+            numpy.testing.assert_array_equal(data, feat)
+            numpy.testing.assert_array_equal(data, numpy.array(data_))
+            numpy.testing.assert_array_equal(times, numpy.array(times_))
+        archive = FileArchive(tmp_dir + "/align.cache")
+        archive.set_allophones(tmp_dir + "/allophones")
+        for name in rle.keys():
+            for raw in [False, True]:
+                times, allos, states, weights = archive.read_alignment(name, raw=raw)
+                ref = archive.read(name, "align_raw" if raw else "align")
+                assert_equal(times.tolist(), [t for (t, _, _, _) in ref])
+                assert_equal(allos.tolist(), [a for (_, a, _, _) in ref])
+                if not raw:
+                    assert_equal(states.tolist(), [s for (_, _, s, _) in ref])
+                assert_equal(weights.tolist(), [w for (_, _, _, w) in ref])
+
+        dataset = SprintCacheDataset(
+            data={
+                "data": {"filename": tmp_dir + "/feat.cache"},
+                "classes": {
+                    "filename": tmp_dir + "/align.cache",
+                    "allophone_labeling": {
+                        "silence_phone": "si",
+                        "allophone_file": tmp_dir + "/allophones",
+                        "phoneme_file": tmp_dir + "/phonemes",
+                    },
+                },
+            }
+        )
+        dataset.init_seq_order(epoch=1)
+        dataset.load_seqs(0, 2)
+        for seq_idx in range(2):
+            name = dataset.get_tag(seq_idx)
+            numpy.testing.assert_array_equal(dataset.get_data(seq_idx, "data"), feats[name])
+            # The phonemes are in the same order as the allophones here, so the label is the allophone idx.
+            ref_labels = [a for (_, a, _, _) in archive.read(name, "align")]
+            assert_equal(dataset.get_data(seq_idx, "classes").tolist(), ref_labels)
+
+
+def test_SprintCacheDataset_bundle_index():
+    import tempfile
+    import numpy
+    from returnn.sprint.cache import FileArchive, FileArchiveBundle
+    from returnn.datasets.sprint import SprintCacheDataset
+
+    rnd = numpy.random.RandomState(42)
+    feats = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with open(tmp_dir + "/feat.bundle", "w") as bundle_file:
+            for i in range(5):
+                archive = FileArchive("%s/feat.cache.%i" % (tmp_dir, i), must_exists=False)
+                for j in range(3):
+                    name = "corpus/seq%i-%i/1" % (i, j)
+                    feats[name] = rnd.normal(size=(rnd.randint(1, 10), 2)).astype("float32")
+                    archive.add_feature_cache(name, feats[name], [(t, t + 1.0) for t in range(len(feats[name]))])
+                archive.finalize()
+                archive.f.close()
+                bundle_file.write("feat.cache.%i\n" % i)
+
+        index_file = tmp_dir + "/index/feat.bundle.npz"
+        for i in range(2):  # first creates the index, second uses it
+            bundle = FileArchiveBundle(tmp_dir + "/feat.bundle", index_file=index_file, max_open_archives=2)
+            assert len(bundle._open_archives) == (2 if i == 0 else 0)
+            assert os.path.exists(index_file)
+            assert sorted(n for n in bundle.file_list() if not n.endswith(".attribs")) == sorted(feats.keys())
+            for name, feat in feats.items():
+                assert bundle.has_entry(name)
+                times, data = bundle.read_features(name)
+                numpy.testing.assert_array_equal(data, feat)
+                assert len(bundle._open_archives) <= 2
+            _, data_ = bundle.read(list(feats.keys())[0], "feat")
+            numpy.testing.assert_array_equal(numpy.array(data_), list(feats.values())[0])
+            # Compatibility: archives and files, via the LRU pool.
+            assert sorted(bundle.archives.keys()) == sorted("%s/feat.cache.%i" % (tmp_dir, i) for i in range(5))
+            assert set(bundle.files.keys()) == set(bundle.file_list())
+            for name, feat in feats.items():
+                archive = bundle.files[name]
+                assert name in archive.ft
+                _, data_ = archive.read(name, "feat")
+                numpy.testing.assert_array_equal(numpy.array(data_), feat)
+                assert len(bundle._open_archives) <= 2
+            assert all(archive.ft for archive in bundle.archives.values())
+
+        dataset = SprintCacheDataset(
+            data={
+                "data": {
+                    "filename": tmp_dir + "/feat.bundle",
+                    "bundle_index_cache": tmp_dir + "/index",
+                    "max_open_archives": 1,
+                }
+            }
+        )
+        dataset.init_seq_order(epoch=1)
+        dataset.load_seqs(0, len(feats))
+        for seq_idx in range(len(feats)):
+            numpy.testing.assert_array_equal(dataset.get_data(seq_idx, "data"), feats[dataset.get_tag(seq_idx)])
+
+
 if __name__ == "__main__":
     better_exchook.install()
     if len(sys.argv) <= 1:
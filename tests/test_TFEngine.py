@@ -335,6 +335,13 @@ def test_engine_train_keras_optimizer():
     test_engine_train(additional_config)
 
 
+def test_engine_train_data_provider_num_threads():
+    additional_config = {
+        "data_provider_num_threads": 3,
+    }
+    test_engine_train(additional_config)
+
+
 def test_engine_train_new_dataset_pipeline():
     from returnn.datasets.generating import DummyDataset
 
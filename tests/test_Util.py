@@ -537,6 +537,86 @@ def test_native_signal_handler():
     install_native_signal_handler(reraise_exceptions=True)
 
 
+def test_DynamicBatcher_BatchingHTTPServer():
+    import threading
+    import json
+    import time
+    from urllib.request import urlopen
+    from http.server import BaseHTTPRequestHandler
+    from returnn.engine.batching_server import DynamicBatcher, BatchingHTTPServer
+
+    batch_sizes = []
+
+    def _process_batch(inputs):
+        batch_sizes.append(len(inputs))
+        assert [len(x) for x in inputs] == sorted([len(x) for x in inputs], reverse=True)
+        time.sleep(0.05)  # simulate some computation, such that requests queue up
+        return [x.upper() for x in inputs]
+
+    class _Handler(BaseHTTPRequestHandler):
+        # noinspection PyPep8Naming
+        def do_POST(self):
+            """handle"""
+            data = self.rfile.read(int(self.headers["Content-Length"])).decode("utf8")
+            res = self.server.batcher.process(data)
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(res.encode("utf8"))
+
+        def log_message(self, *args):
+            """silent"""
+
+    batcher = DynamicBatcher(_process_batch, max_batch_size=4, max_wait_time=0.02)
+    httpd = BatchingHTTPServer(port=0, handler_cls=_Handler, batcher=batcher)
+    port = httpd.server_address[1]
+    server_thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    server_thread.start()
+
+    num_requests = 12
+    results = [None] * num_requests
+
+    def _client(idx):
+        with urlopen("http://localhost:%i/" % port, data=("req%s" % ("x" * idx)).encode("utf8")) as f:
+            results[idx] = f.read().decode("utf8")
+
+    clients = [threading.Thread(target=_client, args=(i,)) for i in range(num_requests)]
+    for t in clients:
+        t.start()
+    for t in clients:
+        t.join()
+    assert results == ["REQ%s" % ("X" * i) for i in range(num_requests)]
+    assert sum(batch_sizes) == num_requests and max(batch_sizes) <= 4
+    assert len(batch_sizes) < num_requests  # some requests were batched together
+
+    with urlopen("http://localhost:%i/stats" % port) as f:
+        stats = json.loads(f.read().decode("utf8"))
+    print(stats)
+    assert stats["num_requests"] == num_requests and stats["num_batches"] == len(batch_sizes)
+    assert batcher.latency.num == num_requests
+    assert 0.05 <= batcher.latency.get_percentile(0.5) <= batcher.latency.max_seen_time
+    print(batcher.get_report_str())
+
+    httpd.shutdown()
+    server_thread.join()
+    httpd.server_close()
+
+
+def test_DynamicBatcher_exception():
+    from returnn.engine.batching_server import DynamicBatcher
+
+    def _process_batch(inputs):
+        if "fail" in inputs:
+            raise ValueError("fail")
+        return inputs
+
+    batcher = DynamicBatcher(_process_batch)
+    batcher.start()
+    assert batcher.process("ok") == "ok"
+    assert_raises(ValueError, batcher.process, "fail")
+    assert batcher.process("ok2") == "ok2"
+    batcher.stop()
+
+
 if __name__ == "__main__":
     better_exchook.install()
     if len(sys.argv) <= 1:
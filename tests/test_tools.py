@@ -226,3 +226,38 @@ def test_compile_tf_graph_transducer_time_sync_delayed_recurrent_step():
         os.path.join(tmp_dir, "returnn.config"),
     ]
     run(*args)
+
+
+###############################
+# Tests for torch_avg_checkpoints.py
+###############################
+
+
+def test_torch_avg_checkpoints():
+    import torch
+    from returnn.util.basic import generic_import_module
+
+    mod = generic_import_module(os.path.join(base_dir, "tools/torch_avg_checkpoints.py"))
+    tmp_dir = tempfile.mkdtemp()
+    in_ckpts = []
+    params = []
+    for epoch in range(1, 4):
+        param = {
+            "w": torch.randn(3, 4),
+            "b": torch.randn(4).to(torch.bfloat16),
+            "num_batches_tracked": torch.tensor(epoch * 10),
+        }
+        params.append(param)
+        in_ckpts.append(os.path.join(tmp_dir, "epoch.%03i.pt" % epoch))
+        torch.save({"model": param, "epoch": epoch, "step": epoch * 100, "effective_learning_rate": 0.1}, in_ckpts[-1])
+    out_ckpt = os.path.join(tmp_dir, "avg.pt")
+    mod.merge_checkpoints(in_ckpts, out_ckpt, num_threads=2, chunk_size_bytes=100)  # multiple chunks
+    out_state = torch.load(out_ckpt)
+    assert out_state["epoch"] == 3 and out_state["step"] == 300
+    assert out_state["merged_epochs"] == [1, 2, 3] and out_state["merged_steps"] == [100, 200, 300]
+    assert out_state["effective_learning_rate"] == 0.1
+    assert list(out_state["model"].keys()) == ["w", "b", "num_batches_tracked"]
+    for k, v in out_state["model"].items():
+        expected = sum(param[k].double() for param in params) / len(params)
+        assert v.dtype == (params[0][k].dtype if params[0][k].is_floating_point() else torch.float32)
+        torch.testing.assert_close(v, expected.to(v.dtype))
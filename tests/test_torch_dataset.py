@@ -6,6 +6,7 @@ import _setup_test_env  # noqa
 from typing import Optional, Any, Dict
 import sys
 import unittest
+import numpy
 import torch
 from torch.utils.data import DataLoader
 
@@ -155,6 +156,112 @@ def test_func_in_global_config():
         assert c == 3
 
 
+def test_BucketBatchingIterDataPipe():
+    def _get_batches() -> list:
+        dataset = Task12AXDataset(num_seqs=100)
+        wrapped_dataset = returnn_dataset_wrapper.ReturnnDatasetIterDataPipe(dataset)
+        batches_dataset = data_pipeline.BucketBatchingIterDataPipe(
+            wrapped_dataset, batch_size=100, max_seqs=10, buffer_size=30, seed=1
+        )
+        res = []
+        for batch in batches_dataset:
+            res.append([str(seq["seq_tag"]) for seq in batch])
+            assert len(batch) <= 10
+            assert len(batch) == 1 or max(seq["data"].shape[0] for seq in batch) * len(batch) <= 100
+        return res
+
+    batches = _get_batches()
+    seq_tags = sum(batches, [])
+    assert len(seq_tags) == len(set(seq_tags)) == 100
+    # Deterministic.
+    assert batches == _get_batches()
+
+
+def test_collate_batch():
+    import numpy
+
+    rnd = numpy.random.RandomState(42)
+    batch = [
+        {
+            "data": rnd.normal(size=(n, 3)).astype("float32"),
+            "classes": rnd.randint(0, 10, size=(n,)).astype("uint32"),
+            "alignment": rnd.randint(0, 10, size=(n + 1,)).astype("uint16"),
+            "scalar": numpy.array(i, dtype="int32"),
+            "seq_tag": numpy.array("seq-%i" % i),
+        }
+        for i, n in enumerate([5, 2, 7, 0])
+    ]
+    res = data_pipeline.collate_batch(batch)
+    assert set(res.keys()) == {
+        "data",
+        "data:seq_len",
+        "classes",
+        "classes:seq_len",
+        "alignment",
+        "alignment:seq_len",
+        "scalar",
+        "seq_tag",
+    }
+    for key in ["data", "classes", "alignment"]:
+        ls = [data_pipeline.create_tensor(seq[key]) for seq in batch]
+        ref = torch.nn.utils.rnn.pad_sequence(ls, batch_first=True, padding_value=0)
+        assert res[key].dtype == ref.dtype and torch.equal(res[key], ref)
+        assert res[key + ":seq_len"].dtype == torch.int32
+        assert res[key + ":seq_len"].tolist() == [seq[key].shape[0] for seq in batch]
+    assert res["classes"].dtype == torch.int64 and res["alignment"].dtype == torch.int32
+    assert res["scalar"].tolist() == [0, 1, 2, 3]
+    assert isinstance(res["seq_tag"], numpy.ndarray) and res["seq_tag"].tolist() == ["seq-0", "seq-1", "seq-2", "seq-3"]
+
+
+def test_ReturnnDatasetIterDataPipe_resume():
+    from returnn.datasets.generating import StaticDataset
+
+    def _get_pipe() -> data_pipeline.ChunkingIterDataPipe:
+        dataset = StaticDataset([{"data": numpy.arange(n * 3).reshape(n, 3).astype("float32")} for n in range(1, 11)])
+        wrapped_dataset = returnn_dataset_wrapper.ReturnnDatasetIterDataPipe(dataset, with_seq_idx=True)
+        return data_pipeline.ChunkingIterDataPipe(wrapped_dataset, 3)
+
+    def _get_chunks(pipe: data_pipeline.ChunkingIterDataPipe) -> list:
+        return [(str(chunk["seq_tag"]), int(chunk[":chunk_idx"]), chunk["data"].tolist()) for chunk in pipe]
+
+    chunks = _get_chunks(_get_pipe())
+    pipe = _get_pipe()
+    # Like the engine, get the position after some batches.
+    batches_dataset = data_pipeline.BatchingIterDataPipe(pipe, batch_size=12)
+    batches = iter(batches_dataset)
+    batch = data_pipeline.collate_batch(next(batches))
+    num_chunks = len(batch["data"])
+    position = data_pipeline.pop_data_position_after_batch(batch)
+    assert ":seq_idx" not in batch
+    assert position == (3, 1)  # seqs of len 1, 2, 3, and the first chunk of the seq of len 4
+    pipe = _get_pipe()
+    # noinspection PyProtectedMember
+    pipe._dataset.set_resume_position(epoch=1, seq_idx=position[0], chunk_idx=position[1])
+    assert _get_chunks(pipe) == chunks[num_chunks:]
+    # Only once.
+    assert _get_chunks(pipe) == chunks
+
+
+def test_DevicePrefetchDataIter():
+    from returnn.torch.data.device_prefetch_data_iter import DevicePrefetchDataIter
+
+    def _get_loader() -> DataLoader:
+        dataset = Task12AXDataset(num_seqs=20)
+        wrapped_dataset = returnn_dataset_wrapper.ReturnnDatasetIterDataPipe(dataset)
+        batches_dataset = data_pipeline.BatchingIterDataPipe(wrapped_dataset, batch_size=50, max_seqs=3)
+        return data_pipeline.create_data_loader_from_batches(batches_dataset)
+
+    batches = list(_get_loader())
+    batches_ = list(DevicePrefetchDataIter(_get_loader(), device="cpu"))
+    assert len(batches) == len(batches_) > 1
+    for batch, batch_ in zip(batches, batches_):
+        assert set(batch.keys()) == set(batch_.keys())
+        for key in batch.keys():
+            if isinstance(batch[key], torch.Tensor):
+                assert batch_[key].device.type == "cpu"
+                assert torch.equal(batch[key], batch_[key])
+
+
 def test_HDFDataset():
     # https://github.com/rwth-i6/returnn/issues/1281
     from test_HDFDataset import generate_hdf_from_other, HDFDataset
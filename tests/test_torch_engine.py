@@ -5,6 +5,7 @@ Tests for PyTorch engine.
 from __future__ import annotations
 import _setup_test_env  # noqa
 import sys
+from typing import Optional, Dict
 import unittest
 import tempfile
 import numpy
@@ -71,6 +72,287 @@ def test_torch_engine_train():
         engine.train()
 
 
+def test_torch_engine_train_loss_sync_interval():
+    def _get_model(**_kwargs):
+        return torch.nn.Linear(9, 2)
+
+    def _train_step(*, model: torch.nn.Module, extern_data: TensorDict, **_kwargs):
+        data: Tensor = extern_data["data"]
+        logits = model(data.raw_tensor)
+        targets = extern_data["classes"].raw_tensor
+        loss = torch.nn.CrossEntropyLoss(reduction="none")(logits.flatten(0, 1), targets.flatten().long())
+        rf.get_run_ctx().mark_as_loss(name="ce", loss=loss)
+
+    def _train(**kwargs) -> Dict[str, float]:
+        config = Config(
+            dict(
+                task="train",
+                device="cpu",
+                extern_data={"data": {"dim": 9}, "classes": {"dim": 2, "sparse": True}},
+                get_model=_get_model,
+                train_step=_train_step,
+                batch_size=500,
+                optimizer={"class": "adam"},
+                num_epochs=1,
+                **kwargs,
+            )
+        )
+        dataset = init_dataset({"class": "Task12AXDataset", "num_seqs": 100, "name": "train", "fixed_random_seed": 1})
+        dataset.init_seq_order(epoch=1)
+        torch.manual_seed(42)
+        with global_config_ctx(config):
+            engine = Engine(config=config)
+            engine.init_train_from_config(train_data=dataset)
+            engine.train()
+            return engine.learning_rate_control.epoch_data[1].error
+
+    error = _train()
+    error_ = _train(torch_train_loss_sync_interval=3)
+    print(error, error_)
+    assert error == error_
+
+
+def test_torch_engine_train_data_loader_profile_autotune():
+    def _get_model(**_kwargs):
+        return torch.nn.Linear(9, 2)
+
+    def _train_step(*, model: torch.nn.Module, extern_data: TensorDict, **_kwargs):
+        data: Tensor = extern_data["data"]
+        logits = model(data.raw_tensor)
+        targets = extern_data["classes"].raw_tensor
+        loss = torch.nn.CrossEntropyLoss(reduction="none")(logits.flatten(0, 1), targets.flatten().long())
+        rf.get_run_ctx().mark_as_loss(name="ce", loss=loss)
+
+    config = Config(
+        dict(
+            task="train",
+            device="cpu",
+            extern_data={"data": {"dim": 9}, "classes": {"dim": 2, "sparse": True}},
+            get_model=_get_model,
+            train_step=_train_step,
+            batch_size=500,
+            chunking="10:5",
+            optimizer={"class": "adam"},
+            num_epochs=2,
+            torch_dataloader_profile=True,
+            torch_dataloader_autotune={"num_steps": 3, "num_workers": [0, 1], "prefetch_factor": [2]},
+        )
+    )
+    dataset = init_dataset({"class": "Task12AXDataset", "num_seqs": 100, "name": "train"})
+    dataset.init_seq_order(epoch=1)
+    with global_config_ctx(config):
+        engine = Engine(config=config)
+        engine.init_train_from_config(train_data=dataset)
+        engine.train()
+        meta1 = engine.learning_rate_control.epoch_data[1].meta
+        meta2 = engine.learning_rate_control.epoch_data[2].meta
+    print(meta1)
+    autotune = meta1["data_loader_autotune"]
+    assert autotune["num_workers"] in {0, 1}
+    assert len(autotune["batches_per_sec"]) == 2
+    assert autotune["secs"] > 0
+    assert "data_loader_autotune" not in meta2  # only done once
+    for meta in [meta1, meta2]:
+        assert meta["epoch_data_wait_secs"] >= 0
+        stages = meta["epoch_data_stage_secs"]
+        assert set(stages.keys()) == {
+            "ReturnnDatasetIterDataPipe",
+            "ChunkingIterDataPipe",
+            "BatchingIterDataPipe",
+            "collate_batch",
+        }
+        assert all(v >= 0 for v in stages.values())
+
+
+def test_torch_engine_train_async_checkpoint():
+    import os
+
+    def _get_model(**_kwargs):
+        return torch.nn.Linear(9, 2)
+
+    def _train_step(*, model: torch.nn.Module, extern_data: TensorDict, **_kwargs):
+        data: Tensor = extern_data["data"]
+        logits = model(data.raw_tensor)
+        targets = extern_data["classes"].raw_tensor
+        loss = torch.nn.CrossEntropyLoss(reduction="none")(logits.flatten(0, 1), targets.flatten().long())
+        rf.get_run_ctx().mark_as_loss(name="ce", loss=loss)
+
+    with tempfile.TemporaryDirectory(prefix="returnn_test_torch_engine_train_async_checkpoint") as tmp_dir:
+        config = Config(
+            dict(
+                task="train",
+                device="cpu",
+                extern_data={"data": {"dim": 9}, "classes": {"dim": 2, "sparse": True}},
+                get_model=_get_model,
+                train_step=_train_step,
+                batch_size=500,
+                optimizer={"class": "adam"},
+                num_epochs=2,
+                model=tmp_dir + "/model",
+                learning_rate_file=tmp_dir + "/lr.txt",
+                torch_async_checkpoint=True,
+            )
+        )
+        dataset = init_dataset({"class": "Task12AXDataset", "num_seqs": 100, "name": "train"})
+        dataset.init_seq_order(epoch=1)
+        with global_config_ctx(config):
+            engine = Engine(config=config)
+            engine.init_train_from_config(train_data=dataset)
+            engine.train()
+
+            print(sorted(os.listdir(tmp_dir)))
+            assert not [fn for fn in os.listdir(tmp_dir) if "tmp" in fn]
+            for epoch in [1, 2]:
+                assert os.path.exists(f"{tmp_dir}/model.{epoch:03}.pt")
+                assert os.path.exists(f"{tmp_dir}/model.{epoch:03}.opt.pt")
+            ckpt = torch.load(f"{tmp_dir}/model.002.pt")
+            assert ckpt["epoch"] == 2
+            for key, value in engine.get_pt_model().state_dict().items():
+                assert torch.equal(ckpt["model"][key], value)
+            opt_ckpt = torch.load(f"{tmp_dir}/model.002.opt.pt")
+            engine.get_pt_optimizer().load_state_dict(opt_ckpt["optimizer"])
+
+
+def test_torch_engine_train_step_checkpoint_resume():
+    import os
+
+    class _Crash(Exception):
+        pass
+
+    crash_at_step = [None]
+
+    def _get_model(**_kwargs):
+        return torch.nn.Sequential(torch.nn.Linear(9, 10), torch.nn.Dropout(0.5), torch.nn.Linear(10, 2))
+
+    def _train_step(*, model: torch.nn.Module, extern_data: TensorDict, **_kwargs):
+        if rf.get_run_ctx().step == crash_at_step[0]:
+            raise _Crash(f"crash at step {crash_at_step[0]}")
+        data: Tensor = extern_data["data"]
+        logits = model(data.raw_tensor)
+        targets = extern_data["classes"].raw_tensor
+        loss = torch.nn.CrossEntropyLoss(reduction="none")(logits.flatten(0, 1), targets.flatten().long())
+        rf.get_run_ctx().mark_as_loss(name="ce", loss=loss)
+
+    def _train(tmp_dir: str, *, crash: Optional[int] = None):
+        config = Config(
+            dict(
+                task="train",
+                device="cpu",
+                extern_data={"data": {"dim": 9}, "classes": {"dim": 2, "sparse": True}},
+                get_model=_get_model,
+                train_step=_train_step,
+                batch_size=100,
+                chunking="10:7",
+                optimizer={"class": "adam"},
+                num_epochs=1,
+                model=tmp_dir + "/model",
+                learning_rate_file=tmp_dir + "/lr.txt",
+                torch_save_step_interval=3,
+            )
+        )
+        dataset = init_dataset({"class": "Task12AXDataset", "num_seqs": 20, "name": "train", "fixed_random_seed": 1})
+        dataset.init_seq_order(epoch=1)
+        crash_at_step[0] = crash
+        torch.manual_seed(42)
+        with global_config_ctx(config):
+            engine = Engine(config=config)
+            engine.init_train_from_config(train_data=dataset)
+            engine.train()
+            return engine.get_pt_model().state_dict(), engine.learning_rate_control.epoch_data[1].error
+
+    with tempfile.TemporaryDirectory(prefix="returnn_test_torch_engine_train_step_checkpoint_resume") as tmp_dir:
+        os.mkdir(tmp_dir + "/ref")
+        os.mkdir(tmp_dir + "/resume")
+        params_ref, error_ref = _train(tmp_dir + "/ref")
+        assert not os.path.exists(tmp_dir + "/ref/model.step_ckpt.pt")  # deleted at the end of the epoch
+        try:
+            _train(tmp_dir + "/resume", crash=8)
+        except _Crash:
+            pass
+        else:
+            raise Exception("expected crash")
+        assert os.path.exists(tmp_dir + "/resume/model.step_ckpt.pt")
+        assert not os.path.exists(tmp_dir + "/resume/model.001.pt")
+        params, error = _train(tmp_dir + "/resume")
+        assert os.path.exists(tmp_dir + "/resume/model.001.pt")
+
+    print(error_ref, error)
+    assert error == error_ref
+    assert params.keys() == params_ref.keys()
+    for key in params.keys():
+        assert torch.equal(params[key], params_ref[key]), f"param {key} differs"
+
+
+def test_torch_engine_train_step_checkpoint_resume_autotune():
+    import os
+
+    class _Crash(Exception):
+        pass
+
+    crash_at_step = [None]
+
+    def _get_model(**_kwargs):
+        return torch.nn.Linear(9, 2)
+
+    def _train_step(*, model: torch.nn.Module, extern_data: TensorDict, **_kwargs):
+        if rf.get_run_ctx().step == crash_at_step[0]:
+            raise _Crash(f"crash at step {crash_at_step[0]}")
+        data: Tensor = extern_data["data"]
+        logits = model(data.raw_tensor)
+        targets = extern_data["classes"].raw_tensor
+        loss = torch.nn.CrossEntropyLoss(reduction="none")(logits.flatten(0, 1), targets.flatten().long())
+        rf.get_run_ctx().mark_as_loss(name="ce", loss=loss)
+
+    def _train(tmp_dir: str, *, crash: Optional[int] = None):
+        config = Config(
+            dict(
+                task="train",
+                device="cpu",
+                extern_data={"data": {"dim": 9}, "classes": {"dim": 2, "sparse": True}},
+                get_model=_get_model,
+                train_step=_train_step,
+                batch_size=100,
+                chunking="10:7",
+                optimizer={"class": "adam"},
+                num_epochs=1,
+                model=tmp_dir + "/model",
+                learning_rate_file=tmp_dir + "/lr.txt",
+                torch_save_step_interval=3,
+                torch_dataloader_autotune={"num_steps": 2, "num_workers": [0, 1, 2], "prefetch_factor": [2]},
+            )
+        )
+        dataset = init_dataset({"class": "Task12AXDataset", "num_seqs": 20, "name": "train", "fixed_random_seed": 1})
+        dataset.init_seq_order(epoch=1)
+        crash_at_step[0] = crash
+        torch.manual_seed(42)
+        with global_config_ctx(config):
+            engine = Engine(config=config)
+            engine.init_train_from_config(train_data=dataset)
+            engine.train()
+            epoch_data = engine.learning_rate_control.epoch_data[1]
+            return engine.get_pt_model().state_dict(), epoch_data.error, epoch_data.meta["data_loader_autotune"]
+
+    with tempfile.TemporaryDirectory(prefix="returnn_test_torch_engine_train_step_ckpt_autotune") as tmp_dir:
+        os.mkdir(tmp_dir + "/ref")
+        os.mkdir(tmp_dir + "/resume")
+        params_ref, error_ref, autotune = _train(tmp_dir + "/ref")
+        print(autotune)
+        assert len(autotune["batches_per_sec"]) == 2  # num_workers=2 is not tried
+        assert autotune["num_workers"] in {0, 1}
+        try:
+            _train(tmp_dir + "/resume", crash=8)
+        except _Crash:
+            pass
+        else:
+            raise Exception("expected crash")
+        params, error, _ = _train(tmp_dir + "/resume")
+
+    print(error_ref, error)
+    assert error == error_ref
+    for key in params.keys():
+        assert torch.equal(params[key], params_ref[key]), f"param {key} differs"
+
+
 def test_torch_engine_forward_simple():
     def _get_model(**_kwargs):
         return torch.nn.Module()
@@ -147,6 +429,61 @@ def test_torch_engine_forward():
         assert callback.init_called and callback.finish_called
 
 
+def test_torch_engine_forward_seqs_dynamic_batcher():
+    import threading
+    from returnn.engine.batching_server import DynamicBatcher
+
+    def _get_model(**_kwargs):
+        return torch.nn.Module()
+
+    num_forward_steps = [0]
+
+    def _forward_step(*, extern_data: TensorDict, **_kwargs):
+        num_forward_steps[0] += 1
+        rf.get_run_ctx().mark_as_default_output(extern_data["data"])
+
+    config = Config(
+        dict(
+            task="forward",
+            extern_data={"data": {"dim": 3}, "classes": {"dim": 5, "sparse": True}},
+            batch_size=500,
+            get_model=_get_model,
+            forward_step=_forward_step,
+        )
+    )
+    rnd = numpy.random.RandomState(42)
+    inputs = [rnd.normal(size=(rnd.randint(1, 20), 3)).astype("float32") for _ in range(10)]
+
+    with global_config_ctx(config):
+        engine = Engine(config=config)
+        engine.init_network_from_config()
+        outputs = engine.forward_seqs([{"data": x} for x in inputs])
+        assert num_forward_steps[0] == 1
+        assert len(outputs) == len(inputs)
+        for x, out in zip(inputs, outputs):
+            numpy.testing.assert_array_equal(out["output"], x)
+
+        num_forward_steps[0] = 0
+        batcher = DynamicBatcher(
+            lambda xs: engine.forward_seqs([{"data": x} for x in xs]), max_batch_size=4, max_wait_time=0.5
+        )
+        batcher.start()
+        results = [None] * len(inputs)
+
+        def _client(idx):
+            results[idx] = batcher.process(inputs[idx])
+
+        clients = [threading.Thread(target=_client, args=(i,)) for i in range(len(inputs))]
+        for t in clients:
+            t.start()
+        for t in clients:
+            t.join()
+        batcher.stop()
+        for x, out in zip(inputs, results):
+            numpy.testing.assert_array_equal(out["output"], x)
+        assert batcher.num_requests == len(inputs) and batcher.num_batches == num_forward_steps[0] < len(inputs)
+
+
 def test_torch_engine_forward_pure_torch_no_model_out():
     # https://github.com/rwth-i6/returnn/issues/1385
     # Automatically assume that we have batch-dim first in mark_as_output with raw tensor.
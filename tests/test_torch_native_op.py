@@ -0,0 +1,193 @@
+"""
+tests for returnn.torch.native_op
+"""
+
+import _setup_test_env  # noqa
+
+import sys
+import unittest
+import numpy.testing
+import torch
+
+from returnn.util import better_exchook
+from returnn.tensor import Tensor, Dim
+import returnn.frontend as rf
+import returnn.native_op as native_op
+from returnn.torch import native_op as torch_native_op
+
+
+rf.select_backend_torch()
+
+
+def _naive_edit_distance(a, b):
+    row = list(range(len(b) + 1))
+    for i, a_ in enumerate(a):
+        prev_row, row = row, [i + 1]
+        for j, b_ in enumerate(b):
+            row.append(min(prev_row[j + 1] + 1, row[j] + 1, prev_row[j] + (a_ != b_)))
+    return row[-1]
+
+
+def _make_ctc_inputs():
+    torch.manual_seed(42)
+    n_time, n_batch, n_classes = 7, 3, 5
+    logits = torch.randn(n_time, n_batch, n_classes)
+    logits_seq_lens = torch.tensor([7, 5, 6])
+    targets = torch.tensor([[1, 2, 2], [3, 0, 0], [1, 4, 0]])
+    targets_seq_lens = torch.tensor([3, 1, 2])
+    return logits, logits_seq_lens, targets, targets_seq_lens
+
+
+def test_edit_distance():
+    a = torch.tensor([[1, 2, 3, 4], [1, 2, 0, 0], [5, 5, 5, 5], [0, 0, 0, 0]])
+    a_len = torch.tensor([4, 2, 4, 0])
+    b = torch.tensor([[1, 3, 4], [2, 2, 2], [5, 5, 0], [1, 2, 0]])
+    b_len = torch.tensor([3, 3, 2, 2])
+    res = torch_native_op.edit_distance(a, a_len, b, b_len)
+    assert res.dtype == torch.int32
+    ref = [_naive_edit_distance(a[i, : a_len[i]].tolist(), b[i, : b_len[i]].tolist()) for i in range(len(a))]
+    assert res.tolist() == ref == [1, 2, 2, 2]
+
+
+def test_ctc_loss_full_sum():
+    logits, logits_seq_lens, targets, targets_seq_lens = _make_ctc_inputs()
+    logits_ = logits.clone().requires_grad_()
+    loss = torch_native_op.ctc_loss(
+        logits_, logits_seq_lens, True, targets, targets_seq_lens, blank_index=0
+    )  # via FastBaumWelchOp
+    loss.sum().backward()
+    ref_logits = logits.clone().requires_grad_()
+    ref_loss = torch.nn.functional.ctc_loss(
+        ref_logits.log_softmax(-1), targets, logits_seq_lens, targets_seq_lens, blank=0, reduction="none"
+    )
+    ref_loss.sum().backward()
+    numpy.testing.assert_allclose(loss.detach().numpy(), ref_loss.detach().numpy(), rtol=1e-5)
+    numpy.testing.assert_allclose(logits_.grad.numpy(), ref_logits.grad.numpy(), atol=1e-5)
+
+
+def test_ctc_loss_viterbi():
+    logits, logits_seq_lens, targets, targets_seq_lens = _make_ctc_inputs()
+    loss_full_sum = torch_native_op.ctc_loss(logits, logits_seq_lens, True, targets, targets_seq_lens, blank_index=0)
+    log_probs = logits.log_softmax(-1)
+    edges, weights, start_end_states = torch_native_op.get_ctc_fsa_fast_bw(targets, targets_seq_lens, blank_idx=0)
+    alignment, scores = torch_native_op.fast_viterbi(log_probs, logits_seq_lens, edges, weights, start_end_states)
+    assert alignment.shape == logits.shape[:2]
+    for b in range(logits.shape[1]):
+        align_b = alignment[: logits_seq_lens[b], b].tolist()
+        # The alignment must be valid for the targets (CTC collapse).
+        labels = [label for i, label in enumerate(align_b) if label != 0 and (i == 0 or align_b[i - 1] != label)]
+        assert labels == targets[b, : targets_seq_lens[b]].tolist()
+        score = sum(log_probs[t, b, align_b[t]] for t in range(len(align_b)))
+        numpy.testing.assert_allclose(scores[b].item(), score.item(), rtol=1e-5)
+    # The best path has a higher probability than the full sum.
+    assert (-scores >= loss_full_sum - 1e-5).all()
+
+    logits_ = logits.clone().requires_grad_()
+    loss = torch_native_op.ctc_loss_viterbi(logits_, logits_seq_lens, True, targets, targets_seq_lens, blank_index=0)
+    numpy.testing.assert_allclose(loss.detach().numpy(), -scores.numpy(), rtol=1e-5)
+    loss.sum().backward()
+    # Gradient of the CE with the Viterbi alignment.
+    ref_logits = logits.clone().requires_grad_()
+    mask = torch.arange(logits.shape[0])[:, None] < logits_seq_lens[None, :]
+    ref_ce = torch.nn.functional.cross_entropy(
+        ref_logits.flatten(0, 1), alignment.long().flatten(), reduction="none"
+    ).view(mask.shape)
+    (ref_ce * mask).sum().backward()
+    numpy.testing.assert_allclose(logits_.grad.numpy(), ref_logits.grad.numpy(), atol=1e-5)
+
+
+def test_native_op_grad():
+    # NativeLstm2 has c_bw_code, i.e. the gradient via autograd is covered here.
+    torch.manual_seed(42)
+    n_time, n_batch, n_dim = 4, 2, 3
+    x = torch.randn(n_time, n_batch, n_dim * 4, requires_grad=True)
+    w = torch.randn(n_dim, n_dim * 4, requires_grad=True) * 0.1
+    y0 = torch.zeros(n_batch, n_dim)
+    c0 = torch.zeros(n_batch, n_dim)
+    index = torch.ones(n_time, n_batch)
+    op = torch_native_op.make_op(native_op.NativeLstm2)
+
+    def _loss(x_: torch.Tensor, w_: torch.Tensor) -> torch.Tensor:
+        y, _, _, _ = op(x_, w_, y0, c0, index, 0, 1)
+        return (y**2).sum()
+
+    _loss(x, w).backward()
+    for idx in [0, 5, 17]:
+        eps = 1e-2
+        delta = torch.zeros_like(x).view(-1)
+        delta[idx] = eps
+        delta = delta.view(x.shape)
+        with torch.no_grad():
+            num_grad = (_loss(x + delta, w) - _loss(x - delta, w)) / (2 * eps)
+        numpy.testing.assert_allclose(x.grad.view(-1)[idx].item(), num_grad.item(), rtol=1e-2, atol=1e-3)
+
+
+def test_rf_edit_distance():
+    batch_dim = Dim(3, name="batch")
+    a_spatial_dim = Dim(Tensor("a_len", [batch_dim], dtype="int64", raw_tensor=torch.tensor([4, 2, 0])))
+    b_spatial_dim = Dim(Tensor("b_len", [batch_dim], dtype="int64", raw_tensor=torch.tensor([3, 3, 1])))
+    vocab_dim = Dim(6, name="vocab")
+    a = Tensor(
+        "a",
+        [batch_dim, a_spatial_dim],
+        dtype="int32",
+        sparse_dim=vocab_dim,
+        raw_tensor=torch.tensor([[1, 2, 3, 4], [1, 2, 0, 0], [0, 0, 0, 0]], dtype=torch.int32),
+    )
+    b = Tensor(
+        "b",
+        [b_spatial_dim, batch_dim],  # different order on purpose
+        dtype="int32",
+        sparse_dim=vocab_dim,
+        raw_tensor=torch.tensor([[1, 2, 5], [3, 2, 0], [4, 2, 0]], dtype=torch.int32),
+    )
+    res = rf.edit_distance(a, a_spatial_dim, b, b_spatial_dim)
+    assert res.dims == (batch_dim,) and res.dtype == "int32"
+    assert res.raw_tensor.tolist() == [1, 2, 1]
+
+
+def test_rf_ctc_loss_max_approx():
+    logits, logits_seq_lens, targets, targets_seq_lens = _make_ctc_inputs()
+    batch_dim = Dim(logits.shape[1], name="batch")
+    time_dim = Dim(Tensor("time_len", [batch_dim], dtype="int64", raw_tensor=logits_seq_lens))
+    targets_time_dim = Dim(Tensor("targets_len", [batch_dim], dtype="int64", raw_tensor=targets_seq_lens))
+    classes_dim = Dim(logits.shape[2], name="classes")
+    logits_ = Tensor("logits", [time_dim, batch_dim, classes_dim], dtype="float32", raw_tensor=logits)
+    logits_.feature_dim = classes_dim
+    targets_ = Tensor(
+        "targets", [batch_dim, targets_time_dim], dtype="int64", sparse_dim=classes_dim, raw_tensor=targets
+    )
+    loss = rf.ctc_loss(
+        logits=logits_,
+        targets=targets_,
+        input_spatial_dim=time_dim,
+        targets_spatial_dim=targets_time_dim,
+        blank_index=0,
+        max_approx=True,
+    )
+    ref_loss = torch_native_op.ctc_loss_viterbi(logits, logits_seq_lens, True, targets, targets_seq_lens, blank_index=0)
+    assert loss.dims == (batch_dim,)
+    numpy.testing.assert_allclose(loss.raw_tensor.numpy(), ref_loss.numpy(), rtol=1e-5)
+
+
+if __name__ == "__main__":
+    better_exchook.install()
+    if len(sys.argv) <= 1:
+        for k, v in sorted(globals().items()):
+            if k.startswith("test_"):
+                print("-" * 40)
+                print("Executing: %s" % k)
+                try:
+                    v()
+                except unittest.SkipTest as exc:
+                    print("SkipTest:", exc)
+                print("-" * 40)
+        print("Finished all tests.")
+    else:
+        assert len(sys.argv) >= 2
+        for arg in sys.argv[1:]:
+            print("Executing: %s" % arg)
+            if arg in globals():
+                globals()[arg]()  # assume function and execute
+            else:
+                eval(arg)  # assume Python code and execute
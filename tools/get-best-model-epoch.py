@@ -16,7 +16,7 @@ import _setup_returnn_env  # noqa
 from returnn.util import better_exchook
 from returnn.log import log
 from returnn.config import Config
-from returnn.learning_rate_control import LearningRateControl
+from returnn.learning_rate_control import LearningRateControl, read_learning_rate_file
 
 
 def main():
@@ -40,7 +40,8 @@ def main():
         config.load_file(args.config)
         lr = LearningRateControl.load_initial_from_config(config)
     elif args.learning_rate_file:
-        lr = LearningRateControl(default_learning_rate=1, filename=args.learning_rate_file)  # default lr not relevant
+        lr = LearningRateControl(default_learning_rate=1)  # default lr not relevant
+        lr.epoch_data = read_learning_rate_file(args.learning_rate_file)
     else:
         assert False, "should not get here with %r" % args
 
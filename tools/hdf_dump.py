@@ -18,12 +18,13 @@ from returnn.datasets import Dataset, init_dataset
 from returnn.config import Config
 
 
-def hdf_dataset_init(file_name):
+def hdf_dataset_init(file_name, **kwargs):
     """
     :param str file_name: filename of hdf dataset file in the filesystem
+    :param kwargs: passed to :class:`HDFDatasetWriter`, e.g. write_thread, compression
     :rtype: hdf_dataset_mod.HDFDatasetWriter
     """
-    return hdf_dataset_mod.HDFDatasetWriter(filename=file_name)
+    return hdf_dataset_mod.HDFDatasetWriter(filename=file_name, **kwargs)
 
 
 def hdf_dump_from_dataset(dataset, hdf_dataset, parser_args):
@@ -106,6 +107,10 @@ def main(argv):
     parser.add_argument("--start_seq", type=int, default=0, help="Start sequence index of the dataset to dump")
     parser.add_argument("--end_seq", type=int, default=float("inf"), help="End sequence index of the dataset to dump")
     parser.add_argument("--epoch", type=int, default=1, help="Optional start epoch for initialization")
+    parser.add_argument(
+        "--write_thread", action="store_true", help="Write in a background thread while loading the next seqs"
+    )
+    parser.add_argument("--compression", type=str, help="HDF compression for the data, e.g. gzip or lzf")
 
     args = parser.parse_args(argv[1:])
     returnn_config = None
@@ -115,7 +120,7 @@ def main(argv):
     else:
         dataset_config_str = args.config_file_or_dataset
     dataset = init(config_filename=returnn_config, cmd_line_opts=[], dataset_config_str=dataset_config_str)
-    hdf_dataset = hdf_dataset_init(args.hdf_filename)
+    hdf_dataset = hdf_dataset_init(args.hdf_filename, write_thread=args.write_thread, compression=args.compression)
     hdf_dump_from_dataset(dataset, hdf_dataset, args)
     hdf_close(hdf_dataset)
 
@@ -19,6 +19,10 @@ Script to average values of variables in a list of checkpoint files.
 
 This script is generic for any TF checkpoint. It is not specific to RETURNN.
 
+The variables are averaged one at a time (or multiple in parallel, ``--num_threads``),
+reading the variable from all checkpoints, with a running sum in float64,
+so only the averaged variables (in their original dtype) are kept in memory.
+
 Original code:
 https://github.com/tensorflow/tensor2tensor/blob/master/tensor2tensor/utils/avg_checkpoints.py
 """
@@ -26,8 +30,11 @@ https://github.com/tensorflow/tensor2tensor/blob/master/tensor2tensor/utils/avg_
 from __future__ import annotations
 
 import os
+import sys
+import time
 import numpy
 import logging
+from concurrent.futures import ThreadPoolExecutor
 import tensorflow as tf
 
 import _setup_returnn_env  # noqa
@@ -45,6 +52,7 @@ flags.DEFINE_integer(
 )
 flags.DEFINE_string("prefix", "", "Prefix (e.g., directory) to append to each checkpoint.")
 flags.DEFINE_string("output_path", "/tmp/averaged.ckpt", "Path to output the averaged checkpoint to.")
+flags.DEFINE_integer("num_threads", 1, "Number of variables to average in parallel.")
 
 
 def checkpoint_exists(path):
@@ -90,29 +98,44 @@ def main(_):
             raise ValueError("Could not find checkpoints at %s" % os.path.dirname(FLAGS.prefix))
 
     # Read variables from all checkpoints and average them.
+    start_time = time.time()
     tf_compat.v1.logging.info("Reading variables and averaging checkpoints:")
     for c in checkpoints:
         tf_compat.v1.logging.info("%s ", c)
     var_list = tf.train.list_variables(checkpoints[0])
-    var_values, var_dtypes = {}, {}
-    for (name, shape) in var_list:
-        var_values[name] = numpy.zeros(shape)
-    for checkpoint in checkpoints:
-        reader = tf.train.load_checkpoint(checkpoint)
-        for name in var_values:
+    readers = [tf.train.load_checkpoint(c) for c in checkpoints]  # these read the tensors on demand
+
+    def _average(name):
+        """
+        :param str name:
+        :rtype: numpy.ndarray
+        """
+        sum_ = None
+        tensor = None
+        for reader in readers:
             tensor = reader.get_tensor(name)
             if not isinstance(tensor, numpy.ndarray):  # e.g. int (scalar)
                 tensor = numpy.array(tensor)
             assert isinstance(tensor, numpy.ndarray)
-            var_dtypes[name] = tensor.dtype
-            if isinstance(tensor.dtype, numpy.integer):
-                var_values[name] = tensor  # just take last
+            if tensor.dtype.kind != "f" and tensor.dtype.name != "bfloat16":  # e.g. int or bool
+                continue  # just take last
+            if sum_ is None:
+                sum_ = tensor.astype(numpy.float64)
             else:
-                var_values[name] += tensor
-        tf_compat.v1.logging.info("Read from checkpoint %s", checkpoint)
-    for name in var_values:  # Average.
-        if not isinstance(var_dtypes[name], numpy.integer):
-            var_values[name] /= len(checkpoints)
+                sum_ += tensor
+        if sum_ is None:
+            return tensor
+        return (sum_ / len(readers)).astype(tensor.dtype)
+
+    if FLAGS.num_threads > 1:
+        with ThreadPoolExecutor(max_workers=FLAGS.num_threads) as executor:
+            values = list(executor.map(_average, [name for (name, _) in var_list]))
+    else:
+        values = [_average(name) for (name, _) in var_list]
+    var_values = {name: value for ((name, _), value) in zip(var_list, values)}
+    var_dtypes = {name: value.dtype for (name, value) in var_values.items()}
+    del readers, values
+    tf_compat.v1.logging.info("Averaged %i variables in %.1f secs", len(var_values), time.time() - start_time)
 
     with tf_compat.v1.variable_scope(tf_compat.v1.get_variable_scope(), reuse=tf_compat.v1.AUTO_REUSE):
         tf_vars = [tf_compat.v1.get_variable(v, shape=var_values[v].shape, dtype=var_dtypes[v]) for v in var_values]
@@ -128,7 +151,26 @@ def main(_):
         # Use the built saver to save the averaged checkpoint.
         saver.save(sess, FLAGS.output_path)
 
-    tf_compat.v1.logging.info("Averaged checkpoints saved in %s", FLAGS.output_path)
+    tf_compat.v1.logging.info(
+        "Averaged checkpoints saved in %s, took %.1f secs, peak RSS %s",
+        FLAGS.output_path,
+        time.time() - start_time,
+        _get_peak_rss_str(),
+    )
+
+
+def _get_peak_rss_str():
+    """
+    :rtype: str
+    """
+    try:
+        import resource
+    except ImportError:  # e.g. Windows
+        return "?"
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != "darwin":
+        peak_rss *= 1024  # Linux: kilobytes, MacOS: bytes
+    return "%.1f MB" % (peak_rss / 1024**2)
 
 
 if __name__ == "__main__":
@@ -3,6 +3,12 @@
 """
 Average model checkpoints.
 
+The checkpoints are loaded lazily via memory-mapping (``torch.load(..., mmap=True)``, PyTorch >= 2.1),
+and the parameters are averaged in chunks (``--chunk_size_mb``), with running sums in float64.
+For each chunk, the checkpoints are mapped one after another, and only the parameters of the chunk are read.
+So the memory usage is mostly the size of the output checkpoint plus the chunk,
+independent of the number of input checkpoints.
+
 References:
     Our :file:`tf_avg_checkpoins.py`.
     https://github.com/espnet/espnet/blob/master/utils/average_checkpoints.py
@@ -12,9 +18,11 @@ References:
 from __future__ import annotations
 
 import os
-from typing import Optional, Any, Sequence, Dict
-from collections import defaultdict
+import sys
+import time
+from typing import Optional, Any, Sequence, Tuple, List, Dict
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 import torch
 
 
@@ -31,6 +39,10 @@ def main():
     arg_parser.add_argument("--prefix", default="", help="add this as a prefix to the input checkpoints")
     arg_parser.add_argument("--postfix", default="", help="add this as a postfix to the input checkpoints (e.g. '.pt')")
     arg_parser.add_argument("--output_path", required=True, help="output checkpoint")
+    arg_parser.add_argument("--num_threads", type=int, default=1, help="average multiple parameters in parallel")
+    arg_parser.add_argument(
+        "--chunk_size_mb", type=float, default=256.0, help="size of the float64 running sums of one chunk"
+    )
     args = arg_parser.parse_args()
 
     in_ckpts = []
@@ -54,36 +66,52 @@ def main():
             _add_in_ckpt(in_ckpt)
 
     print("out ckpt:", args.output_path)
-    merge_checkpoints(in_ckpts=in_ckpts, out_ckpt=args.output_path)
-    print("Done.")
+    start_time = time.time()
+    merge_checkpoints(
+        in_ckpts=in_ckpts,
+        out_ckpt=args.output_path,
+        num_threads=args.num_threads,
+        chunk_size_bytes=int(args.chunk_size_mb * 1024**2),
+    )
+    print(f"Done, took {time.time() - start_time:.1f} secs, peak RSS {_get_peak_rss_str()}.")
 
 
-def merge_checkpoints(in_ckpts: Sequence[str], out_ckpt: str, extra_state: Optional[Dict[str, Any]] = None):
+def merge_checkpoints(
+    in_ckpts: Sequence[str],
+    out_ckpt: str,
+    extra_state: Optional[Dict[str, Any]] = None,
+    *,
+    num_threads: int = 1,
+    chunk_size_bytes: int = 256 * 1024**2,
+):
     """
     Merge checkpoints
+
+    :param in_ckpts:
+    :param out_ckpt:
+    :param extra_state: added to the output state
+    :param num_threads: number of parameters which are averaged in parallel
+    :param chunk_size_bytes: max size of the float64 running sums of the parameters which are averaged together.
+        Every input checkpoint is loaded once per chunk, which is cheap with memory-mapping.
     """
-    out_model_state: Dict[str, torch.Tensor] = {}
-    out_model_state_num: Dict[str, int] = defaultdict(int)
-    out_state: Dict[str, Any] = {"model": out_model_state, "merged_epochs": [], "merged_steps": []}
+    out_state: Dict[str, Any] = {"model": {}, "merged_epochs": [], "merged_steps": []}
+    # key -> (shape, dtype, count). ordered like in the checkpoints
+    model_params: Dict[str, Tuple[torch.Size, torch.dtype, int]] = {}
     for in_ckpt in in_ckpts:
         print("read ckpt:", in_ckpt)
-        torch_version = tuple(int(s) for s in str(torch.__version__).split(".")[:2])
-        load_kwargs = dict(map_location=torch.device("cpu"), mmap=True)
-        if torch_version < (2, 1):
-            load_kwargs.pop("mmap")  # mmap flag only introduced from 2.1.0 onwards
-        in_state = torch.load(in_ckpt, **load_kwargs)
-        assert isinstance(in_state, dict)
+        in_state = _load_ckpt(in_ckpt)
 
         assert "model" in in_state and isinstance(in_state["model"], dict)
         covered_keys = {"model"}
         for k, v in in_state["model"].items():
             k: str
             v: torch.Tensor
-            if k in out_model_state:
-                out_model_state[k] += v
+            if k in model_params:
+                shape, dtype, count = model_params[k]
+                assert v.shape == shape, f"{in_ckpt}: param {k!r} shape {v.shape} does not match {shape}"
+                model_params[k] = (shape, dtype, count + 1)
             else:
-                out_model_state[k] = v
-            out_model_state_num[k] += 1
+                model_params[k] = (v.shape, v.dtype, 1)
 
         # Take max value of the following
         for k in ["epoch", "step"]:
@@ -110,8 +138,43 @@ def merge_checkpoints(in_ckpts: Sequence[str], out_ckpt: str, extra_state: Optio
                 out_state[k] = v
 
     # Average
-    for k in out_model_state:
-        out_model_state[k] = out_model_state[k] / out_model_state_num[k]
+    if not _have_mmap():
+        chunk_size_bytes = 0  # without mmap, loading is expensive, so do everything in a single chunk
+    chunks: List[List[str]] = [[]]
+    chunk_bytes = 0
+    for k, (shape, _, _) in model_params.items():
+        num_bytes = shape.numel() * 8  # float64
+        if chunks[-1] and chunk_size_bytes and chunk_bytes + num_bytes > chunk_size_bytes:
+            chunks.append([])
+            chunk_bytes = 0
+        chunks[-1].append(k)
+        chunk_bytes += num_bytes
+    executor = ThreadPoolExecutor(max_workers=num_threads) if num_threads > 1 else None
+    for chunk_idx, chunk in enumerate(chunks):
+        if len(chunks) > 1:
+            print(f"average chunk {chunk_idx + 1}/{len(chunks)} with {len(chunk)} params")
+        # Running sums in float64, to not lose precision for many checkpoints or low precision types (e.g. bfloat16).
+        sums = {k: torch.zeros(model_params[k][0], dtype=torch.float64) for k in chunk}
+        for in_ckpt in in_ckpts:
+            in_model_state = _load_ckpt(in_ckpt)["model"]
+
+            def _add(k: str):
+                if k in in_model_state:
+                    sums[k] += in_model_state[k]
+
+            if executor:
+                list(executor.map(_add, chunk))
+            else:
+                for k_ in chunk:
+                    _add(k_)
+            del in_model_state  # unmap
+        for k in chunk:
+            _, dtype, count = model_params[k]
+            v = sums.pop(k)
+            v /= count
+            out_state["model"][k] = v.to(dtype if dtype.is_floating_point else torch.get_default_dtype())
+    if executor:
+        executor.shutdown()
 
     if extra_state:
         out_state.update(extra_state)
@@ -120,5 +183,30 @@ def merge_checkpoints(in_ckpts: Sequence[str], out_ckpt: str, extra_state: Optio
     torch.save(out_state, out_ckpt)
 
 
+def _have_mmap() -> bool:
+    torch_version = tuple(int(s) for s in str(torch.__version__).split(".")[:2])
+    return torch_version >= (2, 1)  # mmap flag only introduced from 2.1.0 onwards
+
+
+def _load_ckpt(filename: str) -> Dict[str, Any]:
+    load_kwargs = dict(map_location=torch.device("cpu"), mmap=True)
+    if not _have_mmap():
+        load_kwargs.pop("mmap")
+    state = torch.load(filename, **load_kwargs)
+    assert isinstance(state, dict)
+    return state
+
+
+def _get_peak_rss_str() -> str:
+    try:
+        import resource
+    except ImportError:  # e.g. Windows
+        return "?"
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != "darwin":
+        peak_rss *= 1024  # Linux: kilobytes, MacOS: bytes
+    return f"{peak_rss / 1024 ** 2:.1f} MB"
+
+
 if __name__ == "__main__":
     main()